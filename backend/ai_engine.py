@@ -3,19 +3,270 @@ Biped AI Engine - Intelligent Job Matching and Analytics
 Provides AI-powered features for the marketplace platform
 """
 
+import hashlib
 import json
-import re
+import logging
 import math
+import os
 import random
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass
+import re
 import sqlite3
-from geopy.distance import geodesic
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import joblib
 import numpy as np
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 
+logger = logging.getLogger(__name__)
+
+# Location score by distance band: within 5/15/30/50 km, beyond 50 km
+LOCATION_BANDS_KM = (5, 15, 30, 50)
+LOCATION_BAND_SCORES = (1.0, 0.8, 0.6, 0.4, 0.2)
+
+# Keyword dictionaries for job description analysis. Keywords match anywhere
+# in the lowercased text, including inside longer words
+URGENCY_KEYWORDS = {
+    'asap': ['urgent', 'asap', 'immediately', 'emergency', 'today'],
+    'week': ['this week', 'soon', 'quickly', 'within days'],
+    'month': ['this month', 'few weeks', 'when possible'],
+    'flexible': ['flexible', 'no rush', 'when convenient']
+}
+
+COMPLEXITY_KEYWORDS = {
+    'simple': ['simple', 'basic', 'quick', 'small', 'minor'],
+    'medium': ['medium', 'standard', 'typical', 'regular'],
+    'complex': ['complex', 'major', 'large', 'extensive', 'complete']
+}
+
+SKILL_PATTERNS = {
+    'electrical': ['electrical', 'wiring', 'circuit', 'panel', 'outlet'],
+    'plumbing': ['plumbing', 'pipe', 'drain', 'water', 'leak'],
+    'construction': ['construction', 'building', 'renovation', 'carpentry'],
+    'tech': ['website', 'app', 'software', 'computer', 'digital'],
+    'automotive': ['car', 'vehicle', 'engine', 'brake', 'automotive'],
+    'landscaping': ['garden', 'lawn', 'landscape', 'tree', 'plant'],
+    'cleaning': ['clean', 'maintenance', 'janitorial', 'housekeeping']
+}
+
+ANALYSIS_CACHE_SIZE = 1024  # Job descriptions whose analysis is kept
+
+# Fitted skill matcher loaded at startup (see train_skill_matcher.py)
+SKILL_MATCHER_PATH = os.getenv(
+    'SKILL_MATCHER_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'skill_matcher.joblib')
+)
+
+
+class KeywordMatcher:
+    """
+    Finds which of many keyword groups occur in a text with one compiled
+    regex. A lookahead at every position captures the longest keyword
+    starting there; shorter keywords inside a captured one (e.g. 'quick'
+    in 'quickly') are credited through a precomputed closure, so the result
+    equals checking every keyword with ``in``.
+    """
+    
+    def __init__(self, groups: Dict[Tuple[str, str], List[str]]):
+        keywords = sorted({keyword for words in groups.values() for keyword in words},
+                          key=lambda keyword: (-len(keyword), keyword))
+        self.pattern = re.compile(
+            '(?=(' + '|'.join(re.escape(keyword) for keyword in keywords) + '))'
+        )
+        # Groups credited by a match of each keyword, including its substrings
+        self.credits = {
+            keyword: {
+                group for group, words in groups.items()
+                if any(word in keyword for word in words)
+            }
+            for keyword in keywords
+        }
+    
+    def find(self, text: str) -> Dict[Tuple[str, str], bool]:
+        """Groups with at least one keyword in ``text`` (case-insensitive)"""
+        found = {}
+        for keyword in set(self.pattern.findall(text.lower())):
+            for group in self.credits[keyword]:
+                found[group] = True
+        return found
+
+
+KEYWORD_MATCHER = KeywordMatcher({
+    **{('urgency', name): words for name, words in URGENCY_KEYWORDS.items()},
+    **{('complexity', name): words for name, words in COMPLEXITY_KEYWORDS.items()},
+    **{('skill', name): words for name, words in SKILL_PATTERNS.items()},
+})
+
+
+class AnalysisCache:
+    """Thread-safe bounded LRU of job analyses, with hit/miss counters"""
+    
+    def __init__(self, max_size: int = ANALYSIS_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            analysis = self._entries.get(key)
+            if analysis is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return analysis
+    
+    def set(self, key: str, analysis: Dict) -> None:
+        with self._lock:
+            self._entries[key] = analysis
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0
+            }
+
+
+class SemanticSkillMatcher:
+    """
+    TF-IDF over character n-grams of skill text, so related word forms
+    ('electrician' / 'electrical', 'plumber' / 'plumbing') score as similar.
+    
+    The vectorizer is fitted once on the skill vocabulary and job corpus and
+    persisted with joblib; workers load it instead of refitting. Indexed
+    providers' skill vectors stay resident as one sparse matrix, so scoring a
+    job against many providers is a single sparse matrix-vector product.
+    """
+    
+    VERSION = 1
+    
+    def __init__(self, vectorizer: Optional[TfidfVectorizer] = None):
+        self.vectorizer = vectorizer
+        self.provider_ids: List[str] = []
+        self.provider_texts: List[str] = []
+        self.provider_rows: Dict[str, int] = {}
+        self.provider_matrix = None  # CSR, one L2-normalized row per provider
+    
+    @staticmethod
+    def skill_text(skills: List[str]) -> str:
+        return ' '.join(skill.lower() for skill in skills if skill)
+    
+    @classmethod
+    def fit(cls, skill_vocabulary: List[str], job_corpus: List[str] = ()) -> 'SemanticSkillMatcher':
+        """Fit the vectorizer on skill names plus job titles/descriptions"""
+        vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(3, 5),
+                                     sublinear_tf=True, lowercase=True)
+        corpus = [text for text in list(skill_vocabulary) + list(job_corpus) if text]
+        vectorizer.fit(corpus or ['general'])
+        return cls(vectorizer)
+    
+    @classmethod
+    def default(cls) -> 'SemanticSkillMatcher':
+        """Matcher fitted on the built-in skill dictionaries"""
+        vocabulary = [skill for skill in SKILL_PATTERNS]
+        vocabulary += [word for words in SKILL_PATTERNS.values() for word in words]
+        return cls.fit(vocabulary)
+    
+    def transform(self, texts: List[str]):
+        return self.vectorizer.transform(texts)
+    
+    def index_providers(self, providers: List[Tuple[str, List[str]]]) -> None:
+        """Keep (provider id, skills) vectors resident, replacing the index"""
+        self.provider_ids = [str(provider_id) for provider_id, _ in providers]
+        self.provider_texts = [self.skill_text(skills) for _, skills in providers]
+        self.provider_rows = {provider_id: row for row, provider_id in enumerate(self.provider_ids)}
+        self.provider_matrix = self.transform(self.provider_texts).tocsr()
+    
+    def provider_vectors(self, providers: List[Tuple[str, List[str]]]):
+        """Rows for the given providers: resident ones reused, others transformed"""
+        texts = [self.skill_text(skills) for _, skills in providers]
+        rows, missing = [], []
+        for index, ((provider_id, _), text) in enumerate(zip(providers, texts)):
+            row = self.provider_rows.get(str(provider_id))
+            if row is not None and self.provider_texts[row] == text:
+                rows.append(row)
+            else:
+                rows.append(None)
+                missing.append(index)
+        
+        if not missing:
+            return self.provider_matrix[rows]
+        fresh = self.transform([texts[index] for index in missing])
+        if len(missing) == len(providers):
+            return fresh
+        # Resident rows first, then fresh ones; permute back to input order
+        known = [row for row in rows if row is not None]
+        stacked = sparse.vstack([self.provider_matrix[known], fresh]).tocsr()
+        order, next_known, next_fresh = [], 0, len(known)
+        for row in rows:
+            if row is None:
+                order.append(next_fresh)
+                next_fresh += 1
+            else:
+                order.append(next_known)
+                next_known += 1
+        return stacked[order]
+    
+    def similarities(self, job_skills: List[str], providers: List[Tuple[str, List[str]]]) -> np.ndarray:
+        """Cosine similarity of a job's skills to each provider's skills"""
+        if not providers:
+            return np.zeros(0)
+        job_vector = self.transform([self.skill_text(job_skills)])
+        # Rows are L2-normalized, so the dot product is the cosine
+        return np.asarray((self.provider_vectors(providers) @ job_vector.T).todense()).ravel()
+    
+    def similarity(self, job_skills: List[str], provider_skills: List[str]) -> float:
+        return float(self.similarities(job_skills, [('', provider_skills)])[0])
+    
+    def save(self, path: str = SKILL_MATCHER_PATH) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump({
+            'version': self.VERSION,
+            'vectorizer': self.vectorizer,
+            'provider_ids': self.provider_ids,
+            'provider_texts': self.provider_texts,
+            'provider_matrix': self.provider_matrix,
+        }, path)
+    
+    @classmethod
+    def load(cls, path: str = SKILL_MATCHER_PATH) -> 'SemanticSkillMatcher':
+        state = joblib.load(path)
+        if state.get('version') != cls.VERSION:
+            raise ValueError(f"Unsupported skill matcher version {state.get('version')}")
+        matcher = cls(state['vectorizer'])
+        matcher.provider_ids = state['provider_ids']
+        matcher.provider_texts = state['provider_texts']
+        matcher.provider_rows = {provider_id: row for row, provider_id in enumerate(matcher.provider_ids)}
+        matcher.provider_matrix = state['provider_matrix']
+        return matcher
+    
+    @classmethod
+    def load_or_default(cls, path: str = SKILL_MATCHER_PATH) -> 'SemanticSkillMatcher':
+        """The persisted matcher if there is a usable one, else the built-in fit"""
+        if os.path.exists(path):
+            try:
+                return cls.load(path)
+            except Exception as e:
+                # Corrupt or outdated file; fall back to the default fit
+                logger.warning(f"Could not load skill matcher from {path}: {e}")
+        return cls.default()
+
+
 @dataclass
 class JobRequirement:
     """Represents a job posting with requirements"""
@@ -62,7 +313,7 @@ class BipedAIEngine:
     """Main AI engine for Biped marketplace"""
     
     def __init__(self):
-        self.vectorizer = TfidfVectorizer(stop_words='english', max_features=1000)
+        self.skill_matcher = SemanticSkillMatcher.load_or_default()
         self.skill_weights = {
             'construction': 1.2,
             'electrical': 1.3,
@@ -72,55 +323,37 @@ class BipedAIEngine:
             'landscaping': 1.0,
             'cleaning': 0.9
         }
+        self.analysis_cache = AnalysisCache()
         
     def analyze_job_description(self, description: str) -> Dict:
         """
-        Analyze job description using AI to extract key information
+        Analyze job description using AI to extract key information.
+        Results are memoized by description, so re-analysing a job is free.
         """
-        # Extract urgency indicators
-        urgency_keywords = {
-            'asap': ['urgent', 'asap', 'immediately', 'emergency', 'today'],
-            'week': ['this week', 'soon', 'quickly', 'within days'],
-            'month': ['this month', 'few weeks', 'when possible'],
-            'flexible': ['flexible', 'no rush', 'when convenient']
-        }
-        
-        description_lower = description.lower()
-        detected_urgency = 'flexible'
-        
-        for urgency, keywords in urgency_keywords.items():
-            if any(keyword in description_lower for keyword in keywords):
-                detected_urgency = urgency
-                break
-                
-        # Extract complexity indicators
-        complexity_keywords = {
-            'simple': ['simple', 'basic', 'quick', 'small', 'minor'],
-            'medium': ['medium', 'standard', 'typical', 'regular'],
-            'complex': ['complex', 'major', 'large', 'extensive', 'complete']
-        }
+        key = hashlib.sha1(description.encode('utf-8')).hexdigest()
+        analysis = self.analysis_cache.get(key)
+        if analysis is None:
+            analysis = self._analyze_job_description(description)
+            self.analysis_cache.set(key, analysis)
+        # Copies, so callers can't modify the cached analysis
+        return dict(analysis, skills=list(analysis['skills']))
+    
+    def _analyze_job_description(self, description: str) -> Dict:
+        # One pass over the text finds every urgency, complexity and skill keyword
+        found = KEYWORD_MATCHER.find(description)
+        
+        # First urgency and complexity level (in dictionary order) with a keyword
+        detected_urgency = next(
+            (urgency for urgency in URGENCY_KEYWORDS if found.get(('urgency', urgency))),
+            'flexible'
+        )
+        complexity = next(
+            (level for level in COMPLEXITY_KEYWORDS if found.get(('complexity', level))),
+            'medium'
+        )
         
-        complexity = 'medium'
-        for level, keywords in complexity_keywords.items():
-            if any(keyword in description_lower for keyword in keywords):
-                complexity = level
-                break
-                
         # Extract skill requirements
-        skill_patterns = {
-            'electrical': ['electrical', 'wiring', 'circuit', 'panel', 'outlet'],
-            'plumbing': ['plumbing', 'pipe', 'drain', 'water', 'leak'],
-            'construction': ['construction', 'building', 'renovation', 'carpentry'],
-            'tech': ['website', 'app', 'software', 'computer', 'digital'],
-            'automotive': ['car', 'vehicle', 'engine', 'brake', 'automotive'],
-            'landscaping': ['garden', 'lawn', 'landscape', 'tree', 'plant'],
-            'cleaning': ['clean', 'maintenance', 'janitorial', 'housekeeping']
-        }
-        
-        detected_skills = []
-        for skill, patterns in skill_patterns.items():
-            if any(pattern in description_lower for pattern in patterns):
-                detected_skills.append(skill)
+        detected_skills = [skill for skill in SKILL_PATTERNS if found.get(('skill', skill))]
                 
         # Estimate budget based on complexity and skills
         base_rates = {
@@ -166,8 +399,13 @@ class BipedAIEngine:
             'confidence': 0.85
         }
     
-    def calculate_skill_match(self, job_skills: List[str], provider_skills: List[str]) -> float:
-        """Calculate skill compatibility between job and provider"""
+    def calculate_skill_match(self, job_skills: List[str], provider_skills: List[str],
+                              semantic: Optional[float] = None) -> float:
+        """
+        Calculate skill compatibility between job and provider: the better of
+        exact-skill Jaccard and TF-IDF similarity (``semantic``, computed here
+        unless the caller scored it in a batch)
+        """
         if not job_skills or not provider_skills:
             return 0.0
             
@@ -181,8 +419,10 @@ class BipedAIEngine:
         
         if union == 0:
             return 0.0
-            
-        base_score = intersection / union
+        
+        if semantic is None:
+            semantic = self.skill_matcher.similarity(job_skills, provider_skills)
+        base_score = max(intersection / union, semantic)
         
         # Bonus for having all required skills
         if job_set.issubset(provider_set):
@@ -199,22 +439,27 @@ class BipedAIEngine:
     def calculate_location_score(self, job_location: Tuple[float, float], 
                                 provider_location: Tuple[float, float]) -> float:
         """Calculate location compatibility score"""
+        return float(self.calculate_location_scores(job_location, [provider_location])[0])
+    
+    def calculate_location_scores(self, job_location: Tuple[float, float],
+                                  provider_locations: List[Tuple[float, float]]) -> np.ndarray:
+        """Location scores of many providers for one job, from one distance pass"""
+        # Imported here so the engine loads without backend/ on sys.path
+        from src.utils.geo_distance import haversine_km_array
+
         try:
-            distance = geodesic(job_location, provider_location).kilometers
-            
-            # Score based on distance (closer is better)
-            if distance <= 5:
-                return 1.0
-            elif distance <= 15:
-                return 0.8
-            elif distance <= 30:
-                return 0.6
-            elif distance <= 50:
-                return 0.4
-            else:
-                return 0.2
-        except Exception:
-            return 0.5  # Default score if calculation fails
+            points = np.array(provider_locations, dtype=float).reshape(-1, 2)
+            distances = haversine_km_array(points[:, 0], points[:, 1], *job_location)
+        except (TypeError, ValueError):
+            return np.full(len(provider_locations), 0.5)
+        
+        # Score based on distance band (closer is better)
+        scores = np.select(
+            [distances <= bound for bound in LOCATION_BANDS_KM],
+            LOCATION_BAND_SCORES[:-1],
+            default=LOCATION_BAND_SCORES[-1]
+        )
+        return np.where(np.isnan(distances), 0.5, scores)  # Default if location missing
     
     def calculate_budget_compatibility(self, job_budget: Tuple[float, float], 
                                      provider_rate: float, estimated_hours: float) -> float:
@@ -268,14 +513,23 @@ class BipedAIEngine:
         job_analysis = self.analyze_job_description(job.description)
         estimated_hours = job_analysis['estimated_hours']
         
-        for provider in providers:
-            # Skip if category doesn't match
-            if provider.category != job.category:
-                continue
-                
+        # Skip providers whose category doesn't match
+        providers = [provider for provider in providers if provider.category == job.category]
+        
+        # Distances and skill similarities to every candidate in one vectorized pass each
+        location_scores = self.calculate_location_scores(
+            job.location, [provider.location for provider in providers]
+        )
+        semantic_scores = self.skill_matcher.similarities(
+            job.skills_required, [(provider.id, provider.skills) for provider in providers]
+        )
+        
+        for provider, location_score, semantic in zip(
+                providers, location_scores.tolist(), semantic_scores.tolist()):
             # Calculate individual scores
-            skill_score = self.calculate_skill_match(job.skills_required, provider.skills)
-            location_score = self.calculate_location_score(job.location, provider.location)
+            skill_score = self.calculate_skill_match(
+                job.skills_required, provider.skills, semantic
+            )
             budget_score = self.calculate_budget_compatibility(
                 (job.budget_min, job.budget_max), provider.hourly_rate, estimated_hours
             )
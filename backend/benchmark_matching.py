@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+"""
+Offline matching benchmark for Biped Platform
+
+Builds a seeded synthetic marketplace in a scratch database, replays
+matching for every open job through each matching path and writes a JSON
+report: latency percentiles, queries per call, peak memory per call and
+every job's ranking. Pass an earlier report as ``--baseline`` to add
+ranking stability against it. The same seed and sizes produce the same
+marketplace, so reports from two commits can be diffed directly.
+
+    python benchmark_matching.py --providers 2000 --jobs 300 \\
+        --output after.json --baseline before.json
+
+Matching paths replayed:
+
+- ``smart_matching.compute_matches``: scoring a job's candidates directly
+- ``smart_matching.find_matches``: the served path, reading materialized
+  lists
+- ``ai_engine.find_matches``: ``/api/ai/find-matches``, feature store
+  candidates scored by ``BipedAIEngine`` (jobs without coordinates or a
+  budget are skipped)
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from ai_engine import JobRequirement
+from flask import Flask
+from sqlalchemy import event
+
+from src.models import (
+    Job,
+    ProviderProfile,
+    Review,
+    Service,
+    ServiceCategory,
+    User,
+    db,
+)
+from src.models.job import JobStatus
+from src.services import candidate_index, job_index
+from src.services.match_materializer import match_materializer
+from src.services.matching_weights import weight_registry
+
+REPORT_VERSION = 1
+
+# Jobs replayed per path for the (slower) tracemalloc pass
+MEMORY_SAMPLE = 50
+
+# Trade -> (share of providers and jobs, typical hourly rate, specialist skills)
+TRADES = {
+    "Plumbing": (0.20, 95, ["pipe fitting", "drain cleaning", "hot water systems"]),
+    "Electrical": (0.18, 100, ["wiring", "lighting", "switchboards"]),
+    "Carpentry": (0.12, 80, ["cabinet making", "framing", "home renovation"]),
+    "Painting": (0.12, 60, ["interior painting", "exterior painting"]),
+    "Roofing": (0.08, 85, ["roof repairs", "gutter cleaning"]),
+    "HVAC": (0.08, 105, ["air conditioning", "heating"]),
+    "Landscaping": (0.11, 55, ["garden design", "lawn care", "tree pruning"]),
+    "Cleaning": (0.11, 45, ["house cleaning", "office cleaning", "deep cleaning"]),
+}
+
+# Service category -> the trades whose services it lists. Shaped like the
+# categories init_database.py seeds, most of them naming several trades
+CATEGORIES = {
+    "Plumbing & Electrical": ["Plumbing", "Electrical"],
+    "Construction & Renovation": ["Carpentry"],
+    "Roofing & Guttering": ["Roofing"],
+    "Painting & Decorating": ["Painting"],
+    "Heating & Cooling": ["HVAC"],
+    "Landscaping": ["Landscaping"],
+    "Cleaning & Maintenance": ["Cleaning"],
+}
+
+# City -> (state, postcode, lat, lon, share of the marketplace)
+CITIES = {
+    "Sydney": ("NSW", "2000", -33.8688, 151.2093, 0.30),
+    "Melbourne": ("VIC", "3000", -37.8136, 144.9631, 0.28),
+    "Brisbane": ("QLD", "4000", -27.4698, 153.0251, 0.14),
+    "Perth": ("WA", "6000", -31.9505, 115.8605, 0.11),
+    "Adelaide": ("SA", "5000", -34.9285, 138.6007, 0.07),
+    "Gold Coast": ("QLD", "4217", -28.0167, 153.4000, 0.04),
+    "Canberra": ("ACT", "2600", -35.2809, 149.1300, 0.03),
+    "Hobart": ("TAS", "7000", -42.8821, 147.3272, 0.02),
+    "Darwin": ("NT", "0800", -12.4634, 130.8456, 0.01),
+}
+
+JOB_DESCRIPTIONS = [
+    "Need this fixed ASAP, it is an emergency",
+    "Looking for a quote this week for a simple repair",
+    "Complex renovation project, custom work required",
+    "Routine maintenance, timing is flexible",
+    "Small job, should be quick and easy",
+]
+
+WEEKDAYS = [
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+]
+
+
+def _weighted(rng: random.Random, table: Dict[str, tuple], share_index: int) -> str:
+    names = list(table)
+    return rng.choices(names, [table[name][share_index] for name in names])[0]
+
+
+def _place(rng: random.Random, city: str, located_share: float):
+    """A jittered point around a city, or no coordinates"""
+    _, _, latitude, longitude, _ = CITIES[city]
+    if rng.random() > located_share:
+        return None, None
+    return latitude + rng.gauss(0, 0.15), longitude + rng.gauss(0, 0.15)
+
+
+def generate_marketplace(
+    providers: int, jobs: int, seed: int = 42, customers: int = 50
+) -> Dict[str, int]:
+    """
+    Add a synthetic marketplace to the current database: providers with
+    trade skills, city-clustered locations, rates and review histories,
+    and ``jobs`` open jobs. Returns the number of rows of each kind.
+    """
+    rng = random.Random(seed)
+    services = {}
+    for name, trades in CATEGORIES.items():
+        category = ServiceCategory(
+            name=name, slug="-".join(name.lower().replace("&", " ").split())
+        )
+        db.session.add(category)
+        db.session.flush()
+        for trade in trades:
+            service = Service(category_id=category.id, name=trade, slug=trade.lower())
+            db.session.add(service)
+            db.session.flush()
+            services[trade] = service.id
+
+    def user(email, user_type):
+        row = User(
+            email=email,
+            password_hash="x",
+            first_name="Bench",
+            last_name=email.split("@")[0].title(),
+            user_type=user_type,
+        )
+        db.session.add(row)
+        db.session.flush()
+        return row.id
+
+    customer_ids = [
+        user(f"customer{index}@bench.test", "customer") for index in range(customers)
+    ]
+
+    def job(trade, city, status, latitude, longitude, **fields):
+        state, postcode = CITIES[city][:2]
+        budget = rng.choice([None, 150, 300, 600, 1200, 5000])
+        return Job(
+            customer_id=rng.choice(customer_ids),
+            service_id=services[trade],
+            title=f"{trade} job in {city}",
+            description=rng.choice(JOB_DESCRIPTIONS),
+            street_address=f"{rng.randint(1, 400)} Main Street",
+            city=city,
+            state=state,
+            postcode=postcode,
+            latitude=latitude,
+            longitude=longitude,
+            budget_min=budget // 2 if budget else None,
+            budget_max=budget,
+            property_type=rng.choice(["residential", "commercial"]),
+            status=status,
+            **fields,
+        )
+
+    reviews = history = 0
+    for index in range(providers):
+        trade = _weighted(rng, TRADES, 0)
+        _, rate, specialties = TRADES[trade]
+        skills = [trade] + rng.sample(specialties, rng.randint(0, len(specialties)))
+        if rng.random() < 0.1:
+            skills.append(_weighted(rng, TRADES, 0))
+        city = _weighted(rng, CITIES, 4)
+        latitude, longitude = _place(rng, city, 0.9)
+        user_id = user(f"provider{index}@bench.test", "provider")
+        db.session.add(
+            ProviderProfile(
+                user_id=user_id,
+                skills=", ".join(skills),
+                hourly_rate=round(rng.lognormvariate(np.log(rate), 0.25)),
+                years_experience=rng.randint(0, 30),
+                availability=rng.choice(["weekdays", "weekends", "flexible", None]),
+                availability_schedule={day: rng.random() < 0.7 for day in WEEKDAYS},
+                response_time_hours=round(rng.uniform(0.5, 48), 1),
+                service_area=city,
+                service_radius=rng.choice([10, 20, 30, 50, 100]),
+                latitude=latitude,
+                longitude=longitude,
+            )
+        )
+
+        # Completed work, most of it reviewed around the provider's quality
+        quality = rng.betavariate(5, 1.5)
+        for _ in range(int(rng.expovariate(1 / 4))):
+            done = job(
+                trade,
+                city,
+                JobStatus.COMPLETED,
+                latitude,
+                longitude,
+                assigned_provider_id=user_id,
+                created_at=datetime.utcnow() - timedelta(days=rng.randint(1, 365)),
+            )
+            db.session.add(done)
+            db.session.flush()
+            history += 1
+            if rng.random() < 0.7:
+                rating = round(1 + 4 * min(max(rng.gauss(quality, 0.15), 0), 1))
+                db.session.add(
+                    Review(
+                        job_id=done.id,
+                        reviewer_id=done.customer_id,
+                        reviewee_id=user_id,
+                        overall_rating=rating,
+                    )
+                )
+                reviews += 1
+
+    for _ in range(jobs):
+        city = _weighted(rng, CITIES, 4)
+        db.session.add(
+            job(
+                _weighted(rng, TRADES, 0),
+                city,
+                JobStatus.POSTED,
+                *_place(rng, city, 0.95),
+            )
+        )
+    db.session.commit()
+
+    candidate_index.build_candidate_index()
+    job_index.build_open_job_index()
+    weight_registry.refresh()
+    return {
+        "providers": providers,
+        "open_jobs": jobs,
+        "completed_jobs": history,
+        "reviews": reviews,
+        "customers": customers,
+    }
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(np.mean(values)), 3),
+        "max": round(float(np.max(values)), 3),
+    }
+
+
+def replay(
+    match: Callable[[int], Optional[List]], job_ids: Iterable[int]
+) -> Dict[str, Any]:
+    """
+    Time one matching path over every job. ``match`` returns a job's ranked
+    provider ids, or None to skip the job. Each call starts with a
+    fresh session, as a request would.
+    """
+    job_ids = list(job_ids)
+    latencies, queries, rankings = [], [], {}
+    for job_id in job_ids:
+        db.session.remove()
+        with count_queries() as statements:
+            started = time.perf_counter()
+            ranking = match(job_id)
+            elapsed = time.perf_counter() - started
+        if ranking is None:
+            continue
+        latencies.append(elapsed * 1000)
+        queries.append(len(statements))
+        rankings[str(job_id)] = ranking
+
+    # Memory is measured in a separate pass; tracemalloc skews timings
+    peaks = []
+    tracemalloc.start()
+    try:
+        for job_id in [int(job_id) for job_id in rankings][:MEMORY_SAMPLE]:
+            db.session.remove()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            match(job_id)
+            peaks.append((tracemalloc.get_traced_memory()[1] - baseline) / 1024)
+    finally:
+        tracemalloc.stop()
+    db.session.remove()
+
+    return {
+        "calls": len(latencies),
+        "skipped": len(job_ids) - len(latencies),
+        "latency_ms": percentiles(latencies),
+        "queries_per_call": percentiles(queries),
+        "peak_memory_kib": percentiles(peaks),
+        "rankings": rankings,
+    }
+
+
+def ranking_stability(
+    current: Dict[str, List], baseline: Dict[str, List]
+) -> Dict[str, Any]:
+    """How far each job's ranking moved from the baseline's"""
+    shared = sorted(set(current) & set(baseline), key=int)
+    overlaps, same_top, identical = [], 0, 0
+    for job_id in shared:
+        now, before = current[job_id], baseline[job_id]
+        size = max(len(now), len(before))
+        overlaps.append(len(set(now) & set(before)) / size if size else 1.0)
+        same_top += now[:1] == before[:1]
+        identical += now == before
+    count = len(shared) or 1
+    return {
+        "jobs_compared": len(shared),
+        "mean_overlap_at_k": round(float(np.mean(overlaps)) if overlaps else 0.0, 4),
+        "top1_agreement": round(same_top / count, 4),
+        "identical_rankings": round(identical / count, 4),
+    }
+
+
+def matching_paths(limit: int) -> Dict[str, Callable[[int], Optional[List]]]:
+    """Each replayed path, taking a job id and returning ranked provider ids"""
+    # Imported here so the engines load against the benchmark's app
+    from src.routes.ai import _get_providers, ai_engine
+    from src.routes.smart_matching import matching_engine
+
+    def compute_matches(job_id):
+        matches = matching_engine.compute_matches(db.session.get(Job, job_id), limit)
+        return [match["provider_id"] for match in matches]
+
+    def find_matches(job_id):
+        matches = matching_engine.find_matches(job_id, limit)
+        return [match["provider_id"] for match in matches]
+
+    def ai_find_matches(job_id):
+        job = db.session.get(Job, job_id)
+        # The route requires a location and a budget
+        if None in (job.latitude, job.longitude, job.budget_max):
+            return None
+        category = job.service.category.name.lower()
+        requirement = JobRequirement(
+            id=str(job.id),
+            title=job.title,
+            description=job.description,
+            category=category,
+            budget_min=float(job.budget_min or 0),
+            budget_max=float(job.budget_max or 0),
+            location=(job.latitude, job.longitude),
+            urgency="flexible",
+            skills_required=[category],
+            posted_date=job.created_at,
+        )
+        providers = _get_providers(category, requirement.location)
+        matches = ai_engine.find_matches(requirement, providers, top_k=limit)
+        # Ids are strings here, and mock ids when no provider is near
+        return [match.provider_id for match in matches]
+
+    return {
+        "smart_matching.compute_matches": compute_matches,
+        "smart_matching.find_matches": find_matches,
+        "ai_engine.find_matches": ai_find_matches,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(
+    providers: int,
+    jobs: int,
+    seed: int = 42,
+    limit: int = 10,
+    baseline: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Generate a marketplace in the current database and replay matching"""
+    started = time.perf_counter()
+    marketplace = generate_marketplace(providers, jobs, seed)
+    generation_seconds = time.perf_counter() - started
+
+    job_ids = [
+        job_id
+        for (job_id,) in db.session.query(Job.id)
+        .filter(Job.status == JobStatus.POSTED)
+        .order_by(Job.id)
+    ]
+    paths = matching_paths(limit)
+
+    # Served lists are materialized up front, as the background worker would
+    match_materializer.mark_all()
+    match_materializer.run_pending()
+
+    results = {}
+    for name, match in paths.items():
+        match(job_ids[0])  # Warm caches and lazy indexes
+        results[name] = replay(match, job_ids)
+
+    config = {"providers": providers, "jobs": jobs, "seed": seed, "limit": limit}
+    report = {
+        "report_version": REPORT_VERSION,
+        "generated_at": datetime.utcnow().isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": config,
+        "marketplace": {
+            **marketplace,
+            "generation_seconds": round(generation_seconds, 2),
+        },
+        "weights_version": weight_registry.current()[0],
+        "paths": results,
+    }
+
+    if baseline is not None:
+        report["baseline"] = {
+            "git_commit": baseline.get("git_commit"),
+            "same_config": baseline.get("config") == config,
+        }
+        for name, result in results.items():
+            before = baseline.get("paths", {}).get(name)
+            if before is not None:
+                result["stability"] = ranking_stability(
+                    result["rankings"], before["rankings"]
+                )
+    return report
+
+
+def create_benchmark_app(database_url: str) -> Flask:
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--providers", type=int, default=1000)
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--limit", type=int, default=10, help="matches per job")
+    parser.add_argument("--output", default="matching_benchmark.json")
+    parser.add_argument("--baseline", help="earlier report to compare rankings")
+    parser.add_argument(
+        "--database", help="scratch database URL (default: a temporary SQLite file)"
+    )
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    scratch = None
+    database_url = args.database
+    if database_url is None:
+        scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        scratch.close()
+        database_url = f"sqlite:///{scratch.name}"
+
+    app = create_benchmark_app(database_url)
+    try:
+        with app.app_context():
+            db.create_all()
+            report = run_benchmark(
+                args.providers, args.jobs, args.seed, args.limit, baseline
+            )
+            db.session.remove()
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+        for name, result in report["paths"].items():
+            latency = result["latency_ms"]
+            line = (
+                f"{name}: p50 {latency.get('p50')} ms, p95 {latency.get('p95')} ms, "
+                f"p99 {latency.get('p99')} ms, "
+                f"{result['queries_per_call'].get('mean')} queries/call"
+            )
+            if "stability" in result:
+                line += f", top-1 agreement {result['stability']['top1_agreement']}"
+            print(line)
+        print(f"✅ Benchmark report written to {args.output}")
+
+    except Exception as e:
+        print(f"❌ Error running matching benchmark: {e}")
+    finally:
+        if scratch is not None:
+            os.unlink(scratch.name)
+
+
+if __name__ == "__main__":
+    main()
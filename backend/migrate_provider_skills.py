@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Create and backfill the normalized provider skill tables for Biped Platform
+
+Splits every ProviderProfile.skills CSV into the ``skill`` vocabulary and
+``provider_skill`` rows. Safe to re-run: the association rows are rebuilt.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.main import app
+from src.models import ProviderSkill, Skill, db
+from src.services.provider_skills import backfill_provider_skills
+
+
+def migrate_provider_skills():
+    """Create the skill tables and backfill them from the CSV column"""
+    with app.app_context():
+        try:
+            db.create_all()
+
+            written = backfill_provider_skills()
+            print(f"✅ Backfilled {written} provider skills")
+            print(f"   {Skill.query.count()} distinct skills")
+            print(f"   {ProviderSkill.query.count()} provider skill rows")
+
+        except Exception as e:
+            print(f"❌ Error migrating provider skills: {e}")
+
+
+if __name__ == "__main__":
+    migrate_provider_skills()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Rebuild the provider feature store for Biped Platform
+
+Recomputes every ``provider_feature`` row (ratings, job counts, location)
+from the review, job and provider profile tables. Safe to re-run.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.main import app
+from src.models import db
+from src.services.provider_features import rebuild_provider_features
+
+
+def rebuild():
+    """Create the feature table if needed and recompute all rows"""
+    with app.app_context():
+        try:
+            db.create_all()
+
+            written = rebuild_provider_features()
+            print(f"✅ Rebuilt {written} provider feature rows")
+
+        except Exception as e:
+            print(f"❌ Error rebuilding provider features: {e}")
+
+
+if __name__ == "__main__":
+    rebuild()
@@ -160,6 +160,105 @@ def create_app():
             db.create_all()
             logger.info("✅ Database tables created")
 
+            # Columns added to existing tables since the first release
+            try:
+                from src.models.schema import init_added_columns
+
+                init_added_columns()
+                logger.info("✅ Added model columns ready")
+            except Exception as e:
+                logger.warning(f"⚠️ Added model columns unavailable: {e}")
+
+            # Coordinate columns and indexes for radius search
+            try:
+                from src.services.geo_search import init_geo_columns
+
+                init_geo_columns()
+                logger.info("✅ Geo search columns ready")
+            except Exception as e:
+                logger.warning(f"⚠️ Geo search columns unavailable: {e}")
+
+            # Full-text job search index (FTS5 / tsvector), backfilled if empty
+            try:
+                from src.services.search_index import init_search_index
+
+                if init_search_index():
+                    logger.info("✅ Job search index ready")
+            except Exception as e:
+                logger.warning(f"⚠️ Job search index unavailable: {e}")
+
+            # Normalized provider skills, backfilled from the CSV column
+            try:
+                from src.services.provider_skills import init_provider_skills
+
+                init_provider_skills()
+                logger.info("✅ Provider skills ready")
+            except Exception as e:
+                logger.warning(f"⚠️ Provider skills unavailable: {e}")
+
+            # Per-provider matching aggregates, built if empty
+            try:
+                from src.services.provider_features import init_provider_features
+
+                init_provider_features()
+                logger.info("✅ Provider feature store ready")
+            except Exception as e:
+                logger.warning(f"⚠️ Provider feature store unavailable: {e}")
+
+            # In-memory autocomplete for /api/search/suggestions
+            try:
+                from src.services.autocomplete import build_suggestion_indexes
+
+                build_suggestion_indexes()
+                logger.info("✅ Search suggestion index ready")
+            except Exception as e:
+                logger.warning(f"⚠️ Search suggestion index unavailable: {e}")
+
+            # Trade and geo-cell index narrowing match candidates
+            try:
+                from src.services.candidate_index import build_candidate_index
+
+                build_candidate_index()
+                logger.info("✅ Match candidate index ready")
+            except Exception as e:
+                logger.warning(f"⚠️ Match candidate index unavailable: {e}")
+
+            # Category and geo-cell index of open jobs for provider job feeds
+            try:
+                from src.services.job_index import build_open_job_index
+
+                build_open_job_index()
+                logger.info("✅ Open job index ready")
+            except Exception as e:
+                logger.warning(f"⚠️ Open job index unavailable: {e}")
+
+            # Published matching weights shared by every worker
+            try:
+                from src.services.matching_weights import weight_registry
+
+                version = weight_registry.refresh()
+                logger.info(f"✅ Matching weights v{version} loaded")
+            except Exception as e:
+                logger.warning(f"⚠️ Matching weights unavailable: {e}")
+
+            # Background refresh of each open job's top matches, run by the
+            # worker holding the materializer's Redis leader lock
+            try:
+                from src.routes.smart_matching import match_materializer
+
+                match_materializer.start(app)
+                logger.info("✅ Match materializer started")
+            except Exception as e:
+                logger.warning(f"⚠️ Match materializer unavailable: {e}")
+
+            # Committed model writes invalidate the cache entries tagged with them
+            try:
+                import src.services.cache_invalidation  # noqa: F401
+
+                logger.info("✅ Cache tag invalidation enabled")
+            except Exception as e:
+                logger.warning(f"⚠️ Cache tag invalidation unavailable: {e}")
+
             # Create default admin user if not exists
             from src.models import Admin
 
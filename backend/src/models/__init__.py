@@ -18,9 +18,13 @@ from .financial import (
     PlatformRevenue,
 )
 from .job import Job, JobMessage, JobMilestone, Quote
+from .job_match import JobMatch, JobMatchList
+from .matching_weights import MatchingWeights
 from .payment import Dispute, Payment, StripeAccount, Transfer
+from .provider_feature import ProviderFeature
 from .review import Message, Notification, Review
 from .service import PortfolioItem, ProviderService, Service, ServiceCategory
+from .skill import ProviderSkill, Skill
 from .user import CustomerProfile, ProviderProfile, User
 
 # Export commonly used items
@@ -35,10 +39,16 @@ __all__ = [
     "ServiceCategory",
     "ProviderService",
     "PortfolioItem",
+    "Skill",
+    "ProviderSkill",
+    "ProviderFeature",
     "Job",
     "Quote",
     "JobMilestone",
     "JobMessage",
+    "JobMatch",
+    "JobMatchList",
+    "MatchingWeights",
     "Payment",
     "StripeAccount",
     "Transfer",
@@ -20,6 +20,8 @@ class JobStatus(Enum):
 class Job(db.Model):
     """Job postings from customers"""
 
+    __table_args__ = (db.Index("ix_job_lat_lon", "latitude", "longitude"),)
+
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     service_id = db.Column(db.Integer, db.ForeignKey("service.id"), nullable=False)
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from . import db
+
+
+class JobMatch(db.Model):
+    """One entry of an open job's precomputed top provider matches"""
+
+    job_id = db.Column(db.Integer, db.ForeignKey("job.id"), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)  # 0 is the best match
+    provider_id = db.Column(
+        db.Integer, db.ForeignKey("user.id"), nullable=False, index=True
+    )
+
+    overall_score = db.Column(db.Float, nullable=False)
+    match = db.Column(db.JSON, nullable=False)  # As returned by find_matches
+    weights_version = db.Column(db.Integer, default=0, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<JobMatch {self.job_id}#{self.rank}>"
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "rank": self.rank,
+            "provider_id": self.provider_id,
+            "overall_score": self.overall_score,
+            "match": self.match,
+            "weights_version": self.weights_version,
+            "computed_at": self.computed_at.isoformat() if self.computed_at else None,
+        }
+
+
+class JobMatchList(db.Model):
+    """
+    When an open job's match list was computed and how long it is. A list of
+    size 0 records that the job has no candidates, so it is not rescored.
+    """
+
+    job_id = db.Column(db.Integer, db.ForeignKey("job.id"), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    weights_version = db.Column(db.Integer, default=0, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<JobMatchList {self.job_id} ({self.size})>"
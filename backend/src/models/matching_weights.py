@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from . import db
+
+
+class MatchingWeights(db.Model):
+    """One published version of the smart matching factor weights"""
+
+    version = db.Column(db.Integer, primary_key=True)  # Latest version is live
+    weights = db.Column(db.JSON, nullable=False)  # factor -> weight, summing to 1
+    created_by = db.Column(db.Integer, db.ForeignKey("admin.id"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<MatchingWeights v{self.version}>"
+
+    def to_dict(self):
+        return {
+            "version": self.version,
+            "weights": self.weights,
+            "created_by": self.created_by,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
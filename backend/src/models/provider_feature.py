@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from . import db
+
+
+class ProviderFeature(db.Model):
+    """Per-provider matching aggregates, kept in step with reviews and jobs"""
+
+    provider_id = db.Column(
+        db.Integer, db.ForeignKey("provider_profile.id"), primary_key=True
+    )
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("user.id"), unique=True, nullable=False, index=True
+    )
+
+    average_rating = db.Column(db.Float, nullable=True)  # None until reviewed
+    review_count = db.Column(db.Integer, default=0, nullable=False)
+    active_jobs = db.Column(db.Integer, default=0, nullable=False)  # Accepted/started
+    completed_jobs = db.Column(db.Integer, default=0, nullable=False)
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    def __repr__(self):
+        return f"<ProviderFeature {self.provider_id}>"
+
+    def to_dict(self):
+        return {
+            "provider_id": self.provider_id,
+            "user_id": self.user_id,
+            "average_rating": self.average_rating,
+            "review_count": self.review_count,
+            "active_jobs": self.active_jobs,
+            "completed_jobs": self.completed_jobs,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
@@ -0,0 +1,46 @@
+"""
+Schema upgrades for databases created before later model columns existed.
+db.create_all() creates missing tables but never alters existing ones.
+"""
+
+import logging
+from typing import Dict, Tuple
+
+from sqlalchemy import inspect, text
+
+from . import db
+
+logger = logging.getLogger(__name__)
+
+# Columns added to existing tables after the first release
+ADDED_COLUMNS = {
+    "provider_profile": ("skills", "service_area", "availability"),
+}
+
+
+def add_missing_columns(connection, columns: Dict[str, Tuple[str, ...]]) -> None:
+    """ALTER existing tables to add the listed columns with their model types"""
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+    for table, names in columns.items():
+        if table not in tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        for name in names:
+            if name in existing:
+                continue
+            column_type = db.metadata.tables[table].c[name].type
+            connection.execute(
+                text(
+                    f"ALTER TABLE {table} ADD COLUMN {name} "
+                    f"{column_type.compile(dialect=connection.dialect)}"
+                )
+            )
+            logger.info(f"Added {table}.{name}")
+
+
+def init_added_columns(engine=None) -> None:
+    """Add the ADDED_COLUMNS missing from an existing schema"""
+    engine = engine or db.engine
+    with engine.begin() as connection:
+        add_missing_columns(connection, ADDED_COLUMNS)
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from . import db
+
+
+class Skill(db.Model):
+    """Skill vocabulary shared by all providers"""
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)  # First spelling seen
+    slug = db.Column(db.String(100), unique=True, nullable=False, index=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Skill {self.slug}>"
+
+    def to_dict(self):
+        return {"id": self.id, "name": self.name, "slug": self.slug}
+
+
+class ProviderSkill(db.Model):
+    """Skills held by a provider, normalized from ProviderProfile.skills"""
+
+    provider_id = db.Column(
+        db.Integer, db.ForeignKey("provider_profile.id"), primary_key=True
+    )
+    skill_id = db.Column(
+        db.Integer, db.ForeignKey("skill.id"), primary_key=True, index=True
+    )
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    skill = db.relationship("Skill", lazy="joined")
+
+    def __repr__(self):
+        return f"<ProviderSkill {self.provider_id}-{self.skill_id}>"
@@ -2,6 +2,7 @@ from datetime import datetime
 
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import Numeric
+from sqlalchemy.ext.hybrid import hybrid_property
 from werkzeug.security import check_password_hash, generate_password_hash
 
 # Import db from models package to avoid multiple instances
@@ -67,6 +68,15 @@ class User(db.Model):
         """Get user's full name"""
         return f"{self.first_name} {self.last_name}"
 
+    @hybrid_property
+    def full_name(self):
+        """Full name, usable both on instances and in queries"""
+        return self.get_full_name()
+
+    @full_name.expression
+    def full_name(cls):
+        return cls.first_name + " " + cls.last_name
+
     def __repr__(self):
         return f"<User {self.email}>"
 
@@ -128,6 +138,8 @@ class CustomerProfile(db.Model):
 class ProviderProfile(db.Model):
     """Extended profile for service providers"""
 
+    __table_args__ = (db.Index("ix_provider_profile_lat_lon", "latitude", "longitude"),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
 
@@ -147,8 +159,13 @@ class ProviderProfile(db.Model):
     years_experience = db.Column(db.Integer, nullable=True)
     hourly_rate = db.Column(Numeric(8, 2), nullable=True)
     service_radius = db.Column(db.Integer, default=25)  # km
+    skills = db.Column(db.Text, nullable=True)  # Comma-separated skill list
+    service_area = db.Column(db.String(200), nullable=True)  # Suburbs/regions
+    latitude = db.Column(db.Float, nullable=True)  # Centre of service_radius
+    longitude = db.Column(db.Float, nullable=True)
 
     # Availability
+    availability = db.Column(db.String(50), nullable=True)  # e.g. 'weekdays'
     is_available = db.Column(db.Boolean, default=True)
     availability_schedule = db.Column(db.JSON, nullable=True)  # Weekly schedule
 
@@ -175,6 +192,8 @@ class ProviderProfile(db.Model):
     portfolio_items = db.relationship(
         "PortfolioItem", backref="provider", cascade="all, delete-orphan"
     )
+    # Normalized copy of ``skills``, maintained by src.services.provider_skills
+    provider_skills = db.relationship("ProviderSkill", viewonly=True)
 
     def get_verification_score(self):
         """Calculate verification score as percentage"""
@@ -202,6 +221,11 @@ class ProviderProfile(db.Model):
             "years_experience": self.years_experience,
             "hourly_rate": float(self.hourly_rate) if self.hourly_rate else None,
             "service_radius": self.service_radius,
+            "skills": self.skills,
+            "service_area": self.service_area,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "availability": self.availability,
             "is_available": self.is_available,
             "availability_schedule": self.availability_schedule,
             "total_jobs_completed": self.total_jobs_completed,
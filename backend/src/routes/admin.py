@@ -9,6 +9,8 @@ from ..models.job import Job
 from ..models.review import Review
 from ..models.service import Service, ServiceCategory
 from ..models.user import CustomerProfile, ProviderProfile, User
+from ..services.search_metrics import EXPLAIN_THRESHOLD_MS, search_metrics
+from ..utils.pagination import InvalidCursorError, SortKey, paginate, wants_total
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/api/admin")
 
@@ -207,25 +209,36 @@ def get_users():
             )
 
         # Paginate results
-        users = query.paginate(page=page, per_page=per_page, error_out=False)
+        users = paginate(
+            query,
+            [SortKey(User.created_at, descending=True), SortKey(User.id, True)],
+            per_page,
+            page=page,
+            after=request.args.get("after"),
+            with_total=wants_total(request.args),
+            signature="admin_users",
+        )
 
         return (
             jsonify(
                 {
                     "users": [user.to_dict() for user in users.items],
                     "pagination": {
-                        "page": page,
+                        "page": users.page,
                         "per_page": per_page,
                         "total": users.total,
                         "pages": users.pages,
                         "has_next": users.has_next,
                         "has_prev": users.has_prev,
+                        "next_cursor": users.next_cursor,
                     },
                 }
             ),
             200,
         )
 
+    except InvalidCursorError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Get users error: {e}")
         return jsonify({"error": "Failed to get users"}), 500
@@ -397,25 +410,36 @@ def get_jobs():
         if status:
             query = query.filter(Job.status == status)
 
-        jobs = query.paginate(page=page, per_page=per_page, error_out=False)
+        jobs = paginate(
+            query,
+            [SortKey(Job.created_at, descending=True), SortKey(Job.id, True)],
+            per_page,
+            page=page,
+            after=request.args.get("after"),
+            with_total=wants_total(request.args),
+            signature="admin_jobs",
+        )
 
         return (
             jsonify(
                 {
                     "jobs": [job.to_dict() for job in jobs.items],
                     "pagination": {
-                        "page": page,
+                        "page": jobs.page,
                         "per_page": per_page,
                         "total": jobs.total,
                         "pages": jobs.pages,
                         "has_next": jobs.has_next,
                         "has_prev": jobs.has_prev,
+                        "next_cursor": jobs.next_cursor,
                     },
                 }
             ),
             200,
         )
 
+    except InvalidCursorError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Get jobs error: {e}")
         return jsonify({"error": "Failed to get jobs"}), 500
@@ -463,6 +487,37 @@ def get_dashboard_analytics():
         return jsonify({"error": "Failed to get analytics"}), 500
 
 
+@admin_bp.route("/search-metrics", methods=["GET"])
+@admin_required
+@permission_required("analytics")
+def get_search_metrics():
+    """Search latency histograms by filter combination, slowest first"""
+    try:
+        return (
+            jsonify(
+                {
+                    "explain_threshold_ms": EXPLAIN_THRESHOLD_MS,
+                    "groups": search_metrics.snapshot(),
+                }
+            ),
+            200,
+        )
+
+    except Exception as e:
+        logger.error(f"Get search metrics error: {e}")
+        return jsonify({"error": "Failed to get search metrics"}), 500
+
+
+@admin_bp.route("/search-metrics", methods=["DELETE"])
+@admin_required
+@permission_required("analytics")
+def reset_search_metrics():
+    """Start collecting search metrics afresh"""
+    search_metrics.reset()
+    log_admin_action("search_metrics_reset")
+    return jsonify({"message": "Search metrics reset"}), 200
+
+
 # Admin Management Routes (Super Admin only)
 @admin_bp.route("/admins", methods=["GET"])
 @admin_required
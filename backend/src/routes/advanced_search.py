@@ -7,16 +7,154 @@ import re
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 
-from flask import Blueprint, jsonify, request
-from sqlalchemy import and_, asc, desc, func, or_, text
+from flask import Blueprint, jsonify, request, session
+from sqlalchemy import and_, asc, desc, func, literal, or_, text
 
 from src.models.job import Job, JobStatus
 from src.models.review import Review
 from src.models.service import Service, ServiceCategory
 from src.models.user import CustomerProfile, ProviderProfile, User, db
+from src.services.autocomplete import get_suggestions
+from src.services.geo_search import (
+    DEFAULT_SERVICE_RADIUS_KM,
+    haversine_km,
+    radius_filter,
+    validate_point,
+)
+from src.services.provider_skills import provider_skill_filter
+from src.services.search_cache import cached_search
+from src.services.search_facets import (
+    JobFacetCube,
+    get_job_facets,
+    get_provider_facets,
+    job_budget_filter,
+    job_facet_filters,
+    job_location_filter,
+    popular_categories,
+    popular_skills,
+)
+from src.services.search_index import get_job_search_backend, weighted_match_score
+from src.services.search_metrics import format_phase, instrument_search, record_rows
+from src.utils.conditional import conditional_response, tag_versions
+from src.utils.pagination import (
+    COUNT_CACHE_TTL,
+    PageResult,
+    SortKey,
+    paginate,
+    wants_total,
+)
+from src.utils.performance import response_cache
 
 advanced_search_bp = Blueprint("advanced_search", __name__, url_prefix="/api/search")
 
+# Popular terms change slowly; once expired, one request recomputes them
+# while the others are served the previous copy
+POPULAR_CACHE_TTL = 300
+POPULAR_STALE_TTL = 600
+
+# Tables search results are read from; a committed write to any of them
+# changes the ETag of every search response
+SEARCH_TABLES = (
+    "table:job",
+    "table:user",
+    "table:customer_profile",
+    "table:provider_profile",
+    "table:provider_skill",
+    "table:skill",
+    "table:review",
+    "table:service",
+    "table:service_category",
+)
+
+
+def search_version(*args, **kwargs):
+    return tag_versions(*SEARCH_TABLES)
+
+
+class SearchResultHydrator:
+    """
+    Turns a page of search rows into API dictionaries with a constant
+    number of queries: the page query already selects the joined entities,
+    and provider ratings come from one grouped aggregate per page.
+    """
+
+    @staticmethod
+    def rating_stats(user_ids: List[int]) -> Dict[int, Tuple[float, int]]:
+        """Average rating and review count for each reviewee in one query"""
+        if not user_ids:
+            return {}
+
+        rows = (
+            db.session.query(
+                Review.reviewee_id,
+                func.avg(Review.overall_rating),
+                func.count(Review.id),
+            )
+            .filter(Review.reviewee_id.in_(user_ids))
+            .group_by(Review.reviewee_id)
+            .all()
+        )
+        return {reviewee_id: (avg, count) for reviewee_id, avg, count in rows}
+
+    @staticmethod
+    def job_result(
+        job: Job,
+        customer: User,
+        service: Service,
+        category: ServiceCategory,
+        relevance_score: float,
+    ) -> Dict[str, Any]:
+        """Format one joined job row"""
+        return {
+            "id": job.id,
+            "title": job.title,
+            "description": job.description,
+            "service": service.name if service else None,
+            "category": category.name if category else None,
+            "location": f"{job.city}, {job.state}",
+            "budget_min": job.budget_min,
+            "budget_max": job.budget_max,
+            "budget_type": job.budget_type,
+            "status": job.status.value if job.status else None,
+            "is_urgent": job.is_urgent,
+            "property_type": job.property_type,
+            "created_at": job.created_at.isoformat(),
+            "customer": (
+                {
+                    "id": customer.id,
+                    "name": customer.full_name,
+                    "email": customer.email,
+                }
+                if customer
+                else None
+            ),
+            "relevance_score": relevance_score,
+        }
+
+    @staticmethod
+    def provider_result(
+        provider: ProviderProfile,
+        user: User,
+        rating_stats: Dict[int, Tuple[float, int]],
+        relevance_score: float,
+    ) -> Dict[str, Any]:
+        """Format one joined provider row using pre-fetched rating stats"""
+        avg_rating, review_count = rating_stats.get(provider.user_id, (None, 0))
+        return {
+            "id": provider.user_id,
+            "name": user.full_name if user else "Unknown",
+            "email": user.email if user else "",
+            "skills": provider.skills,
+            "hourly_rate": provider.hourly_rate,
+            "years_experience": provider.years_experience,
+            "service_area": provider.service_area,
+            "availability": provider.availability,
+            "bio": user.bio if user else None,
+            "average_rating": round(avg_rating, 2) if avg_rating else None,
+            "review_count": review_count,
+            "relevance_score": relevance_score,
+        }
+
 
 class AdvancedSearchEngine:
     """
@@ -36,12 +174,22 @@ class AdvancedSearchEngine:
             "category_match": 0.2,
             "location_match": 0.1,
         }
+        self.provider_search_weights = {
+            "name_match": 0.3,
+            "skills_match": 0.4,
+            "service_area_match": 0.2,
+            "bio_match": 0.1,
+        }
 
+    @cached_search("jobs", scope=("category", "location"), hydrate="_jobs_by_id")
     def search_jobs(
         self,
         query: str = "",
         category: str = "",
         location: str = "",
+        latitude: float = None,
+        longitude: float = None,
+        radius_km: float = None,
         min_budget: float = None,
         max_budget: float = None,
         status: str = "",
@@ -52,8 +200,20 @@ class AdvancedSearchEngine:
         sort_order: str = "desc",
         page: int = 1,
         per_page: int = 20,
+        after: str = None,
+        with_total: bool = True,
+        count_ttl: int = None,
     ) -> Dict[str, Any]:
-        """Advanced job search with multiple filters"""
+        """
+        Advanced job search with multiple filters.
+
+        Pass the previous page's ``next_cursor`` as ``after`` for keyset
+        pagination; ``with_total=False`` skips the count query. With
+        ``use_cache=True`` the page is served from ``search_cache`` when
+        possible. ``latitude``/``longitude``/``radius_km`` restrict results
+        to jobs within the radius and allow ``sort_by="distance"``.
+        """
+        geo = validate_point(latitude, longitude, radius_km)
 
         # Start with base query including service relationships
         base_query = (
@@ -66,24 +226,17 @@ class AdvancedSearchEngine:
         # Apply filters
         filters = []
 
-        # Text search across multiple fields
+        # Text search through the full-text index (LIKE fallback if unavailable);
+        # joining the ranked matches both filters and scores the jobs
+        relevance = None
         if query:
             search_terms = self._extract_search_terms(query)
-            text_filters = []
-
-            for term in search_terms:
-                term_filter = or_(
-                    Job.title.ilike(f"%{term}%"),
-                    Job.description.ilike(f"%{term}%"),
-                    Service.name.ilike(f"%{term}%"),
-                    ServiceCategory.name.ilike(f"%{term}%"),
-                    Job.street_address.ilike(f"%{term}%"),
-                    Job.city.ilike(f"%{term}%"),
+            if search_terms:
+                matches = get_job_search_backend().ranked_matches(
+                    search_terms, self.search_weights
                 )
-                text_filters.append(term_filter)
-
-            if text_filters:
-                filters.append(and_(*text_filters))
+                base_query = base_query.join(matches, matches.c.job_id == Job.id)
+                relevance = matches.c.relevance
 
         # Category filter
         if category:
@@ -91,23 +244,20 @@ class AdvancedSearchEngine:
 
         # Location filter
         if location:
-            filters.append(
-                or_(
-                    Job.street_address.ilike(f"%{location}%"),
-                    Job.city.ilike(f"%{location}%"),
-                    Job.state.ilike(f"%{location}%"),
-                )
-            )
+            filters.append(job_location_filter(location))
 
-        # Budget range filter
-        if min_budget is not None:
-            filters.append(
-                or_(Job.budget_min >= min_budget, Job.budget_max >= min_budget)
-            )
-        if max_budget is not None:
-            filters.append(
-                or_(Job.budget_min <= max_budget, Job.budget_max <= max_budget)
+        # Radius filter: bounding box on the indexed coordinates, then haversine
+        distance = None
+        if geo:
+            within, distance = radius_filter(
+                Job.latitude, Job.longitude, latitude, longitude, radius_km
             )
+            filters.append(within)
+
+        # Budget range filter: the job's budget range overlaps the bounds
+        budget = job_budget_filter(min_budget, max_budget)
+        if budget is not None:
+            filters.append(budget)
 
         # Status filter
         if status:
@@ -140,97 +290,39 @@ class AdvancedSearchEngine:
         if filters:
             base_query = base_query.filter(and_(*filters))
 
-        # Apply sorting
-        if sort_by == "relevance" and query:
-            # Custom relevance scoring
-            base_query = self._apply_relevance_sorting(base_query, query)
-        elif sort_by == "date":
-            if sort_order == "desc":
-                base_query = base_query.order_by(desc(Job.created_at))
-            else:
-                base_query = base_query.order_by(asc(Job.created_at))
-        elif sort_by == "budget":
-            if sort_order == "desc":
-                base_query = base_query.order_by(desc(Job.budget_min))
-            else:
-                base_query = base_query.order_by(asc(Job.budget_min))
-        elif sort_by == "title":
-            if sort_order == "desc":
-                base_query = base_query.order_by(desc(Job.title))
-            else:
-                base_query = base_query.order_by(asc(Job.title))
-        else:
-            # Default sorting by creation date
-            base_query = base_query.order_by(desc(Job.created_at))
-
-        # Get total count for pagination
-        total_count = base_query.count()
-
-        # Apply pagination
-        offset = (page - 1) * per_page
-        jobs = base_query.offset(offset).limit(per_page).all()
+        # Fetch one page in keyset order; the joined entities come back with
+        # each row and the total is only counted when asked for
+        sort_keys = self._job_sort_keys(sort_by, sort_order, relevance, distance)
+        page_result = paginate(
+            base_query.add_entity(User)
+            .add_entity(Service)
+            .add_entity(ServiceCategory)
+            .add_columns(relevance if relevance is not None else literal(1.0)),
+            sort_keys,
+            per_page,
+            page=page,
+            after=after,
+            with_total=with_total,
+            signature=f"jobs:{sort_by}:{sort_order}",
+            count_query=base_query,
+            count_ttl=count_ttl,
+        )
 
         # Format results
-        results = []
-        for job in jobs:
-            customer = db.session.query(User).filter(User.id == job.customer_id).first()
-            service = (
-                db.session.query(Service).filter(Service.id == job.service_id).first()
-            )
-            category = (
-                db.session.query(ServiceCategory)
-                .filter(ServiceCategory.id == service.category_id)
-                .first()
-                if service
-                else None
-            )
-
-            job_data = {
-                "id": job.id,
-                "title": job.title,
-                "description": job.description,
-                "service": service.name if service else None,
-                "category": category.name if category else None,
-                "location": f"{job.city}, {job.state}",
-                "budget_min": job.budget_min,
-                "budget_max": job.budget_max,
-                "budget_type": job.budget_type,
-                "status": job.status.value if job.status else None,
-                "is_urgent": job.is_urgent,
-                "property_type": job.property_type,
-                "created_at": job.created_at.isoformat(),
-                "customer": (
-                    {
-                        "id": customer.id,
-                        "name": customer.full_name,
-                        "email": customer.email,
-                    }
-                    if customer
-                    else None
-                ),
-                "relevance_score": (
-                    self._calculate_relevance_score(job, service, category, query)
-                    if query
-                    else 1.0
-                ),
-            }
-            results.append(job_data)
-
-        # Calculate pagination info
-        total_pages = (total_count + per_page - 1) // per_page
-        has_next = page < total_pages
-        has_prev = page > 1
+        with format_phase():
+            results = [
+                SearchResultHydrator.job_result(
+                    job, customer, service, category, float(score or 0.0)
+                )
+                for job, customer, service, category, score in page_result.items
+            ]
+            if geo:
+                self._add_distances(results, page_result.items, latitude, longitude)
+        record_rows(len(results), page_result.total)
 
         return {
             "results": results,
-            "pagination": {
-                "page": page,
-                "per_page": per_page,
-                "total_count": total_count,
-                "total_pages": total_pages,
-                "has_next": has_next,
-                "has_prev": has_prev,
-            },
+            "pagination": self._pagination_info(page_result),
             "search_info": {
                 "query": query,
                 "filters_applied": len(filters),
@@ -239,11 +331,15 @@ class AdvancedSearchEngine:
             },
         }
 
+    @cached_search("providers", scope=("location",), hydrate="_providers_by_id")
     def search_providers(
         self,
         query: str = "",
         skills: str = "",
         location: str = "",
+        latitude: float = None,
+        longitude: float = None,
+        radius_km: float = None,
         min_rate: float = None,
         max_rate: float = None,
         min_experience: int = None,
@@ -253,8 +349,12 @@ class AdvancedSearchEngine:
         sort_order: str = "desc",
         page: int = 1,
         per_page: int = 20,
+        after: str = None,
+        with_total: bool = True,
+        count_ttl: int = None,
     ) -> Dict[str, Any]:
-        """Advanced provider search with multiple filters"""
+        """Advanced provider search with multiple filters (see ``search_jobs``)"""
+        geo = validate_point(latitude, longitude, radius_km)
 
         # Start with base query
         base_query = db.session.query(ProviderProfile).join(
@@ -265,35 +365,49 @@ class AdvancedSearchEngine:
         filters = [User.is_active.is_(True)]  # Only active users
 
         # Text search across multiple fields
+        relevance = None
         if query:
             search_terms = self._extract_search_terms(query)
             text_filters = []
+            if search_terms:
+                relevance = weighted_match_score(
+                    self._provider_column_weights(), search_terms
+                )
 
             for term in search_terms:
                 term_filter = or_(
                     User.full_name.ilike(f"%{term}%"),
                     ProviderProfile.skills.ilike(f"%{term}%"),
                     ProviderProfile.service_area.ilike(f"%{term}%"),
-                    ProviderProfile.bio.ilike(f"%{term}%"),
+                    User.bio.ilike(f"%{term}%"),
                 )
                 text_filters.append(term_filter)
 
             if text_filters:
                 filters.append(and_(*text_filters))
 
-        # Skills filter
+        # Skills filter through the normalized provider_skill index
         if skills:
-            skill_terms = [skill.strip() for skill in skills.split(",")]
-            skill_filters = []
-            for skill in skill_terms:
-                skill_filters.append(ProviderProfile.skills.ilike(f"%{skill}%"))
-            if skill_filters:
-                filters.append(or_(*skill_filters))
+            skill_terms = [skill for skill in skills.split(",") if skill.strip()]
+            if skill_terms:
+                filters.append(provider_skill_filter(skill_terms))
 
         # Location filter
         if location:
             filters.append(ProviderProfile.service_area.ilike(f"%{location}%"))
 
+        # Radius filter on the provider's base location
+        distance = None
+        if geo:
+            within, distance = radius_filter(
+                ProviderProfile.latitude,
+                ProviderProfile.longitude,
+                latitude,
+                longitude,
+                radius_km,
+            )
+            filters.append(within)
+
         # Rate range filter
         if min_rate is not None:
             filters.append(ProviderProfile.hourly_rate >= min_rate)
@@ -304,12 +418,13 @@ class AdvancedSearchEngine:
         if min_experience is not None:
             filters.append(ProviderProfile.years_experience >= min_experience)
 
-        # Rating filter
-        if min_rating is not None:
-            # Subquery for average rating
+        # Average rating subquery, shared by the rating filter and sort
+        avg_rating = None
+        if min_rating is not None or sort_by == "rating":
             avg_rating_subquery = (
                 db.session.query(
-                    Review.reviewee_id, func.avg(Review.rating).label("avg_rating")
+                    Review.reviewee_id,
+                    func.avg(Review.overall_rating).label("avg_rating"),
                 )
                 .group_by(Review.reviewee_id)
                 .subquery()
@@ -319,12 +434,14 @@ class AdvancedSearchEngine:
                 avg_rating_subquery,
                 ProviderProfile.user_id == avg_rating_subquery.c.reviewee_id,
             )
+            avg_rating = avg_rating_subquery.c.avg_rating
+
+        # Rating filter
+        if min_rating is not None:
             filters.append(
                 or_(
-                    avg_rating_subquery.c.avg_rating >= min_rating,
-                    avg_rating_subquery.c.avg_rating.is_(
-                        None
-                    ),  # Include providers with no ratings
+                    avg_rating >= min_rating,
+                    avg_rating.is_(None),  # Include providers with no ratings
                 )
             )
 
@@ -336,104 +453,45 @@ class AdvancedSearchEngine:
         if filters:
             base_query = base_query.filter(and_(*filters))
 
-        # Apply sorting
-        if sort_by == "relevance" and query:
-            # Custom relevance scoring for providers
-            base_query = self._apply_provider_relevance_sorting(base_query, query)
-        elif sort_by == "rating":
-            # Sort by average rating
-            avg_rating_subquery = (
-                db.session.query(
-                    Review.reviewee_id, func.avg(Review.rating).label("avg_rating")
-                )
-                .group_by(Review.reviewee_id)
-                .subquery()
-            )
-
-            base_query = base_query.outerjoin(
-                avg_rating_subquery,
-                ProviderProfile.user_id == avg_rating_subquery.c.reviewee_id,
-            )
-
-            if sort_order == "desc":
-                base_query = base_query.order_by(desc(avg_rating_subquery.c.avg_rating))
-            else:
-                base_query = base_query.order_by(asc(avg_rating_subquery.c.avg_rating))
-        elif sort_by == "rate":
-            if sort_order == "desc":
-                base_query = base_query.order_by(desc(ProviderProfile.hourly_rate))
-            else:
-                base_query = base_query.order_by(asc(ProviderProfile.hourly_rate))
-        elif sort_by == "experience":
-            if sort_order == "desc":
-                base_query = base_query.order_by(desc(ProviderProfile.years_experience))
-            else:
-                base_query = base_query.order_by(asc(ProviderProfile.years_experience))
-        else:
-            # Default sorting by user name
-            base_query = base_query.order_by(asc(User.full_name))
-
-        # Get total count for pagination
-        total_count = base_query.count()
+        # Fetch one page in keyset order with the user row alongside
+        sort_keys = self._provider_sort_keys(
+            sort_by, sort_order, relevance, avg_rating, distance
+        )
+        page_result = paginate(
+            base_query.add_entity(User).add_columns(
+                relevance if relevance is not None else literal(1.0)
+            ),
+            sort_keys,
+            per_page,
+            page=page,
+            after=after,
+            with_total=with_total,
+            signature=f"providers:{sort_by}:{sort_order}",
+            count_query=base_query,
+            count_ttl=count_ttl,
+        )
+        rows = page_result.items
 
-        # Apply pagination
-        offset = (page - 1) * per_page
-        providers = base_query.offset(offset).limit(per_page).all()
+        # One grouped aggregate for the whole page's ratings
+        rating_stats = SearchResultHydrator.rating_stats(
+            [provider.user_id for provider, _, _ in rows]
+        )
 
         # Format results
-        results = []
-        for provider in providers:
-            user = db.session.query(User).filter(User.id == provider.user_id).first()
-
-            # Get average rating
-            avg_rating = (
-                db.session.query(func.avg(Review.rating))
-                .filter(Review.reviewee_id == provider.user_id)
-                .scalar()
-            )
-
-            # Get review count
-            review_count = (
-                db.session.query(Review)
-                .filter(Review.reviewee_id == provider.user_id)
-                .count()
-            )
-
-            provider_data = {
-                "id": provider.user_id,
-                "name": user.full_name if user else "Unknown",
-                "email": user.email if user else "",
-                "skills": provider.skills,
-                "hourly_rate": provider.hourly_rate,
-                "years_experience": provider.years_experience,
-                "service_area": provider.service_area,
-                "availability": provider.availability,
-                "bio": provider.bio,
-                "average_rating": round(avg_rating, 2) if avg_rating else None,
-                "review_count": review_count,
-                "relevance_score": (
-                    self._calculate_provider_relevance_score(provider, user, query)
-                    if query
-                    else 1.0
-                ),
-            }
-            results.append(provider_data)
-
-        # Calculate pagination info
-        total_pages = (total_count + per_page - 1) // per_page
-        has_next = page < total_pages
-        has_prev = page > 1
+        with format_phase():
+            results = [
+                SearchResultHydrator.provider_result(
+                    provider, user, rating_stats, float(score or 0.0)
+                )
+                for provider, user, score in rows
+            ]
+            if geo:
+                self._add_distances(results, rows, latitude, longitude)
+        record_rows(len(results), page_result.total)
 
         return {
             "results": results,
-            "pagination": {
-                "page": page,
-                "per_page": per_page,
-                "total_count": total_count,
-                "total_pages": total_pages,
-                "has_next": has_next,
-                "has_prev": has_prev,
-            },
+            "pagination": self._pagination_info(page_result),
             "search_info": {
                 "query": query,
                 "filters_applied": len(filters)
@@ -443,6 +501,65 @@ class AdvancedSearchEngine:
             },
         }
 
+    def jobs_near_provider(
+        self, user_id: int, radius_km: float = None, **search_kwargs
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Open jobs within a provider's service radius of their base location,
+        nearest first. Returns None when the user has no provider profile.
+        """
+        provider = ProviderProfile.query.filter_by(user_id=user_id).first()
+        if provider is None:
+            return None
+        if provider.latitude is None or provider.longitude is None:
+            raise ValueError("Provider profile has no location set")
+
+        search_kwargs.setdefault("status", JobStatus.POSTED.value)
+        search_kwargs.setdefault("sort_by", "distance")
+        return self.search_jobs(
+            latitude=provider.latitude,
+            longitude=provider.longitude,
+            radius_km=radius_km or provider.service_radius or DEFAULT_SERVICE_RADIUS_KM,
+            **search_kwargs,
+        )
+
+    def _jobs_by_id(self, job_ids: List[int], scores: List[float]) -> List[Dict]:
+        """Rehydrate cached job results in one query, keeping their order"""
+        if not job_ids:
+            return []
+        rows = (
+            db.session.query(Job, User, Service, ServiceCategory)
+            .join(User, Job.customer_id == User.id)
+            .join(Service, Job.service_id == Service.id)
+            .join(ServiceCategory, Service.category_id == ServiceCategory.id)
+            .filter(Job.id.in_(job_ids))
+            .all()
+        )
+        by_id = {row[0].id: row for row in rows}
+        return [
+            SearchResultHydrator.job_result(*by_id[job_id], score)
+            for job_id, score in zip(job_ids, scores)
+            if job_id in by_id
+        ]
+
+    def _providers_by_id(self, user_ids: List[int], scores: List[float]) -> List[Dict]:
+        """Rehydrate cached provider results, keeping their order"""
+        if not user_ids:
+            return []
+        rows = (
+            db.session.query(ProviderProfile, User)
+            .join(User, ProviderProfile.user_id == User.id)
+            .filter(ProviderProfile.user_id.in_(user_ids))
+            .all()
+        )
+        by_id = {provider.user_id: (provider, user) for provider, user in rows}
+        rating_stats = SearchResultHydrator.rating_stats(list(by_id))
+        return [
+            SearchResultHydrator.provider_result(*by_id[user_id], rating_stats, score)
+            for user_id, score in zip(user_ids, scores)
+            if user_id in by_id
+        ]
+
     def get_search_suggestions(
         self, query: str, search_type: str = "jobs"
     ) -> List[str]:
@@ -450,64 +567,8 @@ class AdvancedSearchEngine:
         if not query or len(query) < 2:
             return []
 
-        suggestions = []
-
-        if search_type == "jobs":
-            # Get suggestions from job titles and service categories
-            job_suggestions = (
-                db.session.query(Job.title)
-                .filter(Job.title.ilike(f"%{query}%"))
-                .distinct()
-                .limit(5)
-                .all()
-            )
-
-            # Get category suggestions through Service relationship
-            category_suggestions = (
-                db.session.query(ServiceCategory.name)
-                .join(Service, ServiceCategory.id == Service.category_id)
-                .join(Job, Service.id == Job.service_id)
-                .filter(ServiceCategory.name.ilike(f"%{query}%"))
-                .distinct()
-                .limit(5)
-                .all()
-            )
-
-            suggestions.extend([suggestion[0] for suggestion in job_suggestions])
-            suggestions.extend([suggestion[0] for suggestion in category_suggestions])
-
-        elif search_type == "providers":
-            # Get suggestions from provider skills and names
-            skill_suggestions = (
-                db.session.query(ProviderProfile.skills)
-                .filter(ProviderProfile.skills.ilike(f"%{query}%"))
-                .distinct()
-                .limit(5)
-                .all()
-            )
-
-            name_suggestions = (
-                db.session.query(User.full_name)
-                .join(ProviderProfile)
-                .filter(User.full_name.ilike(f"%{query}%"))
-                .distinct()
-                .limit(5)
-                .all()
-            )
-
-            # Extract individual skills
-            for skill_row in skill_suggestions:
-                if skill_row[0]:
-                    skills = [skill.strip() for skill in skill_row[0].split(",")]
-                    for skill in skills:
-                        if query.lower() in skill.lower():
-                            suggestions.append(skill)
-
-            suggestions.extend([suggestion[0] for suggestion in name_suggestions])
-
-        # Remove duplicates and limit results
-        unique_suggestions = list(dict.fromkeys(suggestions))[:10]
-        return unique_suggestions
+        # Ranked prefix completions from the in-memory autocomplete index
+        return get_suggestions(query, search_type, limit=10)
 
     def get_popular_searches(
         self, search_type: str = "jobs", limit: int = 10
@@ -516,54 +577,79 @@ class AdvancedSearchEngine:
         popular_items = []
 
         if search_type == "jobs":
-            # Get most common categories through Service relationship
-            category_counts = (
-                db.session.query(
-                    ServiceCategory.name,
-                    func.count(ServiceCategory.name).label("count"),
-                )
-                .join(Service, ServiceCategory.id == Service.category_id)
-                .join(Job, Service.id == Job.service_id)
-                .filter(ServiceCategory.name.isnot(None))
-                .group_by(ServiceCategory.name)
-                .order_by(desc("count"))
-                .limit(limit)
-                .all()
-            )
-
+            # Most common categories from the materialized job facets
             popular_items = [
                 {"term": category, "count": count, "type": "category"}
-                for category, count in category_counts
+                for category, count in popular_categories(limit)
             ]
 
         elif search_type == "providers":
-            # Get most common skills
-            skill_counts = {}
-            skills_data = (
-                db.session.query(ProviderProfile.skills)
-                .filter(ProviderProfile.skills.isnot(None))
-                .all()
-            )
-
-            for skill_row in skills_data:
-                if skill_row[0]:
-                    skills = [
-                        skill.strip().lower() for skill in skill_row[0].split(",")
-                    ]
-                    for skill in skills:
-                        skill_counts[skill] = skill_counts.get(skill, 0) + 1
-
-            # Sort by count and take top items
-            sorted_skills = sorted(
-                skill_counts.items(), key=lambda x: x[1], reverse=True
-            )[:limit]
+            # Most common skills from the provider facet snapshot
             popular_items = [
                 {"term": skill, "count": count, "type": "skill"}
-                for skill, count in sorted_skills
+                for skill, count in popular_skills(limit)
             ]
 
         return popular_items
 
+    def get_available_filters(
+        self, search_type: str = "jobs", query: str = "", **active_filters
+    ) -> Dict[str, Any]:
+        """
+        Filter options from the facet snapshots. For jobs, ``facet_counts``
+        gives per-value counts conditioned on the other active filters
+        (the ``search_jobs`` filter arguments).
+        """
+        if search_type != "jobs":
+            facets = get_provider_facets()
+            min_rate, max_rate, avg_rate = facets["rate_stats"]
+            min_exp, max_exp, avg_exp = facets["experience_stats"]
+            return {
+                "skills": facets["skills"][:100],  # Limit to top 100 skills
+                "rate_range": {
+                    "min": min_rate or 0,
+                    "max": max_rate or 200,
+                    "average": round(avg_rate or 0, 2),
+                },
+                "experience_range": {
+                    "min": min_exp or 0,
+                    "max": max_exp or 30,
+                    "average": round(avg_exp or 0, 1),
+                },
+                "service_areas": facets["service_areas"],
+                "rating_options": [1, 2, 3, 4, 5],
+            }
+
+        cube = get_job_facets()
+        search_terms = self._extract_search_terms(query) if query else []
+        if search_terms:
+            # Text queries narrow the cube to the matching jobs
+            cube = JobFacetCube.build(
+                job_filter=get_job_search_backend().job_filter(search_terms)
+            )
+
+        filters = job_facet_filters(**active_filters)
+        location = filters["location"]
+        if location and not cube.has_location(location):
+            # Only street addresses can match; narrow the cube to those jobs
+            cube = cube.narrowed_to_location(location)
+            filters["location"] = None
+
+        budget = cube.budget_stats()
+        return {
+            "categories": list(cube.facet_counts("category")),
+            "budget_range": {
+                "min": budget["min"] or 0,
+                "max": budget["max"] or 10000,
+                "average": round(budget["average"] or 0, 2),
+            },
+            "locations": list(cube.facet_counts("location"))[:50],
+            "status_options": [status.value for status in JobStatus],
+            "urgency_options": [True, False],
+            "facet_counts": cube.all_facet_counts(filters),
+            "total_count": cube.total(filters),
+        }
+
     def _extract_search_terms(self, query: str) -> List[str]:
         """Extract meaningful search terms from query"""
         # Remove special characters and split by spaces
@@ -571,76 +657,96 @@ class AdvancedSearchEngine:
         terms = [term.strip() for term in clean_query.split() if len(term.strip()) > 2]
         return terms
 
-    def _apply_relevance_sorting(self, query_obj, search_query: str):
-        """Apply relevance-based sorting to job query"""
-        # This is a simplified relevance scoring
-        # In a real implementation, you'd use full-text search or Elasticsearch
-        return query_obj.order_by(desc(Job.created_at))
-
-    def _apply_provider_relevance_sorting(self, query_obj, search_query: str):
-        """Apply relevance-based sorting to provider query"""
-        # This is a simplified relevance scoring
-        # In a real implementation, you'd use full-text search or Elasticsearch
-        return query_obj.order_by(desc(User.created_at))
-
-    def _calculate_relevance_score(
-        self, job: Job, service: Service, category: ServiceCategory, query: str
-    ) -> float:
-        """Calculate relevance score for a job"""
-        if not query:
-            return 1.0
-
-        score = 0.0
-        query_lower = query.lower()
-
-        # Title match
-        if job.title and query_lower in job.title.lower():
-            score += self.search_weights["title_match"]
-
-        # Description match
-        if job.description and query_lower in job.description.lower():
-            score += self.search_weights["description_match"]
-
-        # Service/Category match
-        if service and service.name and query_lower in service.name.lower():
-            score += self.search_weights["category_match"]
-        if category and category.name and query_lower in category.name.lower():
-            score += self.search_weights["category_match"]
-
-        # Location match
-        location_text = f"{job.street_address} {job.city} {job.state}".lower()
-        if query_lower in location_text:
-            score += self.search_weights["location_match"]
-
-        return min(score, 1.0)
-
-    def _calculate_provider_relevance_score(
-        self, provider: ProviderProfile, user: User, query: str
-    ) -> float:
-        """Calculate relevance score for a provider"""
-        if not query:
-            return 1.0
-
-        score = 0.0
-        query_lower = query.lower()
-
-        # Name match
-        if user and user.full_name and query_lower in user.full_name.lower():
-            score += 0.3
-
-        # Skills match
-        if provider.skills and query_lower in provider.skills.lower():
-            score += 0.4
-
-        # Service area match
-        if provider.service_area and query_lower in provider.service_area.lower():
-            score += 0.2
+    def _job_sort_keys(
+        self, sort_by, sort_order, relevance, distance=None
+    ) -> List[SortKey]:
+        """Keyset for a job sort; Job.id last keeps the order total"""
+        descending = sort_order == "desc"
+        if sort_by == "distance" and distance is not None:
+            # Always nearest first; sort_order defaults to desc for the others
+            return [SortKey(distance), SortKey(Job.id)]
+        if sort_by == "relevance" and relevance is not None:
+            # Weighted relevance computed in the database, newest first on ties
+            return [
+                SortKey(relevance, descending=True),
+                SortKey(Job.created_at, descending=True),
+                SortKey(Job.id, descending=True),
+            ]
+        if sort_by == "date":
+            return [
+                SortKey(Job.created_at, descending),
+                SortKey(Job.id, descending),
+            ]
+        if sort_by == "budget":
+            # NULL budgets sort as zero so keyset comparisons stay well defined
+            return [
+                SortKey(func.coalesce(Job.budget_min, 0), descending),
+                SortKey(Job.id, descending),
+            ]
+        if sort_by == "title":
+            return [SortKey(Job.title, descending), SortKey(Job.id, descending)]
+        # Default sorting by creation date
+        return [
+            SortKey(Job.created_at, descending=True),
+            SortKey(Job.id, descending=True),
+        ]
+
+    def _provider_sort_keys(
+        self, sort_by, sort_order, relevance, avg_rating, distance=None
+    ) -> List[SortKey]:
+        """Keyset for a provider sort; User.id last keeps the order total"""
+        descending = sort_order == "desc"
+        if sort_by == "distance" and distance is not None:
+            return [SortKey(distance), SortKey(User.id)]
+        if sort_by == "relevance" and relevance is not None:
+            return [
+                SortKey(relevance, descending=True),
+                SortKey(User.created_at, descending=True),
+                SortKey(User.id, descending=True),
+            ]
+        if sort_by == "rating":
+            expression = func.coalesce(avg_rating, 0)
+        elif sort_by == "rate":
+            expression = func.coalesce(ProviderProfile.hourly_rate, 0)
+        elif sort_by == "experience":
+            expression = func.coalesce(ProviderProfile.years_experience, 0)
+        else:
+            # Default sorting by user name
+            return [SortKey(User.full_name), SortKey(User.id)]
+        return [SortKey(expression, descending), SortKey(User.id, descending)]
+
+    @staticmethod
+    def _add_distances(results, rows, latitude: float, longitude: float) -> None:
+        """Attach ``distance_km`` from the point to each geo result"""
+        for result, row in zip(results, rows):
+            located = row[0]
+            result["distance_km"] = round(
+                haversine_km(latitude, longitude, located.latitude, located.longitude),
+                2,
+            )
 
-        # Bio match
-        if provider.bio and query_lower in provider.bio.lower():
-            score += 0.1
+    @staticmethod
+    def _pagination_info(page_result: PageResult) -> Dict[str, Any]:
+        """Pagination block for search responses"""
+        return {
+            "page": page_result.page,
+            "per_page": page_result.per_page,
+            "total_count": page_result.total,
+            "total_pages": page_result.pages,
+            "has_next": page_result.has_next,
+            "has_prev": page_result.has_prev,
+            "next_cursor": page_result.next_cursor,
+        }
 
-        return min(score, 1.0)
+    def _provider_column_weights(self) -> List[Tuple[Any, float]]:
+        """Provider columns paired with their relevance weights"""
+        weights = self.provider_search_weights
+        return [
+            (User.full_name, weights["name_match"]),
+            (ProviderProfile.skills, weights["skills_match"]),
+            (ProviderProfile.service_area, weights["service_area_match"]),
+            (User.bio, weights["bio_match"]),
+        ]
 
 
 # Initialize search engine
@@ -648,6 +754,8 @@ search_engine = AdvancedSearchEngine()
 
 
 @advanced_search_bp.route("/jobs", methods=["GET"])
+@conditional_response(search_version)
+@instrument_search("jobs")
 def search_jobs():
     """Advanced job search endpoint"""
     try:
@@ -655,6 +763,9 @@ def search_jobs():
         query = request.args.get("q", "")
         category = request.args.get("category", "")
         location = request.args.get("location", "")
+        latitude = request.args.get("latitude", type=float)
+        longitude = request.args.get("longitude", type=float)
+        radius_km = request.args.get("radius_km", type=float)
         min_budget = request.args.get("min_budget", type=float)
         max_budget = request.args.get("max_budget", type=float)
         status = request.args.get("status", "")
@@ -667,12 +778,17 @@ def search_jobs():
         per_page = min(
             request.args.get("per_page", 20, type=int), 100
         )  # Max 100 per page
+        after = request.args.get("after")
+        with_total = wants_total(request.args)
 
         # Perform search
         results = search_engine.search_jobs(
             query=query,
             category=category,
             location=location,
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=radius_km,
             min_budget=min_budget,
             max_budget=max_budget,
             status=status,
@@ -683,15 +799,23 @@ def search_jobs():
             sort_order=sort_order,
             page=page,
             per_page=per_page,
+            after=after,
+            with_total=with_total,
+            count_ttl=COUNT_CACHE_TTL,
+            use_cache=True,
         )
 
         return jsonify({"success": True, **results})
 
+    except ValueError as e:  # Invalid cursor or radius parameters
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
 @advanced_search_bp.route("/providers", methods=["GET"])
+@conditional_response(search_version)
+@instrument_search("providers")
 def search_providers():
     """Advanced provider search endpoint"""
     try:
@@ -699,6 +823,9 @@ def search_providers():
         query = request.args.get("q", "")
         skills = request.args.get("skills", "")
         location = request.args.get("location", "")
+        latitude = request.args.get("latitude", type=float)
+        longitude = request.args.get("longitude", type=float)
+        radius_km = request.args.get("radius_km", type=float)
         min_rate = request.args.get("min_rate", type=float)
         max_rate = request.args.get("max_rate", type=float)
         min_experience = request.args.get("min_experience", type=int)
@@ -710,12 +837,17 @@ def search_providers():
         per_page = min(
             request.args.get("per_page", 20, type=int), 100
         )  # Max 100 per page
+        after = request.args.get("after")
+        with_total = wants_total(request.args)
 
         # Perform search
         results = search_engine.search_providers(
             query=query,
             skills=skills,
             location=location,
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=radius_km,
             min_rate=min_rate,
             max_rate=max_rate,
             min_experience=min_experience,
@@ -725,15 +857,59 @@ def search_providers():
             sort_order=sort_order,
             page=page,
             per_page=per_page,
+            after=after,
+            with_total=with_total,
+            count_ttl=COUNT_CACHE_TTL,
+            use_cache=True,
         )
 
         return jsonify({"success": True, **results})
 
+    except ValueError as e:  # Invalid cursor or radius parameters
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@advanced_search_bp.route("/jobs/nearby", methods=["GET"])
+@conditional_response(search_version)
+@instrument_search("jobs_nearby")
+def search_nearby_jobs():
+    """Open jobs within the signed-in provider's service radius"""
+    try:
+        user_id = session.get("user_id")
+        if not user_id:
+            return jsonify({"success": False, "error": "Not authenticated"}), 401
+
+        results = search_engine.jobs_near_provider(
+            user_id,
+            radius_km=request.args.get("radius_km", type=float),
+            query=request.args.get("q", ""),
+            category=request.args.get("category", ""),
+            sort_by=request.args.get("sort_by", "distance"),
+            per_page=min(request.args.get("per_page", 20, type=int), 100),
+            page=request.args.get("page", 1, type=int),
+            after=request.args.get("after"),
+            with_total=wants_total(request.args),
+            count_ttl=COUNT_CACHE_TTL,
+            use_cache=True,
+        )
+        if results is None:
+            return (
+                jsonify({"success": False, "error": "Provider profile not found"}),
+                404,
+            )
+
+        return jsonify({"success": True, **results})
+
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
 @advanced_search_bp.route("/suggestions", methods=["GET"])
+@instrument_search("suggestions")
 def get_search_suggestions():
     """Get intelligent search suggestions"""
     try:
@@ -749,6 +925,10 @@ def get_search_suggestions():
 
 
 @advanced_search_bp.route("/popular", methods=["GET"])
+@instrument_search("popular")
+@response_cache.cache_response(
+    ttl=POPULAR_CACHE_TTL, stale_ttl=POPULAR_STALE_TTL, etag=True
+)
 def get_popular_searches():
     """Get popular search terms and categories"""
     try:
@@ -766,102 +946,23 @@ def get_popular_searches():
 
 
 @advanced_search_bp.route("/filters", methods=["GET"])
+@instrument_search("filters")
 def get_available_filters():
     """Get available filter options for search"""
     try:
         search_type = request.args.get("type", "jobs")
 
-        if search_type == "jobs":
-            # Get unique categories through Service relationship
-            categories = (
-                db.session.query(ServiceCategory.name)
-                .join(Service, ServiceCategory.id == Service.category_id)
-                .join(Job, Service.id == Job.service_id)
-                .filter(ServiceCategory.name.isnot(None))
-                .distinct()
-                .all()
-            )
-
-            # Get budget ranges using budget_min and budget_max
-            budget_stats = db.session.query(
-                func.min(Job.budget_min).label("min_budget"),
-                func.max(Job.budget_max).label("max_budget"),
-                func.avg((Job.budget_min + Job.budget_max) / 2).label("avg_budget"),
-            ).first()
-
-            # Get unique locations from city and state
-            locations = (
-                db.session.query((Job.city + ", " + Job.state).label("location"))
-                .filter(and_(Job.city.isnot(None), Job.state.isnot(None)))
-                .distinct()
-                .limit(50)
-                .all()
-            )
-
-            filters = {
-                "categories": [cat[0] for cat in categories if cat[0]],
-                "budget_range": {
-                    "min": budget_stats.min_budget or 0,
-                    "max": budget_stats.max_budget or 10000,
-                    "average": round(budget_stats.avg_budget or 0, 2),
-                },
-                "locations": [loc[0] for loc in locations if loc[0]],
-                "status_options": [status.value for status in JobStatus],
-                "urgency_options": [True, False],
-            }
-
-        else:  # providers
-            # Get unique skills
-            all_skills = set()
-            skills_data = (
-                db.session.query(ProviderProfile.skills)
-                .filter(ProviderProfile.skills.isnot(None))
-                .all()
-            )
-
-            for skill_row in skills_data:
-                if skill_row[0]:
-                    skills = [skill.strip() for skill in skill_row[0].split(",")]
-                    all_skills.update(skills)
-
-            # Get rate ranges
-            rate_stats = db.session.query(
-                func.min(ProviderProfile.hourly_rate).label("min_rate"),
-                func.max(ProviderProfile.hourly_rate).label("max_rate"),
-                func.avg(ProviderProfile.hourly_rate).label("avg_rate"),
-            ).first()
-
-            # Get experience ranges
-            experience_stats = db.session.query(
-                func.min(ProviderProfile.years_experience).label("min_exp"),
-                func.max(ProviderProfile.years_experience).label("max_exp"),
-                func.avg(ProviderProfile.years_experience).label("avg_exp"),
-            ).first()
-
-            # Get service areas
-            service_areas = (
-                db.session.query(ProviderProfile.service_area)
-                .filter(ProviderProfile.service_area.isnot(None))
-                .distinct()
-                .limit(50)
-                .all()
-            )
-
-            filters = {
-                "skills": sorted(list(all_skills))[:100],  # Limit to top 100 skills
-                "rate_range": {
-                    "min": rate_stats.min_rate or 0,
-                    "max": rate_stats.max_rate or 200,
-                    "average": round(rate_stats.avg_rate or 0, 2),
-                },
-                "experience_range": {
-                    "min": experience_stats.min_exp or 0,
-                    "max": experience_stats.max_exp or 30,
-                    "average": round(experience_stats.avg_exp or 0, 1),
-                },
-                "service_areas": [area[0] for area in service_areas if area[0]],
-                "rating_options": [1, 2, 3, 4, 5],
-            }
+        # Active search filters condition the job facet counts
+        filters = search_engine.get_available_filters(
+            search_type,
+            query=request.args.get("q", ""),
+            category=request.args.get("category", ""),
+            location=request.args.get("location", ""),
+            min_budget=request.args.get("min_budget", type=float),
+            max_budget=request.args.get("max_budget", type=float),
+            status=request.args.get("status", ""),
+            urgency=request.args.get("urgency", type=bool),
+        )
 
         return jsonify({"success": True, "filters": filters, "type": search_type})
 
@@ -13,12 +13,31 @@ sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
 from ai_engine import BipedAIEngine, JobRequirement, Provider
 from flask import Blueprint, jsonify, request, session
 
+from src.models.provider_feature import ProviderFeature
+from src.models.user import ProviderProfile, User, db
+from src.services.candidate_index import category_trades
+from src.services.geo_search import radius_filter
+from src.services.provider_skills import provider_skill_filter, provider_skill_sets
+
 # Create blueprint
 ai_bp = Blueprint("ai", __name__, url_prefix="/api/ai")
 
 # Initialize AI engine
 ai_engine = BipedAIEngine()
 
+# Candidate pool for /find-matches; the engine scores 50 km+ as distant
+AI_MATCH_RADIUS_KM = 100
+AI_MATCH_CANDIDATES = 200
+WEEKDAYS = (
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -98,6 +117,12 @@ def analyze_job():
         return jsonify({"error": "Failed to analyze job description"}), 500
 
 
+@ai_bp.route("/analysis-cache", methods=["GET"])
+def analysis_cache_stats():
+    """Hit/miss counters of the job description analysis cache"""
+    return jsonify({"success": True, "cache": ai_engine.analysis_cache.stats()})
+
+
 @ai_bp.route("/find-matches", methods=["POST"])
 def find_matches():
     """Find AI-matched providers for a job"""
@@ -131,8 +156,8 @@ def find_matches():
             posted_date=datetime.now(),
         )
 
-        # Get mock providers (in real implementation, this would come from database)
-        providers = _get_mock_providers(data["category"])
+        # Candidates from the provider feature store (mock data if it is empty)
+        providers = _get_providers(data["category"], job.location)
 
         # Find matches
         matches = ai_engine.find_matches(job, providers, top_k=5)
@@ -361,6 +386,62 @@ def _recommend_timeline(urgency, complexity):
         return "Flexible timeline"
 
 
+def _get_providers(category, location):
+    """
+    Providers near a job with a skill in the category's trades (see
+    category_trades), built from the feature store
+    """
+    within, _ = radius_filter(
+        ProviderFeature.latitude,
+        ProviderFeature.longitude,
+        location[0],
+        location[1],
+        AI_MATCH_RADIUS_KM,
+    )
+    rows = (
+        db.session.query(ProviderFeature, ProviderProfile, User)
+        .join(ProviderProfile, ProviderFeature.provider_id == ProviderProfile.id)
+        .join(User, ProviderProfile.user_id == User.id)
+        .filter(
+            User.is_active.is_(True),
+            within,
+            provider_skill_filter(category_trades(category)),
+        )
+        .limit(AI_MATCH_CANDIDATES)
+        .all()
+    )
+    if not rows:
+        return _get_mock_providers(category)
+
+    skill_sets = provider_skill_sets([profile.id for _, profile, _ in rows])
+    providers = []
+    for features, profile, user in rows:
+        schedule = profile.availability_schedule
+        availability = (
+            {day: bool(value) for day, value in schedule.items()}
+            if isinstance(schedule, dict)
+            else {day: bool(profile.is_available) for day in WEEKDAYS}
+        )
+        rating = features.average_rating or 0.0
+        providers.append(
+            Provider(
+                id=str(user.id),
+                name=user.full_name,
+                category=category,
+                skills=sorted(skill_sets[profile.id]),
+                location=(features.latitude, features.longitude),
+                rating=rating,
+                completed_jobs=features.completed_jobs,
+                hourly_rate=float(profile.hourly_rate or 0),
+                availability=availability,
+                response_time=profile.response_time_hours or 24.0,
+                quality_score=(rating / 5.0) * 0.7
+                + min(features.completed_jobs / 50, 1.0) * 0.3,
+            )
+        )
+    return providers
+
+
 def _get_mock_providers(category):
     """Get mock providers for testing (replace with database query)"""
     providers = [
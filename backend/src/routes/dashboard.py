@@ -14,11 +14,20 @@ from src.models.job import Job, JobStatus
 from src.models.review import Review
 from src.models.service import ServiceCategory
 from src.models.user import CustomerProfile, ProviderProfile, User, db
+from src.utils.performance import response_cache
 
 dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/api/dashboard")
 
+# Platform-wide stats may be a minute old; once expired, one request
+# recomputes them while the others are served the previous copy
+STATS_CACHE_TTL = 60
+STATS_STALE_TTL = 300
+
 
 @dashboard_bp.route("/stats", methods=["GET"])
+@response_cache.cache_response(
+    ttl=STATS_CACHE_TTL, stale_ttl=STATS_STALE_TTL, etag=True
+)
 def get_dashboard_stats():
     """Get overall platform statistics"""
     try:
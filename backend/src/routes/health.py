@@ -243,6 +243,28 @@ def simple_health_check():
     )
 
 
+@health_bp.route("/health/caches", methods=["GET"])
+def cache_health_check():
+    """Size, budget, hit and eviction counters of the in-process caches"""
+    from ..utils.pagination import count_cache
+    from ..utils.performance import response_cache, trading_cache
+
+    return (
+        jsonify(
+            {
+                "status": "healthy",
+                "timestamp": datetime.utcnow().isoformat(),
+                "caches": {
+                    "response_cache": response_cache.stats(),
+                    "trading_cache": trading_cache.get_stats(),
+                    "count_cache": count_cache.get_stats(),
+                },
+            }
+        ),
+        200,
+    )
+
+
 @health_bp.route("/health/vision", methods=["GET"])
 def vision_health_check():
     """Dedicated computer vision health check"""
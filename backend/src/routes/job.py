@@ -6,6 +6,13 @@ from sqlalchemy import and_, or_
 from src.models.job import Job, JobMessage, JobMilestone, JobStatus, Quote
 from src.models.service import Service
 from src.models.user import ProviderProfile, User, db
+from src.utils.pagination import (
+    COUNT_CACHE_TTL,
+    InvalidCursorError,
+    SortKey,
+    paginate,
+    wants_total,
+)
 
 job_bp = Blueprint("job", __name__)
 
@@ -158,11 +165,18 @@ def get_jobs():
         if postcode:
             query = query.filter(Job.postcode == postcode)
 
-        # Order by creation date (newest first)
-        query = query.order_by(Job.created_at.desc())
-
-        # Paginate
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        # Order by creation date (newest first); Job.id breaks ties so
+        # cursors from ``next_cursor`` resume exactly where a page ended
+        pagination = paginate(
+            query,
+            [SortKey(Job.created_at, descending=True), SortKey(Job.id, True)],
+            per_page,
+            page=page,
+            after=request.args.get("after"),
+            with_total=wants_total(request.args),
+            signature="jobs:created_at",
+            count_ttl=COUNT_CACHE_TTL,
+        )
 
         return (
             jsonify(
@@ -175,12 +189,15 @@ def get_jobs():
                         "total": pagination.total,
                         "has_next": pagination.has_next,
                         "has_prev": pagination.has_prev,
+                        "next_cursor": pagination.next_cursor,
                     },
                 }
             ),
             200,
         )
 
+    except InvalidCursorError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 from flask import Blueprint, jsonify, request
 
 from src.utils.error_handling import ErrorHandler
+from src.utils.performance import response_cache
 
 jobs_api_bp = Blueprint("jobs_api", __name__)
 
@@ -384,6 +385,7 @@ def get_provider(provider_id):
 
 
 @jobs_api_bp.route("/api/categories", methods=["GET"])
+@response_cache.cache_response(ttl=3600, etag=True)
 def get_categories():
     """Get service categories with job counts"""
     try:
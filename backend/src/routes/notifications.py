@@ -14,6 +14,7 @@ from sqlalchemy import and_, desc, or_
 
 from src.models.job import Job, JobStatus
 from src.models.user import User, db
+from src.utils.conditional import conditional_response, table_version
 
 notifications_bp = Blueprint("notifications", __name__, url_prefix="/api/notifications")
 
@@ -44,6 +45,9 @@ class Notification(db.Model):
     """Notification model for storing notifications"""
 
     __tablename__ = "notifications"
+    __table_args__ = (
+        db.Index("ix_notifications_user_created", "user_id", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
@@ -293,7 +297,18 @@ class NotificationManager:
 notification_manager = NotificationManager()
 
 
+def notifications_version():
+    """Count and latest creation/read time of the requested user's notifications"""
+    user_id = request.args.get("user_id", type=int)
+    return table_version(
+        db.session.query(Notification).filter(Notification.user_id == user_id),
+        Notification.created_at,
+        Notification.read_at,
+    )
+
+
 @notifications_bp.route("/list", methods=["GET"])
+@conditional_response(notifications_version)
 def get_notifications():
     """Get notifications for the current user"""
     try:
@@ -3,11 +3,13 @@ from sqlalchemy import and_, or_
 
 from src.models.service import PortfolioItem, ProviderService, Service, ServiceCategory
 from src.models.user import ProviderProfile, User, db
+from src.utils.conditional import conditional_response, tag_versions
 
 service_bp = Blueprint("service", __name__)
 
 
 @service_bp.route("/categories", methods=["GET"])
+@conditional_response(lambda: tag_versions("table:service_category"), private=False)
 def get_categories():
     """Get all service categories"""
     try:
@@ -4,17 +4,46 @@ Revolutionary AI-powered contractor-client matching system
 """
 
 import math
-import random
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Tuple
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-from flask import Blueprint, g, jsonify, request
-from sqlalchemy import and_, desc, func, or_
+import numpy as np
+from flask import Blueprint, jsonify, request, session
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 
 from src.models.job import Job, JobStatus
+from src.models.provider_feature import ProviderFeature
 from src.models.review import Review
-from src.models.service import Service, ServiceCategory
-from src.models.user import ProviderProfile, User, db
+from src.models.user import ProviderProfile, db
+from src.routes.unified_auth import admin_required
+from src.services.batch_matching import (
+    AVERAGE_HOURLY_RATE,
+    RELATED_SKILLS,
+    BatchScorer,
+    JobColumns,
+    ProviderFeatures,
+    component_scores_at,
+    job_address,
+    job_budget,
+    provider_details_at,
+    service_area_score,
+    top_k,
+)
+from src.services.candidate_index import match_candidates, provider_trades
+from src.services.geo_search import DEFAULT_SERVICE_RADIUS_KM, haversine_km
+from src.services.job_index import open_jobs_for
+from src.services.match_materializer import (
+    MATCH_LIST_SIZE,
+    is_open,
+    match_materializer,
+    read_matches,
+)
+from src.services.matching_weights import current_weights, weight_registry
+from src.services.provider_skills import normalize_skill, provider_skill_sets
+from src.services.search_cache import search_cache
+
+MAX_FEED_PAGE_SIZE = 100
 
 smart_matching_bp = Blueprint(
     "smart_matching", __name__, url_prefix="/api/smart-matching"
@@ -32,44 +61,34 @@ class SmartMatchingEngine:
     - Customer preferences and budget
     """
 
-    def __init__(self):
-        self.weights = {
-            "skills_match": 0.25,
-            "location_proximity": 0.20,
-            "rating_score": 0.20,
-            "availability": 0.15,
-            "price_compatibility": 0.10,
-            "experience_level": 0.10,
-        }
+    @property
+    def weights(self) -> Dict[str, float]:
+        """The live weights, shared by every worker through the registry"""
+        return current_weights()[1]
+
+    @property
+    def weights_version(self) -> int:
+        return current_weights()[0]
 
-    def calculate_skills_match(self, job: Job, provider: ProviderProfile) -> float:
+    def calculate_skills_match(
+        self, job: Job, provider: ProviderProfile, provider_skills: set = None
+    ) -> float:
         """Calculate skills compatibility score (0-1)"""
-        if not provider.skills or not job.category:
+        category = job.service.category if job.service else None
+        if provider_skills is None:
+            provider_skills = provider_skill_sets([provider.id])[provider.id]
+        if not provider_skills or not category:
             return 0.0
 
-        # Convert skills to lowercase for comparison
-        provider_skills = [
-            skill.lower().strip() for skill in provider.skills.split(",")
-        ]
-        job_category = job.category.lower().strip()
+        # Skills are normalized (lowercase slugs) in the provider_skill table
+        job_category = normalize_skill(category.name)
 
         # Direct category match
         if job_category in provider_skills:
             return 1.0
 
         # Partial match scoring
-        related_skills = {
-            "plumbing": ["plumber", "pipe", "water", "drain", "fixture"],
-            "electrical": ["electrician", "wiring", "electric", "power", "lighting"],
-            "carpentry": ["carpenter", "wood", "cabinet", "furniture", "framing"],
-            "painting": ["painter", "paint", "wall", "interior", "exterior"],
-            "roofing": ["roofer", "roof", "shingle", "gutter", "leak"],
-            "hvac": ["heating", "cooling", "air", "furnace", "ac"],
-            "landscaping": ["landscape", "garden", "lawn", "tree", "yard"],
-            "cleaning": ["clean", "house", "office", "deep", "maintenance"],
-        }
-
-        job_related = related_skills.get(job_category, [])
+        job_related = RELATED_SKILLS.get(job_category, [])
         if job_related:
             matches = sum(
                 1
@@ -84,35 +103,30 @@ class SmartMatchingEngine:
         self, job: Job, provider: ProviderProfile
     ) -> float:
         """Calculate location proximity score (0-1)"""
-        if not job.location or not provider.service_area:
-            return 0.5  # Neutral score if location data missing
-
-        # Simplified location matching (in real implementation, use geolocation)
-        job_location = job.location.lower()
-        service_areas = [
-            area.lower().strip() for area in provider.service_area.split(",")
-        ]
-
-        # Check for exact matches or partial matches
-        for area in service_areas:
-            if area in job_location or job_location in area:
-                return 1.0
-
-        # Check for city/state matches
-        job_parts = job_location.split(",")
-        for part in job_parts:
-            part = part.strip()
-            for area in service_areas:
-                if part in area or area in part:
-                    return 0.7
-
-        return 0.2  # Low score for distant locations
+        if None not in (
+            job.latitude,
+            job.longitude,
+            provider.latitude,
+            provider.longitude,
+        ):
+            # Full score at the provider's base, falling to 0.5 at the edge
+            # of their service radius and 0.2 beyond it
+            distance = haversine_km(
+                provider.latitude, provider.longitude, job.latitude, job.longitude
+            )
+            radius = provider.service_radius or DEFAULT_SERVICE_RADIUS_KM
+            if distance > radius:
+                return 0.2
+            return 1.0 - 0.5 * distance / radius
+
+        # Fall back to matching the service areas against the job address
+        return service_area_score(job_address(job), provider.service_area)
 
     def calculate_rating_score(self, provider_id: int) -> float:
         """Calculate provider rating score (0-1)"""
         avg_rating = (
-            db.session.query(func.avg(Review.rating))
-            .filter(Review.reviewee_id == provider_id)
+            db.session.query(ProviderFeature.average_rating)
+            .filter(ProviderFeature.user_id == provider_id)
             .scalar()
         )
 
@@ -127,23 +141,18 @@ class SmartMatchingEngine:
         if not provider.availability:
             return 0.5
 
-        # Check recent job activity
-        recent_jobs = (
-            db.session.query(Job)
-            .filter(
-                and_(
-                    Job.assigned_provider_id == provider.user_id,
-                    Job.created_at >= datetime.utcnow() - timedelta(days=30),
-                    Job.status.in_([JobStatus.ACCEPTED, JobStatus.IN_PROGRESS]),
-                )
-            )
-            .count()
+        # Jobs the provider is currently committed to, from the feature store
+        active_jobs = (
+            db.session.query(ProviderFeature.active_jobs)
+            .filter(ProviderFeature.provider_id == provider.id)
+            .scalar()
+            or 0
         )
 
         # Lower score for overloaded providers
-        if recent_jobs > 10:
+        if active_jobs > 10:
             return 0.3
-        elif recent_jobs > 5:
+        elif active_jobs > 5:
             return 0.6
         else:
             return 1.0
@@ -152,19 +161,20 @@ class SmartMatchingEngine:
         self, job: Job, provider: ProviderProfile
     ) -> float:
         """Calculate price compatibility score (0-1)"""
-        if not job.budget or not provider.hourly_rate:
+        budget = job_budget(job)
+        if not budget or not provider.hourly_rate:
             return 0.5
 
         # Estimate project hours (simplified)
-        estimated_hours = max(job.budget / 50, 1)  # Assume $50/hour average
-        provider_cost = provider.hourly_rate * estimated_hours
+        estimated_hours = max(budget / AVERAGE_HOURLY_RATE, 1)
+        provider_cost = float(provider.hourly_rate) * estimated_hours
 
         # Calculate compatibility based on budget vs estimated cost
-        if provider_cost <= job.budget:
+        if provider_cost <= budget:
             return 1.0
-        elif provider_cost <= job.budget * 1.2:  # Within 20% of budget
+        elif provider_cost <= budget * 1.2:  # Within 20% of budget
             return 0.8
-        elif provider_cost <= job.budget * 1.5:  # Within 50% of budget
+        elif provider_cost <= budget * 1.5:  # Within 50% of budget
             return 0.5
         else:
             return 0.2
@@ -186,11 +196,11 @@ class SmartMatchingEngine:
             return 0.4
 
     def calculate_match_score(
-        self, job: Job, provider: ProviderProfile
+        self, job: Job, provider: ProviderProfile, provider_skills: set = None
     ) -> Tuple[float, Dict[str, float]]:
         """Calculate overall match score and component scores"""
         scores = {
-            "skills_match": self.calculate_skills_match(job, provider),
+            "skills_match": self.calculate_skills_match(job, provider, provider_skills),
             "location_proximity": self.calculate_location_proximity(job, provider),
             "rating_score": self.calculate_rating_score(provider.user_id),
             "availability": self.calculate_availability_score(provider),
@@ -205,54 +215,161 @@ class SmartMatchingEngine:
 
         return overall_score, scores
 
-    def find_matches(self, job_id: int, limit: int = 10) -> List[Dict[str, Any]]:
-        """Find best matching providers for a job"""
+    def find_matches(
+        self, job_id: int, limit: int = 10, max_age: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Best matching providers for a job. Open jobs are answered from their
+        materialized list, which is empty when the job has no candidates.
+        The job is scored now instead when it is closed, ``limit`` exceeds
+        ``MATCH_LIST_SIZE``, or the list is missing, scored with other
+        weights or older than ``max_age`` seconds; in the last cases the job
+        is also marked for the materializer, as reads never write.
+        """
         job = db.session.query(Job).filter(Job.id == job_id).first()
         if not job:
             return []
+        if not is_open(job) or limit > MATCH_LIST_SIZE:
+            return self.compute_matches(job, limit)
 
-        # Get all available providers
-        providers = (
-            db.session.query(ProviderProfile)
-            .join(User)
-            .filter(User.is_active == True)
-            .all()
-        )
+        matches = read_matches(db.session, job.id, max_age, self.weights_version)
+        if matches is None:
+            match_materializer.mark([job.id])
+            return self.compute_matches(job, limit)
+        return matches[:limit]
+
+    def compute_matches(self, job: Job, limit: int = 10) -> List[Dict[str, Any]]:
+        """Score a job's candidate providers at once and return the top ``limit``"""
+        # Only providers in the job's trade whose service area covers it
+        candidates = match_candidates(job)
+        if candidates is None:
+            features = ProviderFeatures.load()
+        elif candidates:
+            features = ProviderFeatures.load(
+                provider_filter=ProviderProfile.id.in_(candidates)
+            )
+        else:
+            return []
+        version, weights = current_weights()
+        overall, components = BatchScorer(weights).score(job, features)
 
         matches = []
-        for provider in providers:
-            overall_score, component_scores = self.calculate_match_score(job, provider)
-
-            # Get provider user info
-            user = db.session.query(User).filter(User.id == provider.user_id).first()
-            if not user:
-                continue
-
-            match_data = {
-                "provider_id": provider.user_id,
-                "provider_name": user.full_name,
-                "provider_email": user.email,
-                "overall_score": round(overall_score, 3),
-                "component_scores": {
-                    k: round(v, 3) for k, v in component_scores.items()
-                },
-                "provider_details": {
-                    "skills": provider.skills,
-                    "hourly_rate": provider.hourly_rate,
-                    "years_experience": provider.years_experience,
-                    "service_area": provider.service_area,
-                    "availability": provider.availability,
-                },
-                "confidence_level": self._calculate_confidence(overall_score),
-                "recommendation_reason": self._generate_recommendation_reason(
-                    component_scores
-                ),
-            }
-            matches.append(match_data)
+        for row in top_k(overall, limit):
+            overall_score = float(overall[row])
+            component_scores = component_scores_at(components, row)
+            matches.append(
+                {
+                    "provider_id": int(features.user_ids[row]),
+                    "provider_name": features.names[row],
+                    "provider_email": features.emails[row],
+                    "overall_score": round(overall_score, 3),
+                    "component_scores": {
+                        k: round(v, 3) for k, v in component_scores.items()
+                    },
+                    "provider_details": provider_details_at(features, row),
+                    "confidence_level": self._calculate_confidence(overall_score),
+                    "recommendation_reason": self._generate_recommendation_reason(
+                        component_scores
+                    ),
+                    "weights_version": version,
+                }
+            )
+        return matches
+
+    def find_jobs(
+        self, provider_id: int, page: int = 1, per_page: int = 20
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Best open jobs for a provider (user id), a page at a time, or None if
+        there is no such active provider. The whole ranking is scored in one
+        pass over the provider's indexed open jobs and cached per provider
+        and weights version.
+        """
+        if page < 1 or not 1 <= per_page <= MAX_FEED_PAGE_SIZE:
+            raise ValueError(
+                f"page must be at least 1 and per_page between 1 and "
+                f"{MAX_FEED_PAGE_SIZE}"
+            )
 
-        # Sort by overall score and return top matches
-        matches.sort(key=lambda x: x["overall_score"], reverse=True)
-        return matches[:limit]
+        version, weights = current_weights()
+        key = search_cache.make_key(
+            "feeds", {"provider_id": provider_id, "weights_version": version}
+        )
+        ranking = search_cache.get(key)
+        if ranking is None:
+            stamp = search_cache.stamp("feeds")
+            ranking = self._rank_open_jobs(provider_id, weights)
+            if ranking is None:
+                return None
+            search_cache.set(key, ranking, {"provider": str(provider_id)}, stamp)
+
+        start = (page - 1) * per_page
+        page_ids = ranking["ids"][start : start + per_page]
+        query = Job.query.options(
+            joinedload(Job.service),
+            joinedload(Job.customer),
+            joinedload(Job.assigned_provider),
+        ).filter(Job.id.in_(page_ids))
+        jobs = {job.id: job for job in query}
+        results = []
+        for position, job_id in enumerate(page_ids, start):
+            job = jobs.get(job_id)
+            if job is None:
+                continue  # Deleted since the ranking was cached
+            score = ranking["scores"][position]
+            results.append(
+                {
+                    "job": job.to_dict(),
+                    "overall_score": round(score, 3),
+                    "component_scores": {
+                        factor: round(values[position], 3)
+                        for factor, values in ranking["components"].items()
+                    },
+                    "confidence_level": self._calculate_confidence(score),
+                }
+            )
+
+        total = len(ranking["ids"])
+        return {
+            "results": results,
+            "pagination": {
+                "page": page,
+                "per_page": per_page,
+                "total_count": total,
+                "total_pages": math.ceil(total / per_page),
+                "has_next": start + per_page < total,
+                "has_prev": page > 1,
+            },
+            "weights_version": version,
+        }
+
+    def _rank_open_jobs(
+        self, provider_id: int, weights: Dict[str, float]
+    ) -> Optional[Dict[str, Any]]:
+        """Every open job the provider could take, best first, with scores"""
+        features = ProviderFeatures.load(
+            provider_filter=ProviderProfile.user_id == provider_id
+        )
+        if not len(features):
+            return None
+
+        latitude, longitude = features.latitude[0], features.longitude[0]
+        job_ids = open_jobs_for(
+            provider_trades(features.skill_vocabulary),
+            None if np.isnan(latitude) else float(latitude),
+            None if np.isnan(longitude) else float(longitude),
+            float(features.service_radius[0]),
+        )
+        jobs = JobColumns.load(job_ids)
+        overall, components = BatchScorer(weights).score_jobs(jobs, features, 0)
+        order = top_k(overall, len(jobs))
+        return {
+            "ids": jobs.job_ids[order].tolist(),
+            "scores": overall[order].tolist(),
+            "components": {
+                factor: values[order].tolist() for factor, values in components.items()
+            },
+        }
 
     def _calculate_confidence(self, score: float) -> str:
         """Calculate confidence level based on score"""
@@ -286,6 +403,7 @@ class SmartMatchingEngine:
 
 # Initialize matching engine
 matching_engine = SmartMatchingEngine()
+match_materializer.bind(matching_engine)
 
 
 @smart_matching_bp.route("/find-matches/<int:job_id>", methods=["GET"])
@@ -293,7 +411,9 @@ def find_matches(job_id):
     """Find best matching providers for a specific job"""
     try:
         limit = request.args.get("limit", 10, type=int)
-        matches = matching_engine.find_matches(job_id, limit)
+        # Oldest acceptable precomputed list, in seconds
+        max_age = request.args.get("max_age", type=float)
+        matches = matching_engine.find_matches(job_id, limit, max_age)
 
         return jsonify(
             {
@@ -302,6 +422,11 @@ def find_matches(job_id):
                 "matches_found": len(matches),
                 "matches": matches,
                 "algorithm_version": "1.0",
+                "weights_version": (
+                    matches[0]["weights_version"]
+                    if matches
+                    else matching_engine.weights_version
+                ),
                 "generated_at": datetime.utcnow().isoformat(),
             }
         )
@@ -310,6 +435,32 @@ def find_matches(job_id):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@smart_matching_bp.route("/job-feed/<int:provider_id>", methods=["GET"])
+def job_feed(provider_id):
+    """Best open jobs for a provider, paginated"""
+    try:
+        page = request.args.get("page", 1, type=int)
+        per_page = request.args.get("per_page", 20, type=int)
+        feed = matching_engine.find_jobs(provider_id, page, per_page)
+        if feed is None:
+            return jsonify({"success": False, "error": "Provider not found"}), 404
+
+        return jsonify(
+            {
+                "success": True,
+                "provider_id": provider_id,
+                **feed,
+                "algorithm_version": "1.0",
+                "generated_at": datetime.utcnow().isoformat(),
+            }
+        )
+
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 @smart_matching_bp.route("/match-score", methods=["POST"])
 def calculate_match_score():
     """Calculate match score between specific job and provider"""
@@ -339,6 +490,7 @@ def calculate_match_score():
                 404,
             )
 
+        version = matching_engine.weights_version
         overall_score, component_scores = matching_engine.calculate_match_score(
             job, provider
         )
@@ -358,6 +510,7 @@ def calculate_match_score():
                 "recommendation_reason": matching_engine._generate_recommendation_reason(
                     component_scores
                 ),
+                "weights_version": version,
             }
         )
 
@@ -369,6 +522,8 @@ def calculate_match_score():
 def get_algorithm_stats():
     """Get statistics about the matching algorithm performance"""
     try:
+        version, weights = current_weights()
+
         # Calculate algorithm performance metrics
         total_jobs = db.session.query(Job).count()
         matched_jobs = (
@@ -385,7 +540,7 @@ def get_algorithm_stats():
 
         # Get average ratings for matched jobs
         avg_rating = (
-            db.session.query(func.avg(Review.rating))
+            db.session.query(func.avg(Review.overall_rating))
             .join(Job)
             .filter(Job.assigned_provider_id.isnot(None))
             .scalar()
@@ -403,7 +558,8 @@ def get_algorithm_stats():
                     "completion_rate_percent": round(completion_rate, 2),
                     "average_rating": round(avg_rating, 2),
                     "algorithm_version": "1.0",
-                    "weights": matching_engine.weights,
+                    "weights_version": version,
+                    "weights": weights,
                 },
                 "performance_metrics": {
                     "accuracy": round(completion_rate, 2),
@@ -418,42 +574,35 @@ def get_algorithm_stats():
 
 
 @smart_matching_bp.route("/update-weights", methods=["POST"])
+@admin_required
 def update_algorithm_weights():
-    """Update matching algorithm weights (admin only)"""
+    """Publish new matching algorithm weights (admin only)"""
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
         new_weights = data.get("weights", {})
-
-        # Validate weights
         if not isinstance(new_weights, dict):
             return (
                 jsonify({"success": False, "error": "Weights must be a dictionary"}),
                 400,
             )
 
-        # Check if weights sum to 1.0
-        total_weight = sum(new_weights.values())
-        if abs(total_weight - 1.0) > 0.01:
-            return (
-                jsonify(
-                    {
-                        "success": False,
-                        "error": f"Weights must sum to 1.0, got {total_weight}",
-                    }
-                ),
-                400,
-            )
-
-        # Update weights
-        matching_engine.weights.update(new_weights)
+        # Stored as a new version; other workers pick it up on their next poll,
+        # and lists scored with the old version stop being served
+        version, weights = weight_registry.publish(
+            new_weights, created_by=session["admin_id"]
+        )
+        match_materializer.mark_all()
 
         return jsonify(
             {
                 "success": True,
                 "message": "Algorithm weights updated successfully",
-                "new_weights": matching_engine.weights,
+                "weights_version": version,
+                "new_weights": weights,
             }
         )
 
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
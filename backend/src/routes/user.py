@@ -160,6 +160,10 @@ def update_profile():
                 profile.hourly_rate = data["hourly_rate"]
             if "service_radius" in data:
                 profile.service_radius = data["service_radius"]
+            if "latitude" in data:
+                profile.latitude = data["latitude"]
+            if "longitude" in data:
+                profile.longitude = data["longitude"]
             if "is_available" in data:
                 profile.is_available = data["is_available"]
             if "availability_schedule" in data:
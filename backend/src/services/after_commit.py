@@ -0,0 +1,70 @@
+"""
+After-Commit Queues
+===================
+
+Services that keep in-process state in step with the database (the search
+and tag caches, the candidate, job and suggestion indexes, facet snapshots
+and the match materializer) learn of writes from mapper events, which fire
+during a flush, before it is known whether the transaction commits.
+
+Each service creates an ``AfterCommitQueue``: its mapper events queue work
+on the session, which is handed to the queue's ``apply`` once the
+transaction commits and dropped if it rolls back, so rolled-back writes
+never leak in. Rolling back a SAVEPOINT keeps the work queued so far, as
+the outer transaction may still commit; at worst it is applied for writes
+that were undone.
+"""
+
+import logging
+from typing import Any, Callable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class AfterCommitQueue:
+    """Work queued on a session until its transaction commits"""
+
+    def __init__(
+        self,
+        name: str,
+        apply: Callable[[Any], None],
+        factory: Callable[[], Any] = list,
+    ):
+        self.name = name
+        self.key = f"{name}_pending"  # Session.info key
+        self.apply = apply  # Called with the pending container
+        self.factory = factory
+        _queues.append(self)
+
+    def pending(self, session: Optional[Session]) -> Any:
+        """The session's pending container (a ``factory()``), or None"""
+        if session is None:
+            return None
+        return session.info.setdefault(self.key, self.factory())
+
+
+_queues: List[AfterCommitQueue] = []
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    for queue in _queues:
+        pending = session.info.pop(queue.key, None)
+        if not pending:
+            continue
+        try:
+            queue.apply(pending)
+        except Exception as e:
+            # The write is committed; the state catches up on its own
+            # rebuild or expiry
+            logger.warning(f"Applying committed writes to {queue.name} failed: {e}")
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session, previous_transaction):
+    if previous_transaction.parent is None:  # Not just a SAVEPOINT
+        for queue in _queues:
+            session.info.pop(queue.key, None)
@@ -0,0 +1,394 @@
+"""
+Search Autocomplete Index
+=========================
+
+Answers ``/api/search/suggestions`` from memory instead of running
+``ilike('%q%')`` queries on every keystroke.
+
+Each suggestion type keeps an ``AutocompleteIndex``: a sorted array of
+``(key, term)`` pairs where the keys are every word-start suffix of the
+normalized term ("fix leaking tap" is reachable from "fix", "leak" and
+"tap"). A lookup is a binary search to the first key with the prefix plus a
+scan of that range, ranked by frequency weight.
+
+- ``jobs``      - job titles and category names, weighted by job count
+- ``providers`` - individual skills and provider names, weighted by
+  provider count
+
+Indexes are built on first use (or at startup), follow ORM writes made in
+this process once their transaction commits, and are rebuilt every
+``REBUILD_INTERVAL`` seconds to pick up writes made by other workers. That
+periodic rebuild runs on a background thread while lookups keep using the
+previous index.
+"""
+
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import object_session
+
+from src.models.job import Job
+from src.models.service import Service, ServiceCategory
+from src.models.user import ProviderProfile, User, db
+from src.services.after_commit import AfterCommitQueue
+from src.services.provider_skills import skill_histogram
+
+logger = logging.getLogger(__name__)
+
+SUGGESTION_TYPES = ("jobs", "providers")
+
+# Bound on how stale an index can be relative to writes from other processes
+REBUILD_INTERVAL = 600
+
+
+def normalize_term(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", (text or "").lower()).split())
+
+
+def split_skills(skills: Optional[str]) -> List[str]:
+    """Distinct skills from a comma-separated skills column"""
+    seen = {}
+    for skill in (skills or "").split(","):
+        skill = skill.strip()
+        if skill and normalize_term(skill) not in seen:
+            seen[normalize_term(skill)] = skill
+    return list(seen.values())
+
+
+class AutocompleteIndex:
+    """Sorted array of normalized terms with frequency weights"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys: List[Tuple[str, str]] = []  # sorted (key, term) pairs
+        self._terms: Dict[str, list] = {}  # term -> [display text, weight]
+        self.built_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    @property
+    def is_stale(self) -> bool:
+        return self.built_at is None or time.time() - self.built_at > REBUILD_INTERVAL
+
+    def invalidate(self) -> None:
+        """Force a rebuild on the next lookup"""
+        self.built_at = None
+
+    def load(self, weighted_terms: Iterable[Tuple[str, int]]) -> None:
+        """Replace the index contents in one pass"""
+        terms = {}
+        for text, weight in weighted_terms:
+            term = normalize_term(text)
+            if not term or weight <= 0:
+                continue
+            if term in terms:
+                terms[term][1] += weight
+            else:
+                terms[term] = [text.strip(), weight]
+
+        keys = sorted(
+            (key, term) for term in terms for key in self._word_suffixes(term)
+        )
+        with self._lock:
+            self._terms, self._keys = terms, keys
+            self.built_at = time.time()
+
+    def add(self, text: str, weight: int = 1) -> None:
+        """Adjust a term's weight, inserting or dropping it as needed"""
+        term = normalize_term(text)
+        if not term or not weight:
+            return
+
+        with self._lock:
+            entry = self._terms.get(term)
+            if entry is None:
+                if weight > 0:
+                    self._terms[term] = [text.strip(), weight]
+                    for key in self._word_suffixes(term):
+                        bisect.insort(self._keys, (key, term))
+                return
+
+            entry[1] += weight
+            if entry[1] <= 0:
+                del self._terms[term]
+                for key in self._word_suffixes(term):
+                    position = bisect.bisect_left(self._keys, (key, term))
+                    if self._keys[position : position + 1] == [(key, term)]:
+                        del self._keys[position]
+
+    def remove(self, text: str, weight: int = 1) -> None:
+        self.add(text, -weight)
+
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """Highest-weighted terms with a word starting with ``prefix``"""
+        prefix = normalize_term(prefix)
+        if not prefix:
+            return []
+
+        with self._lock:
+            matches = set()
+            position = bisect.bisect_left(self._keys, (prefix,))
+            while position < len(self._keys):
+                key, term = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                matches.add(term)
+                position += 1
+
+            ranked = heapq.nsmallest(
+                limit, matches, key=lambda term: (-self._terms[term][1], term)
+            )
+            return [self._terms[term][0] for term in ranked]
+
+    @staticmethod
+    def _word_suffixes(term: str) -> set:
+        words = term.split(" ")
+        return {" ".join(words[index:]) for index in range(len(words))}
+
+
+suggestion_indexes = {
+    search_type: AutocompleteIndex() for search_type in SUGGESTION_TYPES
+}
+_build_lock = threading.Lock()
+_refreshing = set()  # Search types being rebuilt in the background
+
+
+def _job_terms(session) -> List[Tuple[str, int]]:
+    titles = (
+        session.query(Job.title, db.func.count(Job.id))
+        .filter(Job.title.isnot(None))
+        .group_by(Job.title)
+        .all()
+    )
+    categories = (
+        session.query(ServiceCategory.name, db.func.count(Job.id))
+        .join(Service, ServiceCategory.id == Service.category_id)
+        .join(Job, Service.id == Job.service_id)
+        .group_by(ServiceCategory.name)
+        .all()
+    )
+    return list(titles) + list(categories)
+
+
+def _provider_terms(session) -> List[Tuple[str, int]]:
+    terms = [(name, count) for _, name, count in skill_histogram(session)]
+
+    names = session.query(User.first_name, User.last_name).join(
+        ProviderProfile, ProviderProfile.user_id == User.id
+    )
+    terms.extend((f"{first} {last}", 1) for first, last in names)
+    return terms
+
+
+_loaders = {"jobs": _job_terms, "providers": _provider_terms}
+
+
+def build_suggestion_index(search_type: str, session=None) -> int:
+    """(Re)build one suggestion index; returns the number of terms"""
+    index = suggestion_indexes[search_type]
+    index.load(_loaders[search_type](session or db.session))
+    return len(index)
+
+
+def build_suggestion_indexes(session=None) -> Dict[str, int]:
+    """Build every suggestion index, e.g. at application startup"""
+    return {
+        search_type: build_suggestion_index(search_type, session)
+        for search_type in SUGGESTION_TYPES
+    }
+
+
+def get_suggestions(query: str, search_type: str = "jobs", limit: int = 10):
+    """Ranked completions for ``query`` from the in-memory index"""
+    index = suggestion_indexes.get(search_type)
+    if index is None:
+        return []
+
+    if index.built_at is None:
+        with _build_lock:
+            if index.built_at is None:
+                terms = build_suggestion_index(search_type)
+                logger.info(f"Built {search_type} suggestion index ({terms} terms)")
+    elif index.is_stale:
+        refresh_suggestion_index(search_type)
+    return index.complete(query, limit)
+
+
+def refresh_suggestion_index(search_type: str) -> Optional[threading.Thread]:
+    """
+    Rebuild a suggestion index on a daemon thread, unless one is already
+    running; lookups use the current index meanwhile
+    """
+    with _build_lock:
+        if search_type in _refreshing:
+            return None
+        _refreshing.add(search_type)
+    app = current_app._get_current_object()
+
+    def rebuild():
+        try:
+            with app.app_context():
+                terms = build_suggestion_index(search_type)
+            logger.info(f"Rebuilt {search_type} suggestion index ({terms} terms)")
+        except Exception as e:
+            # The stale index keeps serving; the next lookup tries again
+            logger.warning(f"Rebuilding {search_type} suggestion index failed: {e}")
+        finally:
+            with _build_lock:
+                _refreshing.discard(search_type)
+
+    thread = threading.Thread(
+        target=rebuild, name=f"autocomplete-{search_type}", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+# Index maintenance. Mapper events queue changes on the session and they are
+# applied once the transaction commits (see after_commit).
+
+
+def _apply_pending_suggestions(pending) -> None:
+    for search_type, text, weight in pending:
+        index = suggestion_indexes[search_type]
+        if index.built_at is None:
+            continue  # Not built yet; the first lookup loads everything
+        if text is None:
+            index.invalidate()
+        else:
+            index.add(text, weight)
+
+
+_pending = AfterCommitQueue("autocomplete", _apply_pending_suggestions)
+
+
+def _queue(target, search_type: str, text: Optional[str], weight: int) -> None:
+    pending = _pending.pending(object_session(target))
+    if pending is not None and text:
+        pending.append((search_type, text, weight))
+
+
+def _queue_invalidation(target, search_type: str) -> None:
+    pending = _pending.pending(object_session(target))
+    if pending is not None:
+        pending.append((search_type, None, 0))
+
+
+def _previous(target, field: str):
+    """Value of ``field`` before this flush and whether it changed"""
+    history = inspect(target).attrs[field].history
+    if not history.has_changes():
+        return None, False
+    return (history.deleted[0] if history.deleted else None), True
+
+
+def _track_previous_values(*attributes) -> None:
+    # Load the old value when an expired attribute is assigned, so the
+    # update events know which term to take weight away from
+    for attribute in attributes:
+        event.listen(attribute, "set", lambda *args: None, active_history=True)
+
+
+_track_previous_values(
+    Job.title, Job.service_id, ProviderProfile.skills, User.first_name, User.last_name
+)
+
+
+def _category_name(connection, service_id) -> Optional[str]:
+    if service_id is None:
+        return None
+    return connection.execute(
+        select(ServiceCategory.name)
+        .join(Service, Service.category_id == ServiceCategory.id)
+        .where(Service.id == service_id)
+    ).scalar()
+
+
+def _provider_name(connection, user_id) -> Optional[str]:
+    row = connection.execute(
+        select(User.first_name, User.last_name).where(User.id == user_id)
+    ).first()
+    return f"{row[0]} {row[1]}" if row else None
+
+
+@event.listens_for(Job, "after_insert")
+def _suggest_inserted_job(mapper, connection, target):
+    _queue(target, "jobs", target.title, 1)
+    _queue(target, "jobs", _category_name(connection, target.service_id), 1)
+
+
+@event.listens_for(Job, "after_update")
+def _suggest_updated_job(mapper, connection, target):
+    old_title, changed = _previous(target, "title")
+    if changed:
+        _queue(target, "jobs", old_title, -1)
+        _queue(target, "jobs", target.title, 1)
+
+    old_service_id, changed = _previous(target, "service_id")
+    if changed:
+        _queue(target, "jobs", _category_name(connection, old_service_id), -1)
+        _queue(target, "jobs", _category_name(connection, target.service_id), 1)
+
+
+@event.listens_for(Job, "after_delete")
+def _unsuggest_deleted_job(mapper, connection, target):
+    _queue(target, "jobs", target.title, -1)
+    _queue(target, "jobs", _category_name(connection, target.service_id), -1)
+
+
+@event.listens_for(ServiceCategory, "after_update")
+@event.listens_for(Service, "after_update")
+def _invalidate_job_suggestions(mapper, connection, target):
+    # Renames move many weights at once; rebuilding is simpler and rare
+    fields = ("name", "category_id") if isinstance(target, Service) else ("name",)
+    if any(_previous(target, field)[1] for field in fields):
+        _queue_invalidation(target, "jobs")
+
+
+@event.listens_for(ProviderProfile, "after_insert")
+def _suggest_inserted_provider(mapper, connection, target):
+    for skill in split_skills(target.skills):
+        _queue(target, "providers", skill, 1)
+    _queue(target, "providers", _provider_name(connection, target.user_id), 1)
+
+
+@event.listens_for(ProviderProfile, "after_update")
+def _suggest_updated_provider(mapper, connection, target):
+    old_skills, changed = _previous(target, "skills")
+    if changed:
+        for skill in split_skills(old_skills):
+            _queue(target, "providers", skill, -1)
+        for skill in split_skills(target.skills):
+            _queue(target, "providers", skill, 1)
+
+
+@event.listens_for(ProviderProfile, "after_delete")
+def _unsuggest_deleted_provider(mapper, connection, target):
+    for skill in split_skills(target.skills):
+        _queue(target, "providers", skill, -1)
+    _queue(target, "providers", _provider_name(connection, target.user_id), -1)
+
+
+@event.listens_for(User, "after_update")
+def _suggest_renamed_provider(mapper, connection, target):
+    old_first, first_changed = _previous(target, "first_name")
+    old_last, last_changed = _previous(target, "last_name")
+    if not (first_changed or last_changed):
+        return
+    is_provider = connection.execute(
+        select(ProviderProfile.id).where(ProviderProfile.user_id == target.id)
+    ).first()
+    if is_provider:
+        old_first = old_first if first_changed else target.first_name
+        old_last = old_last if last_changed else target.last_name
+        _queue(target, "providers", f"{old_first} {old_last}", -1)
+        _queue(target, "providers", f"{target.first_name} {target.last_name}", 1)
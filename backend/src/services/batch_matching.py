@@ -0,0 +1,479 @@
+"""
+Batch Match Scoring
+===================
+
+Scores one job against every candidate provider at once. The candidates'
+feature columns are loaded into NumPy arrays with two queries:
+
+- profile columns (rate, experience, radius, availability) joined to the
+  active users and their ``provider_feature`` row (rating, active jobs,
+  coordinates)
+- normalized skills from ``provider_skill``
+
+The six component scores of ``SmartMatchingEngine.weights`` are then array
+expressions over those columns, and the top ``k`` come from
+``np.argpartition`` rather than a full sort. The scoring rules mirror the
+per-provider ``calculate_*`` methods, which stay for single-pair scoring.
+
+``BatchScorer.score_jobs`` runs the same rules the other way round, many
+jobs (``JobColumns``) against one provider, for provider job feeds.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+
+from src.models.job import Job
+from src.models.provider_feature import ProviderFeature
+from src.models.service import Service, ServiceCategory
+from src.models.skill import ProviderSkill, Skill
+from src.models.user import ProviderProfile, User, db
+from src.services.geo_search import DEFAULT_SERVICE_RADIUS_KM, haversine_km_array
+from src.services.provider_skills import normalize_skill
+
+# Skill fragments that count towards a category without a direct skill match
+RELATED_SKILLS = {
+    "plumbing": ["plumber", "pipe", "water", "drain", "fixture"],
+    "electrical": ["electrician", "wiring", "electric", "power", "lighting"],
+    "carpentry": ["carpenter", "wood", "cabinet", "furniture", "framing"],
+    "painting": ["painter", "paint", "wall", "interior", "exterior"],
+    "roofing": ["roofer", "roof", "shingle", "gutter", "leak"],
+    "hvac": ["heating", "cooling", "air", "furnace", "ac"],
+    "landscaping": ["landscape", "garden", "lawn", "tree", "yard"],
+    "cleaning": ["clean", "house", "office", "deep", "maintenance"],
+}
+
+AVERAGE_HOURLY_RATE = 50  # Used to estimate job hours from its budget
+
+
+def job_budget(job: Job) -> Optional[float]:
+    """The job's budget ceiling, or its floor when no ceiling was given"""
+    budget = job.budget_max if job.budget_max is not None else job.budget_min
+    return float(budget) if budget else None
+
+
+def job_address(job: Job) -> str:
+    """Lowercase address text used when coordinates are missing"""
+    return f"{job.street_address}, {job.city}, {job.state}".lower()
+
+
+def service_area_score(job_location: str, service_area: Optional[str]) -> float:
+    """Text proximity between a job address and a provider's service areas"""
+    if not service_area:
+        return 0.5  # Neutral score if location data missing
+
+    service_areas = [area.lower().strip() for area in service_area.split(",")]
+
+    # Check for exact matches or partial matches
+    for area in service_areas:
+        if area and (area in job_location or job_location in area):
+            return 1.0
+
+    # Check for city/state matches
+    for part in job_location.split(","):
+        part = part.strip()
+        for area in service_areas:
+            if part and area and (part in area or area in part):
+                return 0.7
+
+    return 0.2  # Low score for distant locations
+
+
+class ProviderFeatures:
+    """Column arrays describing a set of candidate providers, row-aligned"""
+
+    def __init__(self, rows: List[Tuple], skills: List[Tuple[int, str]]):
+        (
+            profile_ids,
+            user_ids,
+            first_names,
+            last_names,
+            emails,
+            skill_text,
+            service_areas,
+            availability,
+            hourly_rates,
+            years,
+            radii,
+            ratings,
+            active_jobs,
+            latitudes,
+            longitudes,
+        ) = (
+            zip(*rows) if rows else ((),) * 15
+        )
+
+        self.profile_ids = np.array(profile_ids, dtype=np.int64)
+        self.user_ids = np.array(user_ids, dtype=np.int64)
+        self.names = [f"{first} {last}" for first, last in zip(first_names, last_names)]
+        self.emails = list(emails)
+        self.skill_text = list(skill_text)
+        self.service_areas = list(service_areas)
+        self.availability = list(availability)
+        self.has_availability = np.array([bool(a) for a in availability], dtype=bool)
+        self.hourly_rate = _float_array(hourly_rates)
+        self.years_experience = _float_array(years)
+        self.latitude = _float_array(latitudes)
+        self.longitude = _float_array(longitudes)
+        self.service_radius = np.nan_to_num(
+            _float_array(radii), nan=DEFAULT_SERVICE_RADIUS_KM
+        )
+        self.service_radius[self.service_radius <= 0] = DEFAULT_SERVICE_RADIUS_KM
+        self.average_rating = _float_array(ratings)
+        self.active_jobs = np.nan_to_num(_float_array(active_jobs)).astype(np.int64)
+
+        # Skills as (row, vocabulary index) pairs over a shared vocabulary
+        row_of = {profile_id: row for row, profile_id in enumerate(profile_ids)}
+        self.skill_vocabulary: List[str] = []
+        vocabulary_index = {}
+        owners, indexes = [], []
+        for profile_id, slug in skills:
+            if slug not in vocabulary_index:
+                vocabulary_index[slug] = len(self.skill_vocabulary)
+                self.skill_vocabulary.append(slug)
+            owners.append(row_of[profile_id])
+            indexes.append(vocabulary_index[slug])
+        self.skill_owner = np.array(owners, dtype=np.int64)
+        self.skill_index = np.array(indexes, dtype=np.int64)
+        self.skill_count = np.bincount(self.skill_owner, minlength=len(self))
+
+    def __len__(self) -> int:
+        return len(self.profile_ids)
+
+    @classmethod
+    def load(cls, session=None, provider_filter=None) -> "ProviderFeatures":
+        """Features of every active provider matching ``provider_filter``"""
+        session = session or db.session
+        query = (
+            session.query(
+                ProviderProfile.id,
+                ProviderProfile.user_id,
+                User.first_name,
+                User.last_name,
+                User.email,
+                ProviderProfile.skills,
+                ProviderProfile.service_area,
+                ProviderProfile.availability,
+                ProviderProfile.hourly_rate,
+                ProviderProfile.years_experience,
+                ProviderProfile.service_radius,
+                # Aggregates and location from the feature store, if built
+                ProviderFeature.average_rating,
+                ProviderFeature.active_jobs,
+                func.coalesce(ProviderFeature.latitude, ProviderProfile.latitude),
+                func.coalesce(ProviderFeature.longitude, ProviderProfile.longitude),
+            )
+            .join(User, ProviderProfile.user_id == User.id)
+            .outerjoin(
+                ProviderFeature, ProviderFeature.provider_id == ProviderProfile.id
+            )
+            .filter(User.is_active.is_(True))
+            .order_by(ProviderProfile.id)
+        )
+        if provider_filter is not None:
+            query = query.filter(provider_filter)
+        rows = query.all()
+        candidates = query.order_by(None).with_entities(ProviderProfile.id)
+
+        skills = (
+            session.query(ProviderSkill.provider_id, Skill.slug)
+            .join(Skill, ProviderSkill.skill_id == Skill.id)
+            .filter(ProviderSkill.provider_id.in_(candidates.subquery().select()))
+            .all()
+        )
+        return cls(rows, skills)
+
+
+def _float_array(values) -> np.ndarray:
+    """Float array with None as NaN (also converts Decimal columns)"""
+    return np.array(
+        [np.nan if value is None else float(value) for value in values],
+        dtype=np.float64,
+    )
+
+
+class BatchScorer:
+    """Vectorized counterpart of SmartMatchingEngine.calculate_match_score"""
+
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = weights
+
+    def skills_match(self, job: Job, features: ProviderFeatures) -> np.ndarray:
+        category = job.service.category if job.service else None
+        return self.category_skills_match(category and category.name, features)
+
+    def category_skills_match(
+        self, category: Optional[str], features: ProviderFeatures
+    ) -> np.ndarray:
+        scores = np.zeros(len(features))
+        if not category or not len(features.skill_index):
+            return scores
+
+        job_category = normalize_skill(category)
+        has_skills = features.skill_count > 0
+        direct = np.array(
+            [slug == job_category for slug in features.skill_vocabulary], dtype=bool
+        )
+        is_direct = (
+            np.bincount(
+                features.skill_owner,
+                weights=direct[features.skill_index],
+                minlength=len(features),
+            )
+            > 0
+        )
+
+        related = RELATED_SKILLS.get(job_category, [])
+        if related:
+            relates = np.array(
+                [
+                    any(fragment in slug for fragment in related)
+                    for slug in features.skill_vocabulary
+                ],
+                dtype=np.float64,
+            )
+            matches = np.bincount(
+                features.skill_owner,
+                weights=relates[features.skill_index],
+                minlength=len(features),
+            )
+            partial = np.minimum(matches / len(related), 1.0)
+        else:
+            partial = np.full(len(features), 0.3)  # Base compatibility score
+
+        scores[has_skills] = np.where(is_direct, 1.0, partial)[has_skills]
+        return scores
+
+    def location_proximity(self, job: Job, features: ProviderFeatures) -> np.ndarray:
+        scores = np.empty(len(features))
+        located = ~(np.isnan(features.latitude) | np.isnan(features.longitude))
+        if job.latitude is None or job.longitude is None:
+            located[:] = False
+
+        if located.any():
+            # 1.0 at the provider's base, 0.5 at the edge of the radius, 0.2 beyond
+            distance = haversine_km_array(
+                features.latitude[located],
+                features.longitude[located],
+                job.latitude,
+                job.longitude,
+            )
+            radius = features.service_radius[located]
+            scores[located] = np.where(
+                distance > radius, 0.2, 1.0 - 0.5 * distance / radius
+            )
+
+        job_location = job_address(job)
+        for row in np.flatnonzero(~located):
+            scores[row] = service_area_score(job_location, features.service_areas[row])
+        return scores
+
+    def rating_score(self, job: Job, features: ProviderFeatures) -> np.ndarray:
+        rating = features.average_rating
+        return np.where(np.isnan(rating), 0.5, np.minimum(rating / 5.0, 1.0))
+
+    def availability(self, job: Job, features: ProviderFeatures) -> np.ndarray:
+        load = features.active_jobs
+        by_load = np.select([load > 10, load > 5], [0.3, 0.6], default=1.0)
+        return np.where(features.has_availability, by_load, 0.5)
+
+    def price_compatibility(self, job: Job, features: ProviderFeatures) -> np.ndarray:
+        budget = job_budget(job)
+        rate = features.hourly_rate
+        if not budget:
+            return np.full(len(features), 0.5)
+
+        estimated_hours = max(budget / AVERAGE_HOURLY_RATE, 1)
+        cost = rate * estimated_hours
+        scores = np.select(
+            [cost <= budget, cost <= budget * 1.2, cost <= budget * 1.5],
+            [1.0, 0.8, 0.5],
+            default=0.2,
+        )
+        return np.where(np.isnan(rate) | (rate == 0), 0.5, scores)
+
+    def experience_level(self, job: Job, features: ProviderFeatures) -> np.ndarray:
+        years = np.nan_to_num(features.years_experience)
+        return np.select(
+            [years <= 0, years >= 10, years >= 5, years >= 2],
+            [0.3, 1.0, 0.8, 0.6],
+            default=0.4,
+        )
+
+    def score(
+        self, job: Job, features: ProviderFeatures
+    ) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Overall scores and each component score, one entry per provider"""
+        components = {
+            "skills_match": self.skills_match(job, features),
+            "location_proximity": self.location_proximity(job, features),
+            "rating_score": self.rating_score(job, features),
+            "availability": self.availability(job, features),
+            "price_compatibility": self.price_compatibility(job, features),
+            "experience_level": self.experience_level(job, features),
+        }
+        overall = np.zeros(len(features))
+        for factor, weight in self.weights.items():
+            overall += components[factor] * weight
+        return overall, components
+
+    def score_jobs(
+        self, jobs: "JobColumns", features: ProviderFeatures, row: int
+    ) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Overall and component scores of many jobs for the provider at
+        ``row``: the reverse of ``score``, one entry per job
+        """
+        # Scores that depend only on the provider, or only on the category
+        rating = self.rating_score(None, features)[row]
+        availability = self.availability(None, features)[row]
+        experience = self.experience_level(None, features)[row]
+        skills_by_category = {
+            category: self.category_skills_match(category, features)[row]
+            for category in set(jobs.categories)
+        }
+
+        latitude, longitude = features.latitude[row], features.longitude[row]
+        location = np.empty(len(jobs))
+        located = ~(np.isnan(jobs.latitude) | np.isnan(jobs.longitude))
+        if np.isnan(latitude) or np.isnan(longitude):
+            located[:] = False
+        if located.any():
+            radius = features.service_radius[row]
+            distance = haversine_km_array(
+                jobs.latitude[located], jobs.longitude[located], latitude, longitude
+            )
+            location[located] = np.where(
+                distance > radius, 0.2, 1.0 - 0.5 * distance / radius
+            )
+        for index in np.flatnonzero(~located):
+            location[index] = service_area_score(
+                jobs.addresses[index], features.service_areas[row]
+            )
+
+        budget, rate = jobs.budget, features.hourly_rate[row]
+        if np.isnan(rate) or rate == 0:
+            price = np.full(len(jobs), 0.5)
+        else:
+            cost = rate * np.maximum(budget / AVERAGE_HOURLY_RATE, 1)
+            price = np.select(
+                [cost <= budget, cost <= budget * 1.2, cost <= budget * 1.5],
+                [1.0, 0.8, 0.5],
+                default=0.2,
+            )
+        price = np.where(np.isnan(budget), 0.5, price)
+
+        components = {
+            "skills_match": np.array(
+                [skills_by_category[category] for category in jobs.categories],
+                dtype=np.float64,
+            ),
+            "location_proximity": location,
+            "rating_score": np.full(len(jobs), rating),
+            "availability": np.full(len(jobs), availability),
+            "price_compatibility": price,
+            "experience_level": np.full(len(jobs), experience),
+        }
+        overall = np.zeros(len(jobs))
+        for factor, weight in self.weights.items():
+            overall += components[factor] * weight
+        return overall, components
+
+
+class JobColumns:
+    """Column arrays describing a set of jobs, row-aligned"""
+
+    def __init__(self, rows: List[Tuple]):
+        (
+            job_ids,
+            categories,
+            latitudes,
+            longitudes,
+            streets,
+            cities,
+            states,
+            budget_min,
+            budget_max,
+        ) = (
+            zip(*rows) if rows else ((),) * 9
+        )
+        self.job_ids = np.array(job_ids, dtype=np.int64)
+        self.categories = list(categories)
+        self.latitude = _float_array(latitudes)
+        self.longitude = _float_array(longitudes)
+        self.addresses = [
+            f"{street}, {city}, {state}".lower()
+            for street, city, state in zip(streets, cities, states)
+        ]
+        # Same rule as job_budget: the ceiling, else the floor; NaN when unset
+        budget = np.where(
+            np.isnan(_float_array(budget_max)),
+            _float_array(budget_min),
+            _float_array(budget_max),
+        )
+        self.budget = np.where(budget == 0, np.nan, budget)
+
+    def __len__(self) -> int:
+        return len(self.job_ids)
+
+    @classmethod
+    def load(cls, job_ids: List[int], session=None) -> "JobColumns":
+        """Columns of the given jobs, in id order"""
+        session = session or db.session
+        if not job_ids:
+            return cls([])
+        rows = (
+            session.query(
+                Job.id,
+                ServiceCategory.name,
+                Job.latitude,
+                Job.longitude,
+                Job.street_address,
+                Job.city,
+                Job.state,
+                Job.budget_min,
+                Job.budget_max,
+            )
+            .outerjoin(Service, Job.service_id == Service.id)
+            .outerjoin(ServiceCategory, Service.category_id == ServiceCategory.id)
+            .filter(Job.id.in_(job_ids))
+            .order_by(Job.id)
+            .all()
+        )
+        return cls(rows)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Row indexes of the ``k`` highest scores, best first"""
+    if k <= 0 or not len(scores):
+        return np.array([], dtype=np.int64)
+    if k < len(scores):
+        # k-th best score via argpartition's selection; ties at the cutoff
+        # go to the lowest rows so the result is deterministic
+        cutoff = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        above = np.flatnonzero(scores > cutoff)
+        tied = np.flatnonzero(scores == cutoff)[: k - len(above)]
+        candidates = np.concatenate([above, tied])
+    else:
+        candidates = np.arange(len(scores))
+    # Best first, equal scores in row order
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+def component_scores_at(
+    components: Dict[str, np.ndarray], row: int
+) -> Dict[str, float]:
+    return {factor: float(values[row]) for factor, values in components.items()}
+
+
+def provider_details_at(features: ProviderFeatures, row: int) -> Dict[str, Any]:
+    rate = features.hourly_rate[row]
+    years = features.years_experience[row]
+    return {
+        "skills": features.skill_text[row],
+        "hourly_rate": None if np.isnan(rate) else float(rate),
+        "years_experience": None if np.isnan(years) else int(years),
+        "service_area": features.service_areas[row],
+        "availability": features.availability[row],
+    }
@@ -0,0 +1,170 @@
+"""
+Cache Invalidation
+==================
+
+Turns committed ORM writes into cache tag invalidations, so cached
+responses and counts that depend on a record are dropped as soon as the
+record changes instead of living out their TTL.
+
+Every ORM write, including bulk updates and deletes, queues ``table:<name>``
+for its table, which cached counts and API ETags depend on. Writes to a Job,
+ProviderProfile, Review, Quote or User also queue the tags of the records
+they touch:
+
+- ``<kind>:<id>`` for the row itself (``job:123``, ``quote:9``)
+- ``provider:<user id>``, ``customer:<user id>`` and ``user:<user id>`` for
+  the people it belongs to, before and after the write
+- ``category:<slug>`` for a job's service category, before and after
+
+Like the match indexes, tags are queued on the session by mapper events and
+only invalidated once the transaction commits; a rollback discards them.
+"""
+
+import logging
+from typing import Iterable, Optional, Set
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from src.models.job import Job, Quote
+from src.models.review import Review
+from src.models.service import Service, ServiceCategory
+from src.models.user import ProviderProfile, User, db
+from src.services.after_commit import AfterCommitQueue
+from src.utils.cache import invalidate_tags
+
+logger = logging.getLogger(__name__)
+
+
+def _values(target, field: str) -> Set:
+    """Current and (if changed) previous values of a column"""
+    history = inspect(target).attrs[field].history
+    values = {getattr(target, field)}
+    values.update(history.deleted or ())
+    values.discard(None)
+    return values
+
+
+def _tagged(kind: str, ids: Iterable) -> Set[str]:
+    return {f"{kind}:{value}" for value in ids}
+
+
+def _category_slugs(connection, service_ids: Iterable[int]) -> Set[str]:
+    service_ids = list(service_ids)
+    if not service_ids:
+        return set()
+    return set(
+        connection.execute(
+            select(ServiceCategory.slug)
+            .join(Service, Service.category_id == ServiceCategory.id)
+            .where(Service.id.in_(service_ids))
+        ).scalars()
+    )
+
+
+def job_tags(connection, target: Job) -> Set[str]:
+    return (
+        {f"job:{target.id}"}
+        | _tagged("customer", _values(target, "customer_id"))
+        | _tagged("provider", _values(target, "assigned_provider_id"))
+        | _tagged(
+            "category", _category_slugs(connection, _values(target, "service_id"))
+        )
+    )
+
+
+def provider_profile_tags(connection, target: ProviderProfile) -> Set[str]:
+    user_ids = _values(target, "user_id")
+    return _tagged("provider", user_ids) | _tagged("user", user_ids)
+
+
+def review_tags(connection, target: Review) -> Set[str]:
+    return (
+        {f"review:{target.id}"}
+        | _tagged("job", _values(target, "job_id"))
+        | _tagged("provider", _values(target, "reviewee_id"))
+    )
+
+
+def quote_tags(connection, target: Quote) -> Set[str]:
+    return (
+        {f"quote:{target.id}"}
+        | _tagged("job", _values(target, "job_id"))
+        | _tagged("provider", _values(target, "provider_id"))
+    )
+
+
+def user_tags(connection, target: User) -> Set[str]:
+    tags = {f"user:{target.id}"}
+    for user_type in _values(target, "user_type"):
+        if user_type in ("provider", "customer"):
+            tags.add(f"{user_type}:{target.id}")
+    return tags
+
+
+# Columns whose previous value is tagged too; their old values are loaded
+# when they are set, even on expired instances
+TRACKED_COLUMNS = (
+    Job.customer_id,
+    Job.assigned_provider_id,
+    Job.service_id,
+    ProviderProfile.user_id,
+    Review.job_id,
+    Review.reviewee_id,
+    Quote.job_id,
+    Quote.provider_id,
+    User.user_type,
+)
+
+TAGGERS = {
+    Job: job_tags,
+    ProviderProfile: provider_profile_tags,
+    Review: review_tags,
+    Quote: quote_tags,
+    User: user_tags,
+}
+
+
+def _invalidate_pending_tags(tags: Set[str]) -> None:
+    invalidate_tags(tags)  # Looked up per call, so tests can patch it
+
+
+_pending = AfterCommitQueue("cache_invalidation", _invalidate_pending_tags, set)
+
+
+def _queue(session: Optional[Session], tags: Set[str]) -> None:
+    pending = _pending.pending(session)
+    if pending is not None:
+        pending.update(tags)
+
+
+def _listen(model, tagger, propagate: bool = False) -> None:
+    def queue_tags(mapper, connection, target):
+        _queue(object_session(target), tagger(connection, target))
+
+    for name in ("after_insert", "after_update", "after_delete"):
+        event.listen(model, name, queue_tags, propagate=propagate)
+
+
+def _load_previous(target, value, oldvalue, initiator):
+    """No-op; registering it with ``active_history`` loads ``oldvalue``"""
+
+
+for _column in TRACKED_COLUMNS:
+    event.listen(_column, "set", _load_previous, active_history=True)
+
+for _model, _tagger in TAGGERS.items():
+    _listen(_model, _tagger)
+
+
+def _table_tags(connection, target) -> Set[str]:
+    return {f"table:{table.name}" for table in inspect(target).mapper.tables}
+
+
+_listen(db.Model, _table_tags, propagate=True)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _queue_bulk_write(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        _queue(state.session, {f"table:{state.statement.table.name}"})
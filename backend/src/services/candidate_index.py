@@ -0,0 +1,232 @@
+"""
+Match Candidate Index
+=====================
+
+Narrows ``SmartMatchingEngine.find_matches`` to providers that could
+plausibly take a job before any scoring happens, so matching cost follows
+local supply rather than the total number of providers.
+
+The index is sharded by trade. A provider belongs to the trade of each of
+its normalized skills and of the words in them, and to every
+``RELATED_SKILLS`` category one of its skills relates to. A job category
+maps to trades the same way (see ``category_trades``), so "Plumbing &
+Electrical" reaches plumbers and electricians. Within a shard, providers
+are filed under each cell of a ``CELL_DEGREES`` lat/lon grid that their
+service radius overlaps. Looking up a job reads its trades' shards and one
+cell, then checks the exact distance against each provider's radius:
+
+- providers without coordinates are kept, as they are scored by service
+  area text
+- jobs without coordinates get the whole shards
+- jobs without a category, or whose trades no provider is filed under,
+  are not pre-filtered
+
+Like the open job index, it is a ``GridIndex``: built on first use (or at
+startup), following ORM writes in this process once they commit, and
+rebuilt every ``REBUILD_INTERVAL`` seconds to pick up writes made by other
+workers.
+"""
+
+from collections import defaultdict
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+
+from src.models.job import Job
+from src.models.skill import ProviderSkill, Skill
+from src.models.user import ProviderProfile, db
+from src.services.after_commit import AfterCommitQueue
+from src.services.batch_matching import RELATED_SKILLS
+from src.services.geo_search import DEFAULT_SERVICE_RADIUS_KM, haversine_km
+from src.services.grid_index import GridIndex, cell_of, covered_cells
+from src.services.provider_skills import normalize_skill, parse_skills
+
+# Profile fields that change which shards and cells a provider is filed under
+INDEXED_FIELDS = ("skills", "latitude", "longitude", "service_radius")
+
+# Words of category names and skills that say nothing about the trade
+TRADE_STOPWORDS = {"and", "the", "for", "with", "service", "services", "general"}
+
+
+def trade_words(slug: str) -> Set[str]:
+    """The words of a multi-word slug that name a trade on their own"""
+    words = slug.split()
+    if len(words) < 2:
+        return set()
+    return {word for word in words if len(word) > 2 and word not in TRADE_STOPWORDS}
+
+
+def provider_trades(skill_slugs: Iterable[str]) -> Set[str]:
+    """
+    Trades a provider can be matched on: its skills, their words and
+    related categories
+    """
+    trades = set()
+    for slug in skill_slugs:
+        trades.add(slug)
+        trades.update(trade_words(slug))
+        for category, fragments in RELATED_SKILLS.items():
+            if any(fragment in slug for fragment in fragments):
+                trades.add(category)
+    return trades
+
+
+def category_trades(name: Optional[str]) -> Set[str]:
+    """
+    Trades whose providers can take jobs in a category: its normalized name,
+    each of its words, and the ``RELATED_SKILLS`` categories those words are
+    or relate to ("Cleaning & Maintenance" -> cleaning, maintenance)
+    """
+    slug = normalize_skill(name)
+    if not slug:
+        return set()
+    trades = {slug} | trade_words(slug)
+    for word in trades.copy():
+        for category, fragments in RELATED_SKILLS.items():
+            if word == category or word in fragments:
+                trades.add(category)
+    return trades
+
+
+def service_radius_km(radius) -> float:
+    return float(radius) if radius and radius > 0 else DEFAULT_SERVICE_RADIUS_KM
+
+
+class CandidateIndex(GridIndex):
+    """Provider ids by trade and grid cell, with each provider's service area"""
+
+    def __init__(self):
+        super().__init__("match candidate index")
+
+    def rows(self, session) -> List[tuple]:
+        """(id, skill slugs, lat, lon, radius) of every provider"""
+        skills = defaultdict(list)
+        rows = session.query(ProviderSkill.provider_id, Skill.slug).join(
+            Skill, ProviderSkill.skill_id == Skill.id
+        )
+        for profile_id, slug in rows:
+            skills[profile_id].append(slug)
+
+        profiles = session.query(
+            ProviderProfile.id,
+            ProviderProfile.latitude,
+            ProviderProfile.longitude,
+            ProviderProfile.service_radius,
+        )
+        return [
+            (profile_id, skills.get(profile_id, ()), latitude, longitude, radius)
+            for profile_id, latitude, longitude, radius in profiles
+        ]
+
+    def add(
+        self,
+        profile_id: int,
+        skill_slugs: Iterable[str],
+        latitude: Optional[float],
+        longitude: Optional[float],
+        radius: Optional[float],
+    ) -> None:
+        """File a provider under its trades and cells, replacing any entry"""
+        radius = service_radius_km(radius)
+        if latitude is None or longitude is None:
+            latitude = longitude = None
+            cells = {None}
+        else:
+            cells = covered_cells(latitude, longitude, radius)
+        self.file(
+            profile_id, provider_trades(skill_slugs), cells, latitude, longitude, radius
+        )
+
+    def candidates(
+        self,
+        trades: Iterable[str],
+        latitude: Optional[float],
+        longitude: Optional[float],
+    ) -> Optional[List[int]]:
+        """
+        Ids of providers in any of ``trades`` whose service area covers the
+        point, or None if no provider is filed under any of them
+        """
+        with self._lock:
+            shards = [self._shards[trade] for trade in trades if trade in self._shards]
+            if not shards:
+                return None
+            if latitude is None or longitude is None:
+                return sorted(
+                    set().union(*(ids for shard in shards for ids in shard.values()))
+                )
+
+            cell = cell_of(latitude, longitude)
+            profile_ids = set()
+            for shard in shards:
+                profile_ids.update(shard.get(None, ()))
+                for profile_id in shard.get(cell, ()):
+                    if profile_id in profile_ids:
+                        continue
+                    _, _, provider_lat, provider_lon, radius = self._entries[profile_id]
+                    distance = haversine_km(
+                        provider_lat, provider_lon, latitude, longitude
+                    )
+                    if distance <= radius:
+                        profile_ids.add(profile_id)
+            return sorted(profile_ids)
+
+
+candidate_index = CandidateIndex()
+
+
+def build_candidate_index(session=None) -> int:
+    """(Re)build the candidate index; returns the number of providers filed"""
+    return candidate_index.build(session or db.session)
+
+
+def match_candidates(job: Job) -> Optional[List[int]]:
+    """Profile ids worth scoring for a job, or None to score every provider"""
+    category = job.service.category if job.service else None
+    if category is None:
+        return None
+
+    candidate_index.ensure_built(db.session)
+    return candidate_index.candidates(
+        category_trades(category.name), job.latitude, job.longitude
+    )
+
+
+# Index maintenance. Mapper events queue changes on the session and they are
+# applied once the transaction commits (see after_commit).
+
+_pending = AfterCommitQueue("candidate_index", candidate_index.apply)
+
+
+def _queue(target, entry: Optional[tuple]) -> None:
+    pending = _pending.pending(object_session(target))
+    if pending is not None:
+        pending.append((target.id, entry))
+
+
+def _entry(target: ProviderProfile) -> tuple:
+    return (
+        target.id,
+        list(parse_skills(target.skills)),
+        target.latitude,
+        target.longitude,
+        target.service_radius,
+    )
+
+
+@event.listens_for(ProviderProfile, "after_insert")
+def _file_inserted_provider(mapper, connection, target):
+    _queue(target, _entry(target))
+
+
+@event.listens_for(ProviderProfile, "after_update")
+def _refile_updated_provider(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if any(attrs[field].history.has_changes() for field in INDEXED_FIELDS):
+        _queue(target, _entry(target))
+
+
+@event.listens_for(ProviderProfile, "after_delete")
+def _unfile_deleted_provider(mapper, connection, target):
+    _queue(target, None)
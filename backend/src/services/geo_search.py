@@ -0,0 +1,162 @@
+"""
+Geospatial Radius Search
+========================
+
+Radius filters over the ``latitude``/``longitude`` columns of ``Job`` and
+``ProviderProfile``. A radius query runs in two steps:
+
+1. a bounding box on the indexed coordinate columns, so the database only
+   reads the rows inside the box around the point
+2. the exact haversine distance on the rows that survive the box
+
+Both steps are plain SQL expressions, so they compose with the other search
+filters, sorting and keyset pagination. SQLite builds without the math
+functions get Python implementations registered on connect.
+"""
+
+import logging
+import math
+import sqlite3
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, event, func, inspect, or_, text
+from sqlalchemy.engine import Engine
+
+from src.models.schema import add_missing_columns
+from src.models.user import db
+from src.utils.geo_distance import (  # noqa: F401 - re-exported
+    EARTH_RADIUS_KM,
+    haversine_km,
+    haversine_km_array,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERVICE_RADIUS_KM = 25
+
+# Coordinate columns added after the first release; created by init_geo_columns()
+GEO_COLUMNS = {
+    "provider_profile": ("latitude", "longitude"),
+}
+GEO_INDEXES = {
+    "ix_job_lat_lon": ("job", ("latitude", "longitude")),
+    "ix_provider_profile_lat_lon": ("provider_profile", ("latitude", "longitude")),
+}
+
+
+def bounding_box(
+    latitude: float, longitude: float, radius_km: float
+) -> Tuple[float, float, Optional[float], Optional[float]]:
+    """
+    (min_lat, max_lat, min_lon, max_lon) enclosing a radius around a point.
+    Longitudes are None when the box covers every meridian (near a pole);
+    min_lon > max_lon means the box crosses the antimeridian.
+    """
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = latitude - delta_lat, latitude + delta_lat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), None, None
+
+    ratio = math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(latitude))
+    if ratio >= 1:
+        return min_lat, max_lat, None, None
+    delta_lon = math.degrees(math.asin(ratio))
+    min_lon = (longitude - delta_lon + 180) % 360 - 180
+    max_lon = (longitude + delta_lon + 180) % 360 - 180
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def distance_expression(lat_column, lon_column, latitude: float, longitude: float):
+    """SQL haversine distance in kilometres from a point to a row's coordinates"""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = func.radians(lat_column), func.radians(lon_column)
+    sin_lat = func.sin((lat2 - lat1) / 2)
+    sin_lon = func.sin((lon2 - lon1) / 2)
+    a = sin_lat * sin_lat + math.cos(lat1) * func.cos(lat2) * sin_lon * sin_lon
+    return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(a))
+
+
+def bounding_box_filter(
+    lat_column, lon_column, latitude: float, longitude: float, radius_km: float
+):
+    """Range condition on the coordinate columns that an index can serve"""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    conditions = [lat_column.between(min_lat, max_lat)]
+    if min_lon is None:
+        conditions.append(lon_column.isnot(None))
+    elif min_lon <= max_lon:
+        conditions.append(lon_column.between(min_lon, max_lon))
+    else:
+        conditions.append(or_(lon_column >= min_lon, lon_column <= max_lon))
+    return and_(*conditions)
+
+
+def radius_filter(
+    lat_column, lon_column, latitude: float, longitude: float, radius_km: float
+):
+    """
+    Rows within ``radius_km`` of a point, plus the distance expression for
+    sorting: the bounding box narrows the rows, haversine makes it exact
+    """
+    distance = distance_expression(lat_column, lon_column, latitude, longitude)
+    condition = and_(
+        bounding_box_filter(lat_column, lon_column, latitude, longitude, radius_km),
+        distance <= radius_km,
+    )
+    return condition, distance
+
+
+def validate_point(latitude, longitude, radius_km) -> bool:
+    """Whether a radius search was requested; raises on partial or bad input"""
+    if latitude is None and longitude is None and radius_km is None:
+        return False
+    if latitude is None or longitude is None or radius_km is None:
+        raise ValueError("latitude, longitude and radius_km must be given together")
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        raise ValueError("latitude/longitude out of range")
+    if radius_km <= 0:
+        raise ValueError("radius_km must be positive")
+    return True
+
+
+def init_geo_columns(engine=None) -> None:
+    """Add the coordinate columns and indexes missing from an existing schema"""
+    engine = engine or db.engine
+    with engine.begin() as connection:
+        add_missing_columns(connection, GEO_COLUMNS)
+        tables = set(inspect(connection).get_table_names())
+        for name, (table, columns) in GEO_INDEXES.items():
+            if table in tables:
+                connection.execute(
+                    text(
+                        f"CREATE INDEX IF NOT EXISTS {name} "
+                        f"ON {table} ({', '.join(columns)})"
+                    )
+                )
+
+
+@event.listens_for(Engine, "connect")
+def _register_sqlite_math(dbapi_connection, connection_record):
+    """Provide the haversine functions on SQLite builds compiled without them"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    try:
+        dbapi_connection.execute("SELECT radians(asin(sqrt(sin(cos(0)))))")
+        return
+    except sqlite3.OperationalError:
+        pass
+    for name, function in (
+        ("radians", math.radians),
+        ("sin", math.sin),
+        ("cos", math.cos),
+        ("asin", lambda value: math.asin(min(1.0, value))),
+        ("sqrt", math.sqrt),
+    ):
+        dbapi_connection.create_function(
+            name,
+            1,
+            lambda value, function=function: (
+                None if value is None else function(value)
+            ),
+            deterministic=True,
+        )
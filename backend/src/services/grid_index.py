@@ -0,0 +1,154 @@
+"""
+Grid Shard Index
+================
+
+In-memory index of record ids sharded by trade and filed under the cells
+of a ``CELL_DEGREES`` lat/lon grid, shared by the match candidate index
+(providers by the cells their service radius overlaps) and the open job
+index (jobs by the cell they are in). Records without coordinates are
+filed under ``None``.
+
+Each index keeps an entry per record with its trades, cells and location,
+is built on first use (or at startup), follows ORM writes in this process
+once they commit (see ``apply``), and is rebuilt every ``REBUILD_INTERVAL``
+seconds to pick up writes made by other workers.
+"""
+
+import logging
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.services.geo_search import bounding_box
+
+logger = logging.getLogger(__name__)
+
+# Grid cell size; 0.5 degrees is ~55 km north-south
+CELL_DEGREES = 0.5
+
+# Bound on how stale an index can be relative to writes from other processes
+REBUILD_INTERVAL = 600
+
+Cell = Optional[Tuple[int, int]]  # None files records without coordinates
+
+
+def cell_of(latitude: float, longitude: float) -> Tuple[int, int]:
+    return (
+        math.floor(latitude / CELL_DEGREES),
+        math.floor(((longitude + 180) % 360 - 180) / CELL_DEGREES),
+    )
+
+
+def covered_cells(latitude: float, longitude: float, radius_km: float) -> Set:
+    """Grid cells overlapping the bounding box of a radius"""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    rows = range(cell_of(min_lat, 0)[0], cell_of(max_lat, 0)[0] + 1)
+    last_column = cell_of(0, 180 - 1e-9)[1]
+    if min_lon is None:
+        columns = range(cell_of(0, -180)[1], last_column + 1)
+    else:
+        first, last = cell_of(0, min_lon)[1], cell_of(0, max_lon)[1]
+        if first <= last:
+            columns = range(first, last + 1)
+        else:  # Crosses the antimeridian
+            columns = list(range(first, last_column + 1))
+            columns += range(cell_of(0, -180)[1], last + 1)
+    return {(row, column) for row in rows for column in columns}
+
+
+class GridIndex:
+    """
+    Record ids by trade and grid cell. Subclasses read their rows in
+    ``rows``, and turn each into trades, cells and location in ``add`` and
+    file it with ``file``.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._shards: Dict[str, Dict[Cell, Set[int]]] = {}
+        # record id -> (trades, cells, *location)
+        self._entries: Dict[int, tuple] = {}
+        self.built_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def is_stale(self) -> bool:
+        return self.built_at is None or time.time() - self.built_at > REBUILD_INTERVAL
+
+    def invalidate(self) -> None:
+        """Force a rebuild on the next lookup"""
+        self.built_at = None
+
+    def load(self, rows: Iterable[tuple]) -> None:
+        """Replace the index contents from rows for ``add``"""
+        with self._lock:
+            self._shards, self._entries = {}, {}
+            for row in rows:
+                self.add(*row)
+            self.built_at = time.time()
+
+    def build(self, session) -> int:
+        """(Re)build the index; returns the number of records filed"""
+        self.load(self.rows(session))
+        return len(self)
+
+    def ensure_built(self, session) -> None:
+        """Rebuild if stale, once across threads"""
+        if self.is_stale:
+            with self._build_lock:
+                if self.is_stale:
+                    filed = self.build(session)
+                    logger.info(f"Built {self.name} ({filed} filed)")
+
+    def rows(self, session) -> List[tuple]:
+        raise NotImplementedError
+
+    def add(self, record_id: int, *row) -> None:
+        raise NotImplementedError
+
+    def file(
+        self, record_id: int, trades: Set[str], cells: Set[Cell], *location
+    ) -> None:
+        """File a record under its trades and cells, replacing any entry"""
+        with self._lock:
+            self.remove(record_id)
+            if not trades:
+                return
+            for trade in trades:
+                shard = self._shards.setdefault(trade, {})
+                for cell in cells:
+                    shard.setdefault(cell, set()).add(record_id)
+            self._entries[record_id] = (trades, cells, *location)
+
+    def remove(self, record_id: int) -> None:
+        with self._lock:
+            entry = self._entries.pop(record_id, None)
+            if entry is None:
+                return
+            trades, cells = entry[:2]
+            for trade in trades:
+                shard = self._shards[trade]
+                for cell in cells:
+                    shard[cell].discard(record_id)
+                    if not shard[cell]:
+                        del shard[cell]
+                if not shard:
+                    del self._shards[trade]
+
+    def apply(self, pending: Iterable[tuple]) -> None:
+        """
+        Apply committed writes as (record id, row for ``add`` or None to
+        remove); skipped until built, as the first lookup loads everything
+        """
+        if self.built_at is None:
+            return
+        for record_id, row in pending:
+            if row is None:
+                self.remove(record_id)
+            else:
+                self.add(*row)
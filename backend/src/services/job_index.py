@@ -0,0 +1,164 @@
+"""
+Open Job Index
+==============
+
+The reverse of the match candidate index: open jobs by category and grid
+cell, so a provider's job feed reads only the jobs it could match instead
+of scoring every open job.
+
+Each open job is filed under the trades of its category (see
+``category_trades``) and the ``CELL_DEGREES`` grid cell of its coordinates
+(jobs without coordinates under ``None``). A provider looks up each of its
+trades over the cells its service radius overlaps and keeps jobs within
+that radius, so a job is in a provider's feed exactly when the provider is
+one of the job's match candidates. Jobs in a category no provider trades
+in are matched against every provider but stay out of feeds.
+
+Like the candidate index, it is a ``GridIndex`` (see grid_index).
+"""
+
+from typing import Iterable, List, Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import object_session
+
+from src.models.job import Job
+from src.models.service import Service, ServiceCategory
+from src.models.user import db
+from src.services.after_commit import AfterCommitQueue
+from src.services.candidate_index import category_trades, service_radius_km
+from src.services.geo_search import haversine_km
+from src.services.grid_index import GridIndex, cell_of, covered_cells
+from src.services.match_materializer import OPEN_JOB_STATUSES, is_open
+
+# Job fields that change whether and where a job is filed
+INDEXED_FIELDS = ("status", "is_active", "service_id", "latitude", "longitude")
+
+
+class OpenJobIndex(GridIndex):
+    """Open job ids by category and grid cell, with each job's location"""
+
+    def __init__(self):
+        super().__init__("open job index")
+
+    def rows(self, session) -> List[tuple]:
+        """(id, category name, lat, lon) of every open job"""
+        return (
+            session.query(Job.id, ServiceCategory.name, Job.latitude, Job.longitude)
+            .join(Service, Job.service_id == Service.id)
+            .join(ServiceCategory, Service.category_id == ServiceCategory.id)
+            .filter(Job.status.in_(OPEN_JOB_STATUSES), Job.is_active.isnot(False))
+            .all()
+        )
+
+    def add(
+        self,
+        job_id: int,
+        category: Optional[str],
+        latitude: Optional[float],
+        longitude: Optional[float],
+    ) -> None:
+        """File an open job under its category's trades and its cell"""
+        if latitude is None or longitude is None:
+            latitude = longitude = cell = None
+        else:
+            cell = cell_of(latitude, longitude)
+        self.file(job_id, category_trades(category), {cell}, latitude, longitude)
+
+    def jobs_for(
+        self,
+        trades: Iterable[str],
+        latitude: Optional[float],
+        longitude: Optional[float],
+        radius_km: float,
+    ) -> List[int]:
+        """Ids of open jobs in ``trades`` within ``radius_km`` of the point"""
+        located = latitude is not None and longitude is not None
+        cells = covered_cells(latitude, longitude, radius_km) if located else None
+
+        job_ids = set()
+        with self._lock:
+            for trade in trades:
+                shard = self._shards.get(trade)
+                if not shard:
+                    continue
+                if not located:
+                    job_ids.update(*shard.values())
+                    continue
+                job_ids.update(shard.get(None, ()))
+                for cell in cells & shard.keys():
+                    for job_id in shard[cell] - job_ids:
+                        _, _, job_lat, job_lon = self._entries[job_id]
+                        distance = haversine_km(latitude, longitude, job_lat, job_lon)
+                        if distance <= radius_km:
+                            job_ids.add(job_id)
+        return sorted(job_ids)
+
+
+open_job_index = OpenJobIndex()
+
+
+def build_open_job_index(session=None) -> int:
+    """(Re)build the open job index; returns the number of jobs filed"""
+    return open_job_index.build(session or db.session)
+
+
+def open_jobs_for(
+    trades: Iterable[str],
+    latitude: Optional[float],
+    longitude: Optional[float],
+    radius: Optional[float],
+) -> List[int]:
+    """Open jobs a provider with these trades and service area could take"""
+    open_job_index.ensure_built(db.session)
+    return open_job_index.jobs_for(
+        trades, latitude, longitude, service_radius_km(radius)
+    )
+
+
+# Index maintenance. Mapper events queue changes on the session and they are
+# applied once the transaction commits (see after_commit).
+
+_pending = AfterCommitQueue("job_index", open_job_index.apply)
+
+
+def _queue(target, entry: Optional[tuple]) -> None:
+    pending = _pending.pending(object_session(target))
+    if pending is not None:
+        pending.append((target.id, entry))
+
+
+def _category_name(connection, service_id) -> Optional[str]:
+    return connection.execute(
+        select(ServiceCategory.name)
+        .join(Service, Service.category_id == ServiceCategory.id)
+        .where(Service.id == service_id)
+    ).scalar()
+
+
+def _entry(connection, target: Job) -> Optional[tuple]:
+    if not is_open(target):
+        return None
+    return (
+        target.id,
+        _category_name(connection, target.service_id),
+        target.latitude,
+        target.longitude,
+    )
+
+
+@event.listens_for(Job, "after_insert")
+def _file_inserted_job(mapper, connection, target):
+    _queue(target, _entry(connection, target))
+
+
+@event.listens_for(Job, "after_update")
+def _refile_updated_job(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if any(attrs[field].history.has_changes() for field in INDEXED_FIELDS):
+        _queue(target, _entry(connection, target))
+
+
+@event.listens_for(Job, "after_delete")
+def _unfile_deleted_job(mapper, connection, target):
+    _queue(target, None)
@@ -0,0 +1,531 @@
+"""
+Materialized Job Matches
+========================
+
+Keeps the top ``MATCH_LIST_SIZE`` provider matches of every open job in the
+``job_match`` table, so ``/api/smart-matching/find-matches/<job_id>`` and
+the notification flow read a list instead of scoring providers per request.
+
+Writes mark work rather than recomputing inline. Mapper events queue it
+on the session, and it reaches the materializer once the transaction
+commits, in a Redis set shared by every worker when Redis is connected:
+
+- a job posted, or its location, budget, service or status changed,
+  marks that job
+- a provider's profile, reviews, job load or active flag changing marks
+  the provider; it resolves to the open jobs the provider could match
+  (same trade, inside its service radius) plus the jobs already listing it
+
+A background thread recomputes marked jobs every
+``MATERIALIZE_INTERVAL`` seconds (sooner when woken by work marked in the
+same process), scoring with the bound ``SmartMatchingEngine``. Every worker
+starts the thread, but only the holder of a Redis leader lock runs passes;
+it recomputes every open job when it takes the lock. Without Redis each
+process runs its own passes. Lists are upserted, so concurrent passes never
+conflict. Jobs that are no longer open lose their list.
+
+Each list has a ``JobMatchList`` header, so a job without candidates reads
+back as an empty list rather than as missing. Readers pass a ``max_age``
+to fall back to scoring when a list is older than they can accept; reads
+never write, and a missing or outdated list is marked for the next pass.
+
+Each list records the matching weights version it was scored with. Lists
+from any other version are treated as missing, and a pass that sees a new
+live version recomputes every open job.
+"""
+
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, event, inspect, or_
+from sqlalchemy.orm import object_session
+
+from src.models.job import Job, JobStatus
+from src.models.job_match import JobMatch, JobMatchList
+from src.models.review import Review
+from src.models.service import Service, ServiceCategory
+from src.models.user import ProviderProfile, User, db
+from src.services.after_commit import AfterCommitQueue
+from src.services.candidate_index import (
+    category_trades,
+    provider_trades,
+    service_radius_km,
+)
+from src.services.geo_search import radius_filter
+from src.services.matching_weights import current_weights
+from src.services.provider_skills import parse_skills
+from src.utils.redis_client import RedisClient
+
+logger = logging.getLogger(__name__)
+
+MATCH_LIST_SIZE = 20
+
+# Seconds between background passes when nothing wakes the worker
+MATERIALIZE_INTERVAL = 30
+
+# Redis keys of the shared work queue and the leader lock, and the lock's
+# lifetime; the leader renews it every pass
+KEY_PREFIX = "match_materializer"
+LEADER_TTL = 3 * MATERIALIZE_INTERVAL
+
+# Jobs still looking for a provider
+OPEN_JOB_STATUSES = (JobStatus.POSTED, JobStatus.MATCHED)
+
+# Fields whose changes alter a job's or a provider's scores
+JOB_FIELDS = (
+    "status",
+    "is_active",
+    "service_id",
+    "latitude",
+    "longitude",
+    "street_address",
+    "city",
+    "state",
+    "budget_min",
+    "budget_max",
+)
+PROVIDER_FIELDS = (
+    "skills",
+    "hourly_rate",
+    "years_experience",
+    "availability",
+    "service_area",
+    "service_radius",
+    "latitude",
+    "longitude",
+)
+
+
+def is_open(job: Job) -> bool:
+    return job.status in OPEN_JOB_STATUSES and job.is_active is not False
+
+
+def read_matches(
+    session,
+    job_id: int,
+    max_age: Optional[float] = None,
+    weights_version: Optional[int] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    A job's stored matches (empty if it has no candidates), or None if it
+    has no list fresher than max_age or scored with ``weights_version``
+    """
+    rows = (
+        session.query(
+            JobMatchList.size,
+            JobMatchList.weights_version,
+            JobMatchList.computed_at,
+            JobMatch.match,
+        )
+        .outerjoin(JobMatch, JobMatch.job_id == JobMatchList.job_id)
+        .filter(JobMatchList.job_id == job_id)
+        .order_by(JobMatch.rank)
+        .all()
+    )
+    if not rows:
+        return None
+    size, version, computed_at, _ = rows[0]
+    if weights_version is not None and version != weights_version:
+        return None
+    if max_age is not None and datetime.utcnow() - computed_at > timedelta(
+        seconds=max_age
+    ):
+        return None
+    return [match for _, _, _, match in rows[:size]]
+
+
+def _upsert(session, model, rows: List[Dict[str, Any]], keys: List[str]) -> None:
+    """Insert rows, updating those whose ``keys`` already exist"""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        for row in rows:
+            session.merge(model(**row))
+        return
+    statement = dialect_insert(model).values(rows)
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=keys,
+            set_={
+                column: statement.excluded[column]
+                for column in rows[0]
+                if column not in keys
+            },
+        )
+    )
+
+
+def store_matches(
+    session, job_id: int, matches: List[Dict[str, Any]], weights_version: int = 0
+) -> None:
+    """Upsert a job's stored matches, empty lists included; the caller commits"""
+    computed_at = datetime.utcnow()
+    _upsert(
+        session,
+        JobMatchList,
+        [
+            {
+                "job_id": job_id,
+                "size": len(matches),
+                "weights_version": weights_version,
+                "computed_at": computed_at,
+            }
+        ],
+        ["job_id"],
+    )
+    if matches:
+        _upsert(
+            session,
+            JobMatch,
+            [
+                {
+                    "job_id": job_id,
+                    "rank": rank,
+                    "provider_id": match["provider_id"],
+                    "overall_score": match["overall_score"],
+                    "match": match,
+                    "weights_version": match.get("weights_version", weights_version),
+                    "computed_at": computed_at,
+                }
+                for rank, match in enumerate(matches)
+            ],
+            ["job_id", "rank"],
+        )
+    session.execute(
+        delete(JobMatch).where(JobMatch.job_id == job_id, JobMatch.rank >= len(matches))
+    )
+
+
+def delete_matches(session, job_id: int) -> None:
+    """Drop a job's stored list; the caller commits"""
+    session.execute(delete(JobMatch).where(JobMatch.job_id == job_id))
+    session.execute(delete(JobMatchList).where(JobMatchList.job_id == job_id))
+
+
+def affected_jobs(session, provider_ids: Iterable[int]) -> Set[int]:
+    """Open jobs whose matches may change when these providers change"""
+    provider_ids = list(provider_ids)
+    if not provider_ids:
+        return set()
+
+    job_ids = {
+        job_id
+        for (job_id,) in session.query(JobMatch.job_id)
+        .filter(JobMatch.provider_id.in_(provider_ids))
+        .distinct()
+    }
+    profiles = session.query(ProviderProfile).filter(
+        ProviderProfile.user_id.in_(provider_ids)
+    )
+    for profile in profiles:
+        trades = provider_trades(parse_skills(profile.skills))
+        if not trades:
+            continue
+        query = (
+            session.query(Job.id, ServiceCategory.name)
+            .join(Service, Job.service_id == Service.id)
+            .join(ServiceCategory, Service.category_id == ServiceCategory.id)
+            .filter(Job.status.in_(OPEN_JOB_STATUSES))
+        )
+        if profile.latitude is not None and profile.longitude is not None:
+            within, _ = radius_filter(
+                Job.latitude,
+                Job.longitude,
+                profile.latitude,
+                profile.longitude,
+                service_radius_km(profile.service_radius),
+            )
+            query = query.filter(or_(within, Job.latitude.is_(None)))
+        job_ids.update(
+            job_id for job_id, category in query if category_trades(category) & trades
+        )
+    return job_ids
+
+
+class MatchMaterializer:
+    """Marked jobs and providers, and the worker recomputing their lists"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._jobs: Set[int] = set()
+        self._providers: Set[int] = set()
+        self._all = False
+        self._thread: Optional[threading.Thread] = None
+        self.engine = None  # SmartMatchingEngine, bound by the matching routes
+        self.weights_version: Optional[int] = None  # Seen by the last pass
+        self.redis = None  # Shared queue and leader lock, set by start()
+        self.token = uuid.uuid4().hex
+        self.is_leader = False
+
+    def bind(self, engine) -> None:
+        self.engine = engine
+
+    def _shared(self, name: str) -> str:
+        return f"{KEY_PREFIX}:{name}"
+
+    def mark(
+        self, job_ids: Iterable[int] = (), provider_ids: Iterable[int] = ()
+    ) -> None:
+        job_ids = {job_id for job_id in job_ids if job_id}
+        provider_ids = {user_id for user_id in provider_ids if user_id}
+        if self.redis is not None and (job_ids or provider_ids):
+            try:
+                pipe = self.redis.pipeline()
+                if job_ids:
+                    pipe.sadd(self._shared("jobs"), *job_ids)
+                if provider_ids:
+                    pipe.sadd(self._shared("providers"), *provider_ids)
+                pipe.execute()
+                self._wake.set()
+                return
+            except Exception as e:
+                logger.warning(f"Match materializer queue unavailable: {e}")
+        with self._lock:
+            self._jobs.update(job_ids)
+            self._providers.update(provider_ids)
+        self._wake.set()
+
+    def mark_all(self) -> None:
+        """Recompute every open job, e.g. after the weights change"""
+        if self.redis is not None:
+            try:
+                self.redis.set(self._shared("all"), 1)
+                self._wake.set()
+                return
+            except Exception as e:
+                logger.warning(f"Match materializer queue unavailable: {e}")
+        with self._lock:
+            self._all = True
+        self._wake.set()
+
+    def hand_over(self) -> None:
+        """Move work marked here while Redis was unavailable to the leader"""
+        with self._lock:
+            job_ids, provider_ids, everything = self._jobs, self._providers, self._all
+            self._jobs, self._providers, self._all = set(), set(), False
+        self.mark(job_ids, provider_ids)
+        if everything:
+            self.mark_all()
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._jobs) + len(self._providers) + self._all
+
+    def _take(self) -> tuple:
+        """Marked (job ids, provider ids, everything), emptying the queues"""
+        with self._lock:
+            job_ids, provider_ids, everything = self._jobs, self._providers, self._all
+            self._jobs, self._providers, self._all = set(), set(), False
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline()
+                pipe.smembers(self._shared("jobs"))
+                pipe.smembers(self._shared("providers"))
+                pipe.get(self._shared("all"))
+                pipe.delete(
+                    self._shared("jobs"), self._shared("providers"), self._shared("all")
+                )
+                jobs, providers, shared_all, _ = pipe.execute()
+                job_ids |= {int(job_id) for job_id in jobs}
+                provider_ids |= {int(user_id) for user_id in providers}
+                everything = everything or bool(shared_all)
+            except Exception as e:
+                logger.warning(f"Match materializer queue unavailable: {e}")
+        return job_ids, provider_ids, everything
+
+    def run_pending(self, session=None) -> int:
+        """Recompute every marked job; returns the number of jobs processed"""
+        if self.engine is None:
+            return 0
+        session = session or db.session
+        version, _ = current_weights(session)
+        if version != self.weights_version:
+            if self.weights_version is not None:
+                self.mark_all()  # Every list was scored with other weights
+            self.weights_version = version
+        job_ids, provider_ids, everything = self._take()
+
+        try:
+            if everything:
+                job_ids |= {
+                    job_id
+                    for (job_id,) in session.query(Job.id).filter(
+                        Job.status.in_(OPEN_JOB_STATUSES)
+                    )
+                }
+            job_ids |= affected_jobs(session, provider_ids)
+            for job_id in sorted(job_ids):
+                self.materialize(session, job_id)
+                session.commit()
+        except Exception:
+            session.rollback()
+            # Keep the work for the next pass
+            self.mark(job_ids, provider_ids)
+            raise
+        return len(job_ids)
+
+    def materialize(self, session, job_id: int) -> List[Dict[str, Any]]:
+        """Recompute and store one job's matches (none once it is closed)"""
+        job = session.get(Job, job_id)
+        if job is None or not is_open(job):
+            delete_matches(session, job_id)
+            return []
+        version, _ = current_weights(session)
+        matches = self.engine.compute_matches(job, MATCH_LIST_SIZE)
+        store_matches(session, job_id, matches, version)
+        return matches
+
+    def lead(self) -> bool:
+        """
+        Take or renew the leader lock; True if this process should run
+        passes (always, when Redis is unavailable)
+        """
+        if self.redis is None:
+            return True
+        key = self._shared("leader")
+        try:
+            held = self.redis.get(key)
+            if isinstance(held, bytes):
+                held = held.decode()
+            if held == self.token:
+                # Not atomic: if the lock expires before this renews it, two
+                # workers may run a pass; upserts keep that harmless
+                self.redis.expire(key, LEADER_TTL)
+                return True
+            return bool(self.redis.set(key, self.token, nx=True, ex=LEADER_TTL))
+        except Exception as e:
+            logger.warning(f"Match materializer leader lock unavailable: {e}")
+            return True
+
+    def start(self, app, interval: float = MATERIALIZE_INTERVAL) -> None:
+        """
+        Run passes in a daemon thread while this process holds the leader
+        lock, recomputing every open job on taking it
+        """
+        if self._thread is not None:
+            return
+        redis = RedisClient()
+        if redis.is_connected():
+            self.redis = redis.redis_client
+
+        def work():
+            while True:
+                with app.app_context():
+                    try:
+                        leading = self.lead()
+                        if leading and not self.is_leader:
+                            with self._lock:
+                                self._all = True
+                            logger.info("Match materializer leading")
+                        self.is_leader = leading
+                        if leading:
+                            processed = self.run_pending()
+                            if processed:
+                                logger.info(
+                                    f"Materialized matches for {processed} jobs"
+                                )
+                        else:
+                            self.hand_over()
+                    except Exception as e:
+                        logger.error(f"Match materialization failed: {e}")
+                    finally:
+                        db.session.remove()
+                self._wake.wait(interval)
+                self._wake.clear()
+
+        self._thread = threading.Thread(
+            target=work, name="match-materializer", daemon=True
+        )
+        self._thread.start()
+
+
+match_materializer = MatchMaterializer()
+
+
+# Marking. Mapper events queue jobs and providers on the session and they are
+# handed to the materializer once the transaction commits.
+
+
+def _hand_over_marked(pending) -> None:
+    match_materializer.mark(*pending)
+
+
+_pending = AfterCommitQueue(
+    "match_materializer", _hand_over_marked, lambda: (set(), set())
+)
+
+
+def _queue(target, job_ids: Iterable = (), provider_ids: Iterable = ()) -> None:
+    pending = _pending.pending(object_session(target))
+    if pending is not None:
+        pending[0].update(job_ids)
+        pending[1].update(provider_ids)
+
+
+def _changed(target, fields: Iterable[str]) -> bool:
+    attrs = inspect(target).attrs
+    return any(attrs[field].history.has_changes() for field in fields)
+
+
+def _old_and_new(target, field: str) -> List:
+    history = inspect(target).attrs[field].history
+    return list(history.deleted or ()) + [getattr(target, field)]
+
+
+@event.listens_for(Job, "after_insert")
+def _mark_inserted_job(mapper, connection, target):
+    _queue(target, [target.id], [target.assigned_provider_id])
+
+
+@event.listens_for(Job, "after_update")
+def _mark_updated_job(mapper, connection, target):
+    if _changed(target, JOB_FIELDS):
+        _queue(target, [target.id])
+    if _changed(target, ("status", "assigned_provider_id")):
+        # The assigned providers' active job counts moved
+        _queue(target, provider_ids=_old_and_new(target, "assigned_provider_id"))
+
+
+@event.listens_for(Job, "before_delete")
+def _unlist_deleted_job(mapper, connection, target):
+    connection.execute(delete(JobMatch).where(JobMatch.job_id == target.id))
+    connection.execute(delete(JobMatchList).where(JobMatchList.job_id == target.id))
+    _queue(target, provider_ids=[target.assigned_provider_id])
+
+
+@event.listens_for(Review, "after_insert")
+@event.listens_for(Review, "after_update")
+@event.listens_for(Review, "after_delete")
+def _mark_reviewed_provider(mapper, connection, target):
+    _queue(target, provider_ids=_old_and_new(target, "reviewee_id"))
+
+
+@event.listens_for(ProviderProfile, "after_insert")
+@event.listens_for(ProviderProfile, "after_delete")
+def _mark_added_or_removed_provider(mapper, connection, target):
+    _queue(target, provider_ids=[target.user_id])
+
+
+@event.listens_for(ProviderProfile, "after_update")
+def _mark_updated_provider(mapper, connection, target):
+    if _changed(target, PROVIDER_FIELDS):
+        _queue(target, provider_ids=[target.user_id])
+
+
+@event.listens_for(User, "after_update")
+def _mark_deactivated_provider(mapper, connection, target):
+    if _changed(target, ("is_active", "first_name", "last_name", "email")):
+        _queue(target, provider_ids=[target.id])
+
+
+for _attribute in (Review.reviewee_id, Job.assigned_provider_id):
+    # Load old values on assignment so the previous provider is marked too
+    event.listen(_attribute, "set", lambda *args: None, active_history=True)
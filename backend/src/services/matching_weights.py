@@ -0,0 +1,147 @@
+"""
+Matching Weights Registry
+=========================
+
+The smart matching factor weights, versioned in the ``matching_weights``
+table so every worker scores with the same weights and a restart keeps
+them. Publishing inserts a new row; the highest version is live. Before
+anything is published the built-in ``DEFAULT_WEIGHTS`` are live as
+version 0.
+
+Each process caches the live version and polls the table for a newer one
+at most every ``WEIGHTS_POLL_INTERVAL`` seconds, so a publish from any
+worker reaches the others within that bound. Scores carry the version
+they were computed with, which is how precomputed match lists and feed
+rankings are invalidated: readers discard anything from another version.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+
+from src.models.matching_weights import MatchingWeights
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEIGHTS = {
+    "skills_match": 0.25,
+    "location_proximity": 0.20,
+    "rating_score": 0.20,
+    "availability": 0.15,
+    "price_compatibility": 0.10,
+    "experience_level": 0.10,
+}
+
+# Bound on how long a worker keeps scoring with superseded weights
+WEIGHTS_POLL_INTERVAL = float(os.getenv("MATCHING_WEIGHTS_POLL_INTERVAL", "5"))
+
+# Allowed distance of the weight total from 1.0
+WEIGHT_SUM_TOLERANCE = 0.01
+
+
+def validate_weights(weights: Dict[str, float]) -> Dict[str, float]:
+    """Complete, checked weights from a full or partial update"""
+    if not isinstance(weights, dict):
+        raise ValueError("Weights must be a dictionary")
+    unknown = sorted(set(weights) - set(DEFAULT_WEIGHTS))
+    if unknown:
+        raise ValueError(f"Unknown weight factors: {', '.join(unknown)}")
+    for factor, weight in weights.items():
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+            raise ValueError(f"Weight for {factor} must be a number")
+        if weight < 0:
+            raise ValueError(f"Weight for {factor} must not be negative")
+
+    total = sum(weights.values())
+    if abs(total - 1.0) > WEIGHT_SUM_TOLERANCE:
+        raise ValueError(f"Weights must sum to 1.0, got {total}")
+    return {factor: float(weights.get(factor, 0.0)) for factor in DEFAULT_WEIGHTS}
+
+
+class WeightRegistry:
+    """This process's copy of the live weights version"""
+
+    def __init__(self, poll_interval: float = WEIGHTS_POLL_INTERVAL):
+        self._lock = threading.Lock()
+        self.poll_interval = poll_interval
+        self.version = 0
+        self.weights: Dict[str, float] = dict(DEFAULT_WEIGHTS)
+        self.checked_at: Optional[float] = None
+
+    def invalidate(self) -> None:
+        """Poll the table on the next read"""
+        self.checked_at = None
+
+    def current(self, session=None) -> Tuple[int, Dict[str, float]]:
+        """The live (version, weights), polling if the cached copy is due"""
+        checked_at = self.checked_at
+        if checked_at is None or time.monotonic() - checked_at >= self.poll_interval:
+            self.refresh(session)
+        with self._lock:
+            return self.version, dict(self.weights)
+
+    def refresh(self, session=None) -> int:
+        """
+        Load the latest published version; returns the live version. Read on
+        a connection of its own, so a failure never touches the caller's
+        session and its pending changes.
+        """
+        session = session or db.session
+        engine = session.get_bind()
+        try:
+            statement = (
+                select(MatchingWeights.version, MatchingWeights.weights)
+                .order_by(MatchingWeights.version.desc())
+                .limit(1)
+            )
+            with engine.connect() as connection:
+                latest = connection.execute(statement).first()
+        except Exception as e:
+            logger.warning(f"Could not read matching weights: {e}")
+            # Keep the cached version; retry after the next interval
+            self.checked_at = time.monotonic()
+            return self.version
+
+        self._set(*latest if latest else (0, DEFAULT_WEIGHTS))
+        return self.version
+
+    def publish(
+        self,
+        weights: Dict[str, float],
+        created_by: Optional[int] = None,
+        session=None,
+    ) -> Tuple[int, Dict[str, float]]:
+        """
+        Store a new version from a full or partial update and make it live;
+        ``created_by`` is the publishing admin's id
+        """
+        session = session or db.session
+        _, live = self.current(session)
+        merged = validate_weights({**live, **weights})
+
+        row = MatchingWeights(weights=merged, created_by=created_by)
+        session.add(row)
+        session.commit()
+        self._set(row.version, merged)
+        logger.info(f"Published matching weights v{row.version}")
+        return row.version, dict(merged)
+
+    def _set(self, version: int, weights: Dict[str, float]) -> None:
+        with self._lock:
+            if version != self.version:
+                logger.info(f"Matching weights now v{version}")
+            self.version, self.weights = version, dict(weights)
+            self.checked_at = time.monotonic()
+
+
+weight_registry = WeightRegistry()
+
+
+def current_weights(session=None) -> Tuple[int, Dict[str, float]]:
+    """The live (version, weights) every matching path scores with"""
+    return weight_registry.current(session)
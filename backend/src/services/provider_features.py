@@ -0,0 +1,214 @@
+"""
+Provider Feature Store
+======================
+
+One ``provider_feature`` row per provider holding the aggregates matching
+needs: average rating and review count, active and completed job counts,
+and the provider's coordinates. Matching reads these rows instead of
+aggregating ``review`` and ``job`` on every request.
+
+Rows are recomputed from mapper events on ``Review``, ``Job`` and
+``ProviderProfile``, on the flush's connection, so they commit or roll back
+with the write that changed them. The provider's profile row is locked
+(``SELECT ... FOR UPDATE``) before its aggregates are read and the row is
+upserted, so concurrent writes for one provider are serialized.
+``rebuild_provider_features`` recomputes every row (see
+``backend/rebuild_provider_features.py``).
+"""
+
+import logging
+from typing import Iterable, List, Optional
+
+from sqlalchemy import case, delete, event, func, insert, inspect, select
+
+from src.models.job import Job, JobStatus
+from src.models.provider_feature import ProviderFeature
+from src.models.review import Review
+from src.models.user import ProviderProfile, db
+
+logger = logging.getLogger(__name__)
+
+# Jobs a provider is currently committed to
+ACTIVE_JOB_STATUSES = (JobStatus.ACCEPTED, JobStatus.IN_PROGRESS)
+
+
+def _feature_rows(connection, user_ids: Optional[List[int]] = None) -> List[dict]:
+    """Freshly aggregated feature rows, for the given provider users or all"""
+    profiles = select(
+        ProviderProfile.id,
+        ProviderProfile.user_id,
+        ProviderProfile.latitude,
+        ProviderProfile.longitude,
+    )
+    ratings = select(
+        Review.reviewee_id, func.avg(Review.overall_rating), func.count(Review.id)
+    ).group_by(Review.reviewee_id)
+    jobs = select(
+        Job.assigned_provider_id,
+        func.sum(case((Job.status.in_(ACTIVE_JOB_STATUSES), 1), else_=0)),
+        func.sum(case((Job.status == JobStatus.COMPLETED, 1), else_=0)),
+    ).group_by(Job.assigned_provider_id)
+
+    if user_ids is not None:
+        profiles = profiles.where(ProviderProfile.user_id.in_(user_ids))
+        ratings = ratings.where(Review.reviewee_id.in_(user_ids))
+        jobs = jobs.where(Job.assigned_provider_id.in_(user_ids))
+    else:
+        jobs = jobs.where(Job.assigned_provider_id.isnot(None))
+
+    rating_stats = {row[0]: row[1:] for row in connection.execute(ratings)}
+    job_stats = {row[0]: row[1:] for row in connection.execute(jobs)}
+
+    rows = []
+    for provider_id, user_id, latitude, longitude in connection.execute(profiles):
+        average_rating, review_count = rating_stats.get(user_id, (None, 0))
+        active_jobs, completed_jobs = job_stats.get(user_id, (0, 0))
+        rows.append(
+            {
+                "provider_id": provider_id,
+                "user_id": user_id,
+                "average_rating": (
+                    None if average_rating is None else float(average_rating)
+                ),
+                "review_count": review_count,
+                "active_jobs": active_jobs or 0,
+                "completed_jobs": completed_jobs or 0,
+                "latitude": latitude,
+                "longitude": longitude,
+            }
+        )
+    return rows
+
+
+def _upsert_features(connection, rows: List[dict]) -> None:
+    """Insert feature rows, updating those whose provider already has one"""
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        connection.execute(
+            delete(ProviderFeature).where(
+                ProviderFeature.provider_id.in_([row["provider_id"] for row in rows])
+            )
+        )
+        connection.execute(insert(ProviderFeature), rows)
+        return
+    statement = dialect_insert(ProviderFeature).values(rows)
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=["provider_id"],
+            set_={
+                column: statement.excluded[column]
+                for column in rows[0]
+                if column != "provider_id"
+            },
+        )
+    )
+
+
+def refresh_provider_features(connection, user_ids: Iterable[Optional[int]]) -> None:
+    """
+    Recompute the feature rows of the given provider users. Their profile
+    rows are locked first, so concurrent writes for the same provider take
+    turns and each aggregates the other's committed changes.
+    """
+    user_ids = sorted({user_id for user_id in user_ids if user_id})
+    if not user_ids:
+        return
+    connection.execute(
+        select(ProviderProfile.id)
+        .where(ProviderProfile.user_id.in_(user_ids))
+        .order_by(ProviderProfile.id)
+        .with_for_update()
+    )
+    rows = _feature_rows(connection, user_ids)
+    if rows:
+        _upsert_features(connection, rows)
+    # Users without a profile any more
+    connection.execute(
+        delete(ProviderFeature).where(
+            ProviderFeature.user_id.in_(user_ids),
+            ProviderFeature.provider_id.notin_([row["provider_id"] for row in rows]),
+        )
+    )
+
+
+def rebuild_provider_features(engine=None) -> int:
+    """Recompute every provider's feature row; returns rows written"""
+    engine = engine or db.engine
+    with engine.begin() as connection:
+        rows = _feature_rows(connection)
+        connection.execute(delete(ProviderFeature))
+        if rows:
+            connection.execute(insert(ProviderFeature), rows)
+    return len(rows)
+
+
+def init_provider_features(engine=None) -> int:
+    """Build the feature store if profiles exist but it has no rows"""
+    engine = engine or db.engine
+    with engine.connect() as connection:
+        has_rows = connection.execute(select(ProviderFeature.provider_id).limit(1))
+        if has_rows.first() is not None:
+            return 0
+        has_profiles = connection.execute(select(ProviderProfile.id).limit(1))
+        if has_profiles.first() is None:
+            return 0
+    written = rebuild_provider_features(engine)
+    logger.info(f"Built {written} provider feature rows")
+    return written
+
+
+def _old_and_new(target, field: str) -> List:
+    history = inspect(target).attrs[field].history
+    return list(history.deleted or ()) + [getattr(target, field)]
+
+
+@event.listens_for(Review, "after_insert")
+@event.listens_for(Review, "after_update")
+@event.listens_for(Review, "after_delete")
+def _review_written(mapper, connection, target):
+    refresh_provider_features(connection, _old_and_new(target, "reviewee_id"))
+
+
+@event.listens_for(Job, "after_insert")
+@event.listens_for(Job, "after_delete")
+def _job_added_or_removed(mapper, connection, target):
+    refresh_provider_features(connection, [target.assigned_provider_id])
+
+
+@event.listens_for(Job, "after_update")
+def _job_updated(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if attrs.assigned_provider_id.history.has_changes() or (
+        attrs.status.history.has_changes()
+    ):
+        refresh_provider_features(
+            connection, _old_and_new(target, "assigned_provider_id")
+        )
+
+
+@event.listens_for(ProviderProfile, "after_insert")
+def _profile_inserted(mapper, connection, target):
+    refresh_provider_features(connection, [target.user_id])
+
+
+@event.listens_for(ProviderProfile, "after_update")
+def _profile_updated(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if attrs.latitude.history.has_changes() or attrs.longitude.history.has_changes():
+        refresh_provider_features(connection, [target.user_id])
+
+
+@event.listens_for(ProviderProfile, "before_delete")
+def _profile_deleted(mapper, connection, target):
+    connection.execute(
+        delete(ProviderFeature).where(ProviderFeature.provider_id == target.id)
+    )
+
+
+for _attribute in (Review.reviewee_id, Job.assigned_provider_id):
+    # Load old values on assignment so the previous provider is refreshed too
+    event.listen(_attribute, "set", lambda *args: None, active_history=True)
@@ -0,0 +1,209 @@
+"""
+Normalized Provider Skills
+==========================
+
+``ProviderProfile.skills`` stays the comma-separated skills field that the
+API reads and writes. This module keeps a normalized copy of it in the
+``skill`` vocabulary and ``provider_skill`` association tables, so skill
+filters, histograms and matching use indexed joins instead of ``LIKE``
+scans and per-row string splitting.
+
+Rows are synced from mapper events in the same transaction as the profile
+write. ``backfill_provider_skills`` fills the tables for existing profiles
+(see ``backend/migrate_provider_skills.py``).
+"""
+
+import logging
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, event, func, insert, inspect, or_, select
+
+from src.models.skill import ProviderSkill, Skill
+from src.models.user import ProviderProfile, db
+
+logger = logging.getLogger(__name__)
+
+# Length of Skill.slug and Skill.name
+SKILL_MAX_LENGTH = 100
+
+
+def normalize_skill(skill: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", (skill or "").lower()).split())
+
+
+def parse_skills(skills: Optional[str]) -> Dict[str, str]:
+    """
+    Map of slug to display name for a comma-separated skills field. Both
+    are cut to SKILL_MAX_LENGTH, so an over-long entry cannot fail the
+    profile write that syncs it.
+    """
+    parsed = {}
+    for skill in (skills or "").split(","):
+        slug = normalize_skill(skill)[:SKILL_MAX_LENGTH].rstrip()
+        if slug and slug not in parsed:
+            parsed[slug] = skill.strip()[:SKILL_MAX_LENGTH]
+    return parsed
+
+
+def _insert_new_skills(dialect: str):
+    """
+    Insert into the skill vocabulary, skipping slugs that a concurrent
+    profile write added since they were looked up
+    """
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(Skill)
+    return dialect_insert(Skill).on_conflict_do_nothing(index_elements=["slug"])
+
+
+def _skill_ids(connection, skills: Dict[str, str]) -> List[int]:
+    """Ids for the given skills, adding missing ones to the vocabulary"""
+    if not skills:
+        return []
+    existing = dict(
+        connection.execute(
+            select(Skill.slug, Skill.id).where(Skill.slug.in_(list(skills)))
+        ).all()
+    )
+    missing = [slug for slug in skills if slug not in existing]
+    if missing:
+        connection.execute(
+            _insert_new_skills(connection.dialect.name),
+            [{"slug": slug, "name": skills[slug]} for slug in missing],
+        )
+        existing.update(
+            connection.execute(
+                select(Skill.slug, Skill.id).where(Skill.slug.in_(missing))
+            ).all()
+        )
+    return [existing[slug] for slug in skills]
+
+
+def sync_provider_skills(connection, provider_id: int, skills: Optional[str]) -> None:
+    """Replace a provider's normalized skill rows from its skills field"""
+    connection.execute(
+        delete(ProviderSkill).where(ProviderSkill.provider_id == provider_id)
+    )
+    skill_ids = _skill_ids(connection, parse_skills(skills))
+    if skill_ids:
+        connection.execute(
+            insert(ProviderSkill),
+            [
+                {"provider_id": provider_id, "skill_id": skill_id}
+                for skill_id in skill_ids
+            ],
+        )
+
+
+def backfill_provider_skills(engine=None) -> int:
+    """Rebuild provider_skill rows for every profile; returns rows written"""
+    engine = engine or db.engine
+    written = 0
+    with engine.begin() as connection:
+        connection.execute(delete(ProviderSkill))
+        profiles = connection.execute(
+            select(ProviderProfile.id, ProviderProfile.skills).where(
+                ProviderProfile.skills.isnot(None)
+            )
+        ).all()
+        for provider_id, skills in profiles:
+            sync_provider_skills(connection, provider_id, skills)
+            written += len(parse_skills(skills))
+    return written
+
+
+def init_provider_skills(engine=None) -> int:
+    """Backfill the normalized tables if profiles have skills but none exist"""
+    engine = engine or db.engine
+    with engine.connect() as connection:
+        has_rows = connection.execute(select(ProviderSkill.provider_id).limit(1))
+        if has_rows.first() is not None:
+            return 0
+        has_skills = connection.execute(
+            select(ProviderProfile.id)
+            .where(ProviderProfile.skills.isnot(None))
+            .limit(1)
+        )
+        if has_skills.first() is None:
+            return 0
+    written = backfill_provider_skills(engine)
+    logger.info(f"Backfilled {written} provider skills")
+    return written
+
+
+def matching_skill_ids(terms: Iterable[str]):
+    """
+    Select of skill ids whose slug contains any of the given terms, as the
+    old ``LIKE '%term%'`` filter on the skills column matched. The skill
+    vocabulary is small; the provider_skill join is the indexed part.
+    """
+    slugs = [normalize_skill(term) for term in terms if normalize_skill(term)]
+    return select(Skill.id).where(
+        or_(*[Skill.slug.contains(slug, autoescape=True) for slug in slugs])
+    )
+
+
+def provider_skill_filter(terms: Iterable[str]):
+    """Clause matching profiles holding a skill that contains any term"""
+    return ProviderProfile.id.in_(
+        select(ProviderSkill.provider_id).where(
+            ProviderSkill.skill_id.in_(matching_skill_ids(terms))
+        )
+    )
+
+
+def skill_histogram(session=None, limit: int = None):
+    """(slug, name, provider count) rows, most common skills first"""
+    session = session or db.session
+    provider_count = func.count(ProviderSkill.provider_id)
+    query = (
+        session.query(Skill.slug, Skill.name, provider_count)
+        .join(ProviderSkill, ProviderSkill.skill_id == Skill.id)
+        .group_by(Skill.id, Skill.slug, Skill.name)
+        .order_by(provider_count.desc(), Skill.slug)
+    )
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def provider_skill_sets(provider_ids: Iterable[int], session=None) -> Dict[int, Set]:
+    """Normalized skill slugs per ProviderProfile id, in one query"""
+    session = session or db.session
+    provider_ids = list(provider_ids)
+    skill_sets = defaultdict(set)
+    if not provider_ids:
+        return skill_sets
+    rows = (
+        session.query(ProviderSkill.provider_id, Skill.slug)
+        .join(Skill, ProviderSkill.skill_id == Skill.id)
+        .filter(ProviderSkill.provider_id.in_(provider_ids))
+    )
+    for provider_id, slug in rows:
+        skill_sets[provider_id].add(slug)
+    return skill_sets
+
+
+@event.listens_for(ProviderProfile, "after_insert")
+def _sync_inserted_profile(mapper, connection, target):
+    if target.skills:
+        sync_provider_skills(connection, target.id, target.skills)
+
+
+@event.listens_for(ProviderProfile, "after_update")
+def _sync_updated_profile(mapper, connection, target):
+    if inspect(target).attrs.skills.history.has_changes():
+        sync_provider_skills(connection, target.id, target.skills)
+
+
+@event.listens_for(ProviderProfile, "before_delete")
+def _delete_profile_skills(mapper, connection, target):
+    connection.execute(
+        delete(ProviderSkill).where(ProviderSkill.provider_id == target.id)
+    )
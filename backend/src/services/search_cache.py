@@ -0,0 +1,507 @@
+"""
+Search Result Cache
+===================
+
+Caches ``/api/search/jobs`` and ``/api/search/providers`` result pages by a
+canonical form of the request (normalized, order-independent terms and
+filters with empty values dropped). Entries hold only the result ids,
+their scores and the pagination block; a hit is rehydrated by primary key.
+
+Entries live in Redis when it is connected, otherwise in a bounded
+in-process LRU. Each entry records its scope - the category and location
+filters it was computed under - and writes invalidate only the scopes they
+can affect:
+
+- a Job write drops job searches whose category/location filters match
+  the job's old or new category and address (unfiltered searches always
+  match)
+- a ProviderProfile write drops provider searches whose location filter
+  matches the old or new service area
+- Review, User, Service and ServiceCategory writes drop the whole kind,
+  since they change ratings, names or categories of many results
+
+Provider job feeds (``SmartMatchingEngine.find_jobs``) are cached here too,
+as the ``feeds`` kind scoped by provider: writes to a provider's profile,
+reviews or user row drop that provider's feed, and Job, Service and
+ServiceCategory writes drop every feed.
+
+Invalidation happens after the write's transaction commits. Entries also
+expire after ``SEARCH_CACHE_TTL`` seconds, and so do the scope records in
+Redis. Every invalidation of a kind also bumps its generation: a page is
+stamped with the generation before it is computed and only stored if no
+invalidation ran meanwhile, so a page read while a write committed is not
+cached stale for the full TTL.
+
+Scopes match by substring over free-text locations and category names,
+which a fixed set of ``TieredCache`` tags cannot express without dropping
+every filtered page on each job write, so this cache keeps its own scope
+registry instead of the tag invalidation in ``src.utils.cache``.
+"""
+
+import hashlib
+import inspect as pyinspect
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import object_session
+
+from src.models.job import Job
+from src.models.review import Review
+from src.models.service import Service, ServiceCategory
+from src.models.user import ProviderProfile, User
+from src.services.after_commit import AfterCommitQueue
+from src.services.search_metrics import record_rows
+from src.utils.redis_client import RedisClient
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_TTL = 120
+LOCAL_MAX_ENTRIES = 1000
+KEY_PREFIX = "search:v1"
+CACHE_KINDS = ("jobs", "providers", "feeds")
+
+# Per-result fields computed from the request rather than stored on the row
+RESULT_EXTRA_FIELDS = ("distance_km",)
+
+# User columns that appear in, or filter, search results
+USER_RESULT_FIELDS = ("first_name", "last_name", "email", "bio", "is_active")
+
+
+def canonical_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop empty values and normalize strings so equal searches share a key"""
+    canonical = {}
+    for name, value in params.items():
+        if value is None or value == "":
+            continue
+        if name == "query":
+            # Matching and scoring ignore term order, case and punctuation
+            value = " ".join(
+                sorted(set(re.sub(r"[^\w\s]", " ", value.lower()).split()))
+            )
+        elif isinstance(value, str) and name != "after":
+            value = " ".join(value.lower().split())
+        canonical[name] = value
+    return canonical
+
+
+def _scope_matches(scope: Dict[str, Optional[str]], change: Dict[str, Any]) -> bool:
+    """Whether a write described by ``change`` can affect a cached scope"""
+    for name, needle in scope.items():
+        if not needle:
+            continue
+        haystacks = change.get(name)
+        if haystacks is None:
+            continue  # The write did not describe this field; stay safe
+        if not any(needle in (value or "").lower() for value in haystacks):
+            return False
+    return True
+
+
+class LocalSearchStore:
+    """Bounded in-process LRU of search entries with TTL"""
+
+    def __init__(self, max_entries: int = LOCAL_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires, scope, value)
+        self._generations: Dict[str, int] = {}  # kind -> invalidation count
+
+    def stamp(self, kind: str) -> int:
+        with self._lock:
+            return self._generations.get(kind, 0)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if item[0] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return item[2]
+
+    def set(
+        self, key: str, value: dict, scope: dict, ttl: int, stamp: Optional[int] = None
+    ) -> bool:
+        kind = key.split(":")[2]
+        with self._lock:
+            if stamp is not None and self._generations.get(kind, 0) != stamp:
+                return False
+            self._entries[key] = (time.time() + ttl, scope, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def invalidate(self, kind: str, change: Optional[Dict[str, Any]]) -> int:
+        prefix = f"{KEY_PREFIX}:{kind}:"
+        with self._lock:
+            self._generations[kind] = self._generations.get(kind, 0) + 1
+            stale = [
+                key
+                for key, (_, scope, _) in self._entries.items()
+                if key.startswith(prefix)
+                and (change is None or _scope_matches(scope, change))
+            ]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisSearchStore:
+    """
+    Search entries in Redis. Each distinct scope has a key set of its
+    entries and a member of the kind's ``scopes`` sorted set, scored by
+    when its newest entry expires; expired scopes are pruned on every
+    invalidation, so the registry only holds scopes with live entries.
+    """
+
+    def __init__(self, client):
+        self.client = client  # raw redis client
+
+    def _scopes_key(self, kind: str) -> str:
+        return f"{KEY_PREFIX}:{kind}:scopes"
+
+    def _generation_key(self, kind: str) -> str:
+        return f"{KEY_PREFIX}:{kind}:generation"
+
+    def _members_key(self, kind: str, scope_json: str) -> str:
+        scope_id = hashlib.md5(scope_json.encode()).hexdigest()
+        return f"{KEY_PREFIX}:{kind}:scope:{scope_id}"
+
+    def stamp(self, kind: str) -> int:
+        return int(self.client.get(self._generation_key(kind)) or 0)
+
+    def get(self, key: str) -> Optional[dict]:
+        raw = self.client.get(key)
+        return json.loads(raw) if raw else None
+
+    def set(
+        self, key: str, value: dict, scope: dict, ttl: int, stamp: Optional[int] = None
+    ) -> bool:
+        kind = key.split(":")[2]
+        scope_json = json.dumps(scope, sort_keys=True)
+        members_key = self._members_key(kind, scope_json)
+
+        pipe = self.client.pipeline()
+        pipe.setex(key, ttl, json.dumps(value))
+        pipe.sadd(members_key, key)
+        pipe.expire(members_key, ttl)
+        pipe.zadd(self._scopes_key(kind), {scope_json: time.time() + ttl})
+        pipe.expire(self._scopes_key(kind), ttl)
+        pipe.execute()
+
+        # Invalidations bump the generation before dropping entries: either
+        # one ran since the stamp and is seen here, or it runs after the
+        # entry is registered and drops it itself
+        if stamp is not None and self.stamp(kind) != stamp:
+            self.client.delete(key)
+            return False
+        return True
+
+    def invalidate(self, kind: str, change: Optional[Dict[str, Any]]) -> int:
+        scopes_key = self._scopes_key(kind)
+        pipe = self.client.pipeline()
+        pipe.incr(self._generation_key(kind))
+        pipe.zremrangebyscore(scopes_key, "-inf", time.time())
+        pipe.zrange(scopes_key, 0, -1)
+        scopes = pipe.execute()[2]
+
+        stale_scopes = []
+        for scope_json in scopes:
+            if isinstance(scope_json, bytes):
+                scope_json = scope_json.decode()
+            if change is None or _scope_matches(json.loads(scope_json), change):
+                stale_scopes.append(scope_json)
+        if not stale_scopes:
+            return 0
+
+        members_keys = [self._members_key(kind, scope) for scope in stale_scopes]
+        pipe = self.client.pipeline()
+        for members_key in members_keys:
+            pipe.smembers(members_key)
+        keys = {key for members in pipe.execute() for key in members}
+
+        removed = self.client.delete(*keys) if keys else 0
+        pipe = self.client.pipeline()
+        pipe.delete(*members_keys)
+        pipe.zrem(scopes_key, *stale_scopes)
+        pipe.execute()
+        return removed
+
+    def clear(self) -> None:
+        for kind in CACHE_KINDS:
+            self.invalidate(kind, None)
+
+
+class SearchResultCache:
+    """Canonical-key search cache over a Redis or in-process store"""
+
+    def __init__(self, store=None, ttl: int = SEARCH_CACHE_TTL):
+        self.store = store or self._default_store()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _default_store():
+        redis = RedisClient()
+        if redis.is_connected():
+            logger.info("Search result cache using Redis")
+            return RedisSearchStore(redis.redis_client)
+        return LocalSearchStore()
+
+    def make_key(self, kind: str, params: Dict[str, Any]) -> str:
+        payload = json.dumps(canonical_params(params), sort_keys=True, default=str)
+        return f"{KEY_PREFIX}:{kind}:{hashlib.md5(payload.encode()).hexdigest()}"
+
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            entry = self.store.get(key)
+        except Exception as e:
+            logger.warning(f"Search cache read failed: {e}")
+            entry = None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def stamp(self, kind: str) -> Optional[int]:
+        """Generation of ``kind`` to pass to ``set`` for a page computed next"""
+        try:
+            return self.store.stamp(kind)
+        except Exception as e:
+            logger.warning(f"Search cache read failed: {e}")
+            return None
+
+    def set(
+        self,
+        key: str,
+        entry: dict,
+        scope: Dict[str, Optional[str]],
+        stamp: Optional[int] = None,
+    ) -> bool:
+        """
+        Store an entry unless ``kind`` was invalidated since ``stamp`` was
+        taken (before computing it); returns whether it was stored
+        """
+        scope = {name: (value or "").lower() or None for name, value in scope.items()}
+        try:
+            return self.store.set(key, entry, scope, self.ttl, stamp)
+        except Exception as e:
+            logger.warning(f"Search cache write failed: {e}")
+            return False
+
+    def invalidate(self, kind: str, change: Optional[Dict[str, Any]] = None) -> int:
+        """Drop entries of ``kind`` whose scope ``change`` can affect (all if None)"""
+        try:
+            return self.store.invalidate(kind, change)
+        except Exception as e:
+            logger.warning(f"Search cache invalidation failed: {e}")
+            return 0
+
+    def clear(self) -> None:
+        self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.store).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+search_cache = SearchResultCache()
+
+
+def _result_extras(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {name: result[name] for name in RESULT_EXTRA_FIELDS if name in result}
+
+
+def cached_search(kind: str, scope: Tuple[str, ...], hydrate: str) -> Callable:
+    """
+    Decorate a search method so ``use_cache=True`` calls go through
+    ``search_cache``. ``scope`` names the parameters recorded as the entry's
+    scope and ``hydrate`` the method turning cached ids and scores back
+    into results.
+    """
+
+    def decorator(method):
+        signature = pyinspect.signature(method)
+
+        @wraps(method)
+        def wrapper(self, *args, use_cache: bool = False, **kwargs):
+            if not use_cache:
+                return method(self, *args, **kwargs)
+
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            params = {
+                name: value for name, value in bound.arguments.items() if name != "self"
+            }
+            key = search_cache.make_key(kind, params)
+
+            entry = search_cache.get(key)
+            if entry is not None:
+                results = getattr(self, hydrate)(entry["ids"], entry["scores"])
+                extras = entry.get("extras") or {}
+                for result in results:
+                    result.update(extras.get(str(result["id"]), {}))
+                record_rows(
+                    len(results), entry["pagination"].get("total_count"), cache_hit=True
+                )
+                search_info = dict(entry["search_info"], query=params.get("query", ""))
+                return {
+                    "results": results,
+                    "pagination": entry["pagination"],
+                    "search_info": search_info,
+                }
+
+            stamp = search_cache.stamp(kind)
+            response = method(self, *args, **kwargs)
+            search_cache.set(
+                key,
+                {
+                    "ids": [result["id"] for result in response["results"]],
+                    "scores": [
+                        result["relevance_score"] for result in response["results"]
+                    ],
+                    "extras": {
+                        str(result["id"]): _result_extras(result)
+                        for result in response["results"]
+                        if _result_extras(result)
+                    },
+                    "pagination": response["pagination"],
+                    "search_info": response["search_info"],
+                },
+                {name: params.get(name) for name in scope},
+                stamp,
+            )
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+# Invalidation. Mapper events describe each write on the session and the
+# matching entries are dropped once the transaction commits.
+
+
+def _apply_pending_invalidations(pending) -> None:
+    # One full invalidation of a kind makes its selective ones redundant
+    full = {kind for kind, change in pending if change is None}
+    for kind in full:
+        search_cache.invalidate(kind)
+    for kind, change in pending:
+        if kind not in full:
+            search_cache.invalidate(kind, change)
+
+
+_pending = AfterCommitQueue("search_cache", _apply_pending_invalidations)
+
+
+def _queue(target, kind: str, change: Optional[Dict[str, Any]]) -> None:
+    pending = _pending.pending(object_session(target))
+    if pending is not None:
+        pending.append((kind, change))
+
+
+def _old_and_new(target, field: str) -> List[Any]:
+    """Current value of ``field`` plus its value before this flush"""
+    history = inspect(target).attrs[field].history
+    return list(history.deleted or ()) + [getattr(target, field)]
+
+
+def _category_names(connection, service_ids: Iterable[int]) -> List[str]:
+    service_ids = [service_id for service_id in service_ids if service_id]
+    if not service_ids:
+        return []
+    return list(
+        connection.execute(
+            select(ServiceCategory.name)
+            .join(Service, Service.category_id == ServiceCategory.id)
+            .where(Service.id.in_(service_ids))
+        ).scalars()
+    )
+
+
+def _job_change(connection, target) -> Dict[str, Any]:
+    return {
+        "category": _category_names(connection, _old_and_new(target, "service_id")),
+        "location": [
+            value
+            for field in ("street_address", "city", "state")
+            for value in _old_and_new(target, field)
+        ],
+    }
+
+
+@event.listens_for(Job, "after_insert")
+@event.listens_for(Job, "after_update")
+@event.listens_for(Job, "after_delete")
+def _job_written(mapper, connection, target):
+    _queue(target, "jobs", _job_change(connection, target))
+    _queue(target, "feeds", None)
+
+
+def _provider_feeds(target, field: str) -> Dict[str, List[str]]:
+    return {"provider": [str(value) for value in _old_and_new(target, field) if value]}
+
+
+@event.listens_for(ProviderProfile, "after_insert")
+@event.listens_for(ProviderProfile, "after_update")
+@event.listens_for(ProviderProfile, "after_delete")
+def _provider_written(mapper, connection, target):
+    _queue(target, "providers", {"location": _old_and_new(target, "service_area")})
+    _queue(target, "feeds", _provider_feeds(target, "user_id"))
+
+
+@event.listens_for(Review, "after_insert")
+@event.listens_for(Review, "after_update")
+@event.listens_for(Review, "after_delete")
+def _ratings_changed(mapper, connection, target):
+    _queue(target, "providers", None)
+    _queue(target, "feeds", _provider_feeds(target, "reviewee_id"))
+
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in USER_RESULT_FIELDS):
+        _queue(target, "providers", None)
+        _queue(target, "jobs", None)  # Customer names are part of job results
+        _queue(target, "feeds", _provider_feeds(target, "id"))
+
+
+@event.listens_for(Service, "after_update")
+@event.listens_for(ServiceCategory, "after_update")
+def _categories_changed(mapper, connection, target):
+    _queue(target, "jobs", None)
+    _queue(target, "feeds", None)
+
+
+for _attribute in (
+    Job.service_id,
+    Job.street_address,
+    Job.city,
+    Job.state,
+    ProviderProfile.service_area,
+):
+    # Load old values on assignment so both old and new scopes are dropped
+    event.listen(_attribute, "set", lambda *args: None, active_history=True)
@@ -0,0 +1,539 @@
+"""
+Search Facet Aggregates
+=======================
+
+Serves ``/api/search/popular`` and ``/api/search/filters`` from a
+materialized snapshot instead of re-aggregating the job and provider tables
+on every call.
+
+Jobs are summarised into a ``JobFacetCube``: one cell per distinct
+``CUBE_DIMENSIONS`` combination holding the job count and budget
+aggregates, where ``budget_low`` and ``budget_high`` are the
+``BUDGET_RANGES`` of the lower and higher of a job's budget bounds.
+Facet counts conditioned on the active filters are sums over matching
+cells, with each facet ignoring its own filter so a UI can show the
+alternatives for every facet. A text query narrows the cube with one
+grouped query over the matching jobs, as does a location filter that
+matches no city or state, which search_jobs may still match against
+street addresses (kept out of the cube, where nearly every job has its
+own).
+
+Budgets follow the search_jobs rule: a job matches ``min_budget`` and
+``max_budget`` when its budget range overlaps them, and is counted under
+every budget range it overlaps. Cells whose ranges straddle a bound are
+recounted with the search predicate in one grouped query.
+
+Provider facets (skills histogram, rate and experience ranges, service
+areas) are a plain snapshot.
+
+Snapshots are rebuilt after a committed write touching the underlying
+models, and at least every ``FACET_MAX_AGE`` seconds so writes from other
+worker processes show up.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, case, event, inspect, or_
+from sqlalchemy.orm import object_session
+
+from src.models.job import Job, JobStatus
+from src.models.service import Service, ServiceCategory
+from src.models.user import ProviderProfile, db
+from src.services.after_commit import AfterCommitQueue
+from src.services.provider_skills import skill_histogram
+
+logger = logging.getLogger(__name__)
+
+FACET_MAX_AGE = 300
+
+# Budget filters whose recounted cells a cube keeps
+MAX_BUDGET_FILTERS = 64
+
+# Budget ranges: (label, lower bound inclusive, upper exclusive)
+BUDGET_RANGES = (
+    ("0-100", 0, 100),
+    ("100-250", 100, 250),
+    ("250-500", 250, 500),
+    ("500-1000", 500, 1000),
+    ("1000-2500", 1000, 2500),
+    ("2500-5000", 2500, 5000),
+    ("5000+", 5000, None),
+)
+UNKNOWN_BUDGET = "unspecified"
+
+JOB_STATUS_VALUES = {status.value for status in JobStatus}
+
+JOB_FACETS = ("category", "status", "is_urgent", "location", "budget_range")
+
+# Cube key dimensions; budget_range is derived from budget_low..budget_high
+CUBE_DIMENSIONS = (
+    "category",
+    "status",
+    "is_urgent",
+    "city",
+    "state",
+    "budget_low",
+    "budget_high",
+)
+
+# Job columns that move a job between cube cells
+JOB_FACET_FIELDS = (
+    "service_id",
+    "status",
+    "is_urgent",
+    "city",
+    "state",
+    "budget_min",
+    "budget_max",
+)
+
+
+def job_budget_filter(min_budget: Optional[float], max_budget: Optional[float]):
+    """The search_jobs budget predicate: the job's budget range overlaps"""
+    conditions = []
+    if min_budget is not None:
+        conditions.append(
+            or_(Job.budget_min >= min_budget, Job.budget_max >= min_budget)
+        )
+    if max_budget is not None:
+        conditions.append(
+            or_(Job.budget_min <= max_budget, Job.budget_max <= max_budget)
+        )
+    return and_(*conditions) if conditions else None
+
+
+def job_location_filter(location: str):
+    """The search_jobs location predicate: street address, city or state"""
+    return or_(
+        Job.street_address.ilike(f"%{location}%"),
+        Job.city.ilike(f"%{location}%"),
+        Job.state.ilike(f"%{location}%"),
+    )
+
+
+def _range_index(label: str) -> int:
+    return next(i for i, (name, _, _) in enumerate(BUDGET_RANGES) if name == label)
+
+
+def budget_match(
+    low: str, high: str, min_budget: Optional[float], max_budget: Optional[float]
+) -> Optional[bool]:
+    """
+    Whether jobs whose lower and higher budget bounds fall in the ranges
+    ``low`` and ``high`` match the budget filter: True or False for all of
+    them, or None when the ranges straddle a bound
+    """
+    if low == UNKNOWN_BUDGET:
+        return False  # NULL budgets never satisfy the search predicate
+    result = True
+    if min_budget is not None:
+        _, lower, upper = BUDGET_RANGES[_range_index(high)]
+        if upper is not None and upper <= min_budget:
+            return False
+        if lower < min_budget:
+            result = None
+    if max_budget is not None:
+        _, lower, upper = BUDGET_RANGES[_range_index(low)]
+        if lower > max_budget:
+            return False
+        if upper is None or upper > max_budget:
+            result = None
+    return result
+
+
+class CubeCell:
+    """Aggregates for all jobs sharing one combination of facet values"""
+
+    __slots__ = ("count", "budget_min", "budget_max", "midpoint_sum", "midpoints")
+
+    def __init__(self, count=0, budget_min=None, budget_max=None, mid_sum=0, mids=0):
+        self.count = count
+        self.budget_min = budget_min
+        self.budget_max = budget_max
+        self.midpoint_sum = float(mid_sum or 0)
+        self.midpoints = mids or 0
+
+
+class JobFacetCube:
+    """Job counts and budget aggregates keyed by facet values"""
+
+    def __init__(self, rows: Iterable[Tuple] = (), job_filter=None):
+        # key: CUBE_DIMENSIONS
+        self.cells: Dict[Tuple, CubeCell] = {}
+        self.job_filter = job_filter
+        self._budget_cells: Dict[Tuple, Dict[Tuple, CubeCell]] = {}
+        for row in rows:
+            self.cells[tuple(row[:7])] = CubeCell(*row[7:])
+
+    @staticmethod
+    def _budget_range(value):
+        conditions = [
+            (value.is_(None), UNKNOWN_BUDGET),
+            *[
+                (value < upper, label)
+                for label, _, upper in BUDGET_RANGES
+                if upper is not None
+            ],
+        ]
+        return case(*conditions, else_=BUDGET_RANGES[-1][0])
+
+    @classmethod
+    def aggregate_query(cls, session, job_filter=None):
+        """Grouped query producing cube rows, optionally over a job subset"""
+        # The lower and higher of the budget bounds, either of which may be NULL
+        low = case(
+            (Job.budget_max.is_(None), Job.budget_min),
+            (Job.budget_min.is_(None), Job.budget_max),
+            (Job.budget_max < Job.budget_min, Job.budget_max),
+            else_=Job.budget_min,
+        )
+        high = case(
+            (Job.budget_max.is_(None), Job.budget_min),
+            (Job.budget_min.is_(None), Job.budget_max),
+            (Job.budget_max < Job.budget_min, Job.budget_min),
+            else_=Job.budget_max,
+        )
+        midpoint = (Job.budget_min + Job.budget_max) / 2
+        dimensions = (
+            ServiceCategory.name,
+            Job.status,
+            Job.is_urgent,
+            Job.city,
+            Job.state,
+            cls._budget_range(low),
+            cls._budget_range(high),
+        )
+        query = (
+            session.query(
+                *dimensions,
+                db.func.count(Job.id),
+                db.func.min(Job.budget_min),
+                db.func.max(Job.budget_max),
+                db.func.sum(midpoint),
+                db.func.count(midpoint),
+            )
+            .select_from(Job)
+            .join(Service, Job.service_id == Service.id)
+            .join(ServiceCategory, Service.category_id == ServiceCategory.id)
+        )
+        if job_filter is not None:
+            # Service and ServiceCategory are joined, as LIKE search needs
+            query = query.filter(job_filter)
+        return query.group_by(*dimensions)
+
+    @classmethod
+    def build(cls, session=None, job_filter=None) -> "JobFacetCube":
+        session = session or db.session
+        rows = cls.aggregate_query(session, job_filter).all()
+        # Normalise the enum and boolean dimensions to their JSON values
+        return cls(
+            (
+                (
+                    row[0],
+                    row[1].value if isinstance(row[1], JobStatus) else row[1],
+                    bool(row[2]),
+                    *row[3:],
+                )
+                for row in rows
+            ),
+            job_filter,
+        )
+
+    @staticmethod
+    def _cell_values(key: Tuple) -> Dict[str, Any]:
+        values = dict(zip(CUBE_DIMENSIONS, key))
+        city, state = values["city"], values["state"]
+        values["location"] = f"{city}, {state}" if city and state else None
+        low, high = values["budget_low"], values["budget_high"]
+        if low == UNKNOWN_BUDGET:
+            values["budget_range"] = (UNKNOWN_BUDGET,)
+        else:
+            values["budget_range"] = tuple(
+                label
+                for label, _, _ in BUDGET_RANGES[
+                    _range_index(low) : _range_index(high) + 1
+                ]
+            )
+        return values
+
+    @staticmethod
+    def _matches(values: Dict[str, Any], filters: Dict[str, Any], skip=None) -> bool:
+        """Same semantics as AdvancedSearchEngine.search_jobs filters"""
+        category = filters.get("category")
+        if category and skip != "category":
+            if category.lower() not in (values["category"] or "").lower():
+                return False
+        status = filters.get("status")
+        if status and skip != "status" and values["status"] != status.lower():
+            return False
+        urgency = filters.get("is_urgent")
+        if urgency is not None and skip != "is_urgent":
+            if values["is_urgent"] != urgency:
+                return False
+        location = filters.get("location")
+        if location and skip != "location":
+            needle = location.lower()
+            if not any(
+                needle in (values[field] or "").lower() for field in ("city", "state")
+            ):
+                return False
+        return True
+
+    def has_location(self, location: str) -> bool:
+        """Whether any cell's city or state contains ``location``"""
+        needle = location.lower()
+        return any(
+            needle in (value or "").lower() for key in self.cells for value in key[3:5]
+        )
+
+    def narrowed_to_location(self, location: str) -> "JobFacetCube":
+        """
+        A cube of the jobs matching the location filter, for locations that
+        only a street address can match, in one grouped query
+        """
+        job_filter = job_location_filter(location)
+        if self.job_filter is not None:
+            job_filter = and_(self.job_filter, job_filter)
+        return JobFacetCube.build(job_filter=job_filter)
+
+    def budget_cells(
+        self, min_budget: Optional[float], max_budget: Optional[float]
+    ) -> Dict[Tuple, CubeCell]:
+        """
+        Cells narrowed to the jobs matching the budget filter. Cells that
+        straddle a bound are recounted with the search predicate, in one
+        grouped query per distinct filter.
+        """
+        bounds = (min_budget, max_budget)
+        if bounds not in self._budget_cells:
+            cells, straddling = {}, False
+            for key, cell in self.cells.items():
+                match = budget_match(key[5], key[6], *bounds)
+                if match is None:
+                    straddling = True
+                elif match:
+                    cells[key] = cell
+            if straddling:
+                job_filter = job_budget_filter(*bounds)
+                if self.job_filter is not None:
+                    job_filter = and_(self.job_filter, job_filter)
+                recounted = JobFacetCube.build(job_filter=job_filter)
+                for key, cell in recounted.cells.items():
+                    if budget_match(key[5], key[6], *bounds) is None:
+                        cells[key] = cell
+            if len(self._budget_cells) >= MAX_BUDGET_FILTERS:
+                self._budget_cells.clear()
+            self._budget_cells[bounds] = cells
+        return self._budget_cells[bounds]
+
+    def cells_matching(self, filters: Dict[str, Any], skip: str = None):
+        cells = self.cells
+        bounds = filters.get("budget")
+        if bounds is not None and skip != "budget_range":
+            cells = self.budget_cells(*bounds)
+        for key, cell in cells.items():
+            values = self._cell_values(key)
+            if self._matches(values, filters, skip):
+                yield values, cell
+
+    def total(self, filters: Dict[str, Any] = None) -> int:
+        return sum(cell.count for _, cell in self.cells_matching(filters or {}))
+
+    def facet_counts(
+        self, facet: str, filters: Dict[str, Any] = None
+    ) -> Dict[Any, int]:
+        """Counts per value of ``facet`` among jobs matching the other filters"""
+        counts = Counter()
+        for values, cell in self.cells_matching(filters or {}, skip=facet):
+            # A job counts under every budget range it overlaps
+            facet_values = values[facet]
+            if not isinstance(facet_values, tuple):
+                facet_values = (facet_values,)
+            for value in facet_values:
+                if value is not None:
+                    counts[value] += cell.count
+        return dict(counts.most_common())
+
+    def all_facet_counts(self, filters: Dict[str, Any] = None) -> Dict[str, Dict]:
+        return {facet: self.facet_counts(facet, filters) for facet in JOB_FACETS}
+
+    def budget_stats(self, filters: Dict[str, Any] = None) -> Dict[str, Any]:
+        cells = [cell for _, cell in self.cells_matching(filters or {})]
+        minimums = [cell.budget_min for cell in cells if cell.budget_min is not None]
+        maximums = [cell.budget_max for cell in cells if cell.budget_max is not None]
+        midpoints = sum(cell.midpoints for cell in cells)
+        return {
+            "min": float(min(minimums)) if minimums else None,
+            "max": float(max(maximums)) if maximums else None,
+            "average": (
+                sum(cell.midpoint_sum for cell in cells) / midpoints
+                if midpoints
+                else None
+            ),
+        }
+
+
+def _provider_facets(session) -> Dict[str, Any]:
+    histogram = skill_histogram(session)
+    skills = Counter({slug: count for slug, _, count in histogram})
+    skill_names = {name for _, name, _ in histogram}
+
+    rate_stats = session.query(
+        db.func.min(ProviderProfile.hourly_rate),
+        db.func.max(ProviderProfile.hourly_rate),
+        db.func.avg(ProviderProfile.hourly_rate),
+    ).first()
+    experience_stats = session.query(
+        db.func.min(ProviderProfile.years_experience),
+        db.func.max(ProviderProfile.years_experience),
+        db.func.avg(ProviderProfile.years_experience),
+    ).first()
+    service_areas = (
+        session.query(ProviderProfile.service_area)
+        .filter(ProviderProfile.service_area.isnot(None))
+        .distinct()
+        .limit(50)
+        .all()
+    )
+    return {
+        "skill_counts": skills,
+        "skills": sorted(skill_names),
+        "rate_stats": tuple(rate_stats),
+        "experience_stats": tuple(experience_stats),
+        "service_areas": [area for (area,) in service_areas if area],
+    }
+
+
+class FacetStore:
+    """Lazily built, invalidatable facet snapshots"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshots: Dict[str, Tuple[float, Any]] = {}
+        self._builders = {
+            "jobs": lambda session: JobFacetCube.build(session),
+            "providers": _provider_facets,
+        }
+
+    def get(self, kind: str, session=None):
+        snapshot = self._snapshots.get(kind)
+        if snapshot and time.time() - snapshot[0] < FACET_MAX_AGE:
+            return snapshot[1]
+
+        with self._lock:
+            snapshot = self._snapshots.get(kind)
+            if snapshot and time.time() - snapshot[0] < FACET_MAX_AGE:
+                return snapshot[1]
+            value = self._builders[kind](session or db.session)
+            self._snapshots[kind] = (time.time(), value)
+            logger.info(f"Built {kind} facet snapshot")
+            return value
+
+    def invalidate(self, *kinds: str) -> None:
+        for kind in kinds or tuple(self._builders):
+            self._snapshots.pop(kind, None)
+
+
+facet_store = FacetStore()
+
+
+def get_job_facets(session=None) -> JobFacetCube:
+    return facet_store.get("jobs", session)
+
+
+def get_provider_facets(session=None) -> Dict[str, Any]:
+    return facet_store.get("providers", session)
+
+
+# Invalidation. Mapper events mark snapshots dirty on the session and they
+# are dropped once the transaction commits.
+
+
+def _drop_dirty_facets(dirty: Set[str]) -> None:
+    facet_store.invalidate(*dirty)
+
+
+_dirty = AfterCommitQueue("search_facets", _drop_dirty_facets, set)
+
+
+def _mark_dirty(target, *kinds: str) -> None:
+    dirty = _dirty.pending(object_session(target))
+    if dirty is not None:
+        dirty.update(kinds)
+
+
+def _changed(target, fields: Iterable[str]) -> bool:
+    state = inspect(target)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+@event.listens_for(Job, "after_insert")
+@event.listens_for(Job, "after_delete")
+def _job_written(mapper, connection, target):
+    _mark_dirty(target, "jobs")
+
+
+@event.listens_for(Job, "after_update")
+def _job_updated(mapper, connection, target):
+    if _changed(target, JOB_FACET_FIELDS):
+        _mark_dirty(target, "jobs")
+
+
+@event.listens_for(Service, "after_update")
+def _service_updated(mapper, connection, target):
+    if _changed(target, ("category_id",)):
+        _mark_dirty(target, "jobs")
+
+
+@event.listens_for(ServiceCategory, "after_update")
+def _category_updated(mapper, connection, target):
+    if _changed(target, ("name",)):
+        _mark_dirty(target, "jobs")
+
+
+@event.listens_for(ProviderProfile, "after_insert")
+@event.listens_for(ProviderProfile, "after_delete")
+def _provider_written(mapper, connection, target):
+    _mark_dirty(target, "providers")
+
+
+@event.listens_for(ProviderProfile, "after_update")
+def _provider_updated(mapper, connection, target):
+    if _changed(target, ("skills", "hourly_rate", "years_experience", "service_area")):
+        _mark_dirty(target, "providers")
+
+
+def job_facet_filters(
+    category: str = "",
+    status: str = "",
+    urgency: Optional[bool] = None,
+    location: str = "",
+    min_budget: Optional[float] = None,
+    max_budget: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Cube filters from the same parameters search_jobs accepts"""
+    return {
+        "category": category or None,
+        # search_jobs ignores unknown statuses, so the cube does too
+        "status": status if status.lower() in JOB_STATUS_VALUES else None,
+        "is_urgent": urgency,
+        "location": location or None,
+        "budget": (
+            None
+            if min_budget is None and max_budget is None
+            else (min_budget, max_budget)
+        ),
+    }
+
+
+def popular_categories(limit: int = 10) -> List[Tuple[str, int]]:
+    counts = get_job_facets().facet_counts("category")
+    return list(counts.items())[:limit]
+
+
+def popular_skills(limit: int = 10) -> List[Tuple[str, int]]:
+    return get_provider_facets()["skill_counts"].most_common(limit)
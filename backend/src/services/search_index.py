@@ -0,0 +1,482 @@
+"""
+Job Full-Text Search Index
+==========================
+
+Maintains a database-native inverted index over the searchable job fields
+(title, description, service name, category name, street address, city) so
+that text search no longer scans the whole ``job`` table through its joins.
+
+Two backends share one interface:
+
+- ``SQLiteFTSBackend``   - an FTS5 virtual table keyed by job id
+- ``PostgresFTSBackend`` - a weighted ``tsvector`` column with a GIN index
+
+Any other dialect (or an index that has not been initialised) falls back to
+``LikeSearchBackend``, which reproduces the original ``ilike`` behaviour.
+
+Each backend can also return its matches with a relevance score computed
+in the database (weighted ``bm25`` / ``ts_rank`` / weighted ``CASE``) so
+that ordering and pagination happen on the score rather than in Python.
+
+The index is kept in sync from SQLAlchemy mapper events on ``Job``,
+``Service`` and ``ServiceCategory``, inside the same transaction as the
+write that changed the data.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, case, event, inspect, literal, or_, select, text
+from sqlalchemy.types import Float, Integer
+
+from src.models.job import Job
+from src.models.service import Service, ServiceCategory
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+JOB_INDEX_TABLE = "job_search_index"
+
+# Job columns whose changes require the search document to be rebuilt
+INDEXED_JOB_FIELDS = ("title", "description", "street_address", "city", "service_id")
+
+# Dialects whose index schema has been created by init_search_index()
+_ready_dialects = set()
+
+
+def weighted_match_score(weighted_columns: List[Tuple[Any, float]], terms: List[str]):
+    """
+    SQL expression scoring a row 0-1: for each term, the weights of the
+    columns that contain it are summed, then averaged over all terms
+    """
+    per_term = [
+        sum(
+            case((column.ilike(f"%{term}%"), weight), else_=0.0)
+            for column, weight in weighted_columns
+        )
+        for term in terms
+    ]
+    score = sum(per_term) / literal(float(len(terms)))
+    return case((score > 1.0, 1.0), else_=score)
+
+
+def job_column_weights(weights: Dict[str, float]) -> List[Tuple[Any, float]]:
+    """Map AdvancedSearchEngine.search_weights onto the searchable job columns"""
+    return [
+        (Job.title, weights["title_match"]),
+        (Job.description, weights["description_match"]),
+        (Service.name, weights["category_match"]),
+        (ServiceCategory.name, weights["category_match"]),
+        (Job.street_address, weights["location_match"]),
+        (Job.city, weights["location_match"]),
+    ]
+
+
+class SearchIndexBackend:
+    """Common interface for job search index backends"""
+
+    name = "base"
+    is_indexed = True
+
+    def create_schema(self, connection) -> None:
+        """Create index tables if they do not already exist"""
+        raise NotImplementedError
+
+    def upsert_documents(self, connection, job_ids: List[int]) -> None:
+        """(Re)build the search documents for the given jobs"""
+        raise NotImplementedError
+
+    def delete_documents(self, connection, job_ids: List[int]) -> None:
+        """Remove the search documents for the given jobs"""
+        raise NotImplementedError
+
+    def rebuild(self, connection) -> int:
+        """Rebuild the whole index from the job table"""
+        raise NotImplementedError
+
+    def document_count(self, connection) -> int:
+        """Number of documents currently in the index"""
+        return connection.execute(
+            text(f"SELECT COUNT(*) FROM {JOB_INDEX_TABLE}")
+        ).scalar()
+
+    def job_filter(self, terms: List[str]):
+        """Return a boolean clause matching jobs that contain every term"""
+        raise NotImplementedError
+
+    def ranked_matches(self, terms: List[str], weights: Dict[str, float]):
+        """Subquery of (job_id, relevance) for matching jobs, higher is better"""
+        raise NotImplementedError
+
+
+class LikeSearchBackend(SearchIndexBackend):
+    """Fallback backend using substring matching over the joined columns"""
+
+    name = "like"
+    is_indexed = False
+
+    def create_schema(self, connection) -> None:
+        pass
+
+    def upsert_documents(self, connection, job_ids: List[int]) -> None:
+        pass
+
+    def delete_documents(self, connection, job_ids: List[int]) -> None:
+        pass
+
+    def rebuild(self, connection) -> int:
+        return 0
+
+    def document_count(self, connection) -> int:
+        return 0
+
+    def job_filter(self, terms: List[str]):
+        # Requires Service and ServiceCategory to be joined in the outer query
+        return and_(
+            *[
+                or_(
+                    Job.title.ilike(f"%{term}%"),
+                    Job.description.ilike(f"%{term}%"),
+                    Service.name.ilike(f"%{term}%"),
+                    ServiceCategory.name.ilike(f"%{term}%"),
+                    Job.street_address.ilike(f"%{term}%"),
+                    Job.city.ilike(f"%{term}%"),
+                )
+                for term in terms
+            ]
+        )
+
+    def ranked_matches(self, terms: List[str], weights: Dict[str, float]):
+        score = weighted_match_score(job_column_weights(weights), terms)
+        return (
+            select(Job.id.label("job_id"), score.label("relevance"))
+            .join(Service, Job.service_id == Service.id)
+            .join(ServiceCategory, Service.category_id == ServiceCategory.id)
+            .where(self.job_filter(terms))
+            .subquery("job_fts_match")
+        )
+
+
+class SQLiteFTSBackend(SearchIndexBackend):
+    """SQLite FTS5 backend - one virtual-table row per job, rowid = job.id"""
+
+    name = "sqlite_fts5"
+
+    _document_select = """
+        SELECT job.id, job.title, job.description,
+               COALESCE(service.name, ''), COALESCE(service_category.name, ''),
+               job.street_address, job.city
+        FROM job
+        LEFT JOIN service ON service.id = job.service_id
+        LEFT JOIN service_category ON service_category.id = service.category_id
+    """
+
+    def create_schema(self, connection) -> None:
+        connection.execute(
+            text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {JOB_INDEX_TABLE} USING fts5("
+                "title, description, service, category, street_address, city, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+        )
+
+    def upsert_documents(self, connection, job_ids: List[int]) -> None:
+        if not job_ids:
+            return
+        self.delete_documents(connection, job_ids)
+        connection.execute(
+            text(
+                f"INSERT INTO {JOB_INDEX_TABLE} (rowid, title, description, "
+                "service, category, street_address, city) "
+                f"{self._document_select} WHERE job.id IN :job_ids"
+            ).bindparams(bindparam("job_ids", expanding=True)),
+            {"job_ids": list(job_ids)},
+        )
+
+    def delete_documents(self, connection, job_ids: List[int]) -> None:
+        if not job_ids:
+            return
+        connection.execute(
+            text(f"DELETE FROM {JOB_INDEX_TABLE} WHERE rowid IN :job_ids").bindparams(
+                bindparam("job_ids", expanding=True)
+            ),
+            {"job_ids": list(job_ids)},
+        )
+
+    def rebuild(self, connection) -> int:
+        connection.execute(text(f"DELETE FROM {JOB_INDEX_TABLE}"))
+        connection.execute(
+            text(
+                f"INSERT INTO {JOB_INDEX_TABLE} (rowid, title, description, "
+                "service, category, street_address, city) "
+                f"{self._document_select}"
+            )
+        )
+        return self.document_count(connection)
+
+    @staticmethod
+    def build_match_expression(terms: List[str]) -> str:
+        """Build an FTS5 MATCH expression: every term, prefix-matched"""
+        return " AND ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+    def match_query(self, terms: List[str]):
+        """Selectable of (job_id) rows matching every term"""
+        return (
+            text(
+                f"SELECT rowid AS job_id FROM {JOB_INDEX_TABLE} "
+                f"WHERE {JOB_INDEX_TABLE} MATCH :fts_query"
+            )
+            .bindparams(fts_query=self.build_match_expression(terms))
+            .columns(job_id=Integer)
+            .subquery("job_fts_match")
+        )
+
+    def job_filter(self, terms: List[str]):
+        matches = self.match_query(terms)
+        return Job.id.in_(select(matches.c.job_id))
+
+    def ranked_matches(self, terms: List[str], weights: Dict[str, float]):
+        # bm25() takes one weight per indexed column and is lower-is-better
+        return (
+            text(
+                f"SELECT rowid AS job_id, -bm25({JOB_INDEX_TABLE}, "
+                ":w_title, :w_description, :w_category, :w_category, "
+                ":w_location, :w_location) AS relevance "
+                f"FROM {JOB_INDEX_TABLE} WHERE {JOB_INDEX_TABLE} MATCH :fts_query"
+            )
+            .bindparams(
+                fts_query=self.build_match_expression(terms),
+                w_title=weights["title_match"],
+                w_description=weights["description_match"],
+                w_category=weights["category_match"],
+                w_location=weights["location_match"],
+            )
+            .columns(job_id=Integer, relevance=Float)
+            .subquery("job_fts_match")
+        )
+
+
+class PostgresFTSBackend(SearchIndexBackend):
+    """PostgreSQL backend - weighted tsvector per job with a GIN index"""
+
+    name = "postgres_tsvector"
+
+    # Weight classes follow AdvancedSearchEngine.search_weights:
+    # A = title, B = description, C = service/category, D = location
+    _document_select = """
+        SELECT job.id,
+               setweight(to_tsvector('simple', COALESCE(job.title, '')), 'A')
+            || setweight(to_tsvector('simple', COALESCE(job.description, '')), 'B')
+            || setweight(to_tsvector('simple', COALESCE(service.name, '') || ' '
+                                              || COALESCE(service_category.name, '')), 'C')
+            || setweight(to_tsvector('simple', COALESCE(job.street_address, '') || ' '
+                                              || COALESCE(job.city, '')), 'D')
+        FROM job
+        LEFT JOIN service ON service.id = job.service_id
+        LEFT JOIN service_category ON service_category.id = service.category_id
+    """
+
+    def create_schema(self, connection) -> None:
+        connection.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {JOB_INDEX_TABLE} ("
+                "job_id INTEGER PRIMARY KEY REFERENCES job (id) ON DELETE CASCADE, "
+                "document TSVECTOR NOT NULL)"
+            )
+        )
+        connection.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS ix_{JOB_INDEX_TABLE}_document "
+                f"ON {JOB_INDEX_TABLE} USING GIN (document)"
+            )
+        )
+
+    def upsert_documents(self, connection, job_ids: List[int]) -> None:
+        if not job_ids:
+            return
+        connection.execute(
+            text(
+                f"INSERT INTO {JOB_INDEX_TABLE} (job_id, document) "
+                f"{self._document_select} WHERE job.id IN :job_ids "
+                "ON CONFLICT (job_id) DO UPDATE SET document = EXCLUDED.document"
+            ).bindparams(bindparam("job_ids", expanding=True)),
+            {"job_ids": list(job_ids)},
+        )
+
+    def delete_documents(self, connection, job_ids: List[int]) -> None:
+        if not job_ids:
+            return
+        connection.execute(
+            text(f"DELETE FROM {JOB_INDEX_TABLE} WHERE job_id IN :job_ids").bindparams(
+                bindparam("job_ids", expanding=True)
+            ),
+            {"job_ids": list(job_ids)},
+        )
+
+    def rebuild(self, connection) -> int:
+        connection.execute(text(f"TRUNCATE {JOB_INDEX_TABLE}"))
+        connection.execute(
+            text(
+                f"INSERT INTO {JOB_INDEX_TABLE} (job_id, document) "
+                f"{self._document_select}"
+            )
+        )
+        return self.document_count(connection)
+
+    @staticmethod
+    def build_tsquery(terms: List[str]) -> str:
+        """Build a to_tsquery expression: every term, prefix-matched"""
+        return " & ".join(f"{term}:*" for term in terms)
+
+    def match_query(self, terms: List[str]):
+        """Selectable of (job_id) rows matching every term"""
+        return (
+            text(
+                f"SELECT job_id FROM {JOB_INDEX_TABLE} "
+                "WHERE document @@ to_tsquery('simple', :fts_query)"
+            )
+            .bindparams(fts_query=self.build_tsquery(terms))
+            .columns(job_id=Integer)
+            .subquery("job_fts_match")
+        )
+
+    def job_filter(self, terms: List[str]):
+        matches = self.match_query(terms)
+        return Job.id.in_(select(matches.c.job_id))
+
+    def ranked_matches(self, terms: List[str], weights: Dict[str, float]):
+        # ts_rank weight array is ordered {D, C, B, A}
+        rank_weights = [
+            weights["location_match"],
+            weights["category_match"],
+            weights["description_match"],
+            weights["title_match"],
+        ]
+        return (
+            text(
+                "SELECT job_id, ts_rank(CAST(:rank_weights AS float4[]), document, "
+                "to_tsquery('simple', :fts_query)) AS relevance "
+                f"FROM {JOB_INDEX_TABLE} "
+                "WHERE document @@ to_tsquery('simple', :fts_query)"
+            )
+            .bindparams(fts_query=self.build_tsquery(terms), rank_weights=rank_weights)
+            .columns(job_id=Integer, relevance=Float)
+            .subquery("job_fts_match")
+        )
+
+
+_backends = {
+    "sqlite": SQLiteFTSBackend(),
+    "postgresql": PostgresFTSBackend(),
+}
+_like_backend = LikeSearchBackend()
+
+
+def get_backend_for_dialect(dialect_name: str) -> SearchIndexBackend:
+    """Return the index backend for a dialect, or the LIKE fallback"""
+    return _backends.get(dialect_name, _like_backend)
+
+
+def get_job_search_backend(session=None) -> SearchIndexBackend:
+    """Return the backend to use for queries on the given session"""
+    session = session or db.session
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name not in _ready_dialects:
+        return _like_backend
+    return get_backend_for_dialect(dialect_name)
+
+
+def init_search_index(engine=None) -> Optional[SearchIndexBackend]:
+    """Create the index schema and backfill it if it is empty"""
+    engine = engine or db.engine
+    backend = get_backend_for_dialect(engine.dialect.name)
+    if not backend.is_indexed:
+        logger.info(f"No full-text backend for {engine.dialect.name}; using LIKE")
+        return None
+
+    with engine.begin() as connection:
+        backend.create_schema(connection)
+        job_count = connection.execute(select(db.func.count(Job.id))).scalar()
+        if job_count and backend.document_count(connection) == 0:
+            indexed = backend.rebuild(connection)
+            logger.info(f"Backfilled job search index with {indexed} documents")
+
+    _ready_dialects.add(engine.dialect.name)
+    return backend
+
+
+def rebuild_job_index(engine=None) -> int:
+    """Rebuild the whole job index; returns the number of indexed jobs"""
+    engine = engine or db.engine
+    backend = get_backend_for_dialect(engine.dialect.name)
+    with engine.begin() as connection:
+        backend.create_schema(connection)
+        return backend.rebuild(connection)
+
+
+def _active_backend(connection) -> Optional[SearchIndexBackend]:
+    if connection.dialect.name not in _ready_dialects:
+        return None
+    return get_backend_for_dialect(connection.dialect.name)
+
+
+def _job_ids_for_services(connection, service_ids: Iterable[int]) -> List[int]:
+    rows = connection.execute(
+        select(Job.id).where(Job.service_id.in_(list(service_ids)))
+    )
+    return [row[0] for row in rows]
+
+
+@event.listens_for(Job, "after_insert")
+def _index_inserted_job(mapper, connection, target):
+    backend = _active_backend(connection)
+    if backend:
+        backend.upsert_documents(connection, [target.id])
+
+
+@event.listens_for(Job, "after_update")
+def _index_updated_job(mapper, connection, target):
+    backend = _active_backend(connection)
+    if not backend:
+        return
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in INDEXED_JOB_FIELDS):
+        backend.upsert_documents(connection, [target.id])
+
+
+@event.listens_for(Job, "after_delete")
+def _unindex_deleted_job(mapper, connection, target):
+    backend = _active_backend(connection)
+    if backend:
+        backend.delete_documents(connection, [target.id])
+
+
+@event.listens_for(Service, "after_update")
+def _reindex_service_jobs(mapper, connection, target):
+    backend = _active_backend(connection)
+    if not backend:
+        return
+    state = inspect(target)
+    if state.attrs.name.history.has_changes() or (
+        state.attrs.category_id.history.has_changes()
+    ):
+        backend.upsert_documents(
+            connection, _job_ids_for_services(connection, [target.id])
+        )
+
+
+@event.listens_for(ServiceCategory, "after_update")
+def _reindex_category_jobs(mapper, connection, target):
+    backend = _active_backend(connection)
+    if not backend or not inspect(target).attrs.name.history.has_changes():
+        return
+    service_ids = [
+        row[0]
+        for row in connection.execute(
+            select(Service.id).where(Service.category_id == target.id)
+        )
+    ]
+    if service_ids:
+        backend.upsert_documents(
+            connection, _job_ids_for_services(connection, service_ids)
+        )
@@ -0,0 +1,403 @@
+"""
+Search Instrumentation
+======================
+
+Per-request metrics for the ``/api/search/*`` endpoints, grouped by the
+combination of filters each request used, so slow filter combinations show
+up in aggregate instead of in individual log lines.
+
+For every instrumented request this records:
+
+- the endpoint, filter combination and sort
+- SQL statement count and time, from engine cursor events scoped to the
+  request
+- rows returned, and rows matched when the search counted them
+- time spent formatting results, and total time
+
+Statements slower than ``SEARCH_EXPLAIN_THRESHOLD_MS`` are handed to a
+background thread that re-runs them through ``EXPLAIN``, so requests never
+wait for it, and the most recent plans are kept with their filter
+combination. On PostgreSQL this is ``EXPLAIN ANALYZE``, whose per-node row
+counts give the rows each slow statement scanned; SQLite query plans carry
+no row counts. Aggregates are histograms over fixed buckets, exposed through
+``GET /api/admin/search-metrics``.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50)
+ROW_BUCKETS = (0, 1, 10, 20, 50, 100, 1000, 10000, 100000)
+
+# 0 disables EXPLAIN capture
+EXPLAIN_THRESHOLD_MS = float(os.getenv("SEARCH_EXPLAIN_THRESHOLD_MS", "250"))
+EXPLAIN_SAMPLES = 5
+
+# Traces waiting for EXPLAIN; slow statements beyond this are not explained
+EXPLAIN_QUEUE_SIZE = 100
+
+# Distinct filter combinations tracked before new ones are pooled as "other"
+MAX_COMBINATIONS = 200
+
+# Request arguments that page or shape results rather than filter them
+NON_FILTER_ARGS = {"page", "per_page", "after", "sort_by", "sort_order", "with_total"}
+
+
+class Histogram:
+    """Counts of observations per fixed bucket, plus count, sum and max"""
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        index = next(
+            (i for i, bound in enumerate(self.bounds) if value <= bound),
+            len(self.bounds),
+        )
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile"""
+        if not self.count:
+            return None
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= q * self.count:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"le_{bound}" for bound in self.bounds] + ["inf"]
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else None,
+            "max": round(self.max, 3),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+class SearchTrace:
+    """Measurements for one search request"""
+
+    def __init__(self, endpoint: str, filters: Tuple[str, ...], sort_by: str):
+        self.endpoint = endpoint
+        self.filters = filters
+        self.sort_by = sort_by
+        self.started = time.perf_counter()
+        self.statement_count = 0
+        self.sql_ms = 0.0
+        self.format_ms = 0.0
+        self.rows_returned = None
+        self.rows_matched = None
+        self.cache_hit = False
+        self.slow_statements: List[Tuple[str, Any, float]] = []
+
+
+class SearchMetrics:
+    """Thread-safe aggregates of search traces by filter combination"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._groups: Dict[Tuple[str, Tuple[str, ...]], Dict[str, Any]] = {}
+
+    def _group(self, endpoint: str, filters: Tuple[str, ...]) -> Dict[str, Any]:
+        key = (endpoint, filters)
+        if key not in self._groups and len(self._groups) >= MAX_COMBINATIONS:
+            key = (endpoint, ("other",))
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = {
+                "requests": 0,
+                "cache_hits": 0,
+                "sorts": {},
+                "total_ms": Histogram(LATENCY_BUCKETS_MS),
+                "sql_ms": Histogram(LATENCY_BUCKETS_MS),
+                "format_ms": Histogram(LATENCY_BUCKETS_MS),
+                "statements": Histogram(STATEMENT_BUCKETS),
+                "rows_returned": Histogram(ROW_BUCKETS),
+                "rows_matched": Histogram(ROW_BUCKETS),
+                "rows_scanned": Histogram(ROW_BUCKETS),
+                "slow_plans": [],
+            }
+        return group
+
+    def record(self, trace: SearchTrace, total_ms: float) -> None:
+        with self._lock:
+            group = self._group(trace.endpoint, trace.filters)
+            group["requests"] += 1
+            group["cache_hits"] += trace.cache_hit
+            group["sorts"][trace.sort_by] = group["sorts"].get(trace.sort_by, 0) + 1
+            group["total_ms"].observe(total_ms)
+            group["sql_ms"].observe(trace.sql_ms)
+            group["format_ms"].observe(trace.format_ms)
+            group["statements"].observe(trace.statement_count)
+            if trace.rows_returned is not None:
+                group["rows_returned"].observe(trace.rows_returned)
+            if trace.rows_matched is not None:
+                group["rows_matched"].observe(trace.rows_matched)
+
+    def record_plans(self, trace: SearchTrace, plans: List[Dict]) -> None:
+        """Keep the plans of a trace's slow statements and the rows they scanned"""
+        with self._lock:
+            group = self._group(trace.endpoint, trace.filters)
+            for plan in plans:
+                if plan["rows_scanned"] is not None:
+                    group["rows_scanned"].observe(plan["rows_scanned"])
+            group["slow_plans"] = (group["slow_plans"] + plans)[-EXPLAIN_SAMPLES:]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """All groups, slowest mean total time first"""
+        with self._lock:
+            groups = [
+                {
+                    "endpoint": endpoint,
+                    "filters": list(filters),
+                    **{
+                        name: value.to_dict() if isinstance(value, Histogram) else value
+                        for name, value in group.items()
+                    },
+                }
+                for (endpoint, filters), group in self._groups.items()
+            ]
+        return sorted(groups, key=lambda group: -(group["total_ms"]["mean"] or 0))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._groups.clear()
+
+
+search_metrics = SearchMetrics()
+
+_current_trace: ContextVar[Optional[SearchTrace]] = ContextVar(
+    "search_trace", default=None
+)
+
+
+def request_filters(args) -> Tuple[str, ...]:
+    """Sorted names of the filters a request set"""
+    return tuple(
+        sorted(
+            name
+            for name, value in args.items()
+            if value and name not in NON_FILTER_ARGS
+        )
+    )
+
+
+@contextmanager
+def format_phase():
+    """Time the enclosed result formatting against the current trace"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.format_ms += (time.perf_counter() - started) * 1000
+
+
+def record_rows(
+    returned: int, matched: Optional[int] = None, cache_hit: bool = False
+) -> None:
+    """Note how many rows the current search returned and matched"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.rows_returned = returned
+        trace.rows_matched = matched
+        trace.cache_hit = cache_hit
+
+
+def explain(statement: str, parameters, engine=None) -> Tuple[List[str], Optional[int]]:
+    """
+    Plan lines for a statement on the current dialect, and the rows it
+    scanned where the plan reports them (PostgreSQL, which executes it)
+    """
+    engine = engine or db.engine
+    with engine.connect() as connection:
+        if engine.dialect.name == "postgresql":
+            document = connection.exec_driver_sql(
+                f"EXPLAIN (ANALYZE, FORMAT JSON) {statement}", parameters
+            ).scalar()
+            if isinstance(document, str):
+                document = json.loads(document)
+            plan = document[0]["Plan"]
+            return _plan_lines(plan), _rows_scanned(plan)
+
+        prefix = "EXPLAIN QUERY PLAN" if engine.dialect.name == "sqlite" else "EXPLAIN"
+        rows = connection.exec_driver_sql(f"{prefix} {statement}", parameters)
+        return [" ".join(str(column) for column in row) for row in rows], None
+
+
+def _plan_lines(plan: Dict[str, Any], depth: int = 0) -> List[str]:
+    relation = f" on {plan['Relation Name']}" if "Relation Name" in plan else ""
+    line = (
+        f"{'  ' * depth}{plan['Node Type']}{relation} "
+        f"(rows={plan.get('Actual Rows')} loops={plan.get('Actual Loops')} "
+        f"time={plan.get('Actual Total Time')})"
+    )
+    lines = [line]
+    for child in plan.get("Plans", ()):
+        lines += _plan_lines(child, depth + 1)
+    return lines
+
+
+def _rows_scanned(plan: Dict[str, Any]) -> int:
+    """Rows read by the scan nodes of an ``EXPLAIN ANALYZE`` JSON plan"""
+    rows = 0
+    node = plan.get("Node Type", "")
+    # A bitmap index scan's rows are read again by its bitmap heap scan
+    if node.endswith("Scan") and node != "Bitmap Index Scan":
+        per_loop = (
+            plan.get("Actual Rows", 0)
+            + plan.get("Rows Removed by Filter", 0)
+            + plan.get("Rows Removed by Index Recheck", 0)
+        )
+        rows += per_loop * plan.get("Actual Loops", 1)
+    for child in plan.get("Plans", ()):
+        rows += _rows_scanned(child)
+    return rows
+
+
+def _slow_plans(trace: SearchTrace, engine) -> List[Dict[str, Any]]:
+    plans = []
+    for statement, parameters, duration_ms in trace.slow_statements:
+        try:
+            plan, rows_scanned = explain(statement, parameters, engine)
+        except Exception as e:
+            plan, rows_scanned = [f"EXPLAIN failed: {e}"], None
+        plans.append(
+            {
+                "statement": statement,
+                "duration_ms": round(duration_ms, 3),
+                "sort_by": trace.sort_by,
+                "plan": plan,
+                "rows_scanned": rows_scanned,
+            }
+        )
+    return plans
+
+
+class PlanExplainer:
+    """
+    Explains the slow statements of finished traces on a daemon thread,
+    started on first use in each process (so it survives forking workers)
+    """
+
+    def __init__(self, metrics: SearchMetrics):
+        self.metrics = metrics
+        self._queue: queue.Queue = queue.Queue(maxsize=EXPLAIN_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self.dropped = 0
+
+    def submit(self, trace: SearchTrace, engine) -> None:
+        self._start()
+        try:
+            self._queue.put_nowait((trace, engine))
+        except queue.Full:
+            self.dropped += 1
+
+    def join(self) -> None:
+        """Wait until every submitted trace is explained"""
+        self._queue.join()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name="search-explain", daemon=True).start()
+
+    def _run(self) -> None:
+        while True:
+            trace, engine = self._queue.get()
+            try:
+                self.metrics.record_plans(trace, _slow_plans(trace, engine))
+            except Exception as e:
+                logger.warning(f"Search plans not recorded: {e}")
+            finally:
+                self._queue.task_done()
+
+
+plan_explainer = PlanExplainer(search_metrics)
+
+
+def instrument_search(endpoint: str):
+    """Decorator recording a search route's trace in ``search_metrics``"""
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            trace = SearchTrace(
+                endpoint,
+                request_filters(request.args),
+                request.args.get("sort_by", "default"),
+            )
+            token = _current_trace.set(trace)
+            try:
+                return f(*args, **kwargs)
+            finally:
+                _current_trace.reset(token)
+                total_ms = (time.perf_counter() - trace.started) * 1000
+                try:
+                    search_metrics.record(trace, total_ms)
+                    if trace.slow_statements:
+                        plan_explainer.submit(trace, db.engine)
+                except Exception as e:
+                    logger.warning(f"Search metrics not recorded: {e}")
+
+        return decorated_function
+
+    return decorator
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    if _current_trace.get() is not None:
+        conn.info.setdefault("search_trace_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    trace = _current_trace.get()
+    started = conn.info.get("search_trace_started")
+    if trace is None or not started:
+        return
+    duration_ms = (time.perf_counter() - started.pop()) * 1000
+    trace.statement_count += 1
+    trace.sql_ms += duration_ms
+    if (
+        EXPLAIN_THRESHOLD_MS
+        and duration_ms >= EXPLAIN_THRESHOLD_MS
+        and len(trace.slow_statements) < EXPLAIN_SAMPLES
+        and statement.lstrip().upper().startswith("SELECT")
+    ):
+        trace.slow_statements.append((statement, parameters, duration_ms))
@@ -0,0 +1,928 @@
+"""
+Cache engine for TradeHub Platform
+Provides the bounded in-process LRU/TTL cache and a two-tier cache that puts
+it in front of Redis, kept coherent across workers by pub/sub invalidation of
+keys and dependency tags
+"""
+
+import io
+import json
+import logging
+import os
+import pickle
+import socket
+import sys
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import Response
+from werkzeug.wrappers import Response as BaseResponse
+
+from src.utils.config import config_manager
+from src.utils.redis_client import RedisClient
+
+logger = logging.getLogger(__name__)
+
+# Independently locked segments per cache, so threads rarely wait on each other
+CACHE_STRIPES = 16
+
+# Fewest entries a stripe is given; small caches use fewer stripes
+MIN_STRIPE_ENTRIES = 64
+
+# Seconds between sweeps of expired entries within a stripe
+CACHE_SWEEP_INTERVAL = 60
+
+# Levels of nested containers walked when estimating an entry's size
+SIZE_ESTIMATE_DEPTH = 4
+
+
+def estimate_size(value: Any, depth: int = 0) -> int:
+    """Approximate bytes held by a cached value, walking nested containers"""
+    size = sys.getsizeof(value)
+    if depth >= SIZE_ESTIMATE_DEPTH:
+        return size
+    if isinstance(value, dict):
+        size += sum(
+            estimate_size(k, depth + 1) + estimate_size(v, depth + 1)
+            for k, v in value.items()
+        )
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, depth + 1) for item in value)
+    elif hasattr(value, "get_data"):  # Response objects
+        try:
+            size += len(value.get_data())
+        except (RuntimeError, AttributeError):
+            pass  # Streamed (passthrough) responses have no body to measure
+    return size
+
+
+class _CacheStripe:
+    """One LRU segment of a BoundedCache, with its own lock and counters"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.lock = threading.Lock()
+        self.entries: OrderedDict = OrderedDict()  # key -> (value, expires, size)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.swept_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+
+    def pop(self, key: str) -> None:
+        _, _, size = self.entries.pop(key)
+        self.bytes -= size
+
+    def sweep(self, now: float) -> int:
+        """Drop expired entries; the caller holds the lock"""
+        expired = [
+            key for key, (_, expires, _) in self.entries.items() if expires <= now
+        ]
+        for key in expired:
+            self.pop(key)
+        self.expirations += len(expired)
+        self.swept_at = now
+        return len(expired)
+
+
+class BoundedCache:
+    """
+    Thread-safe LRU cache with per-entry TTL, bounded by entry count and
+    approximate bytes (``CACHE_MAX_SIZE`` and ``CACHE_MAX_BYTES`` by
+    default). Keys are spread over independently locked stripes, each an
+    LRU holding its share of both budgets, so reads and writes are O(1)
+    and only contend on the same stripe. Expired entries are dropped on
+    read and by a sweep of the stripe at most every
+    ``CACHE_SWEEP_INTERVAL`` seconds on write.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        default_ttl: int = 300,
+        stripes: int = CACHE_STRIPES,
+        sizer: Callable[[Any], int] = estimate_size,
+    ):
+        config = config_manager.get_performance_config()
+        self.max_entries = max(1, max_entries or config.cache_max_size)
+        self.max_bytes = max(1, max_bytes or config.cache_max_bytes)
+        self.default_ttl = default_ttl
+        self.sizer = sizer
+
+        count = max(1, min(stripes, self.max_entries // MIN_STRIPE_ENTRIES))
+        self._stripes = [
+            _CacheStripe(self.max_entries // count, self.max_bytes // count)
+            for _ in range(count)
+        ]
+
+    def _stripe(self, key: str) -> _CacheStripe:
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def __len__(self) -> int:
+        return sum(len(stripe.entries) for stripe in self._stripes)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """The cached value, or ``default`` if missing or expired"""
+        stripe = self._stripe(key)
+        with stripe.lock:
+            item = stripe.entries.get(key)
+            if item is not None and item[1] <= time.monotonic():
+                stripe.pop(key)
+                stripe.expirations += 1
+                item = None
+            if item is None:
+                stripe.misses += 1
+                return default
+            stripe.entries.move_to_end(key)
+            stripe.hits += 1
+            return item[0]
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """Cache a value, evicting least recently used entries to fit it"""
+        size = self.sizer(value)
+        stripe = self._stripe(key)
+        now = time.monotonic()
+        with stripe.lock:
+            if key in stripe.entries:
+                stripe.pop(key)
+            if size > stripe.max_bytes:
+                stripe.rejected += 1  # Would evict the whole stripe
+                return False
+            stripe.entries[key] = (value, now + (ttl or self.default_ttl), size)
+            stripe.bytes += size
+            if now - stripe.swept_at >= CACHE_SWEEP_INTERVAL:
+                stripe.sweep(now)
+            while (
+                len(stripe.entries) > stripe.max_entries
+                or stripe.bytes > stripe.max_bytes
+            ):
+                oldest = next(iter(stripe.entries))
+                stripe.pop(oldest)
+                stripe.evictions += 1
+        return True
+
+    def delete(self, key: str) -> bool:
+        stripe = self._stripe(key)
+        with stripe.lock:
+            if key not in stripe.entries:
+                return False
+            stripe.pop(key)
+            return True
+
+    def delete_matching(self, predicate: Callable[[str], bool]) -> int:
+        """Drop every entry whose key satisfies ``predicate``"""
+        removed = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                keys = [key for key in stripe.entries if predicate(key)]
+                for key in keys:
+                    stripe.pop(key)
+                removed += len(keys)
+        return removed
+
+    def clear(self) -> None:
+        for stripe in self._stripes:
+            with stripe.lock:
+                stripe.entries.clear()
+                stripe.bytes = 0
+
+    def cleanup_expired(self) -> int:
+        """Sweep every stripe now; returns the number of entries removed"""
+        removed = 0
+        now = time.monotonic()
+        for stripe in self._stripes:
+            with stripe.lock:
+                removed += stripe.sweep(now)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        totals = {
+            "entries": 0,
+            "bytes": 0,
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "rejected": 0,
+        }
+        for stripe in self._stripes:
+            with stripe.lock:
+                totals["entries"] += len(stripe.entries)
+                totals["bytes"] += stripe.bytes
+                for counter in ("hits", "misses", "evictions", "expirations"):
+                    totals[counter] += getattr(stripe, counter)
+                totals["rejected"] += stripe.rejected
+        lookups = totals["hits"] + totals["misses"]
+        return {
+            **totals,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "stripes": len(self._stripes),
+            "hit_rate": round(totals["hits"] / lookups, 3) if lookups else 0.0,
+        }
+
+
+# Values stored in Redis: a magic prefix and format version, then the payload.
+# Bump the version when the encoding changes; entries in an older format are
+# then read as misses instead of being misinterpreted.
+SERIALIZER_MAGIC = b"bc"
+SERIALIZER_VERSION = 2
+
+# Seconds an L2 value is kept in L1; bounds staleness if an invalidation is lost
+L1_TTL = 30
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Seconds to wait before resubscribing after the pub/sub connection drops
+RESUBSCRIBE_DELAY = 5
+
+# Seconds a cache stays L1-only after a Redis error before trying Redis again
+L2_RETRY_INTERVAL = 30
+
+# Tags whose last invalidation each process remembers; older ones are folded
+# into a floor that conservatively invalidates entries cached before it
+MAX_TRACKED_TAGS = 100000
+
+# Lifetime of a Redis tag's key set; must exceed the longest entry TTL
+TAG_SET_TTL = 24 * 3600
+
+# Lifetime of a tag's shared version token; an expired token is replaced by a
+# new one, which only costs clients holding the old one a full response
+TAG_VERSION_TTL = 24 * 3600
+TAG_VERSION_PREFIX = "cache:version:"
+
+# Without Redis, seconds after which a process's tag versions change anyway,
+# bounding how long it can answer 304 across another worker's write
+LOCAL_VERSION_WINDOW = 30
+
+# Seconds a worker holds the Redis lock for recomputing a key; the longest
+# a crashed worker can delay others
+RECOMPUTE_LOCK_TTL = 30
+
+# Seconds a worker waits for another worker's recompute before doing its own
+RECOMPUTE_WAIT = 5
+
+# Seconds between checks for another worker's recomputed value
+RECOMPUTE_POLL_INTERVAL = 0.05
+
+
+def _rebuild_response(data: bytes, status: int, headers: list) -> Response:
+    return Response(data, status=status, headers=headers)
+
+
+class _CachePickler(pickle.Pickler):
+    """Pickles Response objects as their status, headers and body"""
+
+    def reducer_override(self, obj):
+        if isinstance(obj, BaseResponse):
+            # Raises RuntimeError for streamed responses, which are not cached
+            return _rebuild_response, (
+                obj.get_data(),
+                obj.status_code,
+                list(obj.headers.items()),
+            )
+        return NotImplemented
+
+
+class CacheSerializer:
+    """
+    Versioned encoding of cached values (pickle protocol 5). Only this
+    application writes the cache keyspace; Redis must not be shared with
+    untrusted writers.
+    """
+
+    header = SERIALIZER_MAGIC + bytes([SERIALIZER_VERSION])
+
+    def dumps(self, value: Any) -> bytes:
+        buffer = io.BytesIO()
+        buffer.write(self.header)
+        _CachePickler(buffer, protocol=5).dump(value)
+        return buffer.getvalue()
+
+    def loads(self, raw: bytes) -> Any:
+        if not raw.startswith(self.header):
+            raise ValueError("Cached value has an unknown format version")
+        return pickle.loads(raw[len(self.header) :])
+
+
+class TagVersions:
+    """
+    When each tag was last invalidated in this process, as a sequence
+    number. An entry stamped with the sequence current when it was computed
+    is valid while none of its tags was invalidated after that. Only the
+    ``MAX_TRACKED_TAGS`` most recently invalidated tags are remembered;
+    forgotten tags count as invalidated at the newest forgotten sequence.
+    """
+
+    def __init__(self, max_tags: int = MAX_TRACKED_TAGS):
+        self._lock = threading.Lock()
+        self._sequences: OrderedDict = OrderedDict()  # tag -> sequence
+        self.max_tags = max_tags
+        self.sequence = 0
+        self.floor = 0
+
+    def stamp(self) -> int:
+        return self.sequence
+
+    def bump(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            self.sequence += 1
+            for tag in tags:
+                self._sequences[tag] = self.sequence
+                self._sequences.move_to_end(tag)
+            while len(self._sequences) > self.max_tags:
+                _, sequence = self._sequences.popitem(last=False)
+                self.floor = max(self.floor, sequence)
+
+    def valid(self, tags: Iterable[str], stamp: int) -> bool:
+        with self._lock:
+            return all(self._sequences.get(tag, self.floor) <= stamp for tag in tags)
+
+    def version(self, tag: str) -> int:
+        """Sequence of the tag's last invalidation in this process"""
+        with self._lock:
+            return self._sequences.get(tag, self.floor)
+
+
+def _token() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+class InvalidationBus:
+    """
+    Broadcasts key and tag invalidations over Redis pub/sub and applies
+    those from other processes to this process's L1 caches, and keeps a
+    version token per tag in Redis that every invalidation replaces. The
+    subscriber
+    thread is started on first use in each process (so it survives forking
+    workers); after a dropped connection it resubscribes and clears every
+    L1, since messages may have been missed.
+    """
+
+    def __init__(self, channel: str = INVALIDATION_CHANNEL):
+        self.channel = channel
+        self.client = None
+        self.origin: Optional[str] = None
+        self.tags = TagVersions()
+        self.epoch = uuid.uuid4().hex[:8]
+        self._caches: Dict[str, weakref.WeakSet] = {}
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self.sent = 0
+        self.received = 0
+
+    def register(self, cache: "TieredCache") -> None:
+        with self._lock:
+            self._caches.setdefault(cache.namespace, weakref.WeakSet()).add(cache)
+        if cache.redis is not None:
+            self.start(cache.redis)
+
+    def caches(self) -> Dict[str, List["TieredCache"]]:
+        """Live caches of this process by namespace"""
+        with self._lock:
+            return {
+                namespace: list(caches)
+                for namespace, caches in self._caches.items()
+                if len(caches)
+            }
+
+    def start(self, client) -> None:
+        """Subscribe in a daemon thread, once per process"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.client = client
+            self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        threading.Thread(
+            target=self._listen, name="cache-invalidation", daemon=True
+        ).start()
+
+    def publish(
+        self,
+        namespace: Optional[str] = None,
+        keys: Iterable[str] = (),
+        clear: bool = False,
+        tags: Iterable[str] = (),
+    ) -> None:
+        """Announce dropped keys (or a cleared namespace), or invalidated tags"""
+        if self.client is None:
+            return
+        message = {"origin": self.origin}
+        if namespace is not None:
+            message["namespace"] = namespace
+        if clear:
+            message["clear"] = True
+        elif keys:
+            message["keys"] = list(keys)
+        if tags:
+            message["tags"] = list(tags)
+        try:
+            self.client.publish(self.channel, json.dumps(message))
+            self.sent += 1
+        except Exception as e:
+            logger.warning(f"Cache invalidation publish failed: {e}")
+
+    def handle(self, message: Dict[str, Any]) -> None:
+        """Apply an invalidation from another process"""
+        if message.get("origin") == self.origin:
+            return  # This process already applied its own writes
+        self.received += 1
+        if message.get("tags"):
+            self.tags.bump(message["tags"])
+        for cache in self.caches().get(message.get("namespace"), ()):
+            if message.get("clear"):
+                cache.l1.clear()
+            else:
+                for key in message.get("keys", ()):
+                    cache.l1.delete(key)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """
+        Invalidate every entry carrying one of ``tags``, in every namespace
+        and worker; returns the number of Redis entries deleted
+        """
+        tags = sorted(set(tags))
+        if not tags:
+            return 0
+        self.tags.bump(tags)
+        if self.client is not None:
+            try:
+                pipe = self.client.pipeline()
+                for tag in tags:
+                    pipe.set(TAG_VERSION_PREFIX + tag, _token(), ex=TAG_VERSION_TTL)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Cache tag versions not updated: {e}")
+        removed = 0
+        for caches in self.caches().values():
+            removed += caches[0].delete_tagged(tags)
+        self.publish(tags=tags)
+        return removed
+
+    def versions(self, tags: Iterable[str]) -> List[str]:
+        """
+        A token per tag that changes whenever the tag is invalidated,
+        shared by all workers through Redis. Without Redis the tokens are
+        this process's own, never match another process's and also change
+        every ``LOCAL_VERSION_WINDOW`` seconds, as other workers' writes
+        never reach them.
+        """
+        tags = list(tags)
+        if self.client is not None:
+            try:
+                return self._shared_versions(tags)
+            except Exception as e:
+                logger.warning(f"Cache tag versions unavailable: {e}")
+        epoch = f"{self.epoch}-{os.getpid()}-{int(time.time() // LOCAL_VERSION_WINDOW)}"
+        return [f"{epoch}.{self.tags.version(tag)}" for tag in tags]
+
+    def _shared_versions(self, tags: List[str]) -> List[str]:
+        keys = [TAG_VERSION_PREFIX + tag for tag in tags]
+        versions = self.client.mget(keys) if keys else []
+        missing = [key for key, version in zip(keys, versions) if version is None]
+        if missing:
+            # Start untracked tags at a new token rather than a fixed one, so
+            # an expired token can never match again
+            pipe = self.client.pipeline()
+            for key in missing:
+                pipe.set(key, _token(), nx=True, ex=TAG_VERSION_TTL)
+                pipe.get(key)
+            filled = dict(zip(missing, pipe.execute()[1::2]))
+            versions = [filled.get(key, v) for key, v in zip(keys, versions)]
+        return [v.decode() if isinstance(v, bytes) else str(v) for v in versions]
+
+    def clear_local(self) -> None:
+        for caches in self.caches().values():
+            for cache in caches:
+                cache.l1.clear()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    try:
+                        self.handle(json.loads(message["data"]))
+                    except (ValueError, TypeError) as e:
+                        logger.warning(f"Ignoring malformed cache invalidation: {e}")
+            except Exception as e:
+                logger.warning(f"Cache invalidation subscriber failed: {e}")
+            self.clear_local()
+            time.sleep(RESUBSCRIBE_DELAY)
+
+
+invalidation_bus = InvalidationBus()
+
+
+def invalidate_tags(tags: Iterable[str]) -> int:
+    """Invalidate cached entries carrying any of ``tags`` everywhere"""
+    return invalidation_bus.invalidate_tags(tags)
+
+
+class _Flight:
+    """One in-progress computation that concurrent callers wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class TieredCache:
+    """
+    Two-tier cache: a per-process BoundedCache (L1) in front of Redis (L2).
+    Reads check L1, then L2, copying L2 hits into L1 for at most ``L1_TTL``
+    seconds. Writes and deletes go to both tiers and are broadcast on the
+    invalidation bus so other workers drop their L1 copies. Values that
+    cannot be serialized stay in L1 only. Without Redis the cache is
+    L1-only, and after a Redis error it is L1-only for
+    ``L2_RETRY_INTERVAL`` seconds.
+
+    Entries may carry dependency tags (``job:123``, ``provider:45``).
+    ``invalidate_tags`` deletes tagged entries from Redis through a key set
+    per tag, and L1 copies are checked against the bus's ``TagVersions``
+    on read, so an invalidation also catches values computed before it but
+    stored after.
+
+    ``get_or_compute`` guards expensive values against stampedes: one
+    caller per process computes a missing key while the others wait for
+    its result, and a Redis lock lets one worker compute while the others
+    wait for its value. With ``stale_ttl`` an expired value is still
+    served for that long while a single background refresh runs.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        default_ttl: int = 300,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        redis=None,
+        serializer: Optional[CacheSerializer] = None,
+        bus: Optional[InvalidationBus] = None,
+    ):
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        self.l1 = BoundedCache(max_entries, max_bytes, default_ttl)
+        # None picks the shared client; False forces an L1-only cache
+        self.redis = self._default_redis() if redis is None else (redis or None)
+        self.serializer = serializer or CacheSerializer()
+        self.bus = bus or invalidation_bus
+        self.prefix = f"cache:v{SERIALIZER_VERSION}:{namespace}:"
+        self.tag_prefix = f"{self.prefix}~tag:"
+        self.lock_prefix = f"{self.prefix}~lock:"
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+        self.l2_skipped = 0
+        self.invalidated_reads = 0
+        self.stale_hits = 0
+        self.coalesced = 0
+        self.recomputes = 0
+        self._flights: Dict[str, _Flight] = {}
+        self._flights_lock = threading.Lock()
+        self._l2_down_until = 0.0
+        self.bus.register(self)
+
+    @staticmethod
+    def _default_redis():
+        redis = RedisClient()
+        return redis.redis_client if redis.is_connected() else None
+
+    @property
+    def l2_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._l2_down_until
+
+    def _l2_failed(self, action: str, error: Exception) -> None:
+        self.l2_errors += 1
+        self._l2_down_until = time.monotonic() + L2_RETRY_INTERVAL
+        logger.warning(f"Cache {action} in Redis failed, using L1 only: {error}")
+
+    def stamp(self) -> int:
+        """Take before computing a value; pass to ``set`` with its tags"""
+        return self.bus.tags.stamp()
+
+    def get(self, key: str) -> Optional[Any]:
+        found = self.lookup(key)
+        return found[0] if found is not None and found[1] else None
+
+    def lookup(self, key: str) -> Optional[Tuple[Any, bool]]:
+        """``(value, fresh)`` for a cached key, or None; stale values are
+        those past their TTL but within the ``stale_ttl`` they were set with"""
+        stamp = self.stamp()
+        item = self.l1.get(key)
+        if item is not None:
+            value, tags, stored_stamp, fresh_until = item
+            if self.bus.tags.valid(tags, stored_stamp):
+                return value, time.time() < fresh_until
+            self.l1.delete(key)
+            self.invalidated_reads += 1
+        if not self.l2_available:
+            return None
+
+        try:
+            pipe = self.redis.pipeline()
+            pipe.get(self.prefix + key)
+            pipe.pttl(self.prefix + key)
+            raw, ttl_ms = pipe.execute()
+        except Exception as e:
+            self._l2_failed("read", e)
+            return None
+        if raw is None:
+            self.l2_misses += 1
+            return None
+        try:
+            value, tags, fresh_until = self.serializer.loads(raw)
+        except Exception:
+            self.l2_misses += 1  # Older format or corrupt; recompute
+            return None
+        if not self.bus.tags.valid(tags, stamp):
+            self.l2_misses += 1  # Invalidated while being read
+            return None
+
+        self.l2_hits += 1
+        l1_ttl = L1_TTL if ttl_ms is None or ttl_ms < 0 else min(L1_TTL, ttl_ms / 1000)
+        self.l1.set(key, (value, tags, stamp, fresh_until), max(l1_ttl, 0.001))
+        return value, time.time() < fresh_until
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[int] = None,
+        tags: Iterable[str] = (),
+        stamp: Optional[int] = None,
+        stale_ttl: int = 0,
+    ) -> None:
+        """
+        Cache a value under its dependency ``tags``. Pass the ``stamp``
+        taken before computing it; values whose tags were invalidated since
+        are not stored. ``stale_ttl`` keeps the value for that many seconds
+        past ``ttl`` for ``get_or_compute`` to serve while refreshing it.
+        """
+        ttl = ttl or self.default_ttl
+        tags = tuple(sorted(set(tags)))
+        stamp = self.stamp() if stamp is None else stamp
+        if not self.bus.tags.valid(tags, stamp):
+            return  # Already stale
+        fresh_until = time.time() + ttl
+        ttl += stale_ttl
+
+        l2 = self.l2_available
+        entry = (value, tags, stamp, fresh_until)
+        self.l1.set(key, entry, min(ttl, L1_TTL) if l2 else ttl)
+        if not l2:
+            return
+        try:
+            raw = self.serializer.dumps((value, tags, fresh_until))
+        except Exception as e:
+            self.l2_skipped += 1
+            logger.debug(f"Not caching {key} in Redis: {e}")
+            return
+        try:
+            pipe = self.redis.pipeline()
+            pipe.setex(self.prefix + key, ttl, raw)
+            for tag in tags:
+                pipe.sadd(self.tag_prefix + tag, key)
+                pipe.expire(self.tag_prefix + tag, TAG_SET_TTL)
+            pipe.execute()
+        except Exception as e:
+            self._l2_failed("write", e)
+            return
+        self.bus.publish(self.namespace, [key])
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: Optional[int] = None,
+        tags: Iterable[str] = (),
+        stale_ttl: int = 0,
+        cache_if: Optional[Callable[[Any], bool]] = None,
+        background: Optional[Callable[[Callable[[], None]], None]] = None,
+    ) -> Any:
+        """
+        The cached value of ``key``, computing and caching it on a miss with
+        at most one ``compute`` per key in flight. Within ``stale_ttl`` of
+        expiring, the old value is returned while one refresh runs through
+        ``background`` (by default a daemon thread). Computed values failing
+        ``cache_if`` are returned but not cached.
+        """
+        found = self.lookup(key)
+        if found is not None:
+            value, fresh = found
+            if fresh:
+                return value
+            if stale_ttl:
+                self.stale_hits += 1
+                self._refresh(
+                    key, compute, (ttl, tags, stale_ttl, cache_if), background
+                )
+                return value
+
+        flight, leader = self._join(key)
+        if not leader:
+            self.coalesced += 1
+            return flight.wait()
+        try:
+            flight.value = self._compute(key, compute, ttl, tags, stale_ttl, cache_if)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+
+    def _join(self, key: str) -> Tuple[_Flight, bool]:
+        """The key's flight, and whether this caller started (and leads) it"""
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def _land(self, key: str, flight: _Flight) -> None:
+        with self._flights_lock:
+            self._flights.pop(key, None)
+        flight.done.set()
+
+    def _refresh(self, key, compute, options: tuple, background) -> None:
+        flight, leader = self._join(key)
+        if not leader:
+            return  # Already being refreshed in this process
+
+        def run():
+            try:
+                flight.value = self._compute(key, compute, *options)
+            except Exception as e:
+                flight.error = e
+                logger.warning(f"Background refresh of {key} failed: {e}")
+            finally:
+                self._land(key, flight)
+
+        try:
+            if background is not None:
+                background(run)
+            else:
+                threading.Thread(target=run, name="cache-refresh", daemon=True).start()
+        except Exception:
+            self._land(key, flight)
+            raise
+
+    def _compute(self, key, compute, ttl, tags, stale_ttl, cache_if) -> Any:
+        """Compute and cache a value, deferring to a worker that holds the lock"""
+        token = self._lock(key)
+        if token is None:
+            # Another worker is computing it; use its value once stored
+            deadline = time.monotonic() + RECOMPUTE_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(RECOMPUTE_POLL_INTERVAL)
+                found = self.lookup(key)
+                if found is not None and found[1]:
+                    self.coalesced += 1
+                    return found[0]
+                token = self._lock(key)
+                if token is not None:
+                    break
+        try:
+            stamp = self.stamp()
+            value = compute()
+            self.recomputes += 1
+            if cache_if is None or cache_if(value):
+                self.set(key, value, ttl, tags, stamp, stale_ttl)
+            return value
+        finally:
+            if token:
+                self._unlock(key, token)
+
+    def _lock(self, key: str) -> Optional[str]:
+        """
+        Take the cross-worker recompute lock: a token if taken, None if
+        another worker holds it, "" when Redis is unavailable (no lock)
+        """
+        if not self.l2_available:
+            return ""
+        token = uuid.uuid4().hex
+        try:
+            taken = self.redis.set(
+                self.lock_prefix + key, token, nx=True, px=RECOMPUTE_LOCK_TTL * 1000
+            )
+        except Exception as e:
+            self._l2_failed("lock", e)
+            return ""
+        return token if taken else None
+
+    def _unlock(self, key: str, token: str) -> None:
+        # Not atomic: if the lock expired and was retaken in between, the
+        # other worker's lock is dropped, costing at most one extra compute
+        try:
+            held = self.redis.get(self.lock_prefix + key)
+            if isinstance(held, bytes):
+                held = held.decode()
+            if held == token:
+                self.redis.delete(self.lock_prefix + key)
+        except Exception as e:
+            self._l2_failed("unlock", e)
+
+    def delete(self, key: str) -> bool:
+        removed = self.l1.delete(key)
+        if self.l2_available:
+            try:
+                removed = bool(self.redis.delete(self.prefix + key)) or removed
+            except Exception as e:
+                self._l2_failed("delete", e)
+            self.bus.publish(self.namespace, [key])
+        return removed
+
+    def delete_tagged(self, tags: Iterable[str]) -> int:
+        """
+        Delete this namespace's Redis entries carrying any of ``tags``. L1
+        copies are left to the tag check on read; use ``invalidate_tags``.
+        """
+        if not self.l2_available:
+            return 0
+        try:
+            pipe = self.redis.pipeline()
+            for tag in tags:
+                pipe.smembers(self.tag_prefix + tag)
+                pipe.delete(self.tag_prefix + tag)
+            members = pipe.execute()[::2]
+            keys = {
+                self.prefix + (key.decode() if isinstance(key, bytes) else key)
+                for tagged in members
+                for key in tagged
+            }
+            return self.redis.delete(*keys) if keys else 0
+        except Exception as e:
+            self._l2_failed("tag invalidation", e)
+            return 0
+
+    def delete_matching(self, predicate: Callable[[str], bool]) -> int:
+        """Drop entries whose (unprefixed) key satisfies ``predicate``"""
+        removed = self.l1.delete_matching(predicate)
+        if not self.l2_available:
+            return removed
+
+        keys = []
+        try:
+            for raw_key in self.redis.scan_iter(match=self.prefix + "*"):
+                if isinstance(raw_key, bytes):
+                    raw_key = raw_key.decode()
+                if raw_key.startswith((self.tag_prefix, self.lock_prefix)):
+                    continue
+                key = raw_key[len(self.prefix) :]
+                if predicate(key):
+                    keys.append(key)
+            if keys:
+                self.redis.delete(*[self.prefix + key for key in keys])
+        except Exception as e:
+            self._l2_failed("delete", e)
+        if keys:
+            self.bus.publish(self.namespace, keys)
+        return max(removed, len(keys))
+
+    def clear(self) -> None:
+        self.l1.clear()
+        if not self.l2_available:
+            return
+        try:
+            keys = list(self.redis.scan_iter(match=self.prefix + "*"))
+            if keys:
+                self.redis.delete(*keys)
+        except Exception as e:
+            self._l2_failed("clear", e)
+        self.bus.publish(self.namespace, clear=True)
+
+    def cleanup_expired(self) -> int:
+        return self.l1.cleanup_expired()  # Redis expires L2 entries itself
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.l1.stats(),
+            "backend": "redis+local" if self.l2_available else "local",
+            "l2_hits": self.l2_hits,
+            "l2_misses": self.l2_misses,
+            "l2_errors": self.l2_errors,
+            "l2_skipped": self.l2_skipped,
+            "invalidated_reads": self.invalidated_reads,
+            "stale_hits": self.stale_hits,
+            "coalesced": self.coalesced,
+            "recomputes": self.recomputes,
+        }
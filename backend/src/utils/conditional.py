@@ -0,0 +1,158 @@
+"""
+Conditional request utilities for TradeHub Platform
+Answers polling API clients with 304 Not Modified, deciding from cheap
+version checks before the view queries or serializes anything
+"""
+
+import hashlib
+import json
+import logging
+from functools import wraps
+from typing import Any, Callable, List
+
+from flask import current_app, make_response, request, session
+from sqlalchemy import func, select
+
+from src.utils.cache import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+
+def make_etag(*parts: Any) -> str:
+    """Opaque ETag value for JSON-serializable version parts"""
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.md5(encoded).hexdigest()
+
+
+def tag_versions(*tags: str) -> List[Any]:
+    """
+    Version tokens of cache tags such as ``table:job``, changed by every
+    committed write to the tagged records (see cache_invalidation). Without
+    Redis to share them, other workers' writes are read from the tagged
+    tables themselves (see ``tagged_table_versions``).
+    """
+    versions = invalidation_bus.versions(tags)
+    if invalidation_bus.client is None:
+        versions += tagged_table_versions(tags)
+    return versions
+
+
+def tagged_table_versions(tags) -> List[Any]:
+    """
+    Row count and latest ``updated_at`` (or ``created_at``) of each table
+    tagged ``table:<name>``, in one statement. Updates to tables without
+    either column are only caught by the local tokens' time window.
+    """
+    db = current_app.extensions["sqlalchemy"]
+    aggregates = []
+    for tag in tags:
+        table = db.metadata.tables.get(tag[len("table:") :])
+        if not tag.startswith("table:") or table is None:
+            continue
+        aggregates.append(select(func.count()).select_from(table).scalar_subquery())
+        for column in ("updated_at", "created_at"):
+            if column in table.c:
+                aggregates.append(select(func.max(table.c[column])).scalar_subquery())
+                break
+    if not aggregates:
+        return []
+    return list(db.session.execute(select(*aggregates)).one())
+
+
+def table_version(query, *timestamp_columns) -> tuple:
+    """
+    Version of the rows ``query`` selects: their count and the latest of
+    each ``timestamp_columns``. One aggregate instead of the full query; it
+    changes whenever a row is added, removed or stamps one of the columns,
+    including through bulk updates that bypass ORM events.
+    """
+    latest = [func.max(column) for column in timestamp_columns]
+    return tuple(query.with_entities(func.count(), *latest).order_by(None).one())
+
+
+def _current_user_id():
+    user = getattr(request, "current_user", None) or {}
+    return session.get("user_id") or user.get("user_id")
+
+
+def not_modified(etag: str, private: bool = True, max_age: int = 0):
+    """A 304 response carrying the unchanged ETag and caching headers"""
+    response = current_app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    return _cache_headers(response, private, max_age)
+
+
+def with_etag(result, private: bool = True, max_age: int = 0):
+    """
+    A view result as a response with an ETag of its body, for responses
+    that are cached and served many times; error responses are left as is
+    """
+    response = make_response(result)
+    if response.status_code == 200:
+        response.add_etag(weak=True)
+        _cache_headers(response, private, max_age)
+    return response
+
+
+def if_not_modified(response, private: bool = True, max_age: int = 0):
+    """304 if the request already has ``response`` (by its ETag), else None"""
+    etag, _ = response.get_etag()
+    if etag and request.if_none_match.contains_weak(etag):
+        return not_modified(etag, private, max_age)
+    return None
+
+
+def _cache_headers(response, private: bool, max_age: int):
+    if private:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    if max_age:
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True  # Always revalidate
+    return response
+
+
+def conditional_response(
+    version: Callable[..., Any], private: bool = True, max_age: int = 0
+):
+    """
+    Decorator adding ETags to a JSON view and answering matching
+    ``If-None-Match`` requests with 304 before the view runs.
+
+    ``version`` is called with the view's arguments and returns something
+    that changes whenever the response would, such as ``tag_versions`` of
+    the tables read or a ``table_version`` aggregate. The ETag combines it
+    with the endpoint, query string and user, and is taken before the view
+    runs, so a write that lands meanwhile only costs the next poll a full
+    response. Responses are marked ``no-cache`` (revalidate every time)
+    unless ``max_age`` is given.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            try:
+                etag = make_etag(
+                    request.endpoint,
+                    sorted(request.args.items(multi=True)),
+                    _current_user_id(),
+                    version(*args, **kwargs),
+                )
+            except Exception as e:
+                logger.warning(f"No ETag for {request.endpoint}: {e}")
+                return f(*args, **kwargs)
+
+            if request.if_none_match.contains_weak(etag):
+                return not_modified(etag, private, max_age)
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+                _cache_headers(response, private, max_age)
+            return response
+
+        return decorated_function
+
+    return decorator
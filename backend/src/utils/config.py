@@ -29,7 +29,8 @@ class PerformanceConfig:
     """Performance configuration settings"""
 
     cache_default_timeout: int = 300  # 5 minutes
-    cache_max_size: int = 1000
+    cache_max_size: int = 1000  # Entries per cache
+    cache_max_bytes: int = 64 * 1024 * 1024  # Approximate bytes per cache
     response_compression_min_size: int = 1000
     database_pool_size: int = 10
     database_pool_timeout: int = 30
@@ -115,6 +116,9 @@ class ConfigManager:
                     os.getenv("CACHE_TIMEOUT", str(default_cache_timeout))
                 ),
                 cache_max_size=int(os.getenv("CACHE_MAX_SIZE", "1000")),
+                cache_max_bytes=int(
+                    os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+                ),
                 response_compression_min_size=int(
                     os.getenv("COMPRESSION_MIN_SIZE", "1000")
                 ),
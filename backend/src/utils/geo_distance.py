@@ -0,0 +1,44 @@
+"""
+Distance kernels for Biped Platform
+Great-circle distances in kilometres between one point and arrays of points,
+for scoring many providers or jobs against one location in a single call.
+"""
+
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088  # Mean earth radius (IUGG)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_km_array(latitudes, longitudes, latitude: float, longitude: float):
+    """Distances in kilometres from arrays of points to one point (NaN stays NaN)"""
+    lat1, lon1 = np.radians(latitudes), np.radians(longitudes)
+    lat2, lon2 = np.radians(latitude), np.radians(longitude)
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def equirectangular_km_array(latitudes, longitudes, latitude: float, longitude: float):
+    """
+    Flat-earth approximation of ``haversine_km_array``: cheaper, and within
+    about 0.1% of it for points under a few hundred kilometres apart
+    """
+    lat1, lon1 = np.radians(latitudes), np.radians(longitudes)
+    lat2, lon2 = np.radians(latitude), np.radians(longitude)
+    delta_lon = (lon2 - lon1 + np.pi) % (2 * np.pi) - np.pi  # Across the antimeridian
+    x = delta_lon * np.cos((lat1 + lat2) / 2)
+    return EARTH_RADIUS_KM * np.hypot(x, lat2 - lat1)
@@ -0,0 +1,213 @@
+"""
+Pagination utilities for TradeHub Platform
+Provides offset and keyset (cursor) pagination with optional, cached counts
+"""
+
+import base64
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional
+
+from sqlalchemy import and_, asc, desc, or_
+from sqlalchemy.sql.util import find_tables
+
+from src.utils.performance import TradingCacheService
+
+# Exact counts are expensive on large joins; reuse them briefly across requests
+COUNT_CACHE_TTL = 60
+count_cache = TradingCacheService(ttl=COUNT_CACHE_TTL, namespace="counts")
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor is malformed or from another sort"""
+
+
+class SortKey:
+    """One ordering column of a keyset; the last key must be unique (an id)"""
+
+    def __init__(self, expression, descending: bool = False):
+        self.expression = expression
+        self.descending = descending
+
+    def order_clause(self):
+        return desc(self.expression) if self.descending else asc(self.expression)
+
+    def after(self, value):
+        """Clause selecting rows that sort strictly after ``value``"""
+        if self.descending:
+            return self.expression < value
+        return self.expression > value
+
+
+@dataclass
+class PageResult:
+    """A page of rows plus the metadata needed to fetch the next one"""
+
+    items: List[Any]
+    per_page: int
+    has_next: bool
+    next_cursor: Optional[str]
+    page: Optional[int] = None  # None in cursor mode
+    total: Optional[int] = None  # None unless a count was requested
+
+    @property
+    def pages(self) -> Optional[int]:
+        if self.total is None:
+            return None
+        return (self.total + self.per_page - 1) // self.per_page
+
+    @property
+    def has_prev(self) -> bool:
+        return self.page is None or self.page > 1
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"dec": str(value)}
+    if hasattr(value, "value") and not isinstance(value, (int, float, str)):
+        return value.value  # Enum members sort by their stored value
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "dec" in value:
+            return Decimal(value["dec"])
+    return value
+
+
+def encode_cursor(values: List[Any], signature: str = "") -> str:
+    """Encode the sort-key values of the last row into an opaque token"""
+    payload = {"s": signature, "k": [_encode_value(value) for value in values]}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, signature: str = "", key_count: int = None) -> list:
+    """Decode a cursor, checking it belongs to the same sort"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = [_decode_value(value) for value in payload["k"]]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursorError("Invalid pagination cursor")
+
+    if payload.get("s") != signature:
+        raise InvalidCursorError("Cursor does not match the requested sort order")
+    if key_count is not None and len(values) != key_count:
+        raise InvalidCursorError("Invalid pagination cursor")
+    return values
+
+
+def keyset_condition(keys: List[SortKey], values: List[Any]):
+    """Rows strictly after ``values`` in the lexicographic order of ``keys``"""
+    clauses = []
+    for index, key in enumerate(keys):
+        equal_prefix = [
+            prior.expression == value
+            for prior, value in zip(keys[:index], values[:index])
+        ]
+        clauses.append(and_(*equal_prefix, key.after(values[index])))
+    return or_(*clauses)
+
+
+def wants_total(args) -> bool:
+    """Whether a listing request wants a total; by default only the first page"""
+    value = args.get("with_total")
+    if value is None:
+        return not args.get("after")
+    return value.lower() in ("1", "true", "yes")
+
+
+def count_tags(query) -> List[str]:
+    """``table:<name>`` tags for every table a query reads"""
+    tables = find_tables(query.statement, include_joins=True)
+    return sorted({f"table:{table.name}" for table in tables})
+
+
+def cached_count(query, ttl: int = COUNT_CACHE_TTL) -> int:
+    """
+    Count rows for a query, reusing the result for identical queries until
+    a write to one of its tables commits
+    """
+    compiled = query.statement.compile()
+    params = sorted((name, repr(value)) for name, value in compiled.params.items())
+    cache_key = hashlib.md5(f"{compiled}|{params}".encode()).hexdigest()
+
+    total = count_cache.get(cache_key)
+    if total is None:
+        stamp = count_cache.cache.stamp()
+        total = query.order_by(None).count()
+        count_cache.set(cache_key, total, ttl, count_tags(query), stamp)
+    return total
+
+
+def paginate(
+    query,
+    sort_keys: List[SortKey],
+    per_page: int,
+    page: int = 1,
+    after: str = None,
+    with_total: bool = True,
+    signature: str = "",
+    count_query=None,
+    count_ttl: int = None,
+) -> PageResult:
+    """
+    Order ``query`` by ``sort_keys`` and fetch one page.
+
+    With ``after`` the page starts strictly after the cursor's row (keyset
+    pagination, constant cost at any depth); otherwise ``page`` is used as
+    an offset. Every page carries a ``next_cursor`` so clients can switch to
+    cursor mode after the first request. The total is only counted when
+    ``with_total`` is set, over ``count_query`` if given (usually the query
+    before extra entities are added), and cached for ``count_ttl`` seconds.
+    """
+    single_entity = len(query.column_descriptions) == 1
+    total = None
+    if with_total:
+        count_query = count_query if count_query is not None else query
+        if count_ttl:
+            total = cached_count(count_query, count_ttl)
+        else:
+            total = count_query.order_by(None).count()
+
+    if after:
+        values = decode_cursor(after, signature, key_count=len(sort_keys))
+        query = query.filter(keyset_condition(sort_keys, values))
+        page = None
+
+    query = query.order_by(*[key.order_clause() for key in sort_keys])
+    query = query.add_columns(*[key.expression for key in sort_keys])
+    if page is not None:
+        query = query.offset((max(page, 1) - 1) * per_page)
+    rows = query.limit(per_page + 1).all()
+
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    key_count = len(sort_keys)
+
+    next_cursor = None
+    if has_next and rows:
+        next_cursor = encode_cursor(list(rows[-1][-key_count:]), signature)
+
+    items = [row[0] if single_entity else tuple(row[:-key_count]) for row in rows]
+    return PageResult(
+        items=items,
+        per_page=per_page,
+        has_next=has_next,
+        next_cursor=next_cursor,
+        page=page,
+        total=total,
+    )
@@ -7,80 +7,180 @@ import gzip
 import hashlib
 import io
 import json
+import threading
 import time
 from datetime import datetime, timedelta, timezone
 from functools import wraps
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, Iterable, Optional, Union
 
 import psutil
-from flask import current_app, g, jsonify, request
+from flask import (
+    Response,
+    copy_current_request_context,
+    current_app,
+    g,
+    has_app_context,
+    has_request_context,
+    jsonify,
+    request,
+)
+
+from src.utils.cache import TieredCache, invalidate_tags
+from src.utils.conditional import if_not_modified, with_etag
+
+# Static dependency tags, or a function of the view's arguments returning them
+CacheTags = Union[Iterable[str], Callable[..., Iterable[str]], None]
+
+
+def _is_success(result: Any) -> bool:
+    """Whether a view result is worth caching (not an error response)"""
+    if isinstance(result, tuple) and len(result) > 1 and isinstance(result[1], int):
+        return result[1] < 400
+    return getattr(result, "status_code", 200) < 400
+
+
+def _run_in_background(run: Callable[[], None]) -> None:
+    """Run a cache refresh in a daemon thread with the caller's Flask context"""
+    if has_request_context():
+        run = copy_current_request_context(run)
+    elif has_app_context():
+        app, refresh = current_app._get_current_object(), run
+
+        def run():
+            with app.app_context():
+                refresh()
+
+    threading.Thread(target=run, name="response-refresh", daemon=True).start()
 
 
 class ResponseCache:
-    """In-memory response cache with TTL support"""
+    """Response cache with TTL support, shared by workers through Redis"""
 
-    def __init__(self):
-        self.cache = {}
+    def __init__(self, max_entries: int = None, max_bytes: int = None, redis=None):
         self.default_ttl = 300  # 5 minutes
+        self.cache = TieredCache(
+            "responses", self.default_ttl, max_entries, max_bytes, redis
+        )
 
     def _generate_cache_key(self, endpoint: str, args: tuple, kwargs: dict) -> str:
-        """Generate cache key from endpoint and parameters"""
+        """Cache key ``<endpoint>:<parameter hash>``, clearable by endpoint"""
+        in_request = has_request_context()
         key_data = {
             "endpoint": endpoint,
             "args": args,
             "kwargs": kwargs,
-            "user_id": getattr(request, "current_user", {}).get("user_id", "anonymous"),
+            "query": sorted(request.args.items(multi=True)) if in_request else [],
+            "user_id": (
+                getattr(request, "current_user", {}).get("user_id", "anonymous")
+                if in_request
+                else "anonymous"
+            ),
         }
-        key_string = json.dumps(key_data, sort_keys=True)
-        return hashlib.md5(key_string.encode()).hexdigest()
+        key_string = json.dumps(key_data, sort_keys=True, default=str)
+        return f"{endpoint}:{hashlib.md5(key_string.encode()).hexdigest()}"
 
     def get(self, key: str) -> Optional[Any]:
         """Get cached value if not expired"""
-        if key in self.cache:
-            data, expires_at = self.cache[key]
-            if time.time() < expires_at:
-                return data
-            else:
-                del self.cache[key]
-        return None
-
-    def set(self, key: str, value: Any, ttl: int = None) -> None:
-        """Set cached value with TTL"""
-        ttl = ttl or self.default_ttl
-        expires_at = time.time() + ttl
-        self.cache[key] = (value, expires_at)
-
-    def cache_response(self, ttl: int = None):
-        """Decorator to cache function responses"""
+        return self.cache.get(key)
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: int = None,
+        tags: Iterable[str] = (),
+        stamp: int = None,
+    ) -> None:
+        """Set cached value with TTL and dependency tags"""
+        self.cache.set(key, value, ttl or self.default_ttl, tags, stamp)
+
+    def cache_response(
+        self,
+        ttl: int = None,
+        tags: CacheTags = None,
+        single_flight: bool = False,
+        stale_ttl: int = 0,
+        etag: bool = False,
+    ):
+        """
+        Decorator to cache function responses; error responses are not
+        cached. ``tags`` (a list, or a function of the view's arguments)
+        names the records the response depends on, e.g.
+        ``lambda job_id: [f"job:{job_id}"]``; writes to those records
+        invalidate it.
+
+        For expensive aggregates, ``single_flight`` makes concurrent misses
+        on a key wait for one computation, in this worker and across
+        workers, instead of each running the view. ``stale_ttl`` (which
+        implies ``single_flight``) keeps serving an expired response for up
+        to that many seconds while one caller refreshes it in the
+        background.
+
+        With ``etag`` each cached response carries an ETag of its body,
+        hashed once when cached, and a request whose ``If-None-Match``
+        matches the cached copy gets 304 without the view running.
+        """
 
         def decorator(f):
             @wraps(f)
             def decorated_function(*args, **kwargs):
                 cache_key = self._generate_cache_key(f.__name__, args, kwargs)
+                entry_tags = (tags(*args, **kwargs) if callable(tags) else tags) or ()
+
+                def view():
+                    result = f(*args, **kwargs)
+                    return with_etag(result) if etag else result
+
+                if single_flight or stale_ttl:
+                    result = self.cache.get_or_compute(
+                        cache_key,
+                        view,
+                        ttl or self.default_ttl,
+                        entry_tags,
+                        stale_ttl,
+                        cache_if=_is_success,
+                        background=_run_in_background,
+                    )
+                    return self._revalidated(result) if etag else result
 
                 # Try to get from cache
                 cached_result = self.get(cache_key)
                 if cached_result is not None:
-                    return cached_result
+                    return self._revalidated(cached_result) if etag else cached_result
 
-                # Execute function and cache result
-                result = f(*args, **kwargs)
-                self.set(cache_key, result, ttl)
+                # Execute function and cache result, unless a write to one of
+                # its records committed meanwhile
+                stamp = self.cache.stamp()
+                result = view()
+                if _is_success(result):
+                    self.set(cache_key, result, ttl, entry_tags, stamp)
 
-                return result
+                return self._revalidated(result) if etag else result
 
             return decorated_function
 
         return decorator
 
+    @staticmethod
+    def _revalidated(result):
+        """304 in place of a response the client already has"""
+        if isinstance(result, Response) and has_request_context():
+            return if_not_modified(result) or result
+        return result
+
     def clear_cache(self, pattern: str = None) -> None:
-        """Clear cache entries matching pattern"""
+        """Clear cache entries whose key (``<endpoint>:...``) contains ``pattern``"""
         if pattern is None:
             self.cache.clear()
         else:
-            keys_to_delete = [key for key in self.cache.keys() if pattern in key]
-            for key in keys_to_delete:
-                del self.cache[key]
+            self.cache.delete_matching(lambda key: pattern in key)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Drop entries (in every cache and worker) carrying any of ``tags``"""
+        return invalidate_tags(tags)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
 
 
 class CompressionMiddleware:
@@ -312,78 +412,62 @@ class StaticAssetOptimizer:
 class TradingCacheService:
     """Trading-specific cache service with advanced features"""
 
-    def __init__(self, ttl: int = 3600):
-        self.cache = {}
+    def __init__(
+        self,
+        ttl: int = 3600,
+        max_entries: int = None,
+        max_bytes: int = None,
+        namespace: str = "trading",
+        redis=None,
+    ):
         self.default_ttl = ttl
-        self.access_times = {}
-        self.hit_count = 0
-        self.miss_count = 0
+        self.cache = TieredCache(namespace, ttl, max_entries, max_bytes, redis)
 
     def get(self, key: str) -> Optional[Any]:
         """Retrieve cached value if not expired"""
-        if key in self.cache:
-            data, expires_at = self.cache[key]
-            if time.time() < expires_at:
-                self.access_times[key] = time.time()
-                self.hit_count += 1
-                return data
-            else:
-                del self.cache[key]
-                if key in self.access_times:
-                    del self.access_times[key]
-
-        self.miss_count += 1
-        return None
-
-    def set(self, key: str, value: Any, ttl: int = None) -> None:
-        """Cache value with expiration"""
-        ttl = ttl or self.default_ttl
-        expires_at = time.time() + ttl
-        self.cache[key] = (value, expires_at)
-        self.access_times[key] = time.time()
+        return self.cache.get(key)
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: int = None,
+        tags: Iterable[str] = (),
+        stamp: int = None,
+    ) -> None:
+        """Cache value with expiration and dependency tags"""
+        self.cache.set(key, value, ttl or self.default_ttl, tags, stamp)
 
     def delete(self, key: str) -> bool:
         """Delete cached value"""
-        if key in self.cache:
-            del self.cache[key]
-            if key in self.access_times:
-                del self.access_times[key]
-            return True
-        return False
+        return self.cache.delete(key)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Drop entries (in every cache and worker) carrying any of ``tags``"""
+        return invalidate_tags(tags)
 
     def clear(self) -> None:
         """Clear all cached entries"""
         self.cache.clear()
-        self.access_times.clear()
 
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
-        total_requests = self.hit_count + self.miss_count
-        hit_rate = (self.hit_count / total_requests * 100) if total_requests > 0 else 0
+        stats = self.cache.stats()
+        total_requests = stats["hits"] + stats["misses"]
+        hit_rate = (stats["hits"] / total_requests * 100) if total_requests > 0 else 0
 
         return {
-            "hit_count": self.hit_count,
-            "miss_count": self.miss_count,
+            **stats,
+            "hit_count": stats["hits"],
+            "miss_count": stats["misses"],
             "hit_rate": hit_rate,
-            "cache_size": len(self.cache),
+            "cache_size": stats["entries"],
             "total_requests": total_requests,
         }
 
     def cleanup_expired(self) -> int:
         """Remove expired entries and return count of removed items"""
-        current_time = time.time()
-        expired_keys = []
-
-        for key, (data, expires_at) in self.cache.items():
-            if current_time >= expires_at:
-                expired_keys.append(key)
-
-        for key in expired_keys:
-            del self.cache[key]
-            if key in self.access_times:
-                del self.access_times[key]
-
-        return len(expired_keys)
+        return self.cache.cleanup_expired()
 
 
 # Global instances
@@ -0,0 +1,940 @@
+"""
+Cache tests for Biped Platform
+Tests the bounded LRU/TTL cache engine, the two-tier (L1 + Redis) cache
+behind ResponseCache and TradingCacheService with an in-memory stand-in
+for Redis, tag invalidation driven by model writes, stampede
+protection (single-flight recomputes and stale-while-revalidate), and
+conditional GETs answered from version checks.
+"""
+
+import fnmatch
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+# Add the backend directory to the path so ``src`` imports resolve
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from flask import Flask, jsonify, request  # noqa: E402
+
+from src.models.job import Job, Quote  # noqa: E402
+from src.models.review import Review  # noqa: E402
+from src.models.service import Service, ServiceCategory  # noqa: E402
+from src.models.user import ProviderProfile, User, db  # noqa: E402
+from src.services import cache_invalidation  # noqa: E402
+from src.utils import cache as cache_module  # noqa: E402
+from src.utils.cache import (  # noqa: E402
+    BoundedCache,
+    CacheSerializer,
+    InvalidationBus,
+    TagVersions,
+    TieredCache,
+)
+from src.utils.conditional import (  # noqa: E402
+    conditional_response,
+    table_version,
+    tag_versions,
+)
+from src.utils.config import config_manager  # noqa: E402
+from src.utils.pagination import cached_count, count_cache  # noqa: E402
+from src.utils.performance import ResponseCache, TradingCacheService  # noqa: E402
+
+
+class FakeClock:
+    """Stands in for time.monotonic in the cache module"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestBoundedCache(unittest.TestCase):
+    """LRU eviction, TTL expiry, budgets and metrics"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(cache_module.time, "monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = BoundedCache(max_entries=3, max_bytes=10**6)
+        for key in "abc":
+            cache.set(key, key.upper())
+        self.assertEqual(cache.get("a"), "A")  # b is now the oldest
+        cache.set("d", "D")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual([cache.get(key) for key in "acd"], ["A", "C", "D"])
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_entries_expire_on_read_and_sweep(self):
+        cache = BoundedCache(max_entries=10, max_bytes=10**6, default_ttl=30)
+        cache.set("short", 1, ttl=5)
+        cache.set("long", 2)
+        self.clock.now += 10
+        self.assertIsNone(cache.get("short"))
+        self.assertEqual(cache.get("long"), 2)
+
+        cache.set("soon", 3, ttl=1)
+        self.clock.now += cache_module.CACHE_SWEEP_INTERVAL
+        cache.set("fresh", 4)  # Sweeps the stripe
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.stats()["expirations"], 3)
+
+    def test_byte_budget(self):
+        cache = BoundedCache(max_entries=100, max_bytes=100, sizer=len)
+        cache.set("a", "x" * 40)
+        cache.set("b", "y" * 40)
+        cache.set("c", "z" * 40)  # 120 bytes: a goes
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["bytes"], 80)
+
+        self.assertFalse(cache.set("huge", "x" * 101))
+        self.assertIsNone(cache.get("huge"))
+        self.assertEqual(cache.stats()["rejected"], 1)
+        self.assertEqual(cache.get("b"), "y" * 40)
+
+        cache.set("b", "y")  # Replacing an entry releases its bytes
+        self.assertEqual(cache.stats()["bytes"], 41)
+
+    def test_budgets_default_to_config(self):
+        config = config_manager.get_performance_config()
+        cache = BoundedCache()
+        self.assertEqual(cache.max_entries, config.cache_max_size)
+        self.assertEqual(cache.max_bytes, config.cache_max_bytes)
+        self.assertEqual(
+            ResponseCache(redis=False).cache.l1.max_entries, config.cache_max_size
+        )
+
+    def test_stripes_share_the_budgets(self):
+        cache = BoundedCache(max_entries=1000, max_bytes=10**6)
+        self.assertEqual(cache.stats()["stripes"], 15)
+        for index in range(5000):
+            cache.set(f"key{index}", index)
+        self.assertLessEqual(len(cache), 1000)
+        self.assertGreater(len(cache), 900)
+
+    def test_concurrent_writers_stay_within_budget(self):
+        cache = BoundedCache(max_entries=256, max_bytes=10**6)
+
+        def work(offset):
+            for index in range(2000):
+                key = f"key{(offset * 7919 + index) % 600}"
+                cache.set(key, index)
+                cache.get(key)
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = cache.stats()
+        self.assertLessEqual(stats["entries"], 256)
+        self.assertEqual(stats["hits"] + stats["misses"], 16000)
+        self.assertEqual(stats["entries"], len(cache))
+
+    def test_response_and_trading_caches(self):
+        responses = ResponseCache(max_entries=10, redis=False)
+        responses.set("user:1:dashboard", {"jobs": 3})
+        responses.set("user:2:dashboard", {"jobs": 4})
+        responses.clear_cache("user:1")
+        self.assertIsNone(responses.get("user:1:dashboard"))
+        self.assertEqual(responses.get("user:2:dashboard"), {"jobs": 4})
+
+        trading = TradingCacheService(ttl=60, max_entries=10, redis=False)
+        trading.set("market", [1, 2, 3])
+        self.assertEqual(trading.get("market"), [1, 2, 3])
+        self.assertIsNone(trading.get("missing"))
+        self.clock.now += 61
+        self.assertEqual(trading.cleanup_expired(), 1)
+        stats = trading.get_stats()
+        self.assertEqual((stats["hit_count"], stats["miss_count"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 50)
+        self.assertEqual(stats["cache_size"], 0)
+
+
+class FakeRedis:
+    """The slice of redis-py the two-tier cache uses, held in memory"""
+
+    def __init__(self):
+        self.data = {}  # key -> (value, expires_at)
+        self.subscribers = []
+        self.failing = False
+
+    def _check(self):
+        if self.failing:
+            raise ConnectionError("Redis is down")
+
+    def get(self, key):
+        self._check()
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.time():
+            del self.data[key]
+            return None
+        return value
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def pttl(self, key):
+        self._check()
+        if self.get(key) is None:
+            return -2
+        return int((self.data[key][1] - time.time()) * 1000)
+
+    def set(self, key, value, nx=False, px=None, ex=None):
+        self._check()
+        if nx and self.get(key) is not None:
+            return None
+        ttl = px / 1000 if px else ex
+        expires_at = time.time() + ttl if ttl else None
+        self.data[key] = (
+            value.encode() if isinstance(value, str) else value,
+            expires_at,
+        )
+        return True
+
+    def setex(self, key, ttl, value):
+        self._check()
+        self.data[key] = (value, time.time() + ttl)
+
+    def delete(self, *keys):
+        self._check()
+        keys = [key.decode() if isinstance(key, bytes) else key for key in keys]
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def sadd(self, key, *members):
+        self._check()
+        members = {m.encode() if isinstance(m, str) else m for m in members}
+        value, expires_at = self.data.get(key, (set(), None))
+        self.data[key] = (value | members, expires_at)
+
+    def smembers(self, key):
+        self._check()
+        return set(self.data.get(key, (set(), None))[0])
+
+    def incr(self, key):
+        value = int(self.get(key) or 0) + 1
+        self.data[key] = (str(value).encode(), self.data.get(key, (None, None))[1])
+        return value
+
+    def zadd(self, key, mapping):
+        self._check()
+        value, expires_at = self.data.get(key, ({}, None))
+        members = {
+            m.encode() if isinstance(m, str) else m: s for m, s in mapping.items()
+        }
+        self.data[key] = ({**value, **members}, expires_at)
+
+    def zrange(self, key, start, end):
+        self._check()
+        members = self.data.get(key, ({}, None))[0]
+        ordered = sorted(members, key=members.get)
+        return ordered[start:] if end == -1 else ordered[start : end + 1]
+
+    def zremrangebyscore(self, key, low, high):
+        self._check()
+        members = self.data.get(key, ({}, None))[0]
+        low = float(low)
+        for member, score in list(members.items()):
+            if low <= score <= float(high):
+                del members[member]
+
+    def zrem(self, key, *members):
+        self._check()
+        value = self.data.get(key, ({}, None))[0]
+        for member in members:
+            value.pop(member.encode() if isinstance(member, str) else member, None)
+
+    def expire(self, key, ttl):
+        self._check()
+        if key in self.data:
+            self.data[key] = (self.data[key][0], time.time() + ttl)
+
+    def scan_iter(self, match="*"):
+        self._check()
+        return [key.encode() for key in self.data if fnmatch.fnmatch(key, match)]
+
+    def publish(self, channel, message):
+        self._check()
+        for subscriber in self.subscribers:
+            subscriber.put({"type": "message", "channel": channel, "data": message})
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [
+            getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.calls
+        ]
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.messages = queue.Queue()
+
+    def subscribe(self, channel):
+        self.redis.subscribers.append(self.messages)
+
+    def listen(self):
+        while True:
+            yield self.messages.get()
+
+
+def eventually(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return condition()
+
+
+class TestTieredCache(unittest.TestCase):
+    """Per-process L1 in front of a shared Redis L2, invalidated over pub/sub"""
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        # Two workers, each with its own bus and L1
+        self.a = self.worker()
+        self.b = self.worker()
+
+    def worker(self, namespace="test"):
+        return TieredCache(
+            namespace,
+            default_ttl=60,
+            max_entries=100,
+            redis=self.redis,
+            bus=InvalidationBus(),
+        )
+
+    def test_workers_share_l2(self):
+        self.a.set("summary", {"jobs": 3})
+        self.assertEqual(self.b.get("summary"), {"jobs": 3})
+        self.assertEqual(self.b.stats()["l2_hits"], 1)
+        self.assertEqual(self.b.get("summary"), {"jobs": 3})  # Now from L1
+        self.assertEqual(self.b.stats()["l2_hits"], 1)
+        self.assertEqual(self.b.stats()["backend"], "redis+local")
+        self.assertIsNone(self.b.get("missing"))
+        self.assertEqual(self.b.stats()["l2_misses"], 1)
+
+    def test_writes_invalidate_other_workers_l1(self):
+        self.a.set("summary", 1)
+        self.assertEqual(self.b.get("summary"), 1)
+        self.a.set("summary", 2)
+        self.assertTrue(eventually(lambda: self.b.l1.get("summary") is None))
+        self.assertEqual(self.b.get("summary"), 2)
+
+        self.a.delete("summary")
+        self.assertTrue(eventually(lambda: self.b.get("summary") is None))
+
+        self.a.set("x:1", 1)
+        self.a.set("y:1", 1)
+        self.b.get("x:1")
+        self.b.get("y:1")
+        self.assertEqual(self.a.delete_matching(lambda key: key.startswith("x:")), 1)
+        self.assertTrue(eventually(lambda: self.b.get("x:1") is None))
+        self.assertEqual(self.b.get("y:1"), 1)
+
+        self.a.clear()
+        self.assertTrue(eventually(lambda: self.b.get("y:1") is None))
+        self.assertEqual(self.redis.data, {})
+
+    def test_namespaces_are_separate(self):
+        other = self.worker("other")
+        self.a.set("key", "a")
+        other.set("key", "other")
+        self.assertEqual(self.b.get("key"), "a")
+        other.delete("key")
+        self.assertEqual(self.b.get("key"), "a")
+
+    def test_redis_failures_degrade_to_l1(self):
+        self.redis.failing = True
+        self.a.set("summary", 1)
+        self.assertEqual(self.a.get("summary"), 1)
+        stats = self.a.stats()
+        self.assertEqual((stats["l2_errors"], stats["backend"]), (1, "local"))
+
+        # Redis is left alone until the retry interval passes
+        self.redis.failing = False
+        self.a.set("other", 2)
+        self.assertNotIn(self.a.prefix + "other", self.redis.data)
+        self.a._l2_down_until = 0
+        self.a.set("other", 2)
+        self.assertIn(self.a.prefix + "other", self.redis.data)
+
+    def test_without_redis(self):
+        local = TieredCache("test", redis=False, bus=InvalidationBus())
+        local.set("summary", 1)
+        self.assertEqual(local.get("summary"), 1)
+        self.assertEqual(local.stats()["backend"], "local")
+
+    def test_serializer(self):
+        serializer = CacheSerializer()
+        app = Flask(__name__)
+        with app.app_context():
+            response = jsonify({"total": 3})
+        response.headers["X-Total"] = "3"
+        value = serializer.loads(serializer.dumps((response, 201)))
+        self.assertEqual(value[0].get_json(), {"total": 3})
+        self.assertEqual(value[0].headers["X-Total"], "3")
+        self.assertEqual(value[1], 201)
+
+        # Entries from another format version read as misses
+        self.redis.setex(self.a.prefix + "old", 60, b"bc\x00" + b"payload")
+        self.assertIsNone(self.a.get("old"))
+
+        # Unpicklable values stay in L1
+        self.a.set("callable", lambda: None)
+        self.assertIsNotNone(self.a.get("callable"))
+        self.assertNotIn(self.a.prefix + "callable", self.redis.data)
+        self.assertEqual(self.a.stats()["l2_skipped"], 1)
+
+    def test_lost_subscription_clears_l1(self):
+        self.a.set("summary", 1)
+        self.b.get("summary")
+        message = json.dumps(
+            {"origin": "elsewhere", "namespace": "test", "clear": True}
+        )
+        self.b.bus.handle(json.loads(message))
+        self.assertIsNone(self.b.l1.get("summary"))
+
+
+class TestCacheTags(unittest.TestCase):
+    """Entries carry dependency tags; invalidating a tag drops them everywhere"""
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.bus_a, self.bus_b = InvalidationBus(), InvalidationBus()
+        self.a = self.worker(self.bus_a)
+        self.b = self.worker(self.bus_b)
+
+    def worker(self, bus, namespace="test"):
+        return TieredCache(
+            namespace, default_ttl=60, max_entries=100, redis=self.redis, bus=bus
+        )
+
+    def test_tag_versions(self):
+        versions = TagVersions(max_tags=2)
+        stamp = versions.stamp()
+        self.assertTrue(versions.valid(["job:1"], stamp))
+        versions.bump(["job:1"])
+        self.assertFalse(versions.valid(["job:1"], stamp))
+        self.assertTrue(versions.valid(["job:2"], stamp))
+        self.assertTrue(versions.valid(["job:1"], versions.stamp()))
+
+        # Forgotten tags count as invalidated at the newest forgotten sequence
+        versions.bump(["job:2"])
+        versions.bump(["job:3"])
+        self.assertEqual(versions.floor, 1)
+        self.assertFalse(versions.valid(["job:9"], stamp))
+
+    def test_invalidating_a_tag_drops_entries_in_every_worker(self):
+        other = self.worker(self.bus_a, "other")
+        self.a.set("job", "job 1", tags=["job:1", "category:plumbing"])
+        self.a.set("feed", "feed", tags=["provider:45"])
+        other.set("jobs", "jobs", tags=["job:1"])
+        self.assertEqual(self.b.get("job"), "job 1")  # Copied into b's L1
+
+        self.assertEqual(self.bus_a.invalidate_tags(["job:1"]), 2)
+        self.assertIsNone(self.a.get("job"))
+        self.assertIsNone(other.get("jobs"))
+        self.assertEqual(self.a.get("feed"), "feed")
+        self.assertTrue(eventually(lambda: self.b.get("job") is None))
+        self.assertEqual(self.a.stats()["invalidated_reads"], 1)
+        self.assertNotIn(self.a.tag_prefix + "job:1", self.redis.data)
+
+    def test_values_computed_before_an_invalidation_are_not_stored(self):
+        stamp = self.a.stamp()
+        self.bus_a.invalidate_tags(["job:1"])  # A write commits mid-compute
+        self.a.set("job", "old", tags=["job:1"], stamp=stamp)
+        self.assertIsNone(self.a.get("job"))
+        self.assertNotIn(self.a.prefix + "job", self.redis.data)
+
+    def test_clearing_removes_tag_sets(self):
+        self.a.set("job", 1, tags=["job:1"])
+        self.assertEqual(self.a.delete_matching(lambda key: True), 1)
+        self.a.set("job", 1, tags=["job:1"])
+        self.a.clear()
+        self.assertEqual(self.redis.data, {})
+
+    def test_response_cache_tags_and_endpoint_keys(self):
+        app = Flask(__name__)
+        cache = ResponseCache(redis=False)
+        calls = []
+
+        @cache.cache_response(tags=lambda job_id: [f"job:{job_id}"])
+        def job_detail(job_id):
+            calls.append(job_id)
+            return {"id": job_id}
+
+        @cache.cache_response()
+        def categories():
+            calls.append("categories")
+            return []
+
+        with app.test_request_context():
+            job_detail(1)
+            job_detail(1)
+            job_detail(2)
+            categories()
+            self.assertEqual(calls, [1, 2, "categories"])
+
+            cache.invalidate_tags(["job:1"])
+            job_detail(1)
+            job_detail(2)
+            self.assertEqual(calls, [1, 2, "categories", 1])
+
+            cache.clear_cache("categories")
+            categories()
+            job_detail(2)
+            self.assertEqual(calls, [1, 2, "categories", 1, "categories"])
+
+
+class TestStampedeProtection(unittest.TestCase):
+    """Concurrent misses share one computation; expired values refresh once"""
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.a = self.worker()
+        self.b = self.worker()
+        self.calls = []
+
+    def worker(self, redis=None):
+        return TieredCache(
+            "test",
+            default_ttl=60,
+            max_entries=100,
+            redis=redis or self.redis,
+            bus=InvalidationBus(),
+        )
+
+    def compute(self, value="fresh"):
+        def run():
+            self.calls.append(value)
+            return value
+
+        return run
+
+    def test_concurrent_misses_compute_once(self):
+        release = threading.Event()
+        results = []
+
+        def slow():
+            release.wait(2)
+            self.calls.append("slow")
+            return "summary"
+
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(self.a.get_or_compute("summary", slow))
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        self.assertTrue(eventually(lambda: self.a.coalesced == 7))
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ["summary"] * 8)
+        self.assertEqual(self.calls, ["slow"])
+        self.assertEqual(self.b.get_or_compute("summary", slow), "summary")
+        self.assertEqual(self.calls, ["slow"])  # Shared through Redis
+        self.assertFalse(any("~lock:" in key for key in self.redis.data))
+
+    def test_workers_wait_for_the_lock_holder(self):
+        token = self.a._lock("summary")
+        self.assertTrue(token)
+        self.assertIsNone(self.b._lock("summary"))
+
+        def finish():
+            time.sleep(0.05)
+            self.a.set("summary", "from a")
+            self.a._unlock("summary", token)
+
+        threading.Thread(target=finish).start()
+        self.assertEqual(self.b.get_or_compute("summary", self.compute()), "from a")
+        self.assertEqual(self.calls, [])
+
+        # A lock holder that never finishes delays others only so long
+        self.b._lock("stuck")
+        with mock.patch.object(cache_module, "RECOMPUTE_WAIT", 0.1):
+            self.assertEqual(self.a.get_or_compute("stuck", self.compute()), "fresh")
+        self.assertEqual(self.calls, ["fresh"])
+
+    def test_stale_while_revalidate(self):
+        clock = FakeClock()
+        refreshes = []
+        local = TieredCache("test", default_ttl=60, redis=False, bus=InvalidationBus())
+
+        def lookup(value):
+            return local.get_or_compute(
+                "popular",
+                self.compute(value),
+                ttl=10,
+                stale_ttl=30,
+                background=refreshes.append,
+            )
+
+        with (
+            mock.patch.object(cache_module.time, "monotonic", clock),
+            mock.patch.object(cache_module.time, "time", clock),
+        ):
+            self.assertEqual(lookup("v1"), "v1")
+            clock.now += 15  # Expired, within the stale window
+            self.assertEqual(lookup("v2"), "v1")
+            self.assertEqual(lookup("v2"), "v1")
+            self.assertEqual(len(refreshes), 1)  # One refresh for both callers
+            self.assertIsNone(local.get("popular"))
+
+            refreshes.pop()()
+            self.assertEqual(lookup("v3"), "v2")
+            self.assertEqual(self.calls, ["v1", "v2"])
+            self.assertEqual(local.stats()["stale_hits"], 2)
+
+            clock.now += 60  # Past the stale window: recompute inline
+            self.assertEqual(lookup("v4"), "v4")
+
+    def test_decorator_options(self):
+        app = Flask(__name__)
+        cache = ResponseCache(redis=False)
+        calls = []
+
+        @cache.cache_response(ttl=60, stale_ttl=60)
+        def stats():
+            calls.append(request.args.get("type"))
+            if request.args.get("type") == "broken":
+                return jsonify({"success": False}), 500
+            return jsonify({"success": True})
+
+        with app.test_request_context("/stats?type=jobs"):
+            stats()
+            self.assertEqual(stats().get_json(), {"success": True})
+        with app.test_request_context("/stats?type=providers"):
+            stats()
+        with app.test_request_context("/stats?type=broken"):
+            stats()
+            self.assertEqual(stats()[1], 500)
+        self.assertEqual(calls, ["jobs", "providers", "broken", "broken"])
+
+
+class TestModelInvalidation(unittest.TestCase):
+    """Committed model writes invalidate the tags of the records they touch"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.invalidated = []
+        patcher = mock.patch.object(
+            cache_invalidation, "invalidate_tags", self.invalidated.append
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        plumbing = ServiceCategory(name="Plumbing", slug="plumbing")
+        db.session.add(plumbing)
+        db.session.flush()
+        self.service = Service(category_id=plumbing.id, name="Leak", slug="leak")
+        db.session.add(self.service)
+        self.customer = self._user("customer@example.com", "customer")
+        self.provider = self._user("provider@example.com", "provider")
+        self.job = Job(
+            customer_id=self.customer.id,
+            service_id=self.service.id,
+            title="Fix leaking pipe",
+            description="Under the sink",
+            street_address="1 George Street",
+            city="Sydney",
+            state="NSW",
+            postcode="2000",
+            property_type="house",
+        )
+        db.session.add(self.job)
+        db.session.commit()
+        self.invalidated.clear()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _user(self, email, user_type):
+        user = User(
+            email=email,
+            password_hash="x",
+            first_name="Pat",
+            last_name="Lee",
+            user_type=user_type,
+        )
+        db.session.add(user)
+        db.session.flush()
+        return user
+
+    def test_job_update_tags_old_and_new_assignee(self):
+        self.job.assigned_provider_id = self.provider.id
+        db.session.commit()
+        self.job.assigned_provider_id = None
+        db.session.commit()
+
+        first, second = self.invalidated
+        job = self.job.id
+        for tags in (first, second):
+            self.assertTrue(
+                {f"job:{job}", f"customer:{self.customer.id}", "category:plumbing"}
+                <= tags
+            )
+            self.assertIn(f"provider:{self.provider.id}", tags)
+            self.assertIn("table:job", tags)
+
+    def test_related_models(self):
+        db.session.add(ProviderProfile(user_id=self.provider.id))
+        quote = Quote(job_id=self.job.id, provider_id=self.provider.id, price=100)
+        db.session.add(quote)
+        db.session.add(
+            Review(
+                job_id=self.job.id,
+                reviewer_id=self.customer.id,
+                reviewee_id=self.provider.id,
+                overall_rating=5,
+            )
+        )
+        db.session.commit()
+
+        (tags,) = self.invalidated
+        self.assertTrue(
+            {
+                f"provider:{self.provider.id}",
+                f"user:{self.provider.id}",
+                f"job:{self.job.id}",
+                f"quote:{quote.id}",
+                "table:provider_profile",
+                "table:quote",
+                "table:review",
+            }
+            <= tags
+        )
+
+    def test_rolled_back_writes_are_discarded(self):
+        self.job.title = "Changed"
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()
+        self.assertEqual(self.invalidated, [])
+
+    def test_rolled_back_savepoints_keep_outer_writes(self):
+        self.job.title = "Changed"
+        with db.session.begin_nested() as savepoint:
+            self.customer.first_name = "Sam"
+            savepoint.rollback()
+        db.session.commit()
+        self.assertEqual(len(self.invalidated), 1)
+        self.assertIn(f"job:{self.job.id}", self.invalidated[0])
+
+    def test_failed_invalidation_leaves_the_commit_alone(self):
+        with mock.patch.object(
+            cache_invalidation, "invalidate_tags", side_effect=RuntimeError("down")
+        ):
+            self.job.title = "Changed"
+            db.session.commit()
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Job, self.job.id).title, "Changed")
+        self.customer.first_name = "Sam"
+        db.session.commit()
+        self.assertEqual(len(self.invalidated), 1)  # Nothing left over
+        self.assertNotIn(f"job:{self.job.id}", self.invalidated[0])
+
+    def test_bulk_writes_tag_their_table(self):
+        Job.query.filter(Job.id == self.job.id).update({"title": "Bulk"})
+        db.session.commit()
+        self.assertEqual(self.invalidated, [{"table:job"}])
+
+    def test_table_version(self):
+        query = Job.query.filter(Job.customer_id == self.customer.id)
+        before = table_version(query, Job.updated_at)
+        self.assertEqual(before[0], 1)
+        self.assertEqual(table_version(query, Job.updated_at), before)
+        query.update({"updated_at": datetime(2030, 1, 1)})
+        db.session.commit()
+        self.assertNotEqual(table_version(query, Job.updated_at), before)
+
+    def test_tag_versions_read_other_workers_writes_without_redis(self):
+        # Patched invalidate_tags: this process never hears of the write, as
+        # with a write from another worker when there is no Redis
+        self.assertIsNone(cache_module.invalidation_bus.client)
+        before = tag_versions("table:job", "table:user", "not-a-table")
+        self.assertEqual(tag_versions("table:job", "table:user", "not-a-table"), before)
+        Job.query.update({"updated_at": datetime(2030, 1, 1)})
+        db.session.commit()
+        after = tag_versions("table:job", "table:user", "not-a-table")
+        self.assertNotEqual(after, before)
+        User.query.filter(User.id == self.provider.id).delete()
+        db.session.commit()
+        self.assertNotEqual(
+            tag_versions("table:job", "table:user", "not-a-table"), after
+        )
+
+    def test_cached_counts_follow_table_writes(self):
+        self.addCleanup(count_cache.clear)
+        query = Job.query.filter(Job.customer_id == self.customer.id)
+        self.assertEqual(cached_count(query), 1)
+        db.session.add(
+            Job(
+                customer_id=self.customer.id,
+                service_id=self.service.id,
+                title="Second",
+                description="Second job",
+                street_address="2 Pitt Street",
+                city="Sydney",
+                state="NSW",
+                postcode="2000",
+                property_type="house",
+            )
+        )
+        db.session.commit()
+        self.assertEqual(cached_count(query), 1)  # Patched: nothing invalidated
+
+        cache_module.invalidate_tags(self.invalidated[-1])
+        self.assertEqual(cached_count(query), 2)
+
+
+class TestConditionalRequests(unittest.TestCase):
+    """ETags from version counters; matching requests get 304 before the view"""
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.app = Flask(__name__)
+        self.client = self.app.test_client()
+        self.calls = []
+
+    def bus(self):
+        bus = InvalidationBus()
+        bus.client = self.redis  # Publishing side only; no subscriber thread
+        return bus
+
+    def test_tag_versions_are_shared_and_change_on_invalidation(self):
+        a, b = self.bus(), self.bus()
+        first = a.versions(["table:job", "table:user"])
+        self.assertEqual(b.versions(["table:job", "table:user"]), first)
+
+        a.invalidate_tags(["table:job"])
+        second = b.versions(["table:job", "table:user"])
+        self.assertNotEqual(second[0], first[0])
+        self.assertEqual(second[1], first[1])
+
+        # A lost version token restarts at a new value, never an old one
+        del self.redis.data[cache_module.TAG_VERSION_PREFIX + "table:user"]
+        self.assertNotEqual(a.versions(["table:user"]), [first[1]])
+
+        # Without Redis, tokens are per process and match no other process
+        local = InvalidationBus()
+        self.assertNotEqual(
+            local.versions(["table:job"]), InvalidationBus().versions(["table:job"])
+        )
+        before = local.versions(["table:job"])
+        local.invalidate_tags(["table:job"])
+        self.assertNotEqual(local.versions(["table:job"]), before)
+
+    def test_local_versions_expire_for_writes_by_other_workers(self):
+        # Two workers without Redis; only a writes
+        a, b = InvalidationBus(), InvalidationBus()
+        now = 1000 * cache_module.LOCAL_VERSION_WINDOW
+        with mock.patch.object(cache_module.time, "time", return_value=now):
+            before = b.versions(["table:job"])
+            a.invalidate_tags(["table:job"])
+            self.assertEqual(b.versions(["table:job"]), before)
+        later = now + cache_module.LOCAL_VERSION_WINDOW
+        with mock.patch.object(cache_module.time, "time", return_value=later):
+            self.assertNotEqual(b.versions(["table:job"]), before)
+
+    def test_matching_requests_skip_the_view(self):
+        version = {"value": 1}
+
+        @self.app.route("/jobs")
+        @conditional_response(lambda: version["value"])
+        def jobs():
+            self.calls.append(request.args.get("q"))
+            return jsonify({"jobs": []})
+
+        response = self.client.get("/jobs?q=tap")
+        etag = response.headers["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn("no-cache", response.headers["Cache-Control"])
+
+        response = self.client.get("/jobs?q=tap", headers={"If-None-Match": etag})
+        self.assertEqual((response.status_code, response.data), (304, b""))
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(self.calls, ["tap"])
+
+        # Other parameters or a new version mean a full response
+        response = self.client.get("/jobs?q=sink", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        version["value"] = 2
+        response = self.client.get("/jobs?q=tap", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.calls, ["tap", "sink", "tap"])
+
+    def test_failed_versions_and_errors_get_no_etag(self):
+        @self.app.route("/broken")
+        @conditional_response(lambda: 1 / 0)
+        def broken():
+            return jsonify({"ok": True})
+
+        @self.app.route("/error")
+        @conditional_response(lambda: 1)
+        def error():
+            return jsonify({"ok": False}), 500
+
+        self.assertNotIn("ETag", self.client.get("/broken").headers)
+        self.assertNotIn("ETag", self.client.get("/error").headers)
+
+    def test_cached_responses_carry_etags(self):
+        cache = ResponseCache(redis=False)
+
+        @self.app.route("/stats")
+        @cache.cache_response(ttl=60, stale_ttl=60, etag=True)
+        def stats():
+            self.calls.append("stats")
+            return jsonify({"jobs": 3})
+
+        etag = self.client.get("/stats").headers["ETag"]
+        response = self.client.get("/stats", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get("/stats")
+        self.assertEqual(
+            (response.status_code, response.get_json()), (200, {"jobs": 3})
+        )
+        self.assertEqual(self.calls, ["stats"])
+
+
+if __name__ == "__main__":
+    unittest.main()
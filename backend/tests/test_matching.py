@@ -0,0 +1,1353 @@
+"""
+Matching tests for Biped Platform
+Tests SmartMatchingEngine batch scoring against the per-provider scoring
+path on an in-memory SQLite database, and the distance kernels against
+WGS84 geodesics.
+"""
+
+import os
+import re
+import sys
+import tempfile
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest import mock
+
+# Add the backend directory to the path so ``src`` imports resolve
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import ai_engine  # noqa: E402
+import benchmark_matching  # noqa: E402
+import numpy as np  # noqa: E402
+from ai_engine import BipedAIEngine, JobRequirement, Provider  # noqa: E402
+from flask import Flask  # noqa: E402
+from geopy.distance import geodesic  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.dialects import postgresql  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from src.models import db  # noqa: E402
+from src.models.admin import Admin  # noqa: E402
+from src.models.job import Job, JobStatus  # noqa: E402
+from src.models.job_match import JobMatch, JobMatchList  # noqa: E402
+from src.models.matching_weights import MatchingWeights  # noqa: E402
+from src.models.provider_feature import ProviderFeature  # noqa: E402
+from src.models.review import Review  # noqa: E402
+from src.models.service import Service, ServiceCategory  # noqa: E402
+from src.models.user import ProviderProfile, User  # noqa: E402
+from src.routes.smart_matching import (  # noqa: E402
+    SmartMatchingEngine,
+    smart_matching_bp,
+)
+from src.services import (  # noqa: E402
+    batch_matching,
+    candidate_index,
+    grid_index,
+    job_index,
+    match_materializer,
+    matching_weights,
+    provider_features,
+    provider_skills,
+)
+from src.services.geo_search import haversine_km  # noqa: E402
+from src.services.search_cache import search_cache  # noqa: E402
+from src.utils.geo_distance import (  # noqa: E402
+    equirectangular_km_array,
+    haversine_km_array,
+)
+
+SYDNEY = (-33.8688, 151.2093)
+
+AUSTRALIAN_PLACES = {
+    "Sydney": SYDNEY,
+    "Parramatta": (-33.8150, 151.0011),
+    "Bondi": (-33.8915, 151.2767),
+    "Penrith": (-33.7507, 150.6877),
+    "Newcastle": (-32.9283, 151.7817),
+    "Wollongong": (-34.4278, 150.8931),
+    "Canberra": (-35.2809, 149.1300),
+    "Melbourne": (-37.8136, 144.9631),
+    "Geelong": (-38.1499, 144.3617),
+    "Brisbane": (-27.4698, 153.0251),
+    "Gold Coast": (-28.0167, 153.4000),
+    "Perth": (-31.9505, 115.8605),
+    "Fremantle": (-32.0569, 115.7439),
+    "Adelaide": (-34.9285, 138.6007),
+    "Hobart": (-42.8821, 147.3272),
+    "Darwin": (-12.4634, 130.8456),
+    "Cairns": (-16.9186, 145.7781),
+}
+
+
+class MatchingTestCase(unittest.TestCase):
+    """Base class creating an app with one job and a pool of providers"""
+
+    def setUp(self):
+        # A database file rather than in-memory SQLite, whose single shared
+        # connection would let the weights registry's own reads roll back
+        # the session under test
+        self.directory = tempfile.TemporaryDirectory()
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = (
+            f"sqlite:///{self.directory.name}/matching.db"
+        )
+        self.app.config["TESTING"] = True
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        matching_weights.weight_registry.refresh()
+        self.engine = SmartMatchingEngine()
+        self._seed()
+        candidate_index.build_candidate_index()
+        job_index.build_open_job_index()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.ctx.pop()
+        self.directory.cleanup()
+
+    def _seed(self):
+        plumbing = ServiceCategory(name="Plumbing", slug="plumbing")
+        db.session.add(plumbing)
+        db.session.flush()
+        service = Service(category_id=plumbing.id, name="Leak Repair", slug="leak")
+        db.session.add(service)
+
+        self.customer = self._user("customer@example.com", "customer")
+        self.job = Job(
+            customer_id=self.customer.id,
+            service_id=service.id,
+            title="Fix leaking pipe",
+            description="Under the sink",
+            street_address="1 George Street",
+            city="Sydney",
+            state="NSW",
+            postcode="2000",
+            latitude=SYDNEY[0],
+            longitude=SYDNEY[1],
+            budget_min=200,
+            budget_max=400,
+            property_type="residential",
+            status=JobStatus.POSTED,
+        )
+        db.session.add(self.job)
+        db.session.flush()
+
+        # A spread of skills, rates, experience, locations and ratings
+        skill_sets = [
+            "Plumbing",
+            "pipe fitting, drain cleaning",
+            "Electrical",
+            "",
+            "water heaters, Plumbing",
+            "painting",
+        ]
+        for index in range(30):
+            user = self._user(f"provider{index}@example.com", "provider")
+            located = index % 3 != 0
+            db.session.add(
+                ProviderProfile(
+                    user_id=user.id,
+                    skills=skill_sets[index % len(skill_sets)] or None,
+                    hourly_rate=None if index % 7 == 0 else 40 + index * 5,
+                    years_experience=None if index % 5 == 0 else index % 12,
+                    availability="weekdays" if index % 4 else None,
+                    service_area="Sydney, Parramatta" if index % 2 else "Melbourne",
+                    service_radius=10 + index,
+                    latitude=SYDNEY[0] + index * 0.05 if located else None,
+                    longitude=SYDNEY[1] if located else None,
+                )
+            )
+            for rating in range(index % 4):
+                db.session.add(
+                    Review(
+                        job_id=self.job.id,
+                        reviewer_id=self.customer.id,
+                        reviewee_id=user.id,
+                        overall_rating=5 - rating,
+                    )
+                )
+            for _ in range(index % 8 if index % 2 else 0):
+                db.session.add(self._assigned_job(service.id, user.id))
+        db.session.commit()
+
+    def _user(self, email, user_type):
+        user = User(
+            email=email,
+            password_hash="x",
+            first_name="Pat",
+            last_name=email.split("@")[0].title(),
+            user_type=user_type,
+        )
+        db.session.add(user)
+        db.session.flush()
+        return user
+
+    def _assigned_job(self, service_id, provider_user_id):
+        return Job(
+            customer_id=self.customer.id,
+            service_id=service_id,
+            assigned_provider_id=provider_user_id,
+            title="Earlier job",
+            description="Busy",
+            street_address="2 Pitt Street",
+            city="Sydney",
+            state="NSW",
+            postcode="2000",
+            property_type="residential",
+            status=JobStatus.IN_PROGRESS,
+            created_at=datetime.utcnow(),
+        )
+
+    @contextmanager
+    def count_queries(self):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+
+
+class TestBatchScoring(MatchingTestCase):
+    """Vectorized scores agree with the per-provider calculate_* methods"""
+
+    def test_components_match_scalar_scoring(self):
+        features = batch_matching.ProviderFeatures.load()
+        overall, components = batch_matching.BatchScorer(self.engine.weights).score(
+            self.job, features
+        )
+        self.assertEqual(len(features), 30)
+
+        for row, profile_id in enumerate(features.profile_ids):
+            provider = db.session.get(ProviderProfile, int(profile_id))
+            expected_overall, expected = self.engine.calculate_match_score(
+                self.job, provider
+            )
+            for factor, value in expected.items():
+                self.assertAlmostEqual(
+                    components[factor][row], value, places=9, msg=factor
+                )
+            self.assertAlmostEqual(overall[row], expected_overall, places=9)
+
+    def test_find_matches_returns_top_scores_in_order(self):
+        matches = self.engine.find_matches(self.job.id, limit=5)
+        self.assertEqual(len(matches), 5)
+
+        every = self.engine.find_matches(self.job.id, limit=100)
+        self.assertEqual(len(every), len(candidate_index.match_candidates(self.job)))
+        scores = [match["overall_score"] for match in every]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(matches, every[:5])
+        self.assertEqual(every[0]["provider_name"].split()[0], "Pat")
+
+    def test_query_count_is_independent_of_candidates(self):
+        job_id = self.job.id
+
+        def queries():
+            db.session.expire_all()
+            with self.count_queries() as statements:
+                self.engine.compute_matches(db.session.get(Job, job_id), limit=10)
+            return len(statements)
+
+        before = queries()
+        for index in range(30, 40):
+            user = self._user(f"provider{index}@example.com", "provider")
+            db.session.add(ProviderProfile(user_id=user.id, skills="Plumbing"))
+        db.session.commit()
+        self.assertEqual(queries(), before)
+        self.assertEqual(before, 5)  # Job, service, category, 2 feature queries
+
+    def test_top_k_breaks_ties_by_row(self):
+        scores = np.array([0.5, 0.9, 0.5, 0.1, 0.9])
+        self.assertEqual(list(batch_matching.top_k(scores, 3)), [1, 4, 0])
+        self.assertEqual(list(batch_matching.top_k(scores, 10)), [1, 4, 0, 2, 3])
+        self.assertEqual(list(batch_matching.top_k(scores, 0)), [])
+
+
+class TestProviderFeatureStore(MatchingTestCase):
+    """Feature rows follow review, job and profile writes"""
+
+    def features(self, user):
+        db.session.expire_all()
+        return ProviderFeature.query.filter_by(user_id=user.id).one()
+
+    def test_rows_follow_writes(self):
+        user = self._user("new@example.com", "provider")
+        db.session.add(ProviderProfile(user_id=user.id))
+        db.session.commit()
+        row = self.features(user)
+        self.assertEqual((row.average_rating, row.review_count), (None, 0))
+
+        for rating in (5, 4):
+            db.session.add(
+                Review(
+                    job_id=self.job.id,
+                    reviewer_id=self.customer.id,
+                    reviewee_id=user.id,
+                    overall_rating=rating,
+                )
+            )
+        job = self._assigned_job(self.job.service_id, user.id)
+        db.session.add(job)
+        db.session.commit()
+        row = self.features(user)
+        self.assertEqual((row.average_rating, row.review_count), (4.5, 2))
+        self.assertEqual((row.active_jobs, row.completed_jobs), (1, 0))
+
+        job.status = JobStatus.COMPLETED
+        user.provider_profile.latitude = SYDNEY[0]
+        user.provider_profile.longitude = SYDNEY[1]
+        db.session.commit()
+        row = self.features(user)
+        self.assertEqual((row.active_jobs, row.completed_jobs), (0, 1))
+        self.assertEqual((row.latitude, row.longitude), SYDNEY)
+
+    def test_reassigned_job_moves_load(self):
+        first = self._user("first@example.com", "provider")
+        second = self._user("second@example.com", "provider")
+        db.session.add_all(
+            [ProviderProfile(user_id=first.id), ProviderProfile(user_id=second.id)]
+        )
+        job = self._assigned_job(self.job.service_id, first.id)
+        db.session.add(job)
+        db.session.commit()
+
+        job.assigned_provider_id = second.id
+        db.session.commit()
+        self.assertEqual(self.features(first).active_jobs, 0)
+        self.assertEqual(self.features(second).active_jobs, 1)
+
+    def test_rolled_back_writes_leave_rows(self):
+        provider = ProviderProfile.query.first()
+        before = self.features(provider.user).to_dict()
+        db.session.add(
+            Review(
+                job_id=self.job.id,
+                reviewer_id=self.customer.id,
+                reviewee_id=provider.user_id,
+                overall_rating=1,
+            )
+        )
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual(self.features(provider.user).to_dict(), before)
+
+    def test_two_sessions_writing_for_one_provider(self):
+        provider = ProviderProfile.query.first()
+        user_id = provider.user_id
+        reviews = Review.query.filter_by(reviewee_id=user_id).count()
+        db.session.execute(db.delete(ProviderFeature))
+        db.session.commit()
+
+        def review(rating):
+            return Review(
+                job_id=self.job.id,
+                reviewer_id=self.customer.id,
+                reviewee_id=user_id,
+                overall_rating=rating,
+            )
+
+        locks = []
+
+        def record_locks(connection, statement, *args):
+            sql = str(statement.compile(dialect=postgresql.dialect()))
+            if "FROM provider_profile" in sql and "FOR UPDATE" in sql:
+                locks.append(sql)
+
+        event.listen(db.engine, "before_execute", record_locks)
+        other = Session(db.engine)
+        try:
+            other.get(ProviderProfile, provider.id)  # Read before the first write
+            db.session.add(review(5))
+            db.session.commit()  # Inserts the missing row
+            other.add(review(1))
+            other.commit()  # Updates it, with both reviews counted
+        finally:
+            other.close()
+            event.remove(db.engine, "before_execute", record_locks)
+
+        self.assertEqual(len(locks), 2)
+        row = self.features(provider.user)
+        self.assertEqual(row.review_count, reviews + 2)
+        self.assertEqual(ProviderFeature.query.filter_by(user_id=user_id).count(), 1)
+
+    def test_rebuild_matches_incremental_rows(self):
+        def rows():
+            db.session.expire_all()
+            return {
+                row.provider_id: {
+                    key: value
+                    for key, value in row.to_dict().items()
+                    if key != "updated_at"
+                }
+                for row in ProviderFeature.query.all()
+            }
+
+        incremental = rows()
+        db.session.execute(db.delete(ProviderFeature))
+        db.session.commit()
+        self.assertEqual(provider_features.rebuild_provider_features(), 30)
+        self.assertEqual(rows(), incremental)
+
+    def test_matching_reads_no_reviews_or_jobs(self):
+        job_id = self.job.id
+        db.session.expire_all()
+        with self.count_queries() as statements:
+            self.engine.find_matches(job_id, limit=5)
+        tables = " ".join(statements)
+        self.assertNotIn("FROM review", tables)
+        # Only the job being matched
+        self.assertEqual(len(re.findall(r"FROM job\b", tables)), 1)
+
+
+class TestCandidateIndex(MatchingTestCase):
+    """The index keeps exactly the providers in the job's trade and range"""
+
+    def plausible(self, latitude, longitude, category="Plumbing"):
+        trades = candidate_index.category_trades(category)
+        expected = []
+        for provider in ProviderProfile.query.order_by(ProviderProfile.id):
+            slugs = provider_skills.parse_skills(provider.skills)
+            if not trades & candidate_index.provider_trades(slugs):
+                continue
+            if provider.latitude is not None and latitude is not None:
+                distance = haversine_km(
+                    provider.latitude, provider.longitude, latitude, longitude
+                )
+                if distance > provider.service_radius:
+                    continue
+            expected.append(provider.id)
+        return expected
+
+    def test_candidates_match_brute_force(self):
+        for latitude in (SYDNEY[0], SYDNEY[0] + 0.3, SYDNEY[0] + 1.2, None):
+            self.job.latitude = latitude
+            self.job.longitude = None if latitude is None else SYDNEY[1]
+            candidates = candidate_index.match_candidates(self.job)
+            self.assertEqual(candidates, self.plausible(latitude, SYDNEY[1]))
+        self.assertGreater(len(candidates), 0)
+
+    def test_matches_only_score_candidates(self):
+        candidates = candidate_index.match_candidates(self.job)
+        matches = self.engine.find_matches(self.job.id, limit=100)
+        user_ids = {
+            provider.user_id
+            for provider in ProviderProfile.query.filter(
+                ProviderProfile.id.in_(candidates)
+            )
+        }
+        self.assertEqual({match["provider_id"] for match in matches}, user_ids)
+
+    def test_index_follows_committed_writes(self):
+        user = self._user("far@example.com", "provider")
+        profile = ProviderProfile(
+            user_id=user.id, skills="Plumbing", latitude=-37.81, longitude=144.96
+        )
+        db.session.add(profile)
+        db.session.commit()
+        self.assertNotIn(profile.id, candidate_index.match_candidates(self.job))
+
+        profile.latitude, profile.longitude = SYDNEY
+        db.session.commit()
+        self.assertIn(profile.id, candidate_index.match_candidates(self.job))
+
+        profile.skills = "painting"
+        db.session.flush()
+        db.session.rollback()
+        self.assertIn(profile.id, candidate_index.match_candidates(self.job))
+
+        profile_id = profile.id
+        db.session.delete(profile)
+        db.session.commit()
+        self.assertNotIn(profile_id, candidate_index.match_candidates(self.job))
+
+    def _category_job(self, name, slug):
+        category = ServiceCategory(name=name, slug=slug)
+        db.session.add(category)
+        db.session.flush()
+        service = Service(category_id=category.id, name=name, slug=f"{slug}-job")
+        db.session.add(service)
+        db.session.flush()
+        job = Job(
+            customer_id=self.customer.id,
+            service_id=service.id,
+            title="Rewire and replumb",
+            description="Renovation",
+            street_address="3 George Street",
+            city="Sydney",
+            state="NSW",
+            postcode="2000",
+            latitude=SYDNEY[0],
+            longitude=SYDNEY[1],
+            property_type="residential",
+            status=JobStatus.POSTED,
+        )
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    def test_multi_word_categories_map_to_trades(self):
+        self.assertEqual(
+            candidate_index.category_trades("Plumbing & Electrical"),
+            {"plumbing electrical", "plumbing", "electrical"},
+        )
+        self.assertIn(
+            "cleaning", candidate_index.category_trades("Cleaning & Maintenance")
+        )
+
+        job = self._category_job("Plumbing & Electrical", "plumbing-electrical")
+        candidates = candidate_index.match_candidates(job)
+        self.assertEqual(
+            candidates, self.plausible(*SYDNEY, category="Plumbing & Electrical")
+        )
+        skills = {
+            provider.skills
+            for provider in ProviderProfile.query.filter(
+                ProviderProfile.id.in_(candidates)
+            )
+        }
+        self.assertTrue({"Plumbing", "Electrical"} <= skills)
+        self.assertEqual(
+            len(self.engine.compute_matches(job, limit=100)), len(candidates)
+        )
+
+    def test_categories_without_providers_score_everyone(self):
+        job = self._category_job("Tech & Digital", "tech-digital")
+        self.assertIsNone(candidate_index.match_candidates(job))
+        self.assertEqual(
+            len(self.engine.compute_matches(job, limit=100)),
+            ProviderProfile.query.count(),
+        )
+
+    def test_cells_wrap_the_antimeridian(self):
+        cells = grid_index.covered_cells(-17.7, 179.9, 50)
+        columns = {column for _, column in cells}
+        self.assertIn(grid_index.cell_of(0, -179.9)[1], columns)
+        self.assertIn(grid_index.cell_of(0, 179.9)[1], columns)
+
+
+class TestMatchMaterializer(MatchingTestCase):
+    """Open jobs keep a precomputed top-N list that follows writes"""
+
+    def setUp(self):
+        super().setUp()
+        self.materializer = match_materializer.match_materializer
+        self.materializer.run_pending()  # Work marked by seeding
+
+    def stored(self, job_id):
+        return JobMatch.query.filter_by(job_id=job_id).order_by(JobMatch.rank).all()
+
+    def test_find_matches_reads_the_stored_list(self):
+        job_id = self.job.id
+        computed = self.engine.find_matches(job_id, limit=5)
+        self.assertEqual([row.match for row in self.stored(job_id)][:5], computed)
+
+        db.session.expire_all()
+        with self.count_queries() as statements:
+            self.assertEqual(self.engine.find_matches(job_id, limit=5), computed)
+        self.assertEqual(len(statements), 2)  # The job and its list
+
+    def computed_at(self, job_id):
+        return db.session.get(JobMatchList, job_id).computed_at
+
+    def test_max_age_rescores_old_lists(self):
+        job_id = self.job.id
+        self.engine.find_matches(job_id)
+        old = datetime.utcnow() - timedelta(hours=1)
+        JobMatchList.query.filter_by(job_id=job_id).update({"computed_at": old})
+        db.session.commit()
+
+        self.engine.find_matches(job_id, max_age=3600 * 2)
+        self.assertEqual(self.materializer.pending, 0)
+        matches = self.engine.find_matches(job_id, max_age=60)
+        self.assertEqual(
+            matches, self.engine.compute_matches(db.session.get(Job, job_id))
+        )
+        # Reads never write; the list is refreshed by the next pass
+        db.session.expire_all()
+        self.assertEqual(self.computed_at(job_id), old)
+        self.assertEqual(self.materializer.run_pending(), 1)
+        self.assertGreater(self.computed_at(job_id), old)
+
+    def test_jobs_without_candidates_store_an_empty_list(self):
+        electrical = ServiceCategory(name="Electrical", slug="electrical")
+        db.session.add(electrical)
+        db.session.flush()
+        wiring = Service(category_id=electrical.id, name="Wiring", slug="wiring")
+        db.session.add(wiring)
+        db.session.flush()
+        # No electrician covers Perth
+        job = Job(
+            customer_id=self.customer.id,
+            service_id=wiring.id,
+            title="Rewire",
+            description="Old house",
+            street_address="1 Hay Street",
+            city="Perth",
+            state="WA",
+            postcode="6000",
+            latitude=-31.95,
+            longitude=115.86,
+            property_type="residential",
+            status=JobStatus.POSTED,
+        )
+        db.session.add(job)
+        db.session.commit()
+        self.materializer.run_pending()
+        job_id = job.id
+        self.assertEqual(db.session.get(JobMatchList, job_id).size, 0)
+
+        db.session.expire_all()
+        with mock.patch.object(self.engine, "compute_matches") as compute:
+            with self.count_queries() as statements:
+                self.assertEqual(self.engine.find_matches(job_id), [])
+        compute.assert_not_called()
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(self.materializer.pending, 0)
+
+    def test_stored_lists_are_upserted(self):
+        job_id = self.job.id
+        self.materializer.materialize(db.session, job_id)
+        self.materializer.materialize(db.session, job_id)  # Same keys again
+        db.session.commit()
+        size = len(self.stored(job_id))
+        self.assertGreater(size, 2)
+
+        match_materializer.store_matches(
+            db.session, job_id, [row.match for row in self.stored(job_id)[:2]]
+        )
+        db.session.commit()
+        self.assertEqual(len(self.stored(job_id)), 2)
+        self.assertEqual(db.session.get(JobMatchList, job_id).size, 2)
+
+    def test_one_leader_runs_passes_for_every_worker(self):
+        from test_cache import FakeRedis
+
+        redis = FakeRedis()
+        leader = match_materializer.MatchMaterializer()
+        follower = match_materializer.MatchMaterializer()
+        for worker in (leader, follower):
+            worker.redis = redis
+            worker.bind(self.engine)
+        self.assertTrue(leader.lead())
+        self.assertFalse(follower.lead())
+        self.assertTrue(leader.lead())  # Renewed
+
+        JobMatchList.query.delete()
+        db.session.commit()
+        follower.mark([self.job.id])
+        self.assertEqual(follower.pending, 0)  # Queued in Redis
+        self.assertEqual(leader.run_pending(), 1)
+        self.assertIsNotNone(db.session.get(JobMatchList, self.job.id))
+        self.assertEqual(leader.run_pending(), 0)
+
+    def test_posted_and_closed_jobs(self):
+        job = Job(
+            customer_id=self.customer.id,
+            service_id=self.job.service_id,
+            title="Blocked drain",
+            description="Kitchen",
+            street_address="3 Park Street",
+            city="Sydney",
+            state="NSW",
+            postcode="2000",
+            latitude=SYDNEY[0],
+            longitude=SYDNEY[1],
+            property_type="residential",
+            status=JobStatus.POSTED,
+        )
+        db.session.add(job)
+        db.session.commit()
+        self.assertEqual(self.materializer.run_pending(), 1)
+        self.assertEqual(
+            [row.match for row in self.stored(job.id)],
+            self.engine.compute_matches(job, match_materializer.MATCH_LIST_SIZE),
+        )
+
+        job.status = JobStatus.CANCELLED
+        db.session.commit()
+        self.materializer.run_pending()
+        self.assertEqual(self.stored(job.id), [])
+
+    def test_provider_changes_refresh_affected_jobs(self):
+        job_id = self.job.id
+        self.engine.find_matches(job_id)
+        listed = self.stored(job_id)[-1].provider_id
+        db.session.add(
+            Review(
+                job_id=job_id,
+                reviewer_id=self.customer.id,
+                reviewee_id=listed,
+                overall_rating=5,
+            )
+        )
+        db.session.commit()
+        self.assertEqual(self.materializer.run_pending(), 1)
+        self.assertEqual(
+            [row.match for row in self.stored(job_id)],
+            self.engine.compute_matches(
+                db.session.get(Job, job_id), match_materializer.MATCH_LIST_SIZE
+            ),
+        )
+
+        # A painter in Melbourne cannot match the Sydney plumbing job
+        user = self._user("painter@example.com", "provider")
+        db.session.add(
+            ProviderProfile(
+                user_id=user.id, skills="painting", latitude=-37.81, longitude=144.96
+            )
+        )
+        db.session.commit()
+        self.assertEqual(self.materializer.run_pending(), 0)
+
+
+class TestJobFeed(MatchingTestCase):
+    """A provider's open jobs, scored in one pass, paginated and cached"""
+
+    def setUp(self):
+        super().setUp()
+        search_cache.clear()
+        electrical = ServiceCategory(name="Electrical", slug="electrical")
+        db.session.add(electrical)
+        db.session.flush()
+        wiring = Service(category_id=electrical.id, name="Wiring", slug="wiring")
+        db.session.add(wiring)
+        db.session.flush()
+        for index in range(12):
+            service_id = wiring.id if index % 4 == 3 else self.job.service_id
+            located = index % 5 != 4
+            db.session.add(
+                Job(
+                    customer_id=self.customer.id,
+                    service_id=service_id,
+                    title=f"Open job {index}",
+                    description="Open",
+                    street_address=f"{index} Sydney Road",
+                    city="Sydney",
+                    state="NSW",
+                    postcode="2000",
+                    latitude=SYDNEY[0] + index * 0.01 if located else None,
+                    longitude=SYDNEY[1] if located else None,
+                    budget_min=100 * index or None,
+                    budget_max=(150 * index or None) if index % 3 else None,
+                    property_type="residential",
+                    status=JobStatus.POSTED,
+                )
+            )
+        db.session.commit()
+        # A located plumber (see MatchingTestCase._seed)
+        self.provider = ProviderProfile.query.filter_by(
+            user_id=User.query.filter_by(email="provider4@example.com").one().id
+        ).one()
+
+    def feed_ids(self, feed):
+        return [result["job"]["id"] for result in feed["results"]]
+
+    def test_feed_matches_candidates_and_scalar_scores(self):
+        feed = self.engine.find_jobs(self.provider.user_id, per_page=100)
+        open_jobs = Job.query.filter(Job.status == JobStatus.POSTED).all()
+        expected = [
+            job.id
+            for job in open_jobs
+            if self.provider.id in candidate_index.match_candidates(job)
+        ]
+        self.assertEqual(sorted(self.feed_ids(feed)), sorted(expected))
+        self.assertGreater(len(expected), 3)
+
+        for result in feed["results"]:
+            job = db.session.get(Job, result["job"]["id"])
+            overall, components = self.engine.calculate_match_score(job, self.provider)
+            self.assertAlmostEqual(result["overall_score"], round(overall, 3))
+            for factor, value in components.items():
+                self.assertAlmostEqual(
+                    result["component_scores"][factor], round(value, 3), msg=factor
+                )
+        scores = [result["overall_score"] for result in feed["results"]]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_multi_word_category_jobs_reach_the_feed(self):
+        category = ServiceCategory(
+            name="Plumbing & Electrical", slug="plumbing-electrical"
+        )
+        db.session.add(category)
+        db.session.flush()
+        service = Service(category_id=category.id, name="Rewire", slug="rewire")
+        db.session.add(service)
+        db.session.flush()
+        job = Job(
+            customer_id=self.customer.id,
+            service_id=service.id,
+            title="Rewire and replumb",
+            description="Renovation",
+            street_address="5 Sydney Road",
+            city="Sydney",
+            state="NSW",
+            postcode="2000",
+            latitude=self.provider.latitude,
+            longitude=self.provider.longitude,
+            property_type="residential",
+            status=JobStatus.POSTED,
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        self.assertIn(self.provider.id, candidate_index.match_candidates(job))
+        feed = self.engine.find_jobs(self.provider.user_id, per_page=100)
+        self.assertIn(job.id, self.feed_ids(feed))
+
+    def test_pages_cover_the_ranking(self):
+        full = self.engine.find_jobs(self.provider.user_id, per_page=100)
+        first = self.engine.find_jobs(self.provider.user_id, page=1, per_page=3)
+        second = self.engine.find_jobs(self.provider.user_id, page=2, per_page=3)
+        self.assertEqual(
+            self.feed_ids(first) + self.feed_ids(second), self.feed_ids(full)[:6]
+        )
+        self.assertTrue(first["pagination"]["has_next"])
+        self.assertEqual(first["pagination"]["total_count"], len(full["results"]))
+        with self.assertRaises(ValueError):
+            self.engine.find_jobs(self.provider.user_id, per_page=0)
+        self.assertIsNone(self.engine.find_jobs(self.customer.id))
+
+    def test_feed_is_cached_until_the_provider_changes(self):
+        user_id = self.provider.user_id
+        self.engine.find_jobs(user_id)
+        misses = search_cache.misses
+        db.session.expire_all()
+        with self.count_queries() as statements:
+            self.engine.find_jobs(user_id)
+        self.assertEqual(len(statements), 1)  # The page's jobs
+        self.assertEqual(search_cache.misses, misses)
+
+        self.provider.hourly_rate = 500
+        db.session.commit()
+        feed = self.engine.find_jobs(user_id)
+        self.assertEqual(search_cache.misses, misses + 1)
+        self.assertEqual(
+            {
+                result["component_scores"]["price_compatibility"]
+                for result in feed["results"]
+            }
+            - {0.2, 0.5},
+            set(),
+        )
+
+    def test_closed_jobs_leave_the_feed(self):
+        job_id = self.feed_ids(self.engine.find_jobs(self.provider.user_id))[0]
+        db.session.get(Job, job_id).status = JobStatus.CANCELLED
+        db.session.commit()
+        self.assertNotIn(
+            job_id, self.feed_ids(self.engine.find_jobs(self.provider.user_id))
+        )
+
+
+class TestMatchingWeights(MatchingTestCase):
+    """Weights are versioned in the database and stamped on every score"""
+
+    def setUp(self):
+        super().setUp()
+        search_cache.clear()
+        self.registry = matching_weights.weight_registry
+        self.materializer = match_materializer.match_materializer
+        self.materializer.run_pending()
+
+    def test_defaults_until_published(self):
+        self.assertEqual(self.registry.current(), (0, matching_weights.DEFAULT_WEIGHTS))
+        self.assertEqual(self.engine.weights, matching_weights.DEFAULT_WEIGHTS)
+        matches = self.engine.find_matches(self.job.id)
+        self.assertEqual({match["weights_version"] for match in matches}, {0})
+
+    def test_publishing_requires_an_admin(self):
+        self.app.secret_key = "test"
+        self.app.register_blueprint(smart_matching_bp)
+        client = self.app.test_client()
+        body = {"weights": {"skills_match": 0.35, "experience_level": 0.0}}
+
+        response = client.post("/api/smart-matching/update-weights", json=body)
+        self.assertEqual(response.status_code, 401)
+        with client.session_transaction() as user_session:
+            user_session["user_id"] = self.customer.id
+        response = client.post("/api/smart-matching/update-weights", json=body)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.registry.version, 0)
+        self.assertEqual(self.materializer.pending, 0)
+
+        with client.session_transaction() as admin_session:
+            admin_session["admin_id"] = 1
+        response = client.post("/api/smart-matching/update-weights", json=body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.registry.version, 1)
+
+    def test_published_versions_record_the_admin(self):
+        self.app.secret_key = "test"
+        self.app.register_blueprint(smart_matching_bp)
+        client = self.app.test_client()
+        provider = User.query.filter_by(email="provider5@example.com").one()
+        admin = Admin(
+            username="ops",
+            email="ops@example.com",
+            password_hash="x",
+            first_name="Ops",
+            last_name="Admin",
+        )
+        db.session.add(admin)
+        db.session.commit()
+        self.assertNotEqual(admin.id, provider.id)
+
+        # Also signed in to the marketplace, as another user
+        with client.session_transaction() as admin_session:
+            admin_session["admin_id"] = admin.id
+            admin_session["user_id"] = provider.id
+        response = client.post(
+            "/api/smart-matching/update-weights",
+            json={"weights": {"skills_match": 0.35, "experience_level": 0.0}},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(db.session.get(MatchingWeights, 1).created_by, admin.id)
+
+    def test_refresh_leaves_the_callers_session_alone(self):
+        user = self._user("pending@example.com", "provider")  # Flushed only
+        self.registry.refresh()
+        with mock.patch.object(
+            matching_weights, "select", side_effect=RuntimeError("db down")
+        ):
+            self.assertEqual(self.registry.refresh(), 0)
+        db.session.commit()
+        self.assertIsNotNone(User.query.filter_by(email=user.email).first())
+
+    def test_refresh_reads_on_its_own_connection(self):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(f"sqlite:///{directory}/weights.db")
+            db.metadata.create_all(engine)
+            session = Session(engine)
+            try:
+                session.add(MatchingWeights(weights=matching_weights.DEFAULT_WEIGHTS))
+                session.flush()
+                registry = matching_weights.WeightRegistry()
+                self.assertEqual(registry.refresh(session), 0)  # Not committed
+                session.commit()
+                self.assertEqual(registry.refresh(session), 1)
+            finally:
+                session.close()
+                engine.dispose()
+
+    def test_publish_validates_and_versions(self):
+        for bad in (
+            {"charisma": 0.1},
+            {"skills_match": -0.25, "location_proximity": 0.70},
+            {"skills_match": 0.5},
+            {"skills_match": "high"},
+        ):
+            with self.assertRaises(ValueError, msg=bad):
+                self.registry.publish(bad)
+        self.assertEqual(MatchingWeights.query.count(), 0)
+
+        # Partial updates keep the other factors
+        version, weights = self.registry.publish(
+            {"skills_match": 0.35, "experience_level": 0.0}
+        )
+        self.assertEqual(version, 1)
+        self.assertEqual(weights["skills_match"], 0.35)
+        self.assertEqual(weights["rating_score"], 0.20)
+        version, _ = self.registry.publish({"skills_match": 0.25, "availability": 0.25})
+        self.assertEqual(version, 2)
+        self.assertEqual(self.engine.weights_version, 2)
+        self.assertEqual(MatchingWeights.query.count(), 2)
+
+    def test_other_workers_poll_for_new_versions(self):
+        worker = matching_weights.WeightRegistry(poll_interval=3600)
+        self.assertEqual(worker.current()[0], 0)
+        version, weights = self.registry.publish(
+            {"skills_match": 0.35, "experience_level": 0.0}
+        )
+        self.assertEqual(worker.current()[0], 0)  # Not due to poll yet
+
+        worker.poll_interval = 0
+        self.assertEqual(worker.current(), (version, weights))
+
+    def test_lists_from_other_versions_are_rescored(self):
+        job_id = self.job.id
+        self.engine.find_matches(job_id)
+        JobMatch.query.update({"computed_at": datetime(2000, 1, 1)})
+        db.session.commit()
+
+        # Published by another worker: this one learns on its next poll
+        db.session.add(
+            MatchingWeights(
+                weights={
+                    **matching_weights.DEFAULT_WEIGHTS,
+                    "skills_match": 0.35,
+                    "experience_level": 0.0,
+                }
+            )
+        )
+        db.session.commit()
+        self.assertEqual(self.engine.find_matches(job_id)[0]["weights_version"], 0)
+
+        self.registry.invalidate()
+        matches = self.engine.find_matches(job_id)
+        self.assertEqual({match["weights_version"] for match in matches}, {1})
+        self.materializer.run_pending()  # The job was marked by the read
+        stored = JobMatch.query.filter_by(job_id=job_id).all()
+        self.assertEqual({row.weights_version for row in stored}, {1})
+        self.assertEqual(
+            matches,
+            self.engine.compute_matches(
+                db.session.get(Job, job_id), match_materializer.MATCH_LIST_SIZE
+            )[:10],
+        )
+
+        # The materializer's next pass refreshes every open job
+        self.registry.publish({"skills_match": 0.25, "experience_level": 0.1})
+        self.assertEqual(self.materializer.run_pending(), 1)
+        stored = JobMatch.query.filter_by(job_id=job_id).all()
+        self.assertEqual({row.weights_version for row in stored}, {2})
+
+    def test_feeds_are_cached_per_version(self):
+        provider = ProviderProfile.query.filter(
+            ProviderProfile.latitude.isnot(None)
+        ).first()
+        feed = self.engine.find_jobs(provider.user_id)
+        self.assertEqual(feed["weights_version"], 0)
+        misses = search_cache.misses
+
+        self.registry.publish({"skills_match": 0.35, "experience_level": 0.0})
+        feed = self.engine.find_jobs(provider.user_id)
+        self.assertEqual(feed["weights_version"], 1)
+        self.assertEqual(search_cache.misses, misses + 1)
+
+
+class TestMatchingBenchmark(unittest.TestCase):
+    """The offline benchmark replays a seeded marketplace reproducibly"""
+
+    def run_benchmark(self, baseline=None):
+        app = benchmark_matching.create_benchmark_app("sqlite://")
+        with app.app_context():
+            db.create_all()
+            search_cache.clear()
+            try:
+                return benchmark_matching.run_benchmark(
+                    60, 8, seed=7, limit=5, baseline=baseline
+                )
+            finally:
+                db.session.remove()
+                db.drop_all()
+
+    def test_report_and_stability(self):
+        report = self.run_benchmark()
+        self.assertEqual(report["config"]["providers"], 60)
+        self.assertEqual(
+            set(report["paths"]),
+            {
+                "smart_matching.compute_matches",
+                "smart_matching.find_matches",
+                "ai_engine.find_matches",
+            },
+        )
+        for name, result in report["paths"].items():
+            self.assertEqual(result["calls"] + result["skipped"], 8, msg=name)
+            self.assertLessEqual(
+                result["latency_ms"]["p50"], result["latency_ms"]["p99"]
+            )
+            self.assertGreater(result["queries_per_call"]["mean"], 0)
+            self.assertEqual(len(result["rankings"]), result["calls"])
+        # Served lists agree with scoring on the spot
+        self.assertEqual(
+            report["paths"]["smart_matching.find_matches"]["rankings"],
+            report["paths"]["smart_matching.compute_matches"]["rankings"],
+        )
+
+        again = self.run_benchmark(baseline=report)
+        self.assertTrue(again["baseline"]["same_config"])
+        for name, result in again["paths"].items():
+            self.assertEqual(result["rankings"], report["paths"][name]["rankings"])
+            self.assertEqual(result["stability"]["identical_rankings"], 1.0)
+
+    def test_ranking_stability(self):
+        stability = benchmark_matching.ranking_stability(
+            {"1": [1, 2, 3, 4], "2": [5, 6], "3": [7]},
+            {"1": [2, 1, 3, 9], "2": [5, 6], "4": [8]},
+        )
+        self.assertEqual(stability["jobs_compared"], 2)
+        self.assertEqual(stability["mean_overlap_at_k"], 0.875)
+        self.assertEqual(stability["top1_agreement"], 0.5)
+        self.assertEqual(stability["identical_rankings"], 0.5)
+
+
+class TestDistanceKernel(unittest.TestCase):
+    """Vectorized distances agree with WGS84 geodesics over Australia"""
+
+    def setUp(self):
+        places = np.array(list(AUSTRALIAN_PLACES.values()))
+        # Metropolitan spread: random points within ~70 km of Sydney
+        rng = np.random.default_rng(7)
+        nearby = np.column_stack(
+            [
+                SYDNEY[0] + rng.uniform(-0.6, 0.6, 300),
+                SYDNEY[1] + rng.uniform(-0.7, 0.7, 300),
+            ]
+        )
+        self.points = np.vstack([places, nearby])
+
+    def geodesics(self, origin):
+        return np.array([geodesic(origin, point).kilometers for point in self.points])
+
+    def test_haversine_within_half_a_percent_of_geodesic(self):
+        for origin in AUSTRALIAN_PLACES.values():
+            expected = self.geodesics(origin)
+            distances = haversine_km_array(
+                self.points[:, 0], self.points[:, 1], *origin
+            )
+            apart = expected > 0
+            error = np.abs(distances[apart] - expected[apart]) / expected[apart]
+            self.assertLess(error.max(), 0.005)
+
+    def test_equirectangular_close_to_geodesic_at_metro_range(self):
+        expected = self.geodesics(SYDNEY)
+        distances = equirectangular_km_array(
+            self.points[:, 0], self.points[:, 1], *SYDNEY
+        )
+        metro = (expected > 0) & (expected < 100)
+        error = np.abs(distances[metro] - expected[metro]) / expected[metro]
+        self.assertLess(error.max(), 0.003)
+
+    def test_location_bands_match_geodesic_bands(self):
+        engine = BipedAIEngine()
+        expected = self.geodesics(SYDNEY)
+        scores = engine.calculate_location_scores(SYDNEY, self.points.tolist())
+
+        bands = np.select(
+            [expected <= bound for bound in (5, 15, 30, 50)],
+            [1.0, 0.8, 0.6, 0.4],
+            default=0.2,
+        )
+        # Only points within 0.5% of a band edge may land in the next band
+        edge = np.any(
+            [np.abs(expected - bound) <= bound * 0.005 for bound in (5, 15, 30, 50)],
+            axis=0,
+        )
+        self.assertTrue(np.array_equal(scores[~edge], bands[~edge]))
+        self.assertEqual(engine.calculate_location_score(SYDNEY, (None, None)), 0.5)
+
+    def test_find_matches_uses_batch_location_scores(self):
+        engine = BipedAIEngine()
+        job = JobRequirement(
+            id="job",
+            title="Leaking tap",
+            description="Fix a leaking kitchen tap this week",
+            category="plumbing",
+            budget_min=100,
+            budget_max=300,
+            location=SYDNEY,
+            urgency="week",
+            skills_required=["plumbing"],
+            posted_date=datetime.utcnow(),
+        )
+        providers = [
+            Provider(
+                id=name,
+                name=name,
+                category="plumbing" if index % 4 else "electrical",
+                skills=["plumbing"],
+                location=location,
+                rating=4.5,
+                completed_jobs=10,
+                hourly_rate=60,
+                availability={"monday": True},
+                response_time=4,
+                quality_score=0.8,
+            )
+            for index, (name, location) in enumerate(AUSTRALIAN_PLACES.items())
+        ]
+        matches = engine.find_matches(job, providers, top_k=len(providers))
+        self.assertEqual(
+            len(matches), sum(1 for p in providers if p.category == "plumbing")
+        )
+        locations = {provider.id: provider.location for provider in providers}
+        for match in matches:
+            self.assertEqual(
+                match.location_score,
+                engine.calculate_location_score(SYDNEY, locations[match.provider_id]),
+            )
+
+
+class TestJobAnalysis(unittest.TestCase):
+    """The compiled matcher and cache agree with plain keyword scans"""
+
+    def naive(self, description):
+        text = description.lower()
+
+        def first(groups, default):
+            return next(
+                (
+                    name
+                    for name, words in groups.items()
+                    if any(w in text for w in words)
+                ),
+                default,
+            )
+
+        return (
+            first(ai_engine.URGENCY_KEYWORDS, "flexible"),
+            first(ai_engine.COMPLEXITY_KEYWORDS, "medium"),
+            [
+                skill
+                for skill, words in ai_engine.SKILL_PATTERNS.items()
+                if any(word in text for word in words)
+            ],
+        )
+
+    def test_matches_plain_substring_scans(self):
+        groups = (
+            ai_engine.URGENCY_KEYWORDS,
+            ai_engine.COMPLEXITY_KEYWORDS,
+            ai_engine.SKILL_PATTERNS,
+        )
+        vocabulary = [
+            word for group in groups for words in group.values() for word in words
+        ]
+        vocabulary += ["the", "a", "ly", "s", "st", "ing", "Apple", "Street", "CARD"]
+        rng = np.random.default_rng(11)
+        engine = BipedAIEngine()
+        for _ in range(500):
+            words = rng.choice(vocabulary, size=rng.integers(0, 12))
+            glue = rng.choice(["", " ", ", "], size=len(words))
+            description = "".join(f"{word}{sep}" for word, sep in zip(words, glue))
+            analysis = engine.analyze_job_description(description)
+            self.assertEqual(
+                (analysis["urgency"], analysis["complexity"], analysis["skills"]),
+                self.naive(description),
+                description,
+            )
+        # Overlapping keywords: "quickly" (week) contains "quick" (simple)
+        analysis = engine.analyze_job_description("Need it done QUICKLY")
+        self.assertEqual(
+            (analysis["urgency"], analysis["complexity"]), ("week", "simple")
+        )
+
+    def test_repeat_analysis_is_cached(self):
+        engine = BipedAIEngine()
+        description = "Urgent leak under the kitchen sink"
+        first = engine.analyze_job_description(description)
+        first["skills"].append("tampered")
+        second = engine.analyze_job_description(description)
+        self.assertEqual(second["skills"], ["plumbing"])
+        stats = engine.analysis_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (1, 1, 1))
+
+    def test_cache_is_bounded_lru(self):
+        cache = ai_engine.AnalysisCache(max_size=2)
+        cache.set("a", {"skills": []})
+        cache.set("b", {"skills": []})
+        cache.get("a")
+        cache.set("c", {"skills": []})
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(cache.stats()["size"], 2)
+
+
+class TestSemanticSkillMatcher(unittest.TestCase):
+    """Fit-once TF-IDF skill similarity, batched and persisted"""
+
+    def setUp(self):
+        self.matcher = ai_engine.SemanticSkillMatcher.default()
+        self.providers = [
+            ("1", ["electrical", "wiring"]),
+            ("2", ["plumbing"]),
+            ("3", ["landscape", "garden"]),
+            ("4", []),
+        ]
+
+    def test_related_word_forms_match(self):
+        engine = BipedAIEngine()
+        self.assertGreater(
+            engine.calculate_skill_match(["electrician"], ["electrical"]), 0.5
+        )
+        self.assertGreater(engine.calculate_skill_match(["plumber"], ["plumbing"]), 0.3)
+        self.assertLess(engine.calculate_skill_match(["electrician"], ["garden"]), 0.1)
+
+    def test_batch_reuses_resident_rows(self):
+        self.matcher.index_providers(self.providers[:2])
+        # Indexed, changed and unknown providers in mixed order
+        providers = [
+            ("9", ["plumber"]),
+            ("1", ["electrical", "wiring"]),
+            ("2", ["drain"]),
+            *self.providers[2:],
+        ]
+        batch = self.matcher.similarities(["electrician", "plumber"], providers)
+        for score, (_, skills) in zip(batch, providers):
+            self.assertAlmostEqual(
+                score, self.matcher.similarity(["electrician", "plumber"], skills)
+            )
+        self.assertEqual(batch[-1], 0.0)
+
+    def test_persisted_model_round_trips(self):
+        self.matcher.index_providers(self.providers)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "models", "skill_matcher.joblib")
+            self.matcher.save(path)
+            loaded = ai_engine.SemanticSkillMatcher.load(path)
+            self.assertEqual(loaded.provider_ids, ["1", "2", "3", "4"])
+            self.assertTrue(
+                np.allclose(
+                    loaded.similarities(["electrician"], self.providers),
+                    self.matcher.similarities(["electrician"], self.providers),
+                )
+            )
+
+            with open(path, "wb") as f:
+                f.write(b"not a model")
+            with self.assertLogs(ai_engine.logger, "WARNING") as logs:
+                fallback = ai_engine.SemanticSkillMatcher.load_or_default(path)
+            self.assertEqual(fallback.provider_ids, [])
+            self.assertIn(path, logs.output[0])
+
+    def test_find_matches_scores_skills_in_batch(self):
+        engine = BipedAIEngine()
+        job = JobRequirement(
+            id="job",
+            title="Rewire",
+            description="Rewire the kitchen",
+            category="electrical",
+            budget_min=100,
+            budget_max=300,
+            location=SYDNEY,
+            urgency="week",
+            skills_required=["electrician", "wiring"],
+            posted_date=datetime.utcnow(),
+        )
+        providers = [
+            Provider(
+                id=provider_id,
+                name=provider_id,
+                category="electrical",
+                skills=skills,
+                location=SYDNEY,
+                rating=4,
+                completed_jobs=5,
+                hourly_rate=70,
+                availability={},
+                response_time=4,
+                quality_score=0.7,
+            )
+            for provider_id, skills in self.providers
+        ]
+        for match in engine.find_matches(job, providers, top_k=4):
+            skills = dict(self.providers)[match.provider_id]
+            self.assertAlmostEqual(
+                match.skill_match,
+                engine.calculate_skill_match(job.skills_required, skills),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
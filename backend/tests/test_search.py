@@ -0,0 +1,1070 @@
+"""
+Search tests for Biped Platform
+Tests the job full-text index and the AdvancedSearchEngine query paths
+against an in-memory SQLite database.
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+
+# Add the backend directory to the path so ``src`` imports resolve
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from src.models import db  # noqa: E402
+from src.models import schema  # noqa: E402
+from src.models.job import Job, JobStatus  # noqa: E402
+from src.models.review import Review  # noqa: E402
+from src.models.service import Service, ServiceCategory  # noqa: E402
+from src.models.skill import ProviderSkill, Skill  # noqa: E402
+from src.models.user import ProviderProfile, User  # noqa: E402
+from src.routes.advanced_search import (  # noqa: E402
+    AdvancedSearchEngine,
+    advanced_search_bp,
+)
+from src.services import (  # noqa: E402
+    autocomplete,
+    geo_search,
+    provider_skills,
+    search_cache,
+    search_facets,
+    search_index,
+    search_metrics,
+)
+from src.utils.pagination import InvalidCursorError  # noqa: E402
+
+
+class SearchTestCase(unittest.TestCase):
+    """Base class creating an app with a small marketplace"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+        self.app.config["TESTING"] = True
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        search_index.init_search_index()
+        self.engine = AdvancedSearchEngine()
+        self._seed()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        db.session.execute(db.text("DROP TABLE IF EXISTS job_search_index"))
+        search_index._ready_dialects.clear()
+        for index in autocomplete.suggestion_indexes.values():
+            index.invalidate()
+        search_facets.facet_store.invalidate()
+        search_cache.search_cache.clear()
+        self.ctx.pop()
+
+    def _seed(self):
+        plumbing = ServiceCategory(name="Plumbing & Electrical", slug="plumbing")
+        garden = ServiceCategory(name="Landscaping", slug="landscaping")
+        db.session.add_all([plumbing, garden])
+        db.session.flush()
+
+        self.repair = Service(
+            category_id=plumbing.id, name="Plumbing Repair", slug="plumbing-repair"
+        )
+        self.mowing = Service(
+            category_id=garden.id, name="Garden Maintenance", slug="garden"
+        )
+        db.session.add_all([self.repair, self.mowing])
+
+        self.customer = User(
+            email="customer@example.com",
+            password_hash="x",
+            first_name="Jane",
+            last_name="Citizen",
+            user_type="customer",
+        )
+        db.session.add(self.customer)
+        db.session.flush()
+
+        self.leak = self._job("Fix leaking kitchen tap", "Dripping tap", "Sydney")
+        self.hedge = self._job(
+            "Hedge trimming", "Trim the front hedges", "Melbourne", self.mowing
+        )
+        db.session.commit()
+
+    def _job(self, title, description, city, service=None):
+        job = Job(
+            customer_id=self.customer.id,
+            service_id=(service or self.repair).id,
+            title=title,
+            description=description,
+            street_address="1 Example Street",
+            city=city,
+            state="NSW",
+            postcode="2000",
+            property_type="residential",
+            status=JobStatus.POSTED,
+        )
+        db.session.add(job)
+        db.session.flush()
+        return job
+
+    def _provider(self, index, skills, ratings=()):
+        user = User(
+            email=f"provider{index}@example.com",
+            password_hash="x",
+            first_name="Pat",
+            last_name=f"Provider{index}",
+            user_type="provider",
+        )
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(
+            ProviderProfile(
+                user_id=user.id,
+                skills=skills,
+                hourly_rate=60 + index,
+                years_experience=index,
+            )
+        )
+        for rating in ratings:
+            db.session.add(
+                Review(
+                    job_id=self.leak.id,
+                    reviewer_id=self.customer.id,
+                    reviewee_id=user.id,
+                    overall_rating=rating,
+                )
+            )
+        db.session.flush()
+        return user
+
+    @contextmanager
+    def count_queries(self):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+
+    def search_ids(self, query, **kwargs):
+        results = self.engine.search_jobs(query=query, **kwargs)["results"]
+        return [result["id"] for result in results]
+
+
+class TestJobSearchIndex(SearchTestCase):
+    """Full-text index maintenance and querying"""
+
+    def test_backend_selected_for_sqlite(self):
+        backend = search_index.get_job_search_backend()
+        self.assertEqual(backend.name, "sqlite_fts5")
+
+    def test_matches_across_indexed_fields(self):
+        self.assertEqual(self.search_ids("leaking"), [self.leak.id])
+        self.assertEqual(self.search_ids("melbourne"), [self.hedge.id])
+        self.assertEqual(self.search_ids("landscaping"), [self.hedge.id])
+        self.assertEqual(self.search_ids("plumbing repair"), [self.leak.id])
+
+    def test_terms_are_prefix_matched_and_combined(self):
+        self.assertEqual(self.search_ids("leak"), [self.leak.id])
+        self.assertEqual(self.search_ids("kitchen sydney"), [self.leak.id])
+        self.assertEqual(self.search_ids("kitchen melbourne"), [])
+
+    def test_index_follows_job_writes(self):
+        self.leak.title = "Replace hot water system"
+        db.session.commit()
+        self.assertEqual(self.search_ids("leaking"), [])
+        self.assertEqual(self.search_ids("water"), [self.leak.id])
+
+        new_job = self._job("Install ceiling fan", "Bedroom fan", "Perth")
+        db.session.commit()
+        self.assertEqual(self.search_ids("ceiling"), [new_job.id])
+
+        db.session.delete(new_job)
+        db.session.commit()
+        self.assertEqual(self.search_ids("ceiling"), [])
+
+    def test_service_rename_reindexes_jobs(self):
+        self.mowing.name = "Arborist Services"
+        db.session.commit()
+        self.assertEqual(self.search_ids("arborist"), [self.hedge.id])
+
+    def test_like_fallback_matches_index(self):
+        search_index._ready_dialects.clear()
+        self.assertEqual(search_index.get_job_search_backend().name, "like")
+        self.assertEqual(self.search_ids("kitchen sydney"), [self.leak.id])
+        self.assertEqual(self.search_ids("landscaping"), [self.hedge.id])
+
+    def test_rebuild_restores_documents(self):
+        db.session.execute(db.text("DELETE FROM job_search_index"))
+        db.session.commit()
+        self.assertEqual(self.search_ids("hedge"), [])
+        self.assertEqual(search_index.rebuild_job_index(), 2)
+        self.assertEqual(self.search_ids("hedge"), [self.hedge.id])
+
+
+class TestRelevanceRanking(SearchTestCase):
+    """Relevance ordering is computed in SQL before pagination"""
+
+    def _ranked_ids(self, query, **kwargs):
+        response = self.engine.search_jobs(query=query, sort_by="relevance", **kwargs)
+        return [result["id"] for result in response["results"]], response
+
+    def _seed_ranking_jobs(self):
+        # Older job matches in the title, newer only in the description
+        title_match = self._job("Solar panel install", "Roof work", "Perth")
+        title_match.created_at = title_match.created_at.replace(year=2020)
+        for index in range(3):
+            self._job(f"Roof repair {index}", "Needs a solar quote", "Perth")
+        db.session.commit()
+        return title_match
+
+    def test_title_matches_outrank_newer_description_matches(self):
+        title_match = self._seed_ranking_jobs()
+        ids, response = self._ranked_ids("solar")
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(ids[0], title_match.id)
+        scores = [result["relevance_score"] for result in response["results"]]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_top_result_is_correct_on_first_page(self):
+        title_match = self._seed_ranking_jobs()
+        ids, _ = self._ranked_ids("solar", per_page=1)
+        self.assertEqual(ids, [title_match.id])
+
+    def test_like_fallback_ranks_by_weights(self):
+        title_match = self._seed_ranking_jobs()
+        search_index._ready_dialects.clear()
+        ids, response = self._ranked_ids("solar", per_page=1)
+        self.assertEqual(ids, [title_match.id])
+        self.assertAlmostEqual(response["results"][0]["relevance_score"], 0.4)
+
+    def test_provider_skills_outrank_bio(self):
+        bio_only = self._provider(1, "carpentry")
+        bio_only.bio = "Happy to do tiling work"
+        skilled = self._provider(2, "tiling, grouting")
+        db.session.commit()
+
+        response = self.engine.search_providers(query="tiling", sort_by="relevance")
+        names = [result["name"] for result in response["results"]]
+        self.assertEqual(names, [skilled.full_name, bio_only.full_name])
+        self.assertAlmostEqual(response["results"][0]["relevance_score"], 0.4)
+
+
+class TestSearchQueryCount(SearchTestCase):
+    """Result formatting must cost a constant number of queries per page"""
+
+    def _page_query_count(self, search, **kwargs):
+        db.session.expire_all()
+        with self.count_queries() as statements:
+            response = search(**kwargs)
+        return len(statements), response
+
+    def test_job_page_query_count_is_constant(self):
+        small, response = self._page_query_count(
+            self.engine.search_jobs, query="", per_page=1
+        )
+        self.assertEqual(len(response["results"]), 1)
+
+        for index in range(10):
+            self._job(f"Extra job {index}", "More work", "Sydney")
+        db.session.commit()
+
+        large, response = self._page_query_count(
+            self.engine.search_jobs, query="", per_page=20
+        )
+        self.assertEqual(len(response["results"]), 12)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 2)  # count + page
+        self.assertEqual(response["results"][0]["customer"]["name"], "Jane Citizen")
+
+    def test_provider_page_query_count_is_constant(self):
+        self._provider(0, "plumbing", ratings=(4, 5))
+        db.session.commit()
+        small, response = self._page_query_count(self.engine.search_providers)
+        self.assertEqual(len(response["results"]), 1)
+
+        for index in range(1, 10):
+            self._provider(index, "electrical, lighting", ratings=(3,) * index)
+        db.session.commit()
+
+        large, response = self._page_query_count(self.engine.search_providers)
+        self.assertEqual(len(response["results"]), 10)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 3)  # count + page + ratings
+
+        by_id = {result["name"]: result for result in response["results"]}
+        self.assertEqual(by_id["Pat Provider0"]["average_rating"], 4.5)
+        self.assertEqual(by_id["Pat Provider0"]["review_count"], 2)
+        self.assertEqual(by_id["Pat Provider3"]["review_count"], 3)
+
+
+class TestKeysetPagination(SearchTestCase):
+    """Cursor pages walk the same order as offset pages"""
+
+    def setUp(self):
+        super().setUp()
+        for index in range(7):
+            job = self._job(f"Paint fence {index}", "Paint work", "Perth")
+            job.budget_min = (index % 3) * 100 or None
+        db.session.commit()
+
+    def _walk(self, search, **kwargs):
+        ids, after = [], None
+        while True:
+            response = search(per_page=3, after=after, **kwargs)
+            ids.extend(result["id"] for result in response["results"])
+            after = response["pagination"]["next_cursor"]
+            if not after:
+                return ids
+
+    def _offset_ids(self, search, **kwargs):
+        response = search(per_page=100, **kwargs)
+        return [result["id"] for result in response["results"]]
+
+    def test_cursor_walk_matches_offset_order(self):
+        for sort_by in ("relevance", "date", "budget", "title"):
+            for sort_order in ("asc", "desc"):
+                kwargs = {"sort_by": sort_by, "sort_order": sort_order}
+                query = "paint" if sort_by == "relevance" else ""
+                expected = self._offset_ids(
+                    self.engine.search_jobs, query=query, **kwargs
+                )
+                walked = self._walk(self.engine.search_jobs, query=query, **kwargs)
+                self.assertEqual(walked, expected, kwargs)
+
+    def test_provider_cursor_walk_matches_offset_order(self):
+        for index in range(5):
+            self._provider(index, "painting", ratings=(index % 3 + 1,))
+        db.session.commit()
+        for sort_by in ("rating", "rate", "name"):
+            expected = self._offset_ids(self.engine.search_providers, sort_by=sort_by)
+            walked = self._walk(self.engine.search_providers, sort_by=sort_by)
+            self.assertEqual(len(walked), 5)
+            self.assertEqual(walked, expected, sort_by)
+
+    def test_total_is_optional(self):
+        response = self.engine.search_jobs(per_page=3, with_total=False)
+        self.assertIsNone(response["pagination"]["total_count"])
+        self.assertTrue(response["pagination"]["has_next"])
+
+        response = self.engine.search_jobs(per_page=3)
+        self.assertEqual(response["pagination"]["total_count"], 9)
+        self.assertEqual(response["pagination"]["total_pages"], 3)
+
+    def test_cursor_skips_count_query(self):
+        first = self.engine.search_jobs(per_page=3)
+        db.session.expire_all()
+        with self.count_queries() as statements:
+            self.engine.search_jobs(
+                per_page=3,
+                after=first["pagination"]["next_cursor"],
+                with_total=False,
+            )
+        self.assertEqual(len(statements), 1)
+
+    def test_cursor_from_other_sort_is_rejected(self):
+        cursor = self.engine.search_jobs(per_page=3, sort_by="title")["pagination"][
+            "next_cursor"
+        ]
+        with self.assertRaises(InvalidCursorError):
+            self.engine.search_jobs(per_page=3, sort_by="date", after=cursor)
+        with self.assertRaises(InvalidCursorError):
+            self.engine.search_jobs(per_page=3, after="not-a-cursor")
+
+
+class TestSearchSuggestions(SearchTestCase):
+    """Autocomplete answers from the in-memory prefix index"""
+
+    def suggest(self, query, search_type="jobs"):
+        return self.engine.get_search_suggestions(query, search_type)
+
+    def test_index_ranks_by_weight_then_alphabetically(self):
+        index = autocomplete.AutocompleteIndex()
+        index.load([("Tap repair", 1), ("Tiling", 3), ("Leaking tap", 2)])
+        self.assertEqual(index.complete("ta"), ["Leaking tap", "Tap repair"])
+        self.assertEqual(index.complete("t", limit=2), ["Tiling", "Leaking tap"])
+        index.remove("Tiling", 3)
+        self.assertEqual(index.complete("ti"), [])
+        self.assertEqual(len(index), 2)
+
+    def test_stale_index_is_rebuilt_in_the_background(self):
+        self.assertEqual(self.suggest("gutter"), [])  # builds the index
+        index = autocomplete.suggestion_indexes["jobs"]
+        index.built_at -= autocomplete.REBUILD_INTERVAL + 1
+        self._job("Gutter cleaning", "Leaves", "Perth")
+        db.session.commit()
+        index.remove("Gutter cleaning")  # As if written by another worker
+
+        refresh = autocomplete.refresh_suggestion_index
+        build = autocomplete.build_suggestion_index
+        threads, release = [], threading.Event()
+
+        def build_when_released(*args):
+            release.wait(5)
+            return build(*args)
+
+        with (
+            mock.patch.object(
+                autocomplete,
+                "refresh_suggestion_index",
+                lambda search_type: threads.append(refresh(search_type)),
+            ),
+            mock.patch.object(
+                autocomplete, "build_suggestion_index", build_when_released
+            ),
+        ):
+            self.assertEqual(self.suggest("gutter"), [])  # Old index meanwhile
+            self.assertEqual(self.suggest("gutter"), [])
+            self.assertIsNone(threads[1])  # One rebuild at a time
+            release.set()
+            threads[0].join()
+        self.assertFalse(index.is_stale)
+        self.assertEqual(self.suggest("gutter"), ["Gutter cleaning"])
+
+    def test_job_titles_and_categories(self):
+        self.assertEqual(self.suggest("kitch"), ["Fix leaking kitchen tap"])
+        self.assertEqual(self.suggest("land"), ["Landscaping"])
+        self.assertEqual(self.suggest("plumbing"), ["Plumbing & Electrical"])
+        self.assertEqual(self.suggest("x"), [])
+
+    def test_follows_committed_job_writes(self):
+        self.assertEqual(self.suggest("fence"), [])  # builds the index
+        for _ in range(2):
+            self._job("Fence repair", "Broken palings", "Perth")
+        self._job("Fence painting", "Two coats", "Perth")
+        db.session.commit()
+        self.assertEqual(self.suggest("fence"), ["Fence repair", "Fence painting"])
+
+        self.leak.title = "Replace hot water system"
+        db.session.commit()
+        self.assertEqual(self.suggest("kitch"), [])
+        self.assertEqual(self.suggest("hot wat"), ["Replace hot water system"])
+
+    def test_rolled_back_writes_are_ignored(self):
+        self.assertEqual(self.suggest("gutter"), [])
+        self._job("Gutter cleaning", "Leaves", "Perth")
+        db.session.rollback()
+        self.assertEqual(self.suggest("gutter"), [])
+
+    def test_lookup_does_not_query_once_built(self):
+        self.suggest("hedge")
+        with self.count_queries() as statements:
+            self.assertEqual(self.suggest("hedge"), ["Hedge trimming"])
+        self.assertEqual(statements, [])
+
+    def test_provider_skills_and_names(self):
+        self._provider(1, "Tiling, grouting")
+        self._provider(2, "tiling, carpentry")
+        db.session.commit()
+        self.assertEqual(self.suggest("til", "providers"), ["Tiling"])
+        self.assertEqual(self.suggest("gro", "providers"), ["grouting"])
+        self.assertEqual(self.suggest("provider2", "providers"), ["Pat Provider2"])
+
+        profile = ProviderProfile.query.filter_by(skills="Tiling, grouting").one()
+        profile.skills = "plastering"
+        db.session.commit()
+        self.assertEqual(self.suggest("gro", "providers"), [])
+        self.assertEqual(self.suggest("plas", "providers"), ["plastering"])
+
+    def test_category_rename_rebuilds(self):
+        self.assertEqual(self.suggest("land"), ["Landscaping"])
+        self.mowing.category.name = "Gardening"
+        db.session.commit()
+        self.assertEqual(self.suggest("land"), [])
+        self.assertEqual(self.suggest("garden"), ["Gardening"])
+
+
+class TestSearchFacets(SearchTestCase):
+    """Popular searches and filter facets come from materialized aggregates"""
+
+    def setUp(self):
+        super().setUp()
+        for index, budget in enumerate((80, 300, 700, None)):
+            job = self._job(f"Leaking pipe {index}", "Water everywhere", "Sydney")
+            job.budget_min, job.budget_max = budget, budget and budget + 100
+            job.is_urgent = index % 2 == 0
+        self.hedge.status = JobStatus.COMPLETED
+        db.session.commit()
+
+    def filters(self, **kwargs):
+        return self.engine.get_available_filters("jobs", **kwargs)
+
+    def test_popular_categories(self):
+        popular = self.engine.get_popular_searches("jobs")
+        self.assertEqual(
+            [(item["term"], item["count"]) for item in popular],
+            [("Plumbing & Electrical", 5), ("Landscaping", 1)],
+        )
+
+    def test_filters_match_direct_aggregates(self):
+        filters = self.filters()
+        self.assertEqual(
+            filters["categories"], ["Plumbing & Electrical", "Landscaping"]
+        )
+        self.assertEqual(filters["budget_range"]["min"], 80)
+        self.assertEqual(filters["budget_range"]["max"], 800)
+        self.assertAlmostEqual(filters["budget_range"]["average"], 410.0)
+        self.assertEqual(filters["locations"], ["Sydney, NSW", "Melbourne, NSW"])
+        self.assertEqual(filters["total_count"], 6)
+
+    def test_facet_counts_are_conditioned_on_other_filters(self):
+        counts = self.filters(location="sydney", urgency=True)["facet_counts"]
+        # Each facet ignores its own filter but applies the others
+        self.assertEqual(counts["category"], {"Plumbing & Electrical": 2})
+        self.assertEqual(counts["is_urgent"], {False: 3, True: 2})
+        self.assertEqual(counts["location"], {"Sydney, NSW": 2})
+        # Jobs count under every budget range they overlap (80-180 here)
+        self.assertEqual(
+            counts["budget_range"], {"0-100": 1, "100-250": 1, "500-1000": 1}
+        )
+
+        counts = self.filters(status="completed")["facet_counts"]
+        self.assertEqual(counts["category"], {"Landscaping": 1})
+        self.assertEqual(counts["status"], {"posted": 5, "completed": 1})
+
+    def test_counts_agree_with_search(self):
+        # Budget bounds on a range boundary, as facet UIs send them
+        kwargs = {"location": "sydney", "min_budget": 250, "max_budget": 499}
+        facets = self.filters(**kwargs)
+        search = self.engine.search_jobs(**kwargs)
+        self.assertEqual(facets["total_count"], search["pagination"]["total_count"])
+
+    def test_location_matches_street_addresses(self):
+        self.hedge.street_address = "12 Sydney Road"  # A Melbourne job
+        db.session.commit()
+        self.filters()
+        with self.count_queries() as statements:
+            self.filters(location="melbourne")  # A city, from the snapshot
+        self.assertEqual(statements, [])
+        with self.count_queries() as statements:
+            facets = self.filters(location="sydney road")
+        self.assertEqual(len(statements), 1)  # One grouped count
+        search = self.engine.search_jobs(location="sydney road")
+        self.assertEqual(facets["total_count"], 1)
+        self.assertEqual(facets["total_count"], search["pagination"]["total_count"])
+        self.assertEqual(facets["facet_counts"]["category"], {"Landscaping": 1})
+
+    def test_counts_agree_with_search_within_budget_ranges(self):
+        self.filters()
+        # A minimum on a range boundary is answered from the snapshot
+        with self.count_queries() as statements:
+            self.assertEqual(self.filters(min_budget=250)["total_count"], 2)
+        self.assertEqual(statements, [])
+
+        for min_budget, max_budget in ((150, 320), (190, None), (None, 90)):
+            kwargs = {"min_budget": min_budget, "max_budget": max_budget}
+            facets = self.filters(**kwargs)
+            search = self.engine.search_jobs(**kwargs)
+            self.assertEqual(
+                facets["total_count"], search["pagination"]["total_count"], kwargs
+            )
+
+    def test_text_query_narrows_facets(self):
+        facets = self.filters(query="hedge")
+        self.assertEqual(facets["categories"], ["Landscaping"])
+        self.assertEqual(facets["total_count"], 1)
+
+    def test_snapshot_served_without_queries_until_commit(self):
+        self.filters()
+        with self.count_queries() as statements:
+            self.filters(category="plumbing")
+            self.engine.get_popular_searches("jobs")
+        self.assertEqual(statements, [])
+
+        self._job("Gate repair", "Hinges", "Perth", self.mowing)
+        db.session.commit()
+        self.assertEqual(self.filters()["facet_counts"]["category"]["Landscaping"], 2)
+
+    def test_provider_facets(self):
+        self._provider(1, "Tiling, grouting")
+        self._provider(2, "tiling, carpentry")
+        db.session.commit()
+        popular = self.engine.get_popular_searches("providers", limit=1)
+        self.assertEqual(popular, [{"term": "tiling", "count": 2, "type": "skill"}])
+
+        filters = self.engine.get_available_filters("providers")
+        self.assertIn("grouting", filters["skills"])
+        self.assertEqual(filters["rate_range"]["min"], 61)
+        self.assertEqual(filters["experience_range"]["max"], 2)
+
+
+class TestProviderSkills(SearchTestCase):
+    """Skills are normalized into indexed provider_skill rows"""
+
+    def skill_slugs(self, user):
+        profile = ProviderProfile.query.filter_by(user_id=user.id).one()
+        return provider_skills.provider_skill_sets([profile.id])[profile.id]
+
+    def provider_names(self, **kwargs):
+        response = self.engine.search_providers(**kwargs)
+        return sorted(result["name"] for result in response["results"])
+
+    def test_rows_follow_profile_writes(self):
+        user = self._provider(1, "Tiling, Wall-Papering, tiling ")
+        db.session.commit()
+        self.assertEqual(self.skill_slugs(user), {"tiling", "wall papering"})
+
+        user.provider_profile.skills = "Plastering"
+        db.session.commit()
+        self.assertEqual(self.skill_slugs(user), {"plastering"})
+        self.assertEqual(Skill.query.count(), 3)  # Vocabulary is kept
+
+        db.session.delete(user.provider_profile)
+        db.session.commit()
+        self.assertEqual(ProviderSkill.query.count(), 0)
+
+    def test_long_skills_fit_the_vocabulary_columns(self):
+        long_skill = "heritage " * 16 + "restoration"  # 155 characters
+        parsed = provider_skills.parse_skills(f"Tiling, {long_skill}")
+        self.assertEqual(len(parsed), 2)
+        for slug, name in parsed.items():
+            self.assertLessEqual(len(slug), provider_skills.SKILL_MAX_LENGTH)
+            self.assertLessEqual(len(name), provider_skills.SKILL_MAX_LENGTH)
+            self.assertEqual(slug, slug.strip())
+
+        user = self._provider(1, f"Tiling, {long_skill}")
+        db.session.commit()
+        self.assertIn(long_skill[:100], self.skill_slugs(user))
+
+    def test_backfill_from_csv_column(self):
+        user = self._provider(1, "tiling, grouting")
+        self._provider(2, "tiling")
+        db.session.commit()
+        db.session.execute(db.delete(ProviderSkill))
+        db.session.commit()
+
+        self.assertEqual(provider_skills.init_provider_skills(), 3)
+        self.assertEqual(self.skill_slugs(user), {"tiling", "grouting"})
+        self.assertEqual(provider_skills.init_provider_skills(), 0)  # Already done
+
+    def test_skills_filter_uses_normalized_substring_match(self):
+        self._provider(1, "Tiling, grouting")
+        self._provider(2, "carpentry")
+        self._provider(3, "electrical")
+        db.session.commit()
+        self.assertEqual(self.provider_names(skills="til"), ["Pat Provider1"])
+        self.assertEqual(
+            self.provider_names(skills="GROUT, carp"),
+            ["Pat Provider1", "Pat Provider2"],
+        )
+        self.assertEqual(self.provider_names(skills="ing"), ["Pat Provider1"])
+        self.assertEqual(self.provider_names(skills="plumbing"), [])
+
+    def test_skills_filter_matches_inside_multi_word_skills(self):
+        self._provider(1, "Interior Painting")
+        self._provider(2, "roof repairs, gutters")
+        self._provider(3, "painting")
+        db.session.commit()
+        self.assertEqual(
+            self.provider_names(skills="painting"), ["Pat Provider1", "Pat Provider3"]
+        )
+        self.assertEqual(self.provider_names(skills="repair"), ["Pat Provider2"])
+
+    def test_skills_added_concurrently_are_reused(self):
+        user = self._provider(1, "tiling")
+        db.session.commit()
+        real_select = provider_skills.select
+        lookups = []
+
+        def lookup_misses_tiling(*columns):
+            # As if another write added "tiling" after this one first looked
+            statement = real_select(*columns)
+            if columns == (Skill.slug, Skill.id):
+                lookups.append(statement)
+                if len(lookups) == 1:
+                    return statement.where(Skill.slug != "tiling")
+            return statement
+
+        with mock.patch.object(provider_skills, "select", lookup_misses_tiling):
+            other = self._provider(2, "tiling, grouting")
+            db.session.commit()
+        self.assertEqual(self.skill_slugs(other), {"tiling", "grouting"})
+        self.assertEqual(self.skill_slugs(user), {"tiling"})
+        self.assertEqual(Skill.query.count(), 2)
+
+    def test_skill_filter_terms_are_not_like_patterns(self):
+        self._provider(1, "tiling")
+        db.session.commit()
+        self.assertEqual(self.provider_names(skills="t_ling"), [])
+        self.assertEqual(self.provider_names(skills="til"), ["Pat Provider1"])
+
+    def test_histogram_counts_providers(self):
+        self._provider(1, "Tiling, grouting")
+        self._provider(2, "tiling")
+        db.session.commit()
+        self.assertEqual(
+            provider_skills.skill_histogram(),
+            [("tiling", "Tiling", 2), ("grouting", "grouting", 1)],
+        )
+
+
+class TestSearchResultCache(SearchTestCase):
+    """Search pages are cached as ids and scores and invalidated by scope"""
+
+    def cached(self, search=None, **kwargs):
+        search = search or self.engine.search_jobs
+        db.session.expire_all()
+        with self.count_queries() as statements:
+            response = search(use_cache=True, **kwargs)
+        return response, len(statements)
+
+    def test_equivalent_queries_share_an_entry(self):
+        first, _ = self.cached(query="Leaking kitchen", location="Sydney")
+        second, queries = self.cached(query="kitchen  LEAKING!", location="sydney")
+        self.assertEqual(queries, 1)  # Hydration by primary key only
+        self.assertEqual(second["results"], first["results"])
+        self.assertEqual(second["pagination"], first["pagination"])
+        self.assertEqual(second["search_info"]["query"], "kitchen  LEAKING!")
+
+    def test_writes_only_drop_affected_scopes(self):
+        self.cached(location="melbourne")
+        self.cached(location="sydney")
+        self.cached(category="plumbing")
+
+        self._job("Blocked drain", "Kitchen sink", "Sydney")
+        db.session.commit()
+
+        _, queries = self.cached(location="melbourne")
+        self.assertEqual(queries, 1)
+        response, queries = self.cached(location="sydney")
+        self.assertGreater(queries, 1)
+        self.assertEqual(len(response["results"]), 2)
+        response, _ = self.cached(category="plumbing")
+        self.assertEqual(len(response["results"]), 2)
+
+    def test_moved_job_drops_old_and_new_scopes(self):
+        self.cached(location="melbourne")
+        self.hedge.city = "Perth"
+        db.session.commit()
+        response, _ = self.cached(location="melbourne")
+        self.assertEqual(response["results"], [])
+
+    def test_rolled_back_writes_keep_entries(self):
+        self.cached(location="sydney")
+        self._job("Blocked drain", "Kitchen sink", "Sydney")
+        db.session.rollback()
+        _, queries = self.cached(location="sydney")
+        self.assertEqual(queries, 1)
+
+    def test_rolled_back_savepoints_keep_outer_writes(self):
+        self.cached(location="sydney")
+        self._job("Blocked drain", "Kitchen sink", "Sydney")
+        with db.session.begin_nested() as savepoint:
+            self._job("Hedge trimming", "Front yard", "Perth")
+            savepoint.rollback()
+        db.session.commit()
+        response, queries = self.cached(location="sydney")
+        self.assertGreater(queries, 1)
+        self.assertEqual(len(response["results"]), 2)
+
+    def test_reviews_invalidate_provider_searches(self):
+        user = self._provider(1, "tiling")
+        db.session.commit()
+        response, _ = self.cached(self.engine.search_providers)
+        self.assertIsNone(response["results"][0]["average_rating"])
+
+        self._provider(2, "plumbing")  # Different user, any location
+        db.session.add(
+            Review(
+                job_id=self.leak.id,
+                reviewer_id=self.customer.id,
+                reviewee_id=user.id,
+                overall_rating=4,
+            )
+        )
+        db.session.commit()
+        response, _ = self.cached(self.engine.search_providers)
+        ratings = {r["name"]: r["average_rating"] for r in response["results"]}
+        self.assertEqual(ratings["Pat Provider1"], 4)
+
+    def test_page_invalidated_while_computing_is_not_stored(self):
+        # Stamped before the page is computed; a write commits meanwhile
+        key = search_cache.search_cache.make_key("jobs", {"location": "sydney"})
+        stamp = search_cache.search_cache.stamp("jobs")
+        self._job("Blocked drain", "Kitchen sink", "Sydney")
+        db.session.commit()
+        self.assertFalse(
+            search_cache.search_cache.set(
+                key, {"ids": []}, {"location": "sydney"}, stamp
+            )
+        )
+        self.assertIsNone(search_cache.search_cache.get(key))
+
+    def test_redis_store_prunes_expired_scopes(self):
+        from test_cache import FakeRedis
+
+        redis = FakeRedis()
+        store = search_cache.RedisSearchStore(redis)
+        scopes_key = "search:v1:jobs:scopes"
+        store.set("search:v1:jobs:a", {"ids": [1]}, {"location": "perth"}, ttl=60)
+        store.set("search:v1:jobs:b", {"ids": [2]}, {"location": "sydney"}, ttl=60)
+        self.assertEqual(len(redis.zrange(scopes_key, 0, -1)), 2)
+
+        # The Perth scope's entries expire; the next invalidation prunes it
+        perth = next(m for m in redis.data[scopes_key][0] if b"perth" in m)
+        redis.data[scopes_key][0][perth] = time.time() - 1
+        self.assertEqual(store.invalidate("jobs", {"location": ["Melbourne"]}), 0)
+        (remaining,) = redis.zrange(scopes_key, 0, -1)
+        self.assertIn(b"sydney", remaining)
+
+        stamp = store.stamp("jobs")
+        self.assertEqual(store.invalidate("jobs", {"location": ["Sydney CBD"]}), 1)
+        self.assertEqual(redis.zrange(scopes_key, 0, -1), [])
+        self.assertFalse(
+            store.set("search:v1:jobs:c", {"ids": [3]}, {}, ttl=60, stamp=stamp)
+        )
+        self.assertIsNone(store.get("search:v1:jobs:c"))
+
+    def test_local_store_is_bounded(self):
+        store = search_cache.LocalSearchStore(max_entries=2)
+        for index in range(3):
+            store.set(f"search:v1:jobs:{index}", {"ids": [index]}, {}, ttl=60)
+        self.assertIsNone(store.get("search:v1:jobs:0"))
+        self.assertEqual(store.get("search:v1:jobs:2"), {"ids": [2]})
+
+
+class TestGeoSearch(SearchTestCase):
+    """Radius search: bounding box on the coordinates, then haversine"""
+
+    SYDNEY = (-33.8688, 151.2093)
+
+    def setUp(self):
+        super().setUp()
+        self.leak.latitude, self.leak.longitude = self.SYDNEY
+        self.hedge.latitude, self.hedge.longitude = -37.8136, 144.9631
+        self.parramatta = self._job("Fence repair", "Side fence", "Parramatta")
+        self.parramatta.latitude, self.parramatta.longitude = -33.8150, 151.0011
+        self.newcastle = self._job("Roof leak", "Tiles cracked", "Newcastle")
+        self.newcastle.latitude, self.newcastle.longitude = -32.9283, 151.7817
+        db.session.commit()
+
+    def nearby(self, radius_km, **kwargs):
+        response = self.engine.search_jobs(
+            latitude=self.SYDNEY[0],
+            longitude=self.SYDNEY[1],
+            radius_km=radius_km,
+            sort_by="distance",
+            **kwargs,
+        )
+        return response["results"]
+
+    def test_haversine_and_bounding_box(self):
+        distance = geo_search.haversine_km(*self.SYDNEY, -37.8136, 144.9631)
+        self.assertAlmostEqual(distance, 713.4, delta=1.0)
+        min_lat, max_lat, min_lon, max_lon = geo_search.bounding_box(*self.SYDNEY, 50)
+        self.assertLess(min_lat, self.SYDNEY[0] - 0.44)
+        self.assertLess(min_lon, self.SYDNEY[1] - 0.53)
+        self.assertGreater(max_lon, self.SYDNEY[1] + 0.53)
+        # Boxes crossing the antimeridian wrap around
+        _, _, min_lon, max_lon = geo_search.bounding_box(-16.5, 179.9, 50)
+        self.assertGreater(min_lon, max_lon)
+
+    def test_radius_filter_sorts_by_distance(self):
+        results = self.nearby(50)
+        self.assertEqual(
+            [result["id"] for result in results], [self.leak.id, self.parramatta.id]
+        )
+        self.assertEqual(results[0]["distance_km"], 0.0)
+        self.assertAlmostEqual(results[1]["distance_km"], 20.1, delta=0.5)
+
+        ids = [result["id"] for result in self.nearby(150)]
+        self.assertEqual(ids, [self.leak.id, self.parramatta.id, self.newcastle.id])
+
+    def test_radius_combines_with_other_filters(self):
+        results = self.nearby(150, query="leak")
+        self.assertEqual(
+            [result["id"] for result in results], [self.leak.id, self.newcastle.id]
+        )
+
+    def test_bounding_box_uses_coordinate_index(self):
+        condition, _ = geo_search.radius_filter(
+            Job.latitude, Job.longitude, *self.SYDNEY, 50
+        )
+        statement = db.session.query(Job.id).filter(condition).statement
+        compiled = statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+        plan = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {compiled}")).fetchall()
+        self.assertIn("ix_job_lat_lon", " ".join(str(row) for row in plan))
+
+    def test_partial_radius_parameters_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self.engine.search_jobs(latitude=self.SYDNEY[0], radius_km=10)
+
+    def test_provider_finds_jobs_within_service_radius(self):
+        user = self._provider(1, "fencing")
+        user.provider_profile.latitude, user.provider_profile.longitude = (
+            -33.80,
+            151.00,
+        )
+        user.provider_profile.service_radius = 30
+        db.session.commit()
+
+        response = self.engine.jobs_near_provider(user.id)
+        self.assertEqual(
+            [result["id"] for result in response["results"]],
+            [self.parramatta.id, self.leak.id],
+        )
+        self.assertIsNone(self.engine.jobs_near_provider(self.customer.id))
+
+    def test_provider_radius_search(self):
+        near = self._provider(1, "tiling")
+        far = self._provider(2, "tiling")
+        near.provider_profile.latitude, near.provider_profile.longitude = self.SYDNEY
+        far.provider_profile.latitude, far.provider_profile.longitude = -37.8, 145.0
+        db.session.commit()
+
+        response = self.engine.search_providers(
+            latitude=self.SYDNEY[0], longitude=self.SYDNEY[1], radius_km=100
+        )
+        self.assertEqual([result["id"] for result in response["results"]], [near.id])
+
+    def test_cached_pages_keep_distances(self):
+        first = self.nearby(50, use_cache=True)
+        hits = search_cache.search_cache.hits
+        second = self.nearby(50, use_cache=True)
+        self.assertEqual(search_cache.search_cache.hits, hits + 1)
+        self.assertEqual(second, first)
+
+    def test_added_columns_upgrade_existing_schema(self):
+        # A provider_profile table from before the coordinate/skill columns
+        db.session.execute(db.text("DROP TABLE provider_profile"))
+        db.session.execute(
+            db.text(
+                "CREATE TABLE provider_profile (id INTEGER PRIMARY KEY, "
+                "user_id INTEGER, business_name VARCHAR(200))"
+            )
+        )
+        db.session.commit()
+
+        schema.init_added_columns()
+        geo_search.init_geo_columns()
+        schema.init_added_columns()  # Idempotent
+        geo_search.init_geo_columns()
+
+        columns = {
+            column["name"]: str(column["type"])
+            for column in db.inspect(db.engine).get_columns("provider_profile")
+        }
+        for column in (
+            schema.ADDED_COLUMNS["provider_profile"]
+            + geo_search.GEO_COLUMNS["provider_profile"]
+        ):
+            self.assertIn(column, columns)
+        self.assertEqual(columns["skills"], "TEXT")
+        self.assertEqual(columns["service_area"], "VARCHAR(200)")
+        self.assertEqual(columns["latitude"], "FLOAT")
+
+
+class TestSearchMetrics(SearchTestCase):
+    """Search requests are traced and aggregated by filter combination"""
+
+    def setUp(self):
+        super().setUp()
+        self.app.register_blueprint(advanced_search_bp)
+        self.client = self.app.test_client()
+        search_metrics.search_metrics.reset()
+
+    def group(self, endpoint):
+        groups = search_metrics.search_metrics.snapshot()
+        return next(group for group in groups if group["endpoint"] == endpoint)
+
+    def test_requests_grouped_by_filter_combination(self):
+        for url in (
+            "/api/search/jobs?q=leak&location=Sydney&page=1",
+            "/api/search/jobs?location=Melbourne&q=hedge&sort_by=date",
+            "/api/search/jobs?category=Plumbing",
+        ):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        groups = search_metrics.search_metrics.snapshot()
+        filters = sorted(group["filters"] for group in groups)
+        self.assertEqual(filters, [["category"], ["location", "q"]])
+
+        group = next(group for group in groups if group["filters"] == ["location", "q"])
+        self.assertEqual(group["requests"], 2)
+        self.assertEqual(group["sorts"], {"default": 1, "date": 1})
+        self.assertEqual(group["rows_returned"]["count"], 2)
+        self.assertEqual(group["rows_returned"]["max"], 1)
+        self.assertGreaterEqual(group["statements"]["mean"], 2)  # Page and count
+        self.assertEqual(group["slow_plans"], [])
+
+    def test_cache_hits_are_counted(self):
+        self.client.get("/api/search/providers?skills=tiling")
+        self.client.get("/api/search/providers?skills=tiling")
+        group = self.group("providers")
+        self.assertEqual((group["requests"], group["cache_hits"]), (2, 1))
+        self.assertEqual(group["statements"]["buckets"]["le_1"], 1)
+
+    def test_slow_statements_are_explained_off_the_request(self):
+        explain = search_metrics.explain
+        threads = []
+
+        def explain_on(*args):
+            threads.append(threading.current_thread().name)
+            return explain(*args)
+
+        with (
+            mock.patch.object(search_metrics, "EXPLAIN_THRESHOLD_MS", 1e-6),
+            mock.patch.object(search_metrics, "explain", explain_on),
+        ):
+            self.client.get("/api/search/jobs?q=leak&sort_by=budget")
+            search_metrics.plan_explainer.join()
+        self.assertEqual(set(threads), {"search-explain"})
+        plans = self.group("jobs")["slow_plans"]
+        self.assertTrue(plans)
+        self.assertTrue(all(plan["plan"] for plan in plans))
+        self.assertEqual(plans[0]["sort_by"], "budget")
+        self.assertIsNone(plans[0]["rows_scanned"])  # Not in SQLite plans
+
+    def test_rows_scanned_from_analyzed_plans(self):
+        plan = {
+            "Node Type": "Nested Loop",
+            "Plans": [
+                {
+                    "Node Type": "Seq Scan",
+                    "Actual Rows": 10,
+                    "Rows Removed by Filter": 990,
+                    "Actual Loops": 1,
+                },
+                {
+                    "Node Type": "Bitmap Heap Scan",
+                    "Actual Rows": 2,
+                    "Rows Removed by Index Recheck": 1,
+                    "Actual Loops": 10,
+                    "Plans": [
+                        {
+                            "Node Type": "Bitmap Index Scan",
+                            "Actual Rows": 3,
+                            "Actual Loops": 10,
+                        }
+                    ],
+                },
+            ],
+        }
+        self.assertEqual(search_metrics._rows_scanned(plan), 1000 + 30)
+
+    def test_untraced_queries_are_ignored(self):
+        self.engine.search_jobs(query="leak")
+        self.assertEqual(search_metrics.search_metrics.snapshot(), [])
+
+    def test_histogram_buckets_and_quantiles(self):
+        histogram = search_metrics.Histogram((10, 100))
+        for value in (1, 5, 50, 500):
+            histogram.observe(value)
+        summary = histogram.to_dict()
+        self.assertEqual(summary["buckets"], {"le_10": 2, "le_100": 1, "inf": 1})
+        self.assertEqual((summary["p50"], summary["p95"]), (10, 500))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Fit the semantic skill matcher for Biped Platform
+
+Fits the TF-IDF skill vectorizer on the skill vocabulary and job titles and
+descriptions, indexes every provider's skills, and saves the model to
+``SKILL_MATCHER_PATH`` for BipedAIEngine to load at startup. Re-run after
+large changes to the skill vocabulary.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ai_engine import SKILL_MATCHER_PATH, SemanticSkillMatcher
+
+from src.main import app
+from src.models import Job, ProviderProfile, Skill, db
+from src.services.provider_skills import provider_skill_sets
+
+
+def train(path=SKILL_MATCHER_PATH):
+    """Fit, index providers and save the skill matcher"""
+    with app.app_context():
+        try:
+            vocabulary = [name for (name,) in db.session.query(Skill.name)]
+            jobs = [
+                f"{title} {description}"
+                for title, description in db.session.query(Job.title, Job.description)
+            ]
+            matcher = SemanticSkillMatcher.fit(vocabulary, jobs)
+
+            # Same ids and skills as the providers built by /api/ai/find-matches
+            profiles = db.session.query(ProviderProfile.id, ProviderProfile.user_id)
+            profiles = profiles.all()
+            skill_sets = provider_skill_sets([profile_id for profile_id, _ in profiles])
+            matcher.index_providers(
+                [
+                    (str(user_id), sorted(skill_sets[profile_id]))
+                    for profile_id, user_id in profiles
+                ]
+            )
+            matcher.save(path)
+            print(
+                f"✅ Fitted skill matcher on {len(vocabulary)} skills and "
+                f"{len(jobs)} jobs, indexed {len(profiles)} providers: {path}"
+            )
+
+        except Exception as e:
+            print(f"❌ Error training skill matcher: {e}")
+
+
+if __name__ == "__main__":
+    train()